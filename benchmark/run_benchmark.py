@@ -0,0 +1,49 @@
+"""
+Launch script of the benchmarks of the REST clients, see benchmark.src.benchmark
+
+They run offline against a local replay exchange. The process exits with 1 if a benchmark regressed from the baseline.
+
+usage:
+    python benchmark/run_benchmark.py [--n-calls 200] [--only get_orderbook] [--save-baseline]
+"""
+import argparse
+import os
+import sys
+
+from core import root_folder
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../'
+
+from benchmark.src.benchmark import BENCHMARKS, run_benchmarks, compare_to_baseline, load_baseline, save_baseline, \
+    format_results
+from benchmark.src.replay_exchange import ReplayExchange
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the REST clients against a local replay exchange')
+    parser.add_argument('--n-calls', type=int, default=200, help='timed calls per benchmark')
+    parser.add_argument('--only', help='run only the benchmarks whose name contains this')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args()
+
+    benchmarks = [benchmark for benchmark in BENCHMARKS if args.only is None or args.only in benchmark.name]
+    exchange = ReplayExchange()
+    try:
+        results = run_benchmarks(exchange, benchmarks, args.n_calls)
+    finally:
+        exchange.stop()
+
+    baseline = load_baseline()
+    print(format_results(results, baseline))
+    if args.save_baseline:
+        save_baseline({**baseline, **results})
+        return 0
+    regressions = compare_to_baseline(results, baseline)
+    for name, metric, reference, value in regressions:
+        print(f'REGRESSION {name} {metric}: {reference:.3f} -> {value:.3f}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
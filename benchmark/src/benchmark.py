@@ -0,0 +1,233 @@
+"""
+Benchmarks of the public endpoints of the REST clients, run against a ReplayExchange
+
+For each call the latency is split between the network, as timed by the transport (connect, ttfb and download), and
+the client, the rest: building the request, decoding the body and parsing it into the returned object. The client
+time is what a change of the parsing moves, so it is what is compared to the baseline, along with the memory
+allocated per call.
+
+usage:
+    results = run_benchmarks()
+    regressions = compare_to_baseline(results, load_baseline())
+"""
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from core.src.constants import PATH_TO_DATA
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN, DERIBIT
+from core.src.spot_syms import ETHUSD
+from rest.src.instrumentation import RequestMetrics, TIMINGS, CONNECT, TTFB, DOWNLOAD
+from rest.src.market_data_rest_factory import MARKET_DATA_REST_APIS
+
+BASELINE_PATH = PATH_TO_DATA + 'benchmark_baseline.json'
+
+FUTURE_SYM = 'FUT_ETHUSD_230630'
+OPTION_SYM = 'C_ETHUSD_230630_1200'
+
+# keys of the results of a benchmark
+N_CALLS = 'n_calls'
+CALLS_PER_SECOND = 'calls_per_second'
+LATENCY_P50 = 'latency_p50_ms'
+LATENCY_P99 = 'latency_p99_ms'
+CLIENT_P50 = 'client_p50_ms'
+CLIENT_P99 = 'client_p99_ms'
+ALLOCATED_KIB = 'allocated_kib'
+
+# metric -> relative increase over the baseline from which it is a regression, the timings are noisier than the
+# allocations
+TOLERANCES = {CLIENT_P50: 0.3, ALLOCATED_KIB: 0.1}
+
+# the allocations are traced over fewer calls as tracing slows them down
+N_TRACED_CALLS = 20
+
+
+class Benchmark:
+    __slots__ = ['name', 'market', 'instrument_type', 'call']
+
+    def __init__(self, name, market, instrument_type, call):
+        """
+
+        :param name: str, unique, eg: kraken_spot.get_orderbook
+        :param market: str, eg: KRAKEN
+        :param instrument_type: str, eg: SPOT
+        :param call: function, api -> anything, the call to time
+        """
+        self.name = name
+        self.market = market
+        self.instrument_type = instrument_type
+        self.call = call
+
+
+BENCHMARKS = [
+    Benchmark('kraken_spot.get_orderbook', KRAKEN, SPOT, lambda api: api.get_orderbook(ETHUSD, 100)),
+    Benchmark('kraken_spot.get_orderbook_full', KRAKEN, SPOT, lambda api: api.get_orderbook(ETHUSD, 500)),
+    Benchmark('kraken_spot.get_tob_quote', KRAKEN, SPOT, lambda api: api.get_tob_quote(ETHUSD)),
+    Benchmark('kraken_spot.get_tob_mid', KRAKEN, SPOT, lambda api: api.get_tob_mid(ETHUSD)),
+    Benchmark('kraken_spot.get_ohlc', KRAKEN, SPOT, lambda api: api.get_ohlc(ETHUSD)),
+    Benchmark('kraken_spot.get_close', KRAKEN, SPOT, lambda api: api.get_close(ETHUSD)),
+    Benchmark('kraken_spot.get_tickers', KRAKEN, SPOT, lambda api: api.get_tickers([ETHUSD])),
+    Benchmark('kraken_spot.get_trades', KRAKEN, SPOT, lambda api: api.get_trades(ETHUSD)),
+    Benchmark('kraken_spot.get_fee_schedule', KRAKEN, SPOT, lambda api: api.get_fee_schedule(ETHUSD)),
+    Benchmark('kraken_future.get_orderbook', KRAKEN, FUTURE, lambda api: api.get_orderbook(FUTURE_SYM, 10)),
+    Benchmark('kraken_future.get_tob_quote', KRAKEN, FUTURE, lambda api: api.get_tob_quote(FUTURE_SYM)),
+    Benchmark('kraken_future.get_ohlc', KRAKEN, FUTURE, lambda api: api.get_ohlc(FUTURE_SYM)),
+    Benchmark('kraken_future.get_close', KRAKEN, FUTURE, lambda api: api.get_close(FUTURE_SYM)),
+    Benchmark('kraken_future.get_tickers', KRAKEN, FUTURE, lambda api: api.get_tickers()),
+    Benchmark('kraken_future.get_fee_schedule', KRAKEN, FUTURE, lambda api: api.get_fee_schedule(FUTURE_SYM)),
+    Benchmark('deribit_option.get_orderbook', DERIBIT, OPTION, lambda api: api.get_orderbook(OPTION_SYM, 10)),
+    Benchmark('deribit_option.get_tob_quote', DERIBIT, OPTION, lambda api: api.get_tob_quote(OPTION_SYM)),
+    Benchmark('deribit_option.get_ohlc', DERIBIT, OPTION, lambda api: api.get_ohlc(OPTION_SYM)),
+    Benchmark('deribit_option.get_close', DERIBIT, OPTION, lambda api: api.get_close(OPTION_SYM)),
+    Benchmark('deribit_option.get_option_chain', DERIBIT, OPTION, lambda api: api.get_option_chain(ETHUSD)),
+]
+
+
+def make_api(benchmark, exchange):
+    """
+    :param benchmark: Benchmark
+    :param exchange: ReplayExchange
+    :return: MarketDataRestApi, a new client pointed to the exchange, that does not cache the responses
+    """
+    api = exchange.connect(MARKET_DATA_REST_APIS[(benchmark.market, benchmark.instrument_type)]())
+    api.response_cache = None
+    api.request_metrics = RequestMetrics()
+    return api
+
+
+def run_benchmark(benchmark, api, n_calls=200, n_warmup=10):
+    """
+    :param benchmark: Benchmark
+    :param api: MarketDataRestApi, see make_api
+    :param n_calls: int, number of timed calls
+    :param n_warmup: int, number of calls before, not timed, to open the connection and fill the caches of syms
+    :return: dict, with keys [N_CALLS, CALLS_PER_SECOND, LATENCY_P50, LATENCY_P99, CLIENT_P50, CLIENT_P99,
+        ALLOCATED_KIB], the allocations being the peak of the memory allocated during a call
+    """
+    for _ in range(n_warmup):
+        benchmark.call(api)
+
+    # seconds on the network of each attempt
+    network = []
+
+    def record_network(event):
+        timings = event[TIMINGS]
+        network.append(timings.get(CONNECT, 0.) + timings.get(TTFB, 0.) + timings.get(DOWNLOAD, 0.))
+
+    api.request_metrics.add_hook(record_network)
+    latencies = np.empty(n_calls)
+    client_times = np.empty(n_calls)
+    try:
+        start = time.perf_counter()
+        for i in range(n_calls):
+            call_start = time.perf_counter()
+            benchmark.call(api)
+            latencies[i] = time.perf_counter() - call_start
+            client_times[i] = latencies[i] - sum(network)
+            network.clear()
+        elapsed = time.perf_counter() - start
+    finally:
+        api.request_metrics.remove_hook(record_network)
+
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(min(n_calls, N_TRACED_CALLS)):
+            tracemalloc.reset_peak()
+            current, _ = tracemalloc.get_traced_memory()
+            benchmark.call(api)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - current)
+    finally:
+        tracemalloc.stop()
+
+    return {N_CALLS: n_calls,
+            CALLS_PER_SECOND: n_calls / elapsed,
+            LATENCY_P50: np.percentile(latencies, 50) * 1000,
+            LATENCY_P99: np.percentile(latencies, 99) * 1000,
+            CLIENT_P50: np.percentile(client_times, 50) * 1000,
+            CLIENT_P99: np.percentile(client_times, 99) * 1000,
+            ALLOCATED_KIB: float(np.median(peaks)) / 1024}
+
+
+def run_benchmarks(exchange, benchmarks=None, n_calls=200, n_warmup=10):
+    """
+    :param exchange: ReplayExchange
+    :param benchmarks: list, of Benchmark, all by default
+    :param n_calls: int, see run_benchmark
+    :param n_warmup: int, see run_benchmark
+    :return: dict, name of the benchmark -> results, see run_benchmark
+    """
+    results = {}
+    for benchmark in BENCHMARKS if benchmarks is None else benchmarks:
+        api = make_api(benchmark, exchange)
+        results[benchmark.name] = run_benchmark(benchmark, api, n_calls, n_warmup)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerances=None):
+    """
+    :param results: dict, see run_benchmarks
+    :param baseline: dict, same as results, from a previous run
+    :param tolerances: dict, metric -> relative increase from which it is a regression, TOLERANCES by default
+    :return: list, of tuples (name, metric, baseline value, value) of the regressions, the benchmarks missing from
+        the baseline are ignored
+    """
+    tolerances = TOLERANCES if tolerances is None else tolerances
+    regressions = []
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        for metric, tolerance in tolerances.items():
+            reference = baseline[name].get(metric)
+            if reference is not None and metrics[metric] > reference * (1 + tolerance):
+                regressions.append((name, metric, reference, metrics[metric]))
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    """
+    :param path: str
+    :return: dict, see run_benchmarks, empty if there is no baseline
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """
+    :param results: dict, see run_benchmarks
+    :param path: str
+    """
+    with open(path, 'w') as f:
+        json.dump({name: {metric: round(value, 4) for metric, value in metrics.items()}
+                   for name, metrics in results.items()}, f, indent=4, sort_keys=True)
+        f.write('\n')
+
+
+def format_results(results, baseline=None):
+    """
+    :param results: dict, see run_benchmarks
+    :param baseline: dict, optional, adds the change of the client p50 to it
+    :return: str, a table with one row per benchmark
+    """
+    header = f'{"benchmark":<36}{"calls/s":>10}{"p50 ms":>10}{"p99 ms":>10}{"client p50":>12}{"client p99":>12}' \
+             f'{"KiB":>10}'
+    if baseline is not None:
+        header += f'{"vs base":>10}'
+    lines = [header]
+    for name, metrics in results.items():
+        line = f'{name:<36}{metrics[CALLS_PER_SECOND]:>10.0f}{metrics[LATENCY_P50]:>10.3f}' \
+               f'{metrics[LATENCY_P99]:>10.3f}{metrics[CLIENT_P50]:>12.3f}{metrics[CLIENT_P99]:>12.3f}' \
+               f'{metrics[ALLOCATED_KIB]:>10.1f}'
+        if baseline is not None:
+            reference = baseline.get(name, {}).get(CLIENT_P50)
+            line += f'{metrics[CLIENT_P50] / reference - 1:>+10.0%}' if reference else f'{"-":>10}'
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,73 @@
+"""
+A LocalExchange serving the replayed responses from its own process
+
+The server does not share the interpreter of the benchmarked clients, so that it neither holds their GIL nor shows in
+their allocations.
+
+usage:
+    exchange = ReplayExchange()
+    api = exchange.connect(MarketDataRestApiKrakenSpot())
+    ...
+    exchange.stop()
+"""
+import multiprocessing
+
+from benchmark.src.replay_routes import make_replay_routes, FUTURE_MARKET_SYMS
+from rest.src.retry import CircuitBreaker
+from rest.test.local_exchange import LocalExchange
+
+
+def _serve(connection, seed, future_market_syms):
+    """
+    Run the server until anything is sent on the connection
+
+    :param connection: multiprocessing.connection.Connection, the url of the server is sent on it
+    :param seed: int
+    :param future_market_syms: list, of str
+    """
+    exchange = LocalExchange(make_replay_routes(seed, future_market_syms))
+    connection.send(exchange.url)
+    try:
+        connection.recv()
+    except EOFError:
+        # the parent is gone
+        pass
+    exchange.stop()
+
+
+class ReplayExchange:
+
+    def __init__(self, seed=0, future_market_syms=FUTURE_MARKET_SYMS, timeout=30.):
+        """
+
+        :param seed: int, of the generator of the responses, see make_replay_routes
+        :param future_market_syms: list, of str, see make_replay_routes
+        :param timeout: float, in seconds, to wait for the server to start
+        """
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_serve, args=(child_connection, seed, list(future_market_syms)),
+                                               daemon=True)
+        self.process.start()
+        if not self.connection.poll(timeout):
+            self.process.kill()
+            raise Exception(f'The replay exchange did not start within {timeout} seconds')
+        # to be used as api_url
+        self.url = self.connection.recv()
+
+    def connect(self, api):
+        """
+        Point a client to this exchange, see LocalExchange.connect
+
+        :param api: MarketDataRestApi
+        :return: MarketDataRestApi, api
+        """
+        api.api_url = self.url
+        api.rate_limiter = None
+        api.circuit_breaker = CircuitBreaker(api.market)
+        return api
+
+    def stop(self):
+        if self.process.is_alive():
+            self.connection.send(None)
+            self.process.join(5.)
+        self.connection.close()
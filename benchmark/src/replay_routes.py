@@ -0,0 +1,275 @@
+"""
+Responses of every public endpoint used by the Kraken spot, Kraken futures and Deribit clients, to be served by
+LocalExchange
+
+They have the shape and the size of the responses of the exchanges, as recorded from them: full depth books, 720 bars,
+the whole board of tickers and option summaries, the levels sent as strings where the exchange does so. The numbers
+are drawn from a seeded generator and each distinct request is always answered with the same response, so that two
+runs of the benchmarks parse the same bytes.
+
+usage:
+    exchange = LocalExchange(make_replay_routes())
+"""
+import datetime
+
+import numpy as np
+
+from core.src.date import get_current_timestamp, today_date, MINUTES_PER_DAY
+
+# levels of the full books, Kraken spot sends at most 500 per side
+N_LEVELS = 500
+# number of bars of the ohlc endpoints of Kraken spot
+N_BARS = 720
+N_TRADES = 1000
+N_OPTIONS = 700
+# Kraken futures board, fixed maturities and perpetuals, and what is not a future: indices and multi-collateral ones
+FUTURE_PAIRS = ['XBTUSD', 'ETHUSD', 'LTCUSD', 'XRPUSD', 'BCHUSD', 'SOLUSD', 'ADAUSD', 'DOTUSD', 'LINKUSD', 'ATOMUSD']
+FUTURE_EXPIRIES = ['230630', '230728', '230929', '231229']
+DERIBIT_EXPIRIES = ['7JUL23', '14JUL23', '28JUL23', '25AUG23', '29SEP23', '29DEC23', '29MAR24']
+KRAKEN_FUTURE_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+# the charts of Kraken futures have the name of the future in their path, these are served
+FUTURE_MARKET_SYMS = ['FI_ETHUSD_230630', 'PI_ETHUSD']
+
+
+def _first(values):
+    """
+    :param values: list, of the values of a query or form argument, or None
+    :return: str, None if there is none
+    """
+    return values[0] if values else None
+
+
+def replayed(route):
+    """
+    :param route: function, (query, form) -> json response
+    :return: function, same as route but each distinct request is answered with the same response, built once
+    """
+    responses = {}
+
+    def replay(query, form):
+        key = tuple((name, tuple(values)) for arguments in [query, form] for name, values in sorted(arguments.items()))
+        if key not in responses:
+            responses[key] = route(query, form)
+        return responses[key]
+
+    return replay
+
+
+def _kraken_future_server_time():
+    return datetime.datetime.now(datetime.timezone.utc).strftime(KRAKEN_FUTURE_TIME_FORMAT)
+
+
+def _format(value, decimals):
+    return f'{value:.{decimals}f}'
+
+
+def make_levels(random, n_levels, mid, tick, as_text, n_extra=0):
+    """
+    :param random: np.random.RandomState
+    :param n_levels: int, per side
+    :param mid: float
+    :param tick: float, price increment between two levels
+    :param as_text: bool, send the prices and sizes as strings, as Kraken spot does
+    :param n_extra: int, number of fields after price and size, eg: the timestamp of the level for Kraken spot
+    :return: tuple, (bids, asks) as lists of levels from the best
+    """
+    now = int(get_current_timestamp())
+    sides = []
+    for sign in [-1, 1]:
+        prices = mid + sign * tick * (np.arange(n_levels) + 1)
+        sizes = random.exponential(2., n_levels).round(3) + 0.001
+        levels = []
+        for price, size in zip(prices.tolist(), sizes.tolist()):
+            level = [_format(price, 2), _format(size, 3)] if as_text else [round(price, 8), size]
+            level += [now - int(random.randint(0, 600))] * n_extra
+            levels.append(level)
+        sides.append(levels)
+    return sides[0], sides[1]
+
+
+def make_bar_times(n_bars, interval, end=None):
+    """
+    :param n_bars: int
+    :param interval: int, frequency in minutes
+    :param end: int, timestamp in seconds of the last bar, by default the bar in progress
+    :return: list, of int timestamps in seconds, daily bars start at midnight
+    """
+    if interval >= MINUTES_PER_DAY:
+        today = datetime.datetime.combine(today_date(), datetime.time.min)
+        days = interval // MINUTES_PER_DAY
+        return [int((today - datetime.timedelta(days=days * k)).timestamp()) for k in range(n_bars)][::-1]
+    step = interval * 60
+    end = int(get_current_timestamp()) // step * step if end is None else end
+    return [end - step * k for k in range(n_bars)][::-1]
+
+
+def make_closes(random, n_bars, start_price):
+    """
+    :return: np.ndarray, a random walk
+    """
+    return start_price * np.exp(np.cumsum(random.normal(0., 0.01, n_bars)))
+
+
+def make_replay_routes(seed=0, future_market_syms=FUTURE_MARKET_SYMS):
+    """
+    :param seed: int
+    :param future_market_syms: list, of Kraken futures names whose charts are served, their path holds the name
+    :return: dict, path -> route, see LocalExchange
+    """
+    random = np.random.RandomState(seed)
+
+    def kraken_spot_depth(query, form):
+        pair = _first(form.get('pair'))
+        count = min(int(_first(form.get('count')) or 100), N_LEVELS)
+        bids, asks = make_levels(random, count, 1800., 0.01, as_text=True, n_extra=1)
+        return {'error': [], 'result': {pair: {'bids': bids, 'asks': asks}}}
+
+    def kraken_spot_ohlc(query, form):
+        pair = _first(form.get('pair'))
+        interval = int(_first(form.get('interval')) or 1)
+        times = make_bar_times(N_BARS, interval)
+        closes = make_closes(random, len(times), 1800.)
+        bars = [[t, _format(close * 0.999, 2), _format(close * 1.01, 2), _format(close * 0.99, 2),
+                 _format(close, 2), _format(close * 1.001, 2), _format(random.exponential(100.), 8),
+                 int(random.randint(1, 500))]
+                for t, close in zip(times, closes.tolist())]
+        return {'error': [], 'result': {pair: bars, 'last': times[-1]}}
+
+    def kraken_spot_ticker(query, form):
+        result = {}
+        for pair in _first(form.get('pair')).split(','):
+            price = 1800. * (1 + random.normal(0., 0.01))
+            result[pair] = {'a': [_format(price + 0.01, 2), '1', '1.000'], 'b': [_format(price, 2), '2', '2.000'],
+                            'c': [_format(price, 2), '0.10000000'], 'v': ['1000.0', '25000.0'],
+                            'p': [_format(price, 2), _format(price * 1.001, 2)], 't': [1000, 25000],
+                            'l': [_format(price * 0.98, 2)] * 2, 'h': [_format(price * 1.02, 2)] * 2,
+                            'o': _format(price * 0.995, 2)}
+        return {'error': [], 'result': result}
+
+    def kraken_spot_trades(query, form):
+        pair = _first(form.get('pair'))
+        since = float(_first(form.get('since')) or get_current_timestamp() - 3600)
+        times = since + np.sort(random.uniform(0., 3600., N_TRADES))
+        prices = make_closes(random, N_TRADES, 1800.)
+        trades = [[_format(price, 2), _format(random.exponential(1.), 8), round(t, 4), 'b', 'l', '', i]
+                  for i, (t, price) in enumerate(zip(times.tolist(), prices.tolist()))]
+        return {'error': [], 'result': {pair: trades, 'last': str(int(times[-1] * 1e9))}}
+
+    def kraken_spot_asset_pairs(query, form):
+        pair = _first(form.get('pair'))
+        return {'error': [], 'result': {pair: {
+            'altname': pair, 'wsname': pair, 'aclass_base': 'currency', 'base': pair[:4], 'quote': pair[4:],
+            'pair_decimals': 2, 'lot_decimals': 8, 'ordermin': '0.01',
+            'fees': [[0, 0.26], [50000, 0.24], [100000, 0.22], [250000, 0.2], [500000, 0.18], [1000000, 0.16],
+                     [2500000, 0.14], [5000000, 0.12], [10000000, 0.1]],
+            'fees_maker': [[0, 0.16], [50000, 0.14], [100000, 0.12], [250000, 0.1], [500000, 0.08], [1000000, 0.06],
+                           [2500000, 0.04], [5000000, 0.02], [10000000, 0.0]],
+            'fee_volume_currency': 'ZUSD', 'margin_call': 80, 'margin_stop': 40}}}
+
+    def kraken_future_orderbook(query, form):
+        bids, asks = make_levels(random, N_LEVELS, 1800., 0.05, as_text=False)
+        return {'result': 'success', 'serverTime': _kraken_future_server_time(),
+                'orderBook': {'bids': bids, 'asks': asks}}
+
+    def kraken_future_tickers(query, form):
+        symbols = []
+        for pair in FUTURE_PAIRS:
+            symbols += ['pi_' + pair.lower(), 'pf_' + pair.lower(), 'in_' + pair.lower()]
+            symbols += ['fi_' + pair.lower() + '_' + expiry for expiry in FUTURE_EXPIRIES]
+        tickers = []
+        for symbol in symbols:
+            price = 1800. * (1 + random.normal(0., 0.01))
+            ticker = {'symbol': symbol, 'last': price, 'lastTime': '2023-05-01T10:00:00.000Z', 'tag': 'perpetual',
+                      'pair': symbol[3:].upper(), 'markPrice': price, 'bid': price - 0.5, 'bidSize': 1000.,
+                      'ask': price + 0.5, 'askSize': 2000., 'vol24h': 100000., 'openInterest': 500000.,
+                      'open24h': price * 0.99, 'indexPrice': price, 'suspended': False, 'postOnly': False}
+            if symbol.startswith('pi_'):
+                ticker['fundingRate'] = random.normal(0., 1e-9)
+            tickers.append(ticker)
+        return {'result': 'success', 'serverTime': _kraken_future_server_time(),
+                'tickers': tickers}
+
+    def kraken_future_chart(query, form):
+        times = make_bar_times(N_BARS, MINUTES_PER_DAY)
+        start, end = _first(query.get('from')), _first(query.get('to'))
+        times = [t for t in times if (start is None or t >= int(start)) and (end is None or t < int(end))]
+        closes = make_closes(random, len(times), 1800.)
+        candles = [{'time': t * 1000, 'open': _format(close * 0.999, 2), 'high': _format(close * 1.01, 2),
+                    'low': _format(close * 0.99, 2), 'close': _format(close, 2), 'volume': int(random.randint(1, 1000))}
+                   for t, close in zip(times, closes.tolist())]
+        return {'candles': candles, 'more_candles': False}
+
+    def kraken_future_fee_schedules(query, form):
+        tiers = [{'usdVolume': volume, 'takerFee': taker, 'makerFee': maker}
+                 for volume, taker, maker in [(0, 0.05, 0.02), (100000, 0.04, 0.015), (1000000, 0.035, 0.0125),
+                                              (5000000, 0.03, 0.01), (10000000, 0.025, 0.0075),
+                                              (20000000, 0.02, 0.005), (50000000, 0.015, 0.0025),
+                                              (100000000, 0.01, 0.)]]
+        return {'result': 'success', 'feeSchedules': [{'name': 'Tiered fees', 'uid': 'tiered', 'tiers': tiers},
+                                                      {'name': 'Opt out', 'uid': 'opt-out', 'tiers': tiers[:1]}]}
+
+    def deribit_order_book(query, form):
+        name = _first(query.get('instrument_name'))
+        depth = min(int(_first(query.get('depth')) or 20), N_LEVELS)
+        bids, asks = make_levels(random, depth, 0.05, 0.0005, as_text=False)
+        return {'jsonrpc': '2.0', 'usIn': 0, 'usOut': 0, 'usDiff': 0, 'testnet': False, 'result': {
+            'instrument_name': name, 'underlying_price': 1800. * (1 + random.normal(0., 0.001)),
+            'underlying_index': 'ETH-30JUN23', 'timestamp': int(get_current_timestamp() * 1000), 'state': 'open',
+            'bids': bids, 'asks': asks, 'best_bid_price': bids[0][0], 'best_ask_price': asks[0][0],
+            'best_bid_amount': bids[0][1], 'best_ask_amount': asks[0][1], 'mark_price': 0.05, 'mark_iv': 60.,
+            'bid_iv': 58., 'ask_iv': 62., 'index_price': 1800., 'open_interest': 1000., 'interest_rate': 0.,
+            'greeks': {'delta': 0.5, 'gamma': 0.001, 'vega': 2., 'theta': -3., 'rho': 0.5},
+            'stats': {'high': 0.06, 'low': 0.04, 'price_change': 1., 'volume': 100., 'volume_usd': 9000.}}}
+
+    def deribit_chart(query, form):
+        start = int(_first(query.get('start_timestamp')))
+        end = int(_first(query.get('end_timestamp')))
+        resolution = _first(query.get('resolution'))
+        interval = MINUTES_PER_DAY if resolution == '1D' else int(resolution)
+        times = [t * 1000 for t in make_bar_times(N_BARS, interval) if start <= t * 1000 <= end]
+        closes = make_closes(random, len(times), 0.05)
+        return {'jsonrpc': '2.0', 'result': {'ticks': times,
+                                             'open': (closes * 0.999).round(4).tolist(),
+                                             'high': (closes * 1.01).round(4).tolist(),
+                                             'low': (closes * 0.99).round(4).tolist(),
+                                             'close': closes.round(4).tolist(),
+                                             'volume': random.exponential(10., len(times)).round(2).tolist(),
+                                             'cost': random.exponential(1000., len(times)).round(2).tolist(),
+                                             'status': 'ok' if times else 'no_data'}}
+
+    def deribit_book_summary(query, form):
+        currency = _first(query.get('currency'))
+        strikes = np.arange(N_OPTIONS // (2 * len(DERIBIT_EXPIRIES)) + 1) * 50 + 1000
+        summaries = []
+        now = int(get_current_timestamp() * 1000)
+        for expiry in DERIBIT_EXPIRIES:
+            for strike in strikes.tolist():
+                for option_type in ['C', 'P']:
+                    mark = max(random.normal(0.05, 0.02), 0.0005)
+                    has_bid = random.uniform() > 0.1
+                    summaries.append({'instrument_name': f'{currency}-{expiry}-{strike}-{option_type}',
+                                      'base_currency': currency, 'quote_currency': currency,
+                                      'bid_price': round(mark * 0.98, 4) if has_bid else None,
+                                      'ask_price': round(mark * 1.02, 4), 'mark_price': mark, 'mark_iv': 60.,
+                                      'mid_price': mark, 'underlying_price': 1800., 'underlying_index': 'index_price',
+                                      'interest_rate': 0., 'open_interest': 100., 'volume': 10., 'volume_usd': 900.,
+                                      'high': None, 'low': None, 'last': None, 'price_change': None,
+                                      'estimated_delivery_price': 1800., 'creation_timestamp': now})
+        return {'jsonrpc': '2.0', 'result': summaries[:N_OPTIONS]}
+
+    routes = {
+        '/public/Depth': kraken_spot_depth,
+        '/public/OHLC': kraken_spot_ohlc,
+        '/public/Ticker': kraken_spot_ticker,
+        '/public/Trades': kraken_spot_trades,
+        '/public/AssetPairs': kraken_spot_asset_pairs,
+        '/derivatives/api/v3/orderbook': kraken_future_orderbook,
+        '/derivatives/api/v3/tickers': kraken_future_tickers,
+        '/derivatives/api/v3/feeschedules': kraken_future_fee_schedules,
+        '/public/get_order_book': deribit_order_book,
+        '/public/get_tradingview_chart_data': deribit_chart,
+        '/public/get_book_summary_by_currency': deribit_book_summary,
+    }
+    for market_sym in future_market_syms:
+        routes[f'/api/charts/v1/mark/{market_sym}/1d'] = kraken_future_chart
+    return {path: replayed(route) for path, route in routes.items()}
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from core import root_folder
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from benchmark.src.benchmark import BENCHMARKS, make_api, run_benchmark, compare_to_baseline, load_baseline, \
+    save_baseline, format_results, N_CALLS, CLIENT_P50, LATENCY_P50, ALLOCATED_KIB, CALLS_PER_SECOND
+from benchmark.src.replay_exchange import ReplayExchange
+from benchmark.src.replay_routes import replayed
+
+
+class TestBenchmark(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.exchange = ReplayExchange()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.exchange.stop()
+
+    def test_every_benchmark_runs(self):
+        names = set()
+        for benchmark in BENCHMARKS:
+            with self.subTest(benchmark.name):
+                results = run_benchmark(benchmark, make_api(benchmark, self.exchange), n_calls=3, n_warmup=1)
+                self.assertEqual(results[N_CALLS], 3)
+                self.assertGreater(results[CALLS_PER_SECOND], 0)
+                self.assertGreater(results[ALLOCATED_KIB], 0)
+                self.assertLessEqual(results[CLIENT_P50], results[LATENCY_P50])
+            names.add(benchmark.name)
+        self.assertEqual(len(names), len(BENCHMARKS))
+
+    def test_responses_are_replayed(self):
+        api = make_api(BENCHMARKS[0], self.exchange)
+        first, second = [api.get_orderbook('ETHUSD', 10, as_frame=False) for _ in range(2)]
+        self.assertEqual(first.bid_prices.tolist(), second.bid_prices.tolist())
+        self.assertEqual(first.market_timestamp, second.market_timestamp)
+
+    def test_replayed(self):
+        calls = []
+        route = replayed(lambda query, form: calls.append(query) or len(calls))
+        self.assertEqual(route({'a': ['1']}, {}), 1)
+        self.assertEqual(route({'a': ['1']}, {}), 1)
+        self.assertEqual(route({'a': ['2']}, {}), 2)
+        self.assertEqual(len(calls), 2)
+
+    def test_compare_to_baseline(self):
+        baseline = {'a': {CLIENT_P50: 1., ALLOCATED_KIB: 100.}, 'b': {CLIENT_P50: 1., ALLOCATED_KIB: 100.}}
+        results = {'a': {CLIENT_P50: 1.2, ALLOCATED_KIB: 150.},
+                   'b': {CLIENT_P50: 2., ALLOCATED_KIB: 90.},
+                   'c': {CLIENT_P50: 10., ALLOCATED_KIB: 1000.}}
+        self.assertEqual(compare_to_baseline(results, baseline),
+                         [('a', ALLOCATED_KIB, 100., 150.), ('b', CLIENT_P50, 1., 2.)])
+        self.assertEqual(compare_to_baseline(results, baseline, {CLIENT_P50: 1.}), [])
+
+    def test_baseline_round_trip(self):
+        benchmark = BENCHMARKS[0]
+        results = {benchmark.name: run_benchmark(benchmark, make_api(benchmark, self.exchange), n_calls=3,
+                                                 n_warmup=1)}
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'baseline.json')
+            self.assertEqual(load_baseline(path), {})
+            save_baseline(results, path)
+            baseline = load_baseline(path)
+        self.assertEqual(set(baseline[benchmark.name]), set(results[benchmark.name]))
+        self.assertIn(benchmark.name, format_results(results, baseline))
+
+
+if __name__ == '__main__':
+    unittest.main()
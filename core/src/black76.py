@@ -0,0 +1,174 @@
+"""
+Black-76 pricing of options on a forward, every function works on whole numpy arrays at once
+
+Prices are in the currency of the forward, rates are taken as 0 as the Deribit underlying price is already the forward
+of the expiry. Missing prices (no bid or no ask) are nan and give nan implied vols instead of failing the whole chain.
+"""
+import datetime
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.src.column_names import SYM, BID, ASK, MARK, UNDERLYING_PRICE, BID_IV, ASK_IV, MARK_IV, DELTA, GAMMA, \
+    VEGA, THETA
+from core.src.option_syms import get_expiry_option, C_
+
+DAYS_PER_YEAR = 365.
+SECONDS_PER_YEAR = DAYS_PER_YEAR * 24 * 60 * 60
+# Deribit options expire at 08:00 UTC
+EXPIRY_TIME = datetime.time(8, tzinfo=datetime.timezone.utc)
+MAX_VOL = 10.
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / math.sqrt(2 * math.pi)
+
+
+def norm_cdf(x):
+    """
+    Standard normal cumulative distribution, through the complementary error function of Numerical Recipes, its
+    relative error is below 1.2e-7
+
+    :param x: np.ndarray
+    :return: np.ndarray
+    """
+    z = np.abs(x) / math.sqrt(2)
+    t = 1 / (1 + 0.5 * z)
+    erfc = t * np.exp(-z * z - 1.26551223 + t * (1.00002368 + t * (0.37409196 + t * (0.09678418 + t * (
+        -0.18628806 + t * (0.27886807 + t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223 + t * 0.17087277)))))))))
+    return np.where(x >= 0, 1 - 0.5 * erfc, 0.5 * erfc)
+
+
+def _d1_d2(forward, strike, t, vol):
+    vol_sqrt_t = vol * np.sqrt(t)
+    d1 = (np.log(forward / strike) + 0.5 * vol_sqrt_t * vol_sqrt_t) / vol_sqrt_t
+    return d1, d1 - vol_sqrt_t
+
+
+def black76_price(forward, strike, t, vol, is_call):
+    """
+    :param forward: np.ndarray, float64
+    :param strike: np.ndarray, float64
+    :param t: np.ndarray, time to expiry in years
+    :param vol: np.ndarray, annualized volatility, eg: 0.8 for 80%
+    :param is_call: np.ndarray, bool, False for puts
+    :return: np.ndarray, the prices
+    """
+    d1, d2 = _d1_d2(forward, strike, t, vol)
+    # the put is not derived from the call by parity, which would lose the precision of out of the money puts
+    sign = np.where(is_call, 1., -1.)
+    return sign * (forward * norm_cdf(sign * d1) - strike * norm_cdf(sign * d2))
+
+
+def black76_greeks(forward, strike, t, vol, is_call):
+    """
+    :param forward: np.ndarray, float64
+    :param strike: np.ndarray, float64
+    :param t: np.ndarray, time to expiry in years
+    :param vol: np.ndarray, annualized volatility
+    :param is_call: np.ndarray, bool, False for puts
+    :return: dict, with keys [DELTA, GAMMA, VEGA, THETA], vega is for 1 vol point (1%) and theta for 1 day, like on
+        Deribit
+    """
+    d1, _ = _d1_d2(forward, strike, t, vol)
+    sqrt_t = np.sqrt(t)
+    pdf_d1 = norm_pdf(d1)
+    cdf_d1 = norm_cdf(d1)
+    return {DELTA: np.where(is_call, cdf_d1, cdf_d1 - 1),
+            GAMMA: pdf_d1 / (forward * vol * sqrt_t),
+            VEGA: forward * pdf_d1 * sqrt_t / 100,
+            THETA: -forward * pdf_d1 * vol / (2 * sqrt_t) / DAYS_PER_YEAR}
+
+
+def implied_vol(price, forward, strike, t, is_call, tol=1e-10, max_iter=50):
+    """
+    Solve the Black-76 volatility of every price at once, with Newton steps kept inside a bracket that is bisected
+    when a step leaves it
+
+    :param price: np.ndarray, float64, nan if there is no price
+    :param forward: np.ndarray, float64
+    :param strike: np.ndarray, float64
+    :param t: np.ndarray, time to expiry in years
+    :param is_call: np.ndarray, bool, False for puts
+    :param tol: float, on the price relatively to it, or on the width of the bracket
+    :param max_iter: int, the options still not within tol after it get the last iterate
+    :return: np.ndarray, the annualized volatilities, nan where there is no price, the option expired or the price is
+        out of the no-arbitrage bounds
+    """
+    price, forward, strike, t = np.broadcast_arrays(*[np.atleast_1d(np.asarray(x, dtype=np.float64))
+                                                      for x in [price, forward, strike, t]])
+    is_call = np.broadcast_to(np.asarray(is_call, dtype=bool), price.shape)
+    intrinsic = np.maximum(np.where(is_call, forward - strike, strike - forward), 0)
+    upper = np.where(is_call, forward, strike)
+    with np.errstate(invalid='ignore'):
+        valid = np.isfinite(price) & (t > 0) & (forward > 0) & (strike > 0) & (price > intrinsic) & (price < upper)
+    vol = np.full(price.shape, np.nan)
+
+    # only the options that did not converge yet are iterated on
+    index = np.flatnonzero(valid)
+    price, forward, strike, t, is_call = [x[valid] for x in [price, forward, strike, t, is_call]]
+    low = np.zeros(len(index))
+    high = np.full(len(index), MAX_VOL)
+    # Brenner-Subrahmanyam approximation as a first guess
+    guess = np.clip(np.sqrt(2 * math.pi / t) * price / forward, 0.01, MAX_VOL / 2)
+    for _ in range(max_iter):
+        if len(index) == 0:
+            break
+        d1, _ = _d1_d2(forward, strike, t, guess)
+        diff = black76_price(forward, strike, t, guess, is_call) - price
+        converged = (np.abs(diff) <= tol * price) | (high - low <= tol)
+        vol[index[converged]] = guess[converged]
+        keep = ~converged
+        index, price, forward, strike, t, is_call, low, high, guess, diff, d1 = \
+            [x[keep] for x in [index, price, forward, strike, t, is_call, low, high, guess, diff, d1]]
+        high = np.where(diff > 0, guess, high)
+        low = np.where(diff > 0, low, guess)
+        vega = forward * norm_pdf(d1) * np.sqrt(t)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = guess - diff / vega
+        guess = np.where((newton > low) & (newton < high), newton, 0.5 * (low + high))
+    vol[index] = guess
+    return vol
+
+
+def time_to_expiry(expiries, now=None):
+    """
+    :param expiries: np.ndarray, of datetime.date
+    :param now: datetime.datetime, timezone aware, by default now
+    :return: np.ndarray, in years
+    """
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    unique_expiries, inverse = np.unique(np.asarray(expiries), return_inverse=True)
+    seconds = np.array([datetime.datetime.combine(expiry, EXPIRY_TIME).timestamp() for expiry in unique_expiries])
+    return (seconds[inverse] - now.timestamp()) / SECONDS_PER_YEAR
+
+
+def get_chain_implied_vols(chain, now=None):
+    """
+    Implied vols and greeks of a whole option chain
+
+    :param chain: pd.DataFrame, with columns [SYM, BID, ASK, MARK, UNDERLYING_PRICE] in usd, see
+        MarketDataRestApiDeribitOption.get_option_chain
+    :param now: datetime.datetime, timezone aware, by default now
+    :return: pd.DataFrame, chain with the columns [BID_IV, ASK_IV, MARK_IV, DELTA, GAMMA, VEGA, THETA] added, the
+        greeks are at the mark implied vol
+    """
+    chain = chain.copy()
+    # C_ETHUSD_230630_1200
+    parts = chain[SYM].str.split("_", expand=True)
+    is_call = (parts[0] + "_" == C_).to_numpy()
+    strike = pd.to_numeric(parts[3]).to_numpy(dtype=np.float64)
+    # the expiry is parsed once per expiry rather than once per option
+    first_syms = chain[SYM].groupby(parts[2]).first()
+    expiries = parts[2].map({code: get_expiry_option(sym) for code, sym in first_syms.items()})
+    t = time_to_expiry(expiries.to_numpy(), now)
+    forward = chain[UNDERLYING_PRICE].to_numpy(dtype=np.float64)
+
+    for column, iv_column in [(BID, BID_IV), (ASK, ASK_IV), (MARK, MARK_IV)]:
+        chain[iv_column] = implied_vol(chain[column].to_numpy(dtype=np.float64), forward, strike, t, is_call)
+    greeks = black76_greeks(forward, strike, t, chain[MARK_IV].to_numpy(), is_call)
+    for column, values in greeks.items():
+        chain[column] = values
+    return chain
@@ -13,6 +13,10 @@ BID = 'bid'
 BIDS = 'bids'
 ASK = 'ask'
 ASKS = 'asks'
+MID = 'mid'
+SPREAD = 'spread'
+BID_SIZE = 'bid_size'
+ASK_SIZE = 'ask_size'
 PRICE = 'price'
 SIZE = 'size'
 TIME = 'time'
@@ -24,13 +28,49 @@ OPEN = 'open'
 CLOSE = 'close'
 HIGH = 'high'
 LOW = 'low'
+VWAP = 'vwap'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# ticker
+LAST = 'last'
+OPEN_INTEREST = 'open_interest'
+FUNDING_RATE = 'funding_rate'
+INDEX_PRICE = 'index_price'
+
+# options
+MARK = 'mark'
+UNDERLYING_PRICE = 'underlying_price'
+STRIKE = 'strike'
+EXPIRY = 'expiry'
+OPTION_TYPE = 'option_type'
+BID_IV = 'bid_iv'
+ASK_IV = 'ask_iv'
+MARK_IV = 'mark_iv'
+DELTA = 'delta'
+GAMMA = 'gamma'
+VEGA = 'vega'
+THETA = 'theta'
+
 # rest api results
 RESULT = 'result'
 
+# cross market
+BASIS = 'basis'
+ANNUALIZED_BASIS = 'annualized_basis'
+DAYS_TO_EXPIRY = 'days_to_expiry'
+SENT_TIMESTAMP = 'sent_timestamp'
+RECEIVED_TIMESTAMP = 'received_timestamp'
+LATENCY = 'latency'
+SKEW = 'skew'
+BID_MARKETS = 'bid_markets'
+ASK_MARKETS = 'ask_markets'
+
 # fees
 FEES = 'fees'
 FEES_TAKER = 'fees_taker'
 FEES_MAKER = 'fees_maker'
+FEE_VOLUME_CURRENCY = 'fee_volume_currency'
 
 # sym related
 SYM = 'sym'
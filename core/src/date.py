@@ -6,34 +6,69 @@ from dateutil.utils import today
 MINUTES_PER_DAY = 24 * 60
 
 
-def convert_expiry_to_deribit_format(date_string):
-    month_dict = {'01': 'JAN', '02': 'FEB', '03': 'MAR', '04': 'APR', '05': 'MAY',
-                  '06': 'JUN', '07': 'JUL', '08': 'AUG', '09': 'SEP', '10': 'OCT',
-                  '11': 'NOV', '12': 'DEC'}
+MONTHS = {'01': 'JAN', '02': 'FEB', '03': 'MAR', '04': 'APR', '05': 'MAY', '06': 'JUN', '07': 'JUL', '08': 'AUG',
+          '09': 'SEP', '10': 'OCT', '11': 'NOV', '12': 'DEC'}
+
 
+def convert_expiry_to_deribit_format(date_string):
     year = date_string[:2]
-    month = month_dict[date_string[2:4]]
-    day = date_string[4:]
+    month = MONTHS[date_string[2:4]]
+    # deribit does not pad the day, eg: 5MAY23
+    day = str(int(date_string[4:]))
 
     return day + month + year
 
 
+def convert_expiry_from_deribit_format(date_string):
+    """
+    :param date_string: str, eg: 5MAY23
+    :return: str, eg: 230505
+    """
+    month_numbers = {month: number for number, month in MONTHS.items()}
+    year = date_string[-2:]
+    month = month_numbers[date_string[-5:-2]]
+    day = date_string[:-5].zfill(2)
+
+    return year + month + day
+
+
+# function returning the current timestamp in seconds, None for the system clock, see set_clock
+_clock = None
+
+
+def set_clock(clock):
+    """
+    Make get_current_timestamp, get_yesterday_timestamp and today_date follow another clock, eg: the one of a replay
+
+    :param clock: function, () -> float, the current timestamp in seconds, None for the system clock
+    :return: function, the previous clock, None if it was the system clock
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
 def get_current_timestamp():
     """
     get the current timestamp in micro seconds
     :return:
     """
+    if _clock is not None:
+        return _clock()
     # this is a float with the micros after the decimal so multiply by 1000000
     return datetime.datetime.now().timestamp()
 
 
 def get_yesterday_timestamp():
-    yesterday = datetime.datetime.now() - datetime.timedelta(days=2)
+    now = datetime.datetime.now() if _clock is None else datetime.datetime.fromtimestamp(_clock())
+    yesterday = now - datetime.timedelta(days=2)
     midnight = datetime.datetime.combine(yesterday, datetime.time.min)
     return int(midnight.timestamp())
 
 
 def today_date():
+    if _clock is not None:
+        return datetime.date.fromtimestamp(_clock())
     return today().date()
 
 
@@ -4,3 +4,68 @@ def raise_instrument_type_not_supported_for_market_exception(instrument_type, ma
 
 def raise_market_not_supported(market):
     raise Exception(f'Market {market} not supported.')
+
+
+class ExchangeError(Exception):
+    """
+    An error returned by an exchange, or met while talking to it
+    """
+    # whether sending the same request again may succeed
+    retryable = False
+
+    def __init__(self, market, message, status_code=None):
+        """
+
+        :param market: str
+        :param message: str, the error as sent by the exchange
+        :param status_code: int, http status code, None if no response was received
+        """
+        super().__init__(f'{market} error: {message}')
+        self.market = market
+        self.message = message
+        self.status_code = status_code
+
+
+class ExchangeRequestError(ExchangeError):
+    """
+    The request was rejected by the exchange, eg: unknown sym, sending it again will not help
+    """
+    retryable = False
+
+
+class ExchangeRateLimitError(ExchangeError):
+    """
+    The exchange rejected the request because of its rate limit
+    """
+    retryable = True
+
+
+class ExchangeUnavailableError(ExchangeError):
+    """
+    The exchange did not answer properly: timeout, connection error, 5xx or maintenance
+    """
+    retryable = True
+
+
+class CircuitOpenError(ExchangeError):
+    """
+    The exchange failed too many times in a row, requests are not sent until it has had time to recover
+    """
+    retryable = False
+
+
+def raise_exchange_error(market, message, status_code=None, rate_limited=False, unavailable=False):
+    """
+    Raise the ExchangeError matching an error sent by an exchange
+
+    :param market: str
+    :param message: str, the error as sent by the exchange
+    :param status_code: int, http status code
+    :param rate_limited: bool, if the exchange said the rate limit was exceeded
+    :param unavailable: bool, if the exchange said it is down, busy or in maintenance
+    """
+    if rate_limited or status_code == 429:
+        raise ExchangeRateLimitError(market, message, status_code)
+    if unavailable or (status_code is not None and status_code >= 500):
+        raise ExchangeUnavailableError(market, message, status_code)
+    raise ExchangeRequestError(market, message, status_code)
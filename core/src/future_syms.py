@@ -1,7 +1,6 @@
 import datetime
-import re
 
-from core.src.spot_syms import ETHUSD, BTCUSD, XRPUSD, LTCUSD, BCHUSD, SUPPORTED_CCY_PAIRS
+from core.src.spot_syms import ETHUSD, BTCUSD, XRPUSD, LTCUSD, BCHUSD, SUPPORTED_CCY_PAIRS_SET
 
 # Futures
 # This is the standard form of a future, but this instrument is not itself tradeable, what is tradeable is the future
@@ -15,6 +14,8 @@ FUT_BTCUSD_ = FUT_ + BTCUSD + "_"
 FUT_XRPUSD_ = FUT_ + XRPUSD + "_"
 FUT_LTCUSD_ = FUT_ + LTCUSD + "_"
 FUT_BCHUSD_ = FUT_ + BCHUSD + "_"
+# perpetual futures have no expiry, eg: FUT_ETHUSD_PERP
+PERP = "PERP"
 
 
 def raise_wrong_format_future(sym):
@@ -22,13 +23,12 @@ def raise_wrong_format_future(sym):
 
 
 def check_currency_pair_future(sym):
-    pattern = re.compile("_")
-    if len(pattern.findall(sym)) != 2:
+    if sym.count("_") != 2:
         raise_wrong_format_future(sym)
     if sym[:4] != FUT_:
         raise_wrong_format_future(sym)
     spot = sym.split("_")[1]
-    if spot not in SUPPORTED_CCY_PAIRS:
+    if spot not in SUPPORTED_CCY_PAIRS_SET:
         raise Exception(f'Future {sym} has wrong format, currency pair {spot} not supported')
     return True
 
@@ -39,9 +39,9 @@ def get_expiry_future(sym):
     # it should have this format: YYMMDD
     if len(expiry) != 6:
         raise Exception(f'Future {sym} has wrong expiry format')
-    year = expiry[:1]
-    month = expiry[1:3]
-    day = expiry[3:]
+    year = expiry[:2]
+    month = expiry[2:4]
+    day = expiry[4:]
 
     year = 2000 + int(year)
     month = int(month)
@@ -0,0 +1,204 @@
+"""
+Interned instruments: each sym is parsed and checked once per process, then looked up
+
+    get_instrument('C_ETHUSD_230630_1200').strike -> 1200.0
+
+The names of the instruments on the exchanges are cached by the registry, in both directions, see
+InstrumentRegistry.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.src.future_syms import FUT_, PERP, get_expiry_future, check_currency_pair_future
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.option_syms import C_, P_, get_expiry_option
+from core.src.spot_syms import check_currency_pair_spot, split_currency_pair_into_lhs_rhs
+
+
+class Instrument:
+    """
+    A sym and what it is made of, immutable, there is a single instance per sym
+    """
+    __slots__ = ['sym', 'instrument_type', 'pair', 'crypto', 'fiat', 'expiry', 'strike', 'option_type']
+
+    def __init__(self, sym, instrument_type, pair, expiry=None, strike=None, option_type=None):
+        """
+
+        :param sym: str, eg: C_ETHUSD_230630_1200
+        :param instrument_type: str, SPOT, FUTURE or OPTION
+        :param pair: str, eg: ETHUSD
+        :param expiry: datetime.date, None for spots and perpetual futures
+        :param strike: float, None but for options
+        :param option_type: str, C_ or P_, None but for options
+        """
+        crypto, fiat = split_currency_pair_into_lhs_rhs(pair)
+        for name, value in [('sym', sym), ('instrument_type', instrument_type), ('pair', pair), ('crypto', crypto),
+                            ('fiat', fiat), ('expiry', expiry), ('strike', strike), ('option_type', option_type)]:
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'Instrument {self.sym} is immutable')
+
+    def __repr__(self):
+        return f'Instrument({self.sym})'
+
+    @property
+    def is_call(self):
+        return self.option_type == C_
+
+
+def parse_instrument(sym):
+    """
+    :param sym: str, eg: ETHUSD, FUT_ETHUSD_230630, FUT_ETHUSD_PERP or C_ETHUSD_230630_1200
+    :return: Instrument, a new one, use get_instrument to get the interned one
+    """
+    if sym.startswith(FUT_):
+        if sym.endswith("_" + PERP):
+            check_currency_pair_future(sym)
+            return Instrument(sym, FUTURE, sym.split("_")[1])
+        return Instrument(sym, FUTURE, sym.split("_")[1], expiry=get_expiry_future(sym))
+    if sym.startswith(C_) or sym.startswith(P_):
+        expiry = get_expiry_option(sym)
+        _, pair, _, strike = sym.split("_")
+        return Instrument(sym, OPTION, pair, expiry=expiry, strike=float(strike), option_type=sym[:2])
+    return Instrument(sym, SPOT, check_currency_pair_spot(sym))
+
+
+# sym -> Instrument, see get_instrument
+_instruments = {}
+_instruments_lock = threading.Lock()
+
+
+def get_instrument(sym):
+    """
+    :param sym: str
+    :return: Instrument, the same object for the same sym, raises if the sym is not supported
+    """
+    instrument = _instruments.get(sym)
+    if instrument is None:
+        instrument = parse_instrument(sym)
+        with _instruments_lock:
+            instrument = _instruments.setdefault(sym, instrument)
+    return instrument
+
+
+def is_supported(sym):
+    """
+    :param sym: str
+    :return: bool
+    """
+    try:
+        get_instrument(sym)
+        return True
+    except Exception:
+        return False
+
+
+def get_instruments(syms):
+    """
+    Vectorized get_instrument, each distinct sym is looked up once
+
+    :param syms: list or pd.Series, of str
+    :return: same type as syms, of Instrument, raises if a sym is not supported
+    """
+    if isinstance(syms, pd.Series):
+        uniques = syms.unique()
+        return syms.map(dict(zip(uniques, map(get_instrument, uniques))))
+    return [get_instrument(sym) for sym in syms]
+
+
+def are_supported(syms):
+    """
+    Vectorized is_supported, each distinct sym is checked once
+
+    :param syms: list, np.ndarray or pd.Series, of str
+    :return: np.ndarray, of bool
+    """
+    codes, uniques = pd.factorize(pd.Series(syms, dtype=object))
+    supported = np.array([is_supported(sym) for sym in uniques], dtype=bool)
+    # codes are -1 for the missing values
+    return np.where(codes >= 0, supported[codes], False)
+
+
+class InstrumentRegistry:
+    """
+    The names of the syms on the exchanges, in both directions, each name being computed once by the formatting
+    functions of the apis. A namespace holds the names of one naming scheme, eg: (KRAKEN, SPOT) for the rest api. Reads
+    are plain dict lookups, the lock is only taken to add names.
+    """
+
+    def __init__(self):
+        # namespace -> sym -> name on the exchange
+        self.market_syms = {}
+        # namespace -> name on the exchange -> sym, several names can map to the same sym
+        self.syms = {}
+        self.lock = threading.Lock()
+
+    def get_market_sym(self, namespace, sym, format_sym_for_market):
+        """
+        :param namespace: tuple
+        :param sym: str
+        :param format_sym_for_market: function, sym -> name on the exchange, called the first time only
+        :return: str
+        """
+        market_sym = self.market_syms.get(namespace, {}).get(sym)
+        if market_sym is None:
+            market_sym = format_sym_for_market(sym)
+            with self.lock:
+                self.market_syms.setdefault(namespace, {})[sym] = market_sym
+        return market_sym
+
+    def get_sym(self, namespace, market_sym, format_sym_back):
+        """
+        :param namespace: tuple
+        :param market_sym: str, name on the exchange
+        :param format_sym_back: function, name on the exchange -> sym, called the first time only
+        :return: str
+        """
+        sym = self.syms.get(namespace, {}).get(market_sym)
+        if sym is None:
+            sym = format_sym_back(market_sym)
+            with self.lock:
+                self.syms.setdefault(namespace, {})[market_sym] = sym
+        return sym
+
+    def get_market_syms(self, namespace, syms, format_sym_for_market):
+        """
+        Vectorized get_market_sym, each distinct sym is looked up once
+
+        :param namespace: tuple
+        :param syms: list or pd.Series, of str
+        :param format_sym_for_market: function
+        :return: same type as syms, of str
+        """
+        return self._map(syms, lambda sym: self.get_market_sym(namespace, sym, format_sym_for_market))
+
+    def get_syms(self, namespace, market_syms, format_sym_back):
+        """
+        Vectorized get_sym, each distinct name is looked up once
+
+        :param namespace: tuple
+        :param market_syms: list or pd.Series, of str
+        :param format_sym_back: function
+        :return: same type as market_syms, of str
+        """
+        return self._map(market_syms, lambda market_sym: self.get_sym(namespace, market_sym, format_sym_back))
+
+    @staticmethod
+    def _map(values, function):
+        if isinstance(values, pd.Series):
+            uniques = values.unique()
+            return values.map(dict(zip(uniques, map(function, uniques))))
+        return [function(value) for value in values]
+
+
+_registry = InstrumentRegistry()
+
+
+def get_instrument_registry():
+    """
+    :return: InstrumentRegistry, shared by the whole process
+    """
+    return _registry
@@ -0,0 +1,279 @@
+import bisect
+import zlib
+
+import numpy as np
+
+from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
+    ASK_PRICES, MISC
+from core.src.date import get_current_timestamp
+from core.src.orderbook import OrderBook, seconds_to_micros
+
+# number of levels of each side in the checksum of Kraken
+KRAKEN_CHECKSUM_LEVELS = 10
+
+
+def format_kraken_checksum_level(text):
+    """
+    :param text: str, a price or size as sent by Kraken, eg: '0.05005000'
+    :return: str, without the decimal point and the leading zeros, eg: '5005000'
+    """
+    return text.replace('.', '').lstrip('0')
+
+
+def kraken_checksum(ask_levels, bid_levels):
+    """
+    CRC32 of the first levels of a book, as sent along the book updates of Kraken
+
+    :param ask_levels: list, of (price text, size text) from the best ask
+    :param bid_levels: list, of (price text, size text) from the best bid
+    :return: int, unsigned 32 bits
+    """
+    parts = []
+    for levels in [ask_levels[:KRAKEN_CHECKSUM_LEVELS], bid_levels[:KRAKEN_CHECKSUM_LEVELS]]:
+        for price_text, size_text in levels:
+            parts.append(format_kraken_checksum_level(price_text))
+            parts.append(format_kraken_checksum_level(size_text))
+    return zlib.crc32(''.join(parts).encode()) & 0xffffffff
+
+
+class BookSide:
+    """
+    The levels of one side of a book, keyed by price
+
+    The sizes are in a dict, so updating a level is O(1), and the prices are kept sorted from the best in a list so
+    finding a level is a O(log n) bisection. Adding or removing a level shifts the list, which for the depths sent by
+    the exchanges is a memmove of a few kilobytes. Bids are keyed by the opposite of their price so that both sides
+    are sorted from the best.
+    """
+    __slots__ = ['is_bid', 'keys', 'sizes', 'texts']
+
+    def __init__(self, is_bid):
+        """
+
+        :param is_bid: bool
+        """
+        self.is_bid = is_bid
+        # sorted, -price for the bids
+        self.keys = []
+        # price -> size
+        self.sizes = {}
+        # price -> (price text, size text) as sent by the exchange, for the checksums
+        self.texts = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, price, size, price_text=None, size_text=None):
+        """
+        :param price: float
+        :param size: float, 0 to remove the level
+        :param price_text: str, optional, the price as sent by the exchange
+        :param size_text: str, optional, the size as sent by the exchange
+        :return: int, index of the level from the best before the update, or where it was added
+        """
+        key = -price if self.is_bid else price
+        index = bisect.bisect_left(self.keys, key)
+        exists = price in self.sizes
+        if size == 0:
+            if exists:
+                del self.keys[index]
+                del self.sizes[price]
+                self.texts.pop(price, None)
+            return index
+        if not exists:
+            self.keys.insert(index, key)
+        self.sizes[price] = size
+        if price_text is not None:
+            self.texts[price] = (price_text, size_text)
+        return index
+
+    def clear(self):
+        self.keys.clear()
+        self.sizes.clear()
+        self.texts.clear()
+
+    def truncate(self, depth):
+        """
+        :param depth: int, number of levels kept
+        """
+        for key in self.keys[depth:]:
+            price = -key if self.is_bid else key
+            del self.sizes[price]
+            self.texts.pop(price, None)
+        del self.keys[depth:]
+
+    def prices(self, n_levels):
+        """
+        :param n_levels: int
+        :return: list, of the first n_levels prices from the best
+        """
+        keys = self.keys[:n_levels]
+        return [-key for key in keys] if self.is_bid else keys
+
+    def top(self, n_levels):
+        """
+        :param n_levels: int
+        :return: tuple, (prices, sizes) as np.ndarray of float64, from the best
+        """
+        prices = self.prices(n_levels)
+        sizes = self.sizes
+        return np.array(prices, dtype=np.float64), np.array([sizes[price] for price in prices], dtype=np.float64)
+
+    def top_texts(self, n_levels):
+        """
+        :param n_levels: int
+        :return: list, of (price text, size text) from the best
+        """
+        return [self.texts[price] for price in self.prices(n_levels)]
+
+
+class L2Book:
+    """
+    An order book maintained from a snapshot and its updates, level by level
+
+    The first n_levels are converted to arrays only when they are read after a change that reached them, so that the
+    updates deep in the book cost nothing but the update itself.
+    """
+    __slots__ = ['sym', 'market', 'n_levels', 'bids', 'asks', 'market_timestamp', '_top']
+
+    def __init__(self, sym, market, n_levels=10):
+        """
+
+        :param sym: str
+        :param market: str
+        :param n_levels: int, number of levels of the snapshots
+        """
+        self.sym = sym
+        self.market = market
+        self.n_levels = n_levels
+        self.bids = BookSide(True)
+        self.asks = BookSide(False)
+        # int micro seconds, of the last update
+        self.market_timestamp = 0
+        # (bid_prices, bid_sizes, ask_prices, ask_sizes), None when a change reached the first n_levels
+        self._top = None
+
+    def __repr__(self):
+        return f'L2Book({self.sym}, {self.market}, bid={self.best_bid}, ask={self.best_ask}, ' \
+               f'n_bids={len(self.bids)}, n_asks={len(self.asks)})'
+
+    @property
+    def best_bid(self):
+        """
+        :return: float, nan if there is no bid
+        """
+        return -self.bids.keys[0] if self.bids.keys else np.nan
+
+    @property
+    def best_ask(self):
+        """
+        :return: float, nan if there is no ask
+        """
+        return self.asks.keys[0] if self.asks.keys else np.nan
+
+    def update(self, is_bid, price, size, price_text=None, size_text=None):
+        """
+        :param is_bid: bool
+        :param price: float
+        :param size: float, 0 to remove the level
+        :param price_text: str, optional, the price as sent by the exchange, needed by the checksums
+        :param size_text: str, optional, the size as sent by the exchange
+        """
+        side = self.bids if is_bid else self.asks
+        if side.update(price, size, price_text, size_text) < self.n_levels:
+            self._top = None
+
+    def update_levels(self, is_bid, levels):
+        """
+        :param is_bid: bool
+        :param levels: list, of [price, size, ...] where price and size are numbers or numeric strings, the strings
+            are kept for the checksums
+        """
+        side = self.bids if is_bid else self.asks
+        n_levels = self.n_levels
+        for level in levels:
+            price, size = level[0], level[1]
+            if isinstance(price, str):
+                index = side.update(float(price), float(size), price, size)
+            else:
+                index = side.update(float(price), float(size))
+            if index < n_levels:
+                self._top = None
+
+    def apply_snapshot(self, bids, asks, market_timestamp=None):
+        """
+        Replace the whole book
+
+        :param bids: list, of [price, size, ...], see update_levels
+        :param asks: list, of [price, size, ...]
+        :param market_timestamp: int, micro seconds, optional
+        """
+        self.clear()
+        self.update_levels(True, bids)
+        self.update_levels(False, asks)
+        if market_timestamp is not None:
+            self.market_timestamp = market_timestamp
+
+    def clear(self):
+        self.bids.clear()
+        self.asks.clear()
+        self._top = None
+
+    def truncate(self, depth):
+        """
+        Remove the levels beyond depth, for the exchanges that do not send their removal
+
+        :param depth: int
+        """
+        self.bids.truncate(depth)
+        self.asks.truncate(depth)
+        if depth < self.n_levels:
+            self._top = None
+
+    def top_levels(self):
+        """
+        :return: tuple, (bid_prices, bid_sizes, ask_prices, ask_sizes) of the first n_levels, as np.ndarray of float64
+            from the best, they should not be modified
+        """
+        if self._top is None:
+            self._top = self.bids.top(self.n_levels) + self.asks.top(self.n_levels)
+        return self._top
+
+    def snapshot(self, price_factor=1.):
+        """
+        :param price_factor: float, the prices are multiplied by it
+        :return: dict, with keys [MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES,
+            ASK_PRICES, MISC], the levels as np.ndarray
+        """
+        ob = self.to_orderbook(price_factor)
+        return {MARKET_TIMESTAMP: ob.market_timestamp,
+                GATEWAY_TIMESTAMP: ob.gateway_timestamp,
+                SYM: ob.sym,
+                MARKET: ob.market,
+                BID_SIZES: ob.bid_sizes,
+                BID_PRICES: ob.bid_prices,
+                ASK_SIZES: ob.ask_sizes,
+                ASK_PRICES: ob.ask_prices,
+                MISC: ob.misc}
+
+    def to_orderbook(self, price_factor=1.):
+        """
+        :param price_factor: float, the prices are multiplied by it, eg: to convert prices in coin to usd
+        :return: OrderBook, with its own copy of the levels
+        """
+        bid_prices, bid_sizes, ask_prices, ask_sizes = self.top_levels()
+        return OrderBook(self.sym, self.market, bid_prices * price_factor, bid_sizes.copy(), ask_prices * price_factor,
+                         ask_sizes.copy(), self.market_timestamp, seconds_to_micros(get_current_timestamp()))
+
+    def kraken_checksum(self):
+        """
+        :return: int, see kraken_checksum, the levels should have been updated with their texts
+        """
+        return kraken_checksum(self.asks.top_texts(KRAKEN_CHECKSUM_LEVELS), self.bids.top_texts(KRAKEN_CHECKSUM_LEVELS))
+
+    def check_kraken_checksum(self, checksum):
+        """
+        :param checksum: int or str, as sent by Kraken
+        :return: bool, False if the book is out of sync with the exchange
+        """
+        return self.kraken_checksum() == int(checksum)
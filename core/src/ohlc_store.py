@@ -0,0 +1,178 @@
+import datetime
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from core.src.column_names import TIME
+
+# name of the arrays in the files, on top of the ohlc columns
+COVERAGE = '__coverage__'
+COLUMNS = '__columns__'
+
+
+def merge_ranges(ranges):
+    """
+    Merge overlapping or adjacent ranges
+
+    :param ranges: list, of (start, end) with end excluded
+    :return: list, of (start, end) sorted and disjoint
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def find_gaps(coverage, start, end):
+    """
+    Find the parts of [start, end) that are not covered
+
+    :param coverage: list, of disjoint sorted (start, end)
+    :param start: int
+    :param end: int, excluded
+    :return: list, of (start, end)
+    """
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in coverage:
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def ohlc_times_to_seconds(ohlc):
+    """
+    :param ohlc: pd.DataFrame, with a TIME column of datetime.datetime
+    :return: np.ndarray, of int64 timestamps in seconds
+    """
+    return np.array([int(t.timestamp()) for t in ohlc[TIME]], dtype=np.int64)
+
+
+class OhlcStore:
+    """
+    An on-disk store of ohlc bars, one file per (market, sym, interval)
+
+    Each file holds one array per column, the times being int64 timestamps in seconds, and the coverage: the time
+    ranges that were fully fetched from the exchange. A range without bars but covered means the exchange had no data,
+    so it is not asked again. Series are kept in memory once loaded.
+    """
+
+    def __init__(self, path):
+        """
+
+        :param path: str, folder of the files, created if needed
+        """
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        # (market, sym, interval) -> (pd.DataFrame of bars with TIME in seconds, list of covered (start, end))
+        self.series = {}
+        self.lock = threading.RLock()
+
+    def _get_file(self, market, sym, interval):
+        return os.path.join(self.path, f'{market}_{sym}_{interval}.npz')
+
+    def _load(self, market, sym, interval):
+        key = (market, sym, interval)
+        if key not in self.series:
+            file = self._get_file(market, sym, interval)
+            if os.path.exists(file):
+                with np.load(file, allow_pickle=False) as arrays:
+                    columns = arrays[COLUMNS].tolist()
+                    bars = pd.DataFrame({column: arrays[column] for column in columns}, columns=columns)
+                    coverage = [tuple(covered) for covered in arrays[COVERAGE].tolist()]
+            else:
+                bars = pd.DataFrame({TIME: np.array([], dtype=np.int64)})
+                coverage = []
+            self.series[key] = (bars, coverage)
+        return self.series[key]
+
+    def _save(self, market, sym, interval, bars, coverage):
+        file = self._get_file(market, sym, interval)
+        arrays = {}
+        for column in bars.columns:
+            values = bars[column].to_numpy()
+            # object arrays could only be saved pickled
+            arrays[column] = values.astype(str) if values.dtype == object else values
+        arrays[COLUMNS] = np.array(bars.columns.tolist())
+        arrays[COVERAGE] = np.array(coverage, dtype=np.int64).reshape(-1, 2)
+        # write then rename so that a crash never leaves a half written file
+        tmp_file = file + '.tmp.npz'
+        np.savez(tmp_file, **arrays)
+        os.replace(tmp_file, file)
+
+    def get_coverage(self, market, sym, interval):
+        """
+        :param market: str
+        :param sym: str
+        :param interval: int, in minutes
+        :return: list, of disjoint sorted (start, end) timestamps in seconds that were fully fetched
+        """
+        with self.lock:
+            return list(self._load(market, sym, interval)[1])
+
+    def find_gaps(self, market, sym, interval, start, end):
+        """
+        :param market: str
+        :param sym: str
+        :param interval: int, in minutes
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded
+        :return: list, of (start, end) that were never fetched
+        """
+        return find_gaps(self.get_coverage(market, sym, interval), start, end)
+
+    def update(self, market, sym, interval, ohlc, covered=()):
+        """
+        Add bars to the store, they replace the stored bars with the same time
+
+        :param market: str
+        :param sym: str
+        :param interval: int, in minutes
+        :param ohlc: pd.DataFrame, bars with TIME as datetime.datetime
+        :param covered: list, of (start, end) timestamps in seconds that are now fully fetched
+        """
+        with self.lock:
+            bars, coverage = self._load(market, sym, interval)
+            if len(ohlc) > 0:
+                new_bars = ohlc.copy()
+                new_bars[TIME] = ohlc_times_to_seconds(ohlc)
+                bars = pd.concat([bars, new_bars]) if len(bars) > 0 else new_bars
+                bars = bars.drop_duplicates(subset=TIME, keep='last').sort_values(TIME).reset_index(drop=True)
+            coverage = merge_ranges(list(coverage) + list(covered))
+            self.series[(market, sym, interval)] = (bars, coverage)
+            self._save(market, sym, interval, bars, coverage)
+
+    def read(self, market, sym, interval, start=None, end=None):
+        """
+        :param market: str
+        :param sym: str
+        :param interval: int, in minutes
+        :param start: int, timestamp in seconds, None for no lower bound
+        :param end: int, timestamp in seconds, excluded, None for no upper bound
+        :return: pd.DataFrame, bars with TIME as datetime.datetime, like the one returned by get_ohlc
+        """
+        with self.lock:
+            bars, _ = self._load(market, sym, interval)
+        times = bars[TIME].to_numpy()
+        mask = np.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if end is not None:
+            mask &= times < end
+        ohlc = bars.loc[mask].reset_index(drop=True)
+        ohlc[TIME] = [datetime.datetime.fromtimestamp(t) for t in ohlc[TIME].tolist()]
+        return ohlc
@@ -3,9 +3,8 @@
 # with a precise expiry and strike:
 # eg: C_ETHUSD_230630_1200
 import datetime
-import re
 
-from core.src.spot_syms import ETHUSD, BTCUSD, SUPPORTED_CCY_PAIRS
+from core.src.spot_syms import ETHUSD, BTCUSD, SUPPORTED_CCY_PAIRS_SET
 
 C_ = "C_"
 P_ = "P_"
@@ -18,13 +17,12 @@ def raise_wrong_format_option(sym):
 
 
 def check_currency_pair_option(sym):
-    pattern = re.compile("_")
-    if len(pattern.findall(sym)) != 3:
+    if sym.count("_") != 3:
         raise_wrong_format_option(sym)
     if sym[:2] not in [C_, P_]:
         raise_wrong_format_option(sym)
     spot = sym.split("_")[1]
-    if spot not in SUPPORTED_CCY_PAIRS:
+    if spot not in SUPPORTED_CCY_PAIRS_SET:
         raise Exception(f'Option {sym} has wrong format, currency pair {spot} not supported')
     return True
 
@@ -35,9 +33,9 @@ def get_expiry_option(sym):
     # it should have this format: YYMMDD
     if len(expiry) != 6:
         raise Exception(f'Option {sym} has wrong expiry format')
-    year = expiry[:1]
-    month = expiry[1:3]
-    day = expiry[3:]
+    year = expiry[:2]
+    month = expiry[2:4]
+    day = expiry[4:]
 
     year = 2000 + int(year)
     month = int(month)
@@ -0,0 +1,148 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
+    ASK_PRICES, MISC
+
+ORDERBOOK_COLUMNS = [MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES,
+                     MISC]
+MICROS_PER_SECOND = 1000000
+
+
+def levels_to_arrays(levels, n_levels=None):
+    """
+    Convert the levels of one side of a book, as sent by the exchanges, to contiguous price and size arrays
+
+    :param levels: list, of [price, size, ...] where price and size are numbers or numeric strings, or np.ndarray of
+        shape (n, row length) as decoded by json_decode.ArrayDecoder
+    :param n_levels: int, optional, only keep the first n_levels
+    :return: tuple, (prices, sizes) as np.ndarray of float64
+    """
+    if isinstance(levels, np.ndarray):
+        return np.array(levels[:n_levels, 0], dtype=np.float64), np.array(levels[:n_levels, 1], dtype=np.float64)
+    if n_levels is not None:
+        levels = levels[:n_levels]
+    prices = np.array([level[0] for level in levels], dtype=np.float64)
+    sizes = np.array([level[1] for level in levels], dtype=np.float64)
+    return prices, sizes
+
+
+def seconds_to_micros(t):
+    """
+    :param t: float, timestamp in seconds
+    :return: int, timestamp in micro seconds
+    """
+    return int(round(t * MICROS_PER_SECOND))
+
+
+def micros_to_datetime(t):
+    """
+    :param t: int, timestamp in micro seconds
+    :return: datetime.datetime
+    """
+    return datetime.datetime.fromtimestamp(t / MICROS_PER_SECOND)
+
+
+class OrderBook:
+    """
+    A snapshot of the first levels of an orderbook
+    Prices and sizes are stored as float64 arrays, best level first, and timestamps as int micro seconds
+    """
+    __slots__ = ['sym', 'market', 'bid_prices', 'bid_sizes', 'ask_prices', 'ask_sizes', 'market_timestamp',
+                 'gateway_timestamp', 'misc']
+
+    def __init__(self, sym, market, bid_prices, bid_sizes, ask_prices, ask_sizes, market_timestamp, gateway_timestamp,
+                 misc=''):
+        """
+
+        :param sym: str
+        :param market: str
+        :param bid_prices: np.ndarray, float64, from best to worst
+        :param bid_sizes: np.ndarray, float64
+        :param ask_prices: np.ndarray, float64, from best to worst
+        :param ask_sizes: np.ndarray, float64
+        :param market_timestamp: int, time of the snapshot on the exchange in micro seconds
+        :param gateway_timestamp: int, time the snapshot was received in micro seconds
+        :param misc: str
+        """
+        self.sym = sym
+        self.market = market
+        self.bid_prices = bid_prices
+        self.bid_sizes = bid_sizes
+        self.ask_prices = ask_prices
+        self.ask_sizes = ask_sizes
+        self.market_timestamp = market_timestamp
+        self.gateway_timestamp = gateway_timestamp
+        self.misc = misc
+
+    def __repr__(self):
+        return f'OrderBook({self.sym}, {self.market}, bid={self.best_bid}, ask={self.best_ask}, ' \
+               f'n_levels={self.n_levels})'
+
+    @property
+    def n_levels(self):
+        return max(len(self.bid_prices), len(self.ask_prices))
+
+    @property
+    def best_bid(self):
+        """
+        :return: float, nan if there is no bid
+        """
+        return float(self.bid_prices[0]) if len(self.bid_prices) > 0 else np.nan
+
+    @property
+    def best_ask(self):
+        """
+        :return: float, nan if there is no ask
+        """
+        return float(self.ask_prices[0]) if len(self.ask_prices) > 0 else np.nan
+
+    @property
+    def best_bid_size(self):
+        return float(self.bid_sizes[0]) if len(self.bid_sizes) > 0 else np.nan
+
+    @property
+    def best_ask_size(self):
+        return float(self.ask_sizes[0]) if len(self.ask_sizes) > 0 else np.nan
+
+    @property
+    def mid(self):
+        return 0.5 * (self.best_bid + self.best_ask)
+
+    @property
+    def spread(self):
+        return self.best_ask - self.best_bid
+
+    def to_dict(self):
+        """
+        :return: dict, json serializable, with keys [MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES,
+            BID_PRICES, ASK_SIZES, ASK_PRICES, MISC] where the timestamps are int micro seconds and the sizes and prices
+            are lists
+        """
+        return {MARKET_TIMESTAMP: self.market_timestamp,
+                GATEWAY_TIMESTAMP: self.gateway_timestamp,
+                SYM: self.sym,
+                MARKET: self.market,
+                BID_SIZES: self.bid_sizes.tolist(),
+                BID_PRICES: self.bid_prices.tolist(),
+                ASK_SIZES: self.ask_sizes.tolist(),
+                ASK_PRICES: self.ask_prices.tolist(),
+                MISC: self.misc}
+
+    def to_frame(self):
+        """
+        :return: pd.DataFrame, with one row and columns [MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES,
+            BID_PRICES, ASK_SIZES, ASK_PRICES, MISC] where the sizes and prices are lists
+        """
+        return pd.DataFrame(data=[[micros_to_datetime(self.market_timestamp),
+                                   micros_to_datetime(self.gateway_timestamp),
+                                   self.sym,
+                                   self.market,
+                                   self.bid_sizes.tolist(),
+                                   self.bid_prices.tolist(),
+                                   self.ask_sizes.tolist(),
+                                   self.ask_prices.tolist(),
+                                   self.misc]],
+                            columns=ORDERBOOK_COLUMNS)
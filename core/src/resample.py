@@ -0,0 +1,102 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from core.src.column_names import TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT
+
+OHLC_COLUMNS = [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
+
+
+def trades_to_ohlc(times, prices, sizes, interval):
+    """
+    Aggregate trades into bars, each bar is reduced with numpy over the slice of its trades
+
+    :param times: np.ndarray, float64 timestamps in seconds, sorted
+    :param prices: np.ndarray, float64
+    :param sizes: np.ndarray, float64
+    :param interval: int, frequency in minutes
+    :return: dict, of np.ndarray with keys OHLC_COLUMNS, TIME being the start of the bars as int64 timestamps in
+        seconds, and the notional under 'notional'
+    """
+    step = interval * 60
+    bar_times = (times // step).astype(np.int64) * step
+    if len(bar_times) == 0:
+        return {column: np.array([]) for column in OHLC_COLUMNS + ['notional']}
+    starts = np.flatnonzero(np.r_[True, bar_times[1:] != bar_times[:-1]])
+    lasts = np.r_[starts[1:], len(bar_times)] - 1
+    volume = np.add.reduceat(sizes, starts)
+    notional = np.add.reduceat(prices * sizes, starts)
+    return {TIME: bar_times[starts],
+            OPEN: prices[starts],
+            HIGH: np.maximum.reduceat(prices, starts),
+            LOW: np.minimum.reduceat(prices, starts),
+            CLOSE: prices[lasts],
+            VWAP: np.divide(notional, volume, out=prices[lasts].copy(), where=volume > 0),
+            VOLUME: volume,
+            COUNT: lasts - starts + 1,
+            'notional': notional}
+
+
+class TradesResampler:
+    """
+    Aggregate a stream of trades into bars, page by page
+    Only the bar in progress is kept between pages, so the memory does not depend on the number of trades.
+    """
+
+    def __init__(self, interval):
+        """
+
+        :param interval: int, frequency in minutes
+        """
+        self.interval = interval
+        # the last bar of the previous page, as it may go on in the next one
+        self.partial = None
+
+    def add(self, times, prices, sizes):
+        """
+        :param times: np.ndarray, float64 timestamps in seconds, sorted and after the previous ones
+        :param prices: np.ndarray, float64
+        :param sizes: np.ndarray, float64
+        :return: pd.DataFrame, the bars that are over, see bars_to_frame
+        """
+        bars = trades_to_ohlc(times, prices, sizes, self.interval)
+        if len(bars[TIME]) == 0:
+            return bars_to_frame(bars, 0)
+        partial = self.partial
+        if partial is not None and partial[TIME][0] == bars[TIME][0]:
+            # the first bar goes on from the previous page
+            bars[OPEN][0] = partial[OPEN][0]
+            bars[HIGH][0] = max(bars[HIGH][0], partial[HIGH][0])
+            bars[LOW][0] = min(bars[LOW][0], partial[LOW][0])
+            bars[VOLUME][0] += partial[VOLUME][0]
+            bars['notional'][0] += partial['notional'][0]
+            bars[COUNT][0] += partial[COUNT][0]
+            if bars[VOLUME][0] > 0:
+                bars[VWAP][0] = bars['notional'][0] / bars[VOLUME][0]
+            partial = None
+        self.partial = {column: values[-1:] for column, values in bars.items()}
+        over = bars_to_frame(bars, len(bars[TIME]) - 1)
+        if partial is not None:
+            over = pd.concat([bars_to_frame(partial, 1), over], ignore_index=True)
+        return over
+
+    def flush(self):
+        """
+        :return: pd.DataFrame, the bar in progress if any
+        """
+        partial, self.partial = self.partial, None
+        return bars_to_frame(partial, 1 if partial is not None else 0)
+
+
+def bars_to_frame(bars, n_bars):
+    """
+    :param bars: dict, see trades_to_ohlc
+    :param n_bars: int, only the first n_bars are kept
+    :return: pd.DataFrame, with columns OHLC_COLUMNS and TIME as datetime.datetime, like get_ohlc
+    """
+    if bars is None or n_bars == 0:
+        return pd.DataFrame(columns=OHLC_COLUMNS)
+    ohlc = pd.DataFrame({column: bars[column][:n_bars] for column in OHLC_COLUMNS})
+    ohlc[TIME] = [datetime.datetime.fromtimestamp(t) for t in ohlc[TIME].tolist()]
+    return ohlc
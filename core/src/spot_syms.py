@@ -48,6 +48,11 @@ SUPPORTED_FIAT_CURRENCIES = [USD, EUR]
 SUPPORTED_CURRENCIES = SUPPORTED_CRYPTO_CURRENCIES + SUPPORTED_FIAT_CURRENCIES
 SUPPORTED_CCY_PAIRS = [crypto + USD for crypto in SUPPORTED_CRYPTO_CURRENCIES]
 CCY_PAIRS_VS_EUR = [USDCEUR]
+# for the membership tests, the lists above keep the order
+SUPPORTED_FIAT_CURRENCIES_SET = frozenset(SUPPORTED_FIAT_CURRENCIES)
+SUPPORTED_CURRENCIES_SET = frozenset(SUPPORTED_CURRENCIES)
+SUPPORTED_CCY_PAIRS_SET = frozenset(SUPPORTED_CCY_PAIRS)
+SUPPORTED_CCY_PAIRS_WITH_EUR_SET = frozenset(SUPPORTED_CCY_PAIRS + CCY_PAIRS_VS_EUR)
 
 
 def split_currency_pair_into_lhs_rhs(sym):
@@ -55,7 +60,7 @@ def split_currency_pair_into_lhs_rhs(sym):
         warnings.warn(f'sym should always be upper case but received {sym}')
     sym = sym.upper()
     fiat = sym[-3:]
-    if fiat in SUPPORTED_FIAT_CURRENCIES:
+    if fiat in SUPPORTED_FIAT_CURRENCIES_SET:
         crypto = sym[:-3]
         return crypto, fiat
     else:
@@ -83,8 +88,8 @@ def check_currency_pairs(syms, include_eur_pairs=False):
 
 def check_currency_pair_spot(sym, include_eur_pairs=False):
     sym = sym.upper()
-    supported_pairs = SUPPORTED_CCY_PAIRS + CCY_PAIRS_VS_EUR if include_eur_pairs else SUPPORTED_CCY_PAIRS
-    if sym not in supported_pairs:
+    if sym not in (SUPPORTED_CCY_PAIRS_WITH_EUR_SET if include_eur_pairs else SUPPORTED_CCY_PAIRS_SET):
+        supported_pairs = SUPPORTED_CCY_PAIRS + CCY_PAIRS_VS_EUR if include_eur_pairs else SUPPORTED_CCY_PAIRS
         raise Exception('Unsupported currency pair:', sym, 'Supported currency pairs:', supported_pairs)
     return sym
 
@@ -98,12 +103,17 @@ def check_currencies(syms):
 
 def check_currency(sym):
     sym = sym.upper()
-    if sym not in SUPPORTED_CURRENCIES:
+    if sym not in SUPPORTED_CURRENCIES_SET:
         raise Exception('Unsupported currency:', sym, 'Supported currencies:', SUPPORTED_CURRENCIES)
     return sym
 
 
 def keep_support_currencies(df, supported_currencies):
+    """
+    :param df: pd.DataFrame, with a column 'sym', upper cased in place
+    :param supported_currencies: iterable, of str
+    :return: pd.DataFrame, the rows of df with a supported sym
+    """
     df['sym'] = df['sym'].str.upper()
     df = df.loc[df['sym'].isin(supported_currencies)]
     return df
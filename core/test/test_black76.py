@@ -0,0 +1,95 @@
+import datetime
+import time
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.src.black76 import black76_price, black76_greeks, implied_vol, norm_cdf, time_to_expiry, \
+    get_chain_implied_vols
+from core.src.column_names import SYM, BID, ASK, MARK, UNDERLYING_PRICE, BID_IV, ASK_IV, MARK_IV, DELTA, GAMMA, \
+    VEGA, THETA
+from core.src.option_syms import get_expiry_option
+
+NOW = datetime.datetime(2023, 5, 1, 8, tzinfo=datetime.timezone.utc)
+
+
+class TestBlack76(unittest.TestCase):
+
+    def test_norm_cdf(self):
+        x = np.array([-3., -1., 0., 0.5, 2.])
+        expected = [0.0013498980316301, 0.1586552539314571, 0.5, 0.6914624612740131, 0.9772498680518208]
+        np.testing.assert_allclose(norm_cdf(x), expected, rtol=1e-6)
+
+    def test_price_and_greeks(self):
+        forward, strike, t, vol = np.array([2000.]), np.array([2000.]), np.array([0.25]), np.array([0.8])
+        call = black76_price(forward, strike, t, vol, True)
+        put = black76_price(forward, strike, t, vol, False)
+        # at the money forward, call and put are worth the same: F * (2 * N(vol * sqrt(t) / 2) - 1)
+        self.assertAlmostEqual(call[0], 2000 * (2 * norm_cdf(np.array([0.2]))[0] - 1))
+        self.assertAlmostEqual(call[0], put[0])
+
+        greeks = black76_greeks(forward, strike, t, vol, np.array([True]))
+        bump = 1e-4
+        up = black76_price(forward + bump, strike, t, vol, True)
+        down = black76_price(forward - bump, strike, t, vol, True)
+        self.assertAlmostEqual(greeks[DELTA][0], (up - down)[0] / (2 * bump), places=5)
+        self.assertAlmostEqual(greeks[GAMMA][0], (up - 2 * call + down)[0] / bump ** 2, places=3)
+        vega = (black76_price(forward, strike, t, vol + 0.01, True) - call)[0]
+        self.assertAlmostEqual(greeks[VEGA][0], vega, places=1)
+        theta = (black76_price(forward, strike, t - 1 / 365, vol, True) - call)[0]
+        self.assertAlmostEqual(greeks[THETA][0], theta, places=1)
+        self.assertAlmostEqual(black76_greeks(forward, strike, t, vol, np.array([False]))[DELTA][0],
+                               greeks[DELTA][0] - 1)
+
+    def test_implied_vol(self):
+        rng = np.random.default_rng(0)
+        n = 1000
+        forward = np.full(n, 2000.)
+        strike = rng.uniform(1000, 4000, n)
+        t = rng.uniform(7 / 365, 1, n)
+        vol = rng.uniform(0.3, 1.5, n)
+        is_call = rng.random(n) < 0.5
+        price = black76_price(forward, strike, t, vol, is_call)
+        # below the deribit tick size, 0.0005 coin, of time value the vol cannot be told apart
+        time_value = price - np.maximum(np.where(is_call, forward - strike, strike - forward), 0)
+        listed = time_value >= 0.0005 * forward
+        forward, strike, t, vol, is_call, price = [x[listed] for x in [forward, strike, t, vol, is_call, price]]
+
+        start = time.perf_counter()
+        iv = implied_vol(price, forward, strike, t, is_call)
+        self.assertLess(time.perf_counter() - start, 0.5)
+        np.testing.assert_allclose(iv, vol, atol=1e-6)
+
+        # no price, expired, below intrinsic or above the forward
+        iv = implied_vol(np.array([np.nan, 100., 50., 2100.]), 2000., np.array([2000., 2000., 1900., 1000.]),
+                         np.array([0.1, 0., 0.1, 0.1]), True)
+        self.assertTrue(np.isnan(iv).all())
+
+    def test_time_to_expiry(self):
+        t = time_to_expiry(np.array([datetime.date(2023, 5, 2), datetime.date(2023, 5, 1), datetime.date(2023, 5, 2)]),
+                           NOW)
+        np.testing.assert_allclose(t, [1 / 365, 0., 1 / 365])
+
+    def test_get_chain_implied_vols(self):
+        syms = ['C_ETHUSD_230630_1800', 'P_ETHUSD_230630_1800', 'C_ETHUSD_231229_2500']
+        forward = np.array([2000., 2000., 2050.])
+        strike = np.array([1800., 1800., 2500.])
+        is_call = np.array([True, False, True])
+        t = time_to_expiry(np.array([get_expiry_option(sym) for sym in syms]), NOW)
+        mark = black76_price(forward, strike, t, np.array([0.7, 0.7, 0.75]), is_call)
+        chain = pd.DataFrame({SYM: syms, BID: [mark[0] - 5, np.nan, mark[2] - 5], ASK: [mark[0] + 5, mark[1] + 5, np.nan],
+                              MARK: mark, UNDERLYING_PRICE: forward})
+
+        chain = get_chain_implied_vols(chain, NOW)
+        np.testing.assert_allclose(chain[MARK_IV], [0.7, 0.7, 0.75])
+        self.assertTrue((chain[BID_IV].values[[0, 2]] < chain[MARK_IV].values[[0, 2]]).all())
+        self.assertTrue(chain[ASK_IV].values[0] > chain[MARK_IV].values[0])
+        self.assertTrue(np.isnan(chain[BID_IV].values[1]))
+        self.assertTrue(np.isnan(chain[ASK_IV].values[2]))
+        self.assertAlmostEqual(chain[DELTA].values[0] - chain[DELTA].values[1], 1)
+        self.assertAlmostEqual(chain[GAMMA].values[0], chain[GAMMA].values[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import datetime
+import os
+import unittest
+
+import pandas as pd
+
+from core import root_folder
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN
+from core.src.option_syms import C_
+from core.src.spot_syms import ETHUSD, BTCUSD, ETH, USD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.instruments import get_instrument, get_instruments, are_supported, is_supported, InstrumentRegistry
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+
+
+class TestInstruments(unittest.TestCase):
+
+    def test_get_instrument(self):
+        instrument = get_instrument(ETHUSD)
+        self.assertIs(get_instrument(ETHUSD), instrument)
+        self.assertEqual(instrument.instrument_type, SPOT)
+        self.assertEqual((instrument.crypto, instrument.fiat), (ETH, USD))
+        with self.assertRaises(AttributeError):
+            instrument.sym = BTCUSD
+
+        future = get_instrument('FUT_BTCUSD_230630')
+        self.assertEqual(future.instrument_type, FUTURE)
+        self.assertEqual(future.pair, BTCUSD)
+        self.assertEqual(future.expiry, datetime.date(2023, 6, 30))
+        self.assertIsNone(get_instrument('FUT_ETHUSD_PERP').expiry)
+
+        option = get_instrument('C_ETHUSD_230526_1200')
+        self.assertEqual(option.instrument_type, OPTION)
+        self.assertEqual(option.strike, 1200.)
+        self.assertEqual(option.option_type, C_)
+        self.assertTrue(option.is_call)
+        self.assertFalse(get_instrument('P_ETHUSD_230526_1200').is_call)
+
+        for sym in ['ETHJPY', 'DOGEUSD', 'FUT_ETHUSD', 'FUT_DOGEUSD_PERP', 'C_ETHUSD_2305_1200', 'X_ETHUSD_230526_1']:
+            self.assertFalse(is_supported(sym), sym)
+            with self.assertRaises(Exception):
+                get_instrument(sym)
+
+    def test_vectorized(self):
+        syms = pd.Series([ETHUSD, 'DOGEUSD', ETHUSD, None, 'FUT_ETHUSD_PERP'])
+        self.assertEqual(are_supported(syms).tolist(), [True, False, True, False, True])
+        self.assertEqual(are_supported([BTCUSD]).tolist(), [True])
+        instruments = get_instruments(syms[are_supported(syms)])
+        self.assertEqual(instruments.index.tolist(), [0, 2, 4])
+        self.assertIs(instruments[0], instruments[2])
+        self.assertEqual([instrument.sym for instrument in get_instruments([BTCUSD])], [BTCUSD])
+
+    def test_registry(self):
+        registry = InstrumentRegistry()
+        calls = []
+
+        def format_sym_for_market(sym):
+            calls.append(sym)
+            return sym.lower()
+
+        namespace = (KRAKEN, SPOT)
+        self.assertEqual(registry.get_market_sym(namespace, ETHUSD, format_sym_for_market), 'ethusd')
+        self.assertEqual(registry.get_market_sym(namespace, ETHUSD, format_sym_for_market), 'ethusd')
+        self.assertEqual(calls, [ETHUSD])
+        self.assertEqual(registry.get_market_syms(namespace, pd.Series([ETHUSD, BTCUSD, BTCUSD]),
+                                                  format_sym_for_market).tolist(), ['ethusd', 'btcusd', 'btcusd'])
+        self.assertEqual(calls, [ETHUSD, BTCUSD])
+        # the namespaces do not share their names
+        registry.get_market_sym((KRAKEN, SPOT, 'ws'), ETHUSD, format_sym_for_market)
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(registry.get_syms(namespace, ['ethusd'], str.upper), [ETHUSD])
+
+    def test_api(self):
+        api = MarketDataRestApiKrakenSpot()
+        self.assertEqual(api.get_market_sym(ETHUSD), 'XETHZUSD')
+        self.assertEqual(api.get_market_syms([ETHUSD, BTCUSD]), ['XETHZUSD', 'XXBTZUSD'])
+        self.assertEqual(api.get_sym('XXBTZUSD'), BTCUSD)
+        self.assertEqual(api.get_syms(pd.Series(['XETHZUSD', 'ETHUSD'])).tolist(), [ETHUSD, ETHUSD])
+        with self.assertRaises(Exception):
+            api.get_market_sym('DOGEUSD')
+
+
+if __name__ == '__main__':
+    unittest.main()
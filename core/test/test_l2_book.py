@@ -0,0 +1,102 @@
+import os
+import random
+import unittest
+import zlib
+
+import numpy as np
+
+from core import root_folder
+from core.src.column_names import BID_PRICES, ASK_PRICES, ASK_SIZES, SYM, MARKET
+from core.src.markets import KRAKEN
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.l2_book import L2Book, kraken_checksum, format_kraken_checksum_level
+
+
+class TestL2Book(unittest.TestCase):
+
+    def setUp(self):
+        self.book = L2Book(ETHUSD, KRAKEN, n_levels=2)
+        self.book.apply_snapshot([['100.5', '2.0'], ['99.5', '4.0'], ['98.5', '1.0']],
+                                 [['101.5', '1.0'], ['102.5', '3.0']], 1700000000000000)
+
+    def test_update(self):
+        self.assertEqual(self.book.best_bid, 100.5)
+        self.assertEqual(self.book.best_ask, 101.5)
+        top = self.book.top_levels()
+        self.assertEqual(top[0].tolist(), [100.5, 99.5])
+        # a change beyond the first levels keeps them
+        self.book.update(True, 97.5, 5.)
+        self.assertIs(self.book.top_levels(), top)
+
+        self.book.update(True, 100.5, 0.)
+        self.book.update(False, 101., 2.)
+        self.book.update(False, 102.5, 7.)
+        bid_prices, bid_sizes, ask_prices, ask_sizes = self.book.top_levels()
+        self.assertEqual(bid_prices.tolist(), [99.5, 98.5])
+        self.assertEqual(ask_prices.tolist(), [101., 101.5])
+        self.assertEqual(ask_sizes.tolist(), [2., 1.])
+        # removing a level that does not exist does nothing
+        self.book.update(False, 150., 0.)
+        self.assertEqual(len(self.book.asks), 3)
+
+        self.book.truncate(1)
+        self.assertEqual(len(self.book.bids), 1)
+        self.assertEqual(self.book.top_levels()[2].tolist(), [101.])
+
+    def test_snapshot(self):
+        snapshot = self.book.snapshot(price_factor=2.)
+        self.assertEqual(snapshot[SYM], ETHUSD)
+        self.assertEqual(snapshot[MARKET], KRAKEN)
+        self.assertEqual(snapshot[BID_PRICES].tolist(), [201., 199.])
+        self.assertEqual(snapshot[ASK_PRICES].tolist(), [203., 205.])
+        self.assertEqual(snapshot[ASK_SIZES].tolist(), [1., 3.])
+        ob = self.book.to_orderbook()
+        self.assertEqual(ob.market_timestamp, 1700000000000000)
+        self.assertEqual(ob.to_frame()[BID_PRICES][0], [100.5, 99.5])
+        # the order books do not share their levels with the book
+        ob.ask_sizes[0] = 0.
+        self.assertEqual(self.book.to_orderbook().ask_sizes[0], 1.)
+
+    def test_random_updates(self):
+        rng = random.Random(0)
+        book = L2Book(ETHUSD, KRAKEN, n_levels=5)
+        bids = {}
+        asks = {}
+        for _ in range(5000):
+            is_bid = rng.random() < 0.5
+            levels = bids if is_bid else asks
+            price = float(rng.randrange(900, 1000) if is_bid else rng.randrange(1000, 1100))
+            size = float(rng.choice([0, 0, 1, 2, 3]))
+            book.update(is_bid, price, size)
+            if size == 0:
+                levels.pop(price, None)
+            else:
+                levels[price] = size
+            bid_prices, bid_sizes, ask_prices, ask_sizes = book.top_levels()
+            expected_bids = sorted(bids, reverse=True)[:5]
+            expected_asks = sorted(asks)[:5]
+            np.testing.assert_array_equal(bid_prices, expected_bids)
+            np.testing.assert_array_equal(bid_sizes, [bids[price] for price in expected_bids])
+            np.testing.assert_array_equal(ask_prices, expected_asks)
+            np.testing.assert_array_equal(ask_sizes, [asks[price] for price in expected_asks])
+
+    def test_kraken_checksum(self):
+        self.assertEqual(format_kraken_checksum_level('0.05005000'), '5005000')
+        self.assertEqual(format_kraken_checksum_level('5541.30000'), '554130000')
+        expected = zlib.crc32(b'1015' b'10' b'1025' b'30' b'1005' b'20' b'995' b'40' b'985' b'10')
+        self.assertEqual(self.book.kraken_checksum(), expected)
+        self.assertTrue(self.book.check_kraken_checksum(str(expected)))
+        # only the first 10 levels of each side count
+        asks = [(f'{price}.0', '1.0') for price in range(101, 121)]
+        self.assertEqual(kraken_checksum(asks, []), kraken_checksum(asks[:10], []))
+
+        self.book.update_levels(False, [['101.5', '0.00000000']])
+        self.assertFalse(self.book.check_kraken_checksum(str(expected)))
+
+
+if __name__ == '__main__':
+    unittest.main()
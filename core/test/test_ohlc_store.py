@@ -0,0 +1,56 @@
+import datetime
+import tempfile
+import unittest
+
+import pandas as pd
+
+from core.src.column_names import TIME, OPEN, CLOSE
+from core.src.markets import KRAKEN
+from core.src.ohlc_store import OhlcStore, merge_ranges, find_gaps
+from core.src.spot_syms import ETHUSD
+
+DAY = 24 * 60 * 60
+START = 1700006400
+
+
+def make_ohlc(times, closes):
+    return pd.DataFrame({TIME: [datetime.datetime.fromtimestamp(t) for t in times],
+                         OPEN: [float(c) - 1 for c in closes],
+                         CLOSE: [float(c) for c in closes]})
+
+
+class TestOhlcStore(unittest.TestCase):
+
+    def test_ranges(self):
+        self.assertEqual(merge_ranges([(5, 8), (0, 2), (2, 4), (7, 9), (3, 3)]), [(0, 4), (5, 9)])
+        self.assertEqual(find_gaps([], 0, 10), [(0, 10)])
+        self.assertEqual(find_gaps([(0, 4), (5, 9)], 0, 10), [(4, 5), (9, 10)])
+        self.assertEqual(find_gaps([(0, 4), (5, 9)], 1, 3), [])
+        self.assertEqual(find_gaps([(2, 4)], 0, 3), [(0, 2)])
+
+    def test_update_and_read(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = OhlcStore(path)
+            self.assertEqual(store.find_gaps(KRAKEN, ETHUSD, 1440, START, START + 3 * DAY),
+                             [(START, START + 3 * DAY)])
+            store.update(KRAKEN, ETHUSD, 1440, make_ohlc([START, START + DAY], [10, 11]),
+                         [(START, START + 2 * DAY)])
+            # a bar for the same time replaces the stored one
+            store.update(KRAKEN, ETHUSD, 1440, make_ohlc([START + DAY, START + 2 * DAY], [12, 13]),
+                         [(START + DAY, START + 3 * DAY)])
+            self.assertEqual(store.get_coverage(KRAKEN, ETHUSD, 1440), [(START, START + 3 * DAY)])
+
+            ohlc = store.read(KRAKEN, ETHUSD, 1440, START + DAY, START + 3 * DAY)
+            self.assertEqual(ohlc.columns.tolist(), [TIME, OPEN, CLOSE])
+            self.assertEqual(ohlc[CLOSE].tolist(), [12.0, 13.0])
+            self.assertEqual(ohlc[TIME].values[0], pd.Timestamp(datetime.datetime.fromtimestamp(START + DAY)))
+
+            # the files are read back by a new store
+            store = OhlcStore(path)
+            self.assertEqual(store.get_coverage(KRAKEN, ETHUSD, 1440), [(START, START + 3 * DAY)])
+            self.assertEqual(store.read(KRAKEN, ETHUSD, 1440)[CLOSE].tolist(), [10.0, 12.0, 13.0])
+            self.assertEqual(len(store.read(KRAKEN, ETHUSD, 60)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import datetime
+import unittest
+
+import numpy as np
+
+from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
+    ASK_PRICES, MISC
+from core.src.markets import KRAKEN
+from core.src.orderbook import OrderBook, levels_to_arrays, seconds_to_micros
+from core.src.spot_syms import ETHUSD
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def test_levels_to_arrays(self):
+        prices, sizes = levels_to_arrays([['100.5', '2', 1700000000], ['100.0', '3.5', 1700000001]])
+        self.assertEqual(prices.dtype, np.float64)
+        self.assertEqual(prices.tolist(), [100.5, 100.0])
+        self.assertEqual(sizes.tolist(), [2.0, 3.5])
+
+        prices, sizes = levels_to_arrays([[100.5, 2], [100.0, 3.5], [99.5, 1]], n_levels=2)
+        self.assertEqual(prices.tolist(), [100.5, 100.0])
+
+        prices, sizes = levels_to_arrays([])
+        self.assertEqual(len(prices), 0)
+
+    def test_orderbook(self):
+        bid_prices, bid_sizes = levels_to_arrays([[100.0, 1.0], [99.0, 2.0]])
+        ask_prices, ask_sizes = levels_to_arrays([[101.0, 3.0]])
+        market_timestamp = seconds_to_micros(1700000000.25)
+        ob = OrderBook(ETHUSD, KRAKEN, bid_prices, bid_sizes, ask_prices, ask_sizes, market_timestamp,
+                       market_timestamp + 1000)
+        self.assertEqual(ob.best_bid, 100.0)
+        self.assertEqual(ob.best_ask, 101.0)
+        self.assertEqual(ob.best_ask_size, 3.0)
+        self.assertEqual(ob.mid, 100.5)
+        self.assertEqual(ob.spread, 1.0)
+        self.assertEqual(ob.n_levels, 2)
+        with self.assertRaises(AttributeError):
+            ob.other = 1
+
+        frame = ob.to_frame()
+        self.assertEqual(frame.columns.tolist(),
+                         [MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES,
+                          ASK_PRICES, MISC])
+        self.assertEqual(len(frame), 1)
+        self.assertEqual(frame[BID_PRICES].values[0], [100.0, 99.0])
+        self.assertEqual(frame[ASK_SIZES].values[0], [3.0])
+        self.assertEqual(frame[MARKET_TIMESTAMP].iloc[0], datetime.datetime.fromtimestamp(1700000000.25))
+
+    def test_empty_side(self):
+        empty_prices, empty_sizes = levels_to_arrays([])
+        ask_prices, ask_sizes = levels_to_arrays([[101.0, 3.0]])
+        ob = OrderBook(ETHUSD, KRAKEN, empty_prices, empty_sizes, ask_prices, ask_sizes, 0, 0)
+        self.assertTrue(np.isnan(ob.best_bid))
+        self.assertTrue(np.isnan(ob.mid))
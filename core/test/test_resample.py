@@ -0,0 +1,47 @@
+import unittest
+
+import numpy as np
+
+from core.src.column_names import TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT
+from core.src.resample import trades_to_ohlc, TradesResampler, OHLC_COLUMNS
+
+START = 1700006400
+
+
+class TestResample(unittest.TestCase):
+
+    def test_trades_to_ohlc(self):
+        times = START + np.array([0., 10., 59., 60., 200.])
+        prices = np.array([10., 12., 11., 20., 21.])
+        sizes = np.array([1., 1., 2., 1., 3.])
+        bars = trades_to_ohlc(times, prices, sizes, 1)
+        self.assertEqual(bars[TIME].tolist(), [START, START + 60, START + 180])
+        self.assertEqual(bars[OPEN].tolist(), [10., 20., 21.])
+        self.assertEqual(bars[HIGH].tolist(), [12., 20., 21.])
+        self.assertEqual(bars[LOW].tolist(), [10., 20., 21.])
+        self.assertEqual(bars[CLOSE].tolist(), [11., 20., 21.])
+        self.assertEqual(bars[VOLUME].tolist(), [4., 1., 3.])
+        self.assertEqual(bars[VWAP].tolist(), [11., 20., 21.])
+        self.assertEqual(bars[COUNT].tolist(), [3, 1, 1])
+        self.assertEqual(len(trades_to_ohlc(np.array([]), np.array([]), np.array([]), 1)[TIME]), 0)
+
+    def test_resampler(self):
+        times = START + np.arange(0., 600., 7.)
+        prices = np.arange(len(times), dtype=np.float64) % 13
+        sizes = np.ones(len(times))
+        expected = trades_to_ohlc(times, prices, sizes, 5)
+
+        # the bars do not depend on how the trades are split in pages
+        resampler = TradesResampler(5)
+        pages = [resampler.add(times[i:i + 9], prices[i:i + 9], sizes[i:i + 9]) for i in range(0, len(times), 9)]
+        pages.append(resampler.flush())
+        self.assertEqual(pages[0].columns.tolist(), OHLC_COLUMNS)
+        ohlc = np.concatenate([page[[OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]].to_numpy(dtype=np.float64)
+                               for page in pages])
+        np.testing.assert_allclose(ohlc, np.array([expected[column] for column in
+                                                   [OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]]).T)
+        self.assertEqual(len(resampler.flush()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
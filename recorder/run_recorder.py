@@ -0,0 +1,18 @@
+"""
+Launch script of the recorder, see recorder.src.recorder
+
+usage:
+    python recorder/run_recorder.py <config.csv> <output folder> [max workers] [number of processes]
+"""
+import os
+import sys
+
+from core import root_folder
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../'
+
+from recorder.src.recorder import main
+
+if __name__ == '__main__':
+    main(sys.argv[1], sys.argv[2], *[int(arg) for arg in sys.argv[3:5]])
@@ -0,0 +1,254 @@
+"""
+Record orderbook snapshots of several syms across markets at a fixed cadence
+
+usage:
+    python recorder/run_recorder.py <config.csv> <output folder> [max workers] [number of processes]
+
+The config lists one sym per line with columns market,instrument_type,sym,n_levels,interval where interval is in
+seconds, see resources/recorder.csv. With more than one process the syms are sharded across them, see
+sharded_recorder.
+"""
+import csv
+import heapq
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.src.orderbook import seconds_to_micros
+from recorder.src.snapshot_writer import RotatingSnapshotWriter
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+
+# number of latency and jitter samples kept for the stats
+N_SAMPLES = 10000
+
+
+class RecordedSym:
+    """
+    One line of the config
+    """
+    __slots__ = ['market', 'instrument_type', 'sym', 'n_levels', 'interval']
+
+    def __init__(self, market, instrument_type, sym, n_levels, interval):
+        """
+
+        :param market: str
+        :param instrument_type: str
+        :param sym: str
+        :param n_levels: int
+        :param interval: float, in seconds
+        """
+        self.market = market
+        self.instrument_type = instrument_type
+        self.sym = sym
+        self.n_levels = n_levels
+        self.interval = interval
+
+    def __repr__(self):
+        return f'RecordedSym({self.market}, {self.instrument_type}, {self.sym}, n_levels={self.n_levels}, ' \
+               f'interval={self.interval})'
+
+
+def load_recorder_config(path):
+    """
+    :param path: str, csv file with columns market,instrument_type,sym,n_levels,interval
+    :return: list, of RecordedSym
+    """
+    with open(path, newline='') as f:
+        recorded_syms = [RecordedSym(row['market'], row['instrument_type'], row['sym'], int(row['n_levels']),
+                                     float(row['interval']))
+                         for row in csv.DictReader(f)]
+    for recorded_sym in recorded_syms:
+        if recorded_sym.interval <= 0:
+            raise Exception(f'Interval should be positive: {recorded_sym}')
+    return recorded_syms
+
+
+def make_snapshot(recorded_sym, ob, request_timestamp):
+    """
+    :param recorded_sym: RecordedSym
+    :param ob: OrderBook
+    :param request_timestamp: int, in micro seconds
+    :return: dict, json serializable, see OrderBook.to_dict, with the request_timestamp
+    """
+    snapshot = ob.to_dict()
+    snapshot['request_timestamp'] = request_timestamp
+    return snapshot
+
+
+def summarize(samples):
+    """
+    :param samples: iterable, of float
+    :return: dict, with keys ['count', 'mean', 'p50', 'p99', 'max'], nan if there is no sample
+    """
+    samples = np.fromiter(samples, dtype=np.float64)
+    if len(samples) == 0:
+        return {'count': 0, 'mean': np.nan, 'p50': np.nan, 'p99': np.nan, 'max': np.nan}
+    p50, p99 = np.percentile(samples, [50, 99])
+    return {'count': len(samples), 'mean': samples.mean(), 'p50': p50, 'p99': p99, 'max': samples.max()}
+
+
+class Recorder:
+    """
+    Snapshots the orderbooks of the config at their own interval
+
+    A single scheduler thread keeps, for each sym, the time of its next tick. Ticks are at start + k * interval, so
+    the time spent sleeping, scheduling or requesting never accumulates into drift. The requests themselves run on a
+    bounded pool of workers. A sym whose previous request is still running skips the tick rather than queueing up,
+    and ticks the scheduler was too late for are skipped too; both are counted as missed.
+    """
+
+    def __init__(self, recorded_syms, writer, max_workers=8, get_api=get_market_data_rest_api, clock=time.time,
+                 to_snapshot=make_snapshot):
+        """
+
+        :param recorded_syms: list, of RecordedSym
+        :param writer: RotatingSnapshotWriter, or any object with write(market, instrument_type, snapshot)
+        :param max_workers: int, maximum number of requests in flight
+        :param get_api: function, (market, instrument_type) -> MarketDataRestApi
+        :param clock: function, returns the current timestamp in seconds
+        :param to_snapshot: function, (RecordedSym, OrderBook, request timestamp in micro seconds) -> what is passed
+            to the writer, see make_snapshot
+        """
+        self.recorded_syms = recorded_syms
+        self.writer = writer
+        self.max_workers = max_workers
+        self.get_api = get_api
+        self.clock = clock
+        self.to_snapshot = to_snapshot
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        # index of the syms with a request in flight
+        self.in_flight = set()
+        self.n_ticks = 0
+        self.n_missed_ticks = 0
+        self.n_snapshots = 0
+        # how late each tick was handed to the workers, in seconds
+        self.jitters = deque(maxlen=N_SAMPLES)
+        # market -> latencies in seconds, and number of errors
+        self.latencies = {}
+        self.errors = {}
+        # market/sym -> number of errors, and the last error, they are reported by get_stats rather than logged as an
+        # outage would fail every sym at every tick
+        self.sym_errors = {}
+        self.last_error = None
+
+    def run(self, duration=None):
+        """
+        Record until stop is called or for duration
+
+        :param duration: float, in seconds, None to run until stop is called
+        """
+        start = self.clock()
+        end = None if duration is None else start + duration
+        # (time of the next tick, index of the sym, number of the tick), the time is recomputed from the number of the
+        # tick rather than summed so that rounding errors do not add up
+        ticks = [(start, i, 0) for i in range(len(self.recorded_syms))]
+        heapq.heapify(ticks)
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='recorder') as pool:
+            while ticks and not self.stop_event.is_set():
+                tick, i, k = ticks[0]
+                if end is not None and tick >= end:
+                    break
+                wait = tick - self.clock()
+                if wait > 0:
+                    self.stop_event.wait(wait)
+                    continue
+                heapq.heappop(ticks)
+                self._on_tick(pool, i, tick)
+                interval = self.recorded_syms[i].interval
+                # the ticks that are already over are skipped
+                n_late = int((self.clock() - tick) // interval)
+                with self.lock:
+                    self.n_missed_ticks += n_late
+                k += n_late + 1
+                heapq.heappush(ticks, (start + k * interval, i, k))
+
+    def _on_tick(self, pool, i, tick):
+        with self.lock:
+            self.n_ticks += 1
+            self.jitters.append(self.clock() - tick)
+            if i in self.in_flight:
+                self.n_missed_ticks += 1
+                return
+            self.in_flight.add(i)
+        pool.submit(self._snapshot, i)
+
+    def _snapshot(self, i):
+        recorded_sym = self.recorded_syms[i]
+        market = recorded_sym.market
+        try:
+            start = self.clock()
+            api = self.get_api(market, recorded_sym.instrument_type)
+            ob = api.get_orderbook(recorded_sym.sym, recorded_sym.n_levels, as_frame=False)
+            latency = self.clock() - start
+            snapshot = self.to_snapshot(recorded_sym, ob, seconds_to_micros(start))
+            self.writer.write(market, recorded_sym.instrument_type, snapshot)
+            with self.lock:
+                self.n_snapshots += 1
+                self.latencies.setdefault(market, deque(maxlen=N_SAMPLES)).append(latency)
+        except Exception as error:
+            key = f'{market}/{recorded_sym.sym}'
+            with self.lock:
+                self.errors[market] = self.errors.get(market, 0) + 1
+                self.sym_errors[key] = self.sym_errors.get(key, 0) + 1
+                self.last_error = f'{recorded_sym}: {error!r}'
+        finally:
+            with self.lock:
+                self.in_flight.discard(i)
+
+    def stop(self):
+        """
+        Stop the scheduler, the requests in flight are completed
+        """
+        self.stop_event.set()
+
+    def get_stats(self):
+        """
+        :return: dict, with keys ['n_ticks', 'n_missed_ticks', 'n_snapshots', 'jitter', 'latency', 'errors',
+            'sym_errors', 'last_error'] where jitter is a summary in seconds, see summarize, latency a summary in
+            seconds per market, errors a count per market, sym_errors a count per market/sym and last_error a str,
+            None if there was no error
+        """
+        with self.lock:
+            return {'n_ticks': self.n_ticks,
+                    'n_missed_ticks': self.n_missed_ticks,
+                    'n_snapshots': self.n_snapshots,
+                    'jitter': summarize(self.jitters),
+                    'latency': {market: summarize(latencies) for market, latencies in self.latencies.items()},
+                    'errors': dict(self.errors),
+                    'sym_errors': dict(self.sym_errors),
+                    'last_error': self.last_error}
+
+
+def main(config_path, folder, max_workers=8, n_shards=1):
+    """
+    Record until interrupted, the stats are printed every minute
+
+    :param config_path: str, see load_recorder_config
+    :param folder: str, where the snapshots are written
+    :param max_workers: int
+    :param n_shards: int, number of processes, see sharded_recorder, 1 to record in this process
+    """
+    writer = RotatingSnapshotWriter(folder)
+    if n_shards > 1:
+        # imported here as the sharded recorder imports this module
+        from recorder.src.sharded_recorder import ShardedRecorder
+        recorder = ShardedRecorder(load_recorder_config(config_path), writer, n_shards, max_workers)
+    else:
+        recorder = Recorder(load_recorder_config(config_path), writer, max_workers)
+    thread = threading.Thread(target=recorder.run, name='recorder-scheduler')
+    thread.start()
+    try:
+        while thread.is_alive():
+            thread.join(60)
+            writer.flush()
+            print(recorder.get_stats())
+    except KeyboardInterrupt:
+        recorder.stop()
+        thread.join()
+    finally:
+        writer.close()
+
@@ -0,0 +1,179 @@
+"""
+The process of a shard of the ShardedRecorder, and the messages it sends to the parent
+
+A worker runs a Recorder on the syms of its shard, with its own clients. Each snapshot is sent as soon as it is parsed,
+packed into a header and the float64 arrays of the book, so that the parent neither unpickles nor rebuilds objects.
+The stats of the Recorder are sent every stats_interval, they are also the heartbeat of the worker. The worker stops
+when the parent closes its end of the stop pipe, or dies.
+
+This module is imported by the new processes before the root folder is set, hence the imports of the recorder and of
+the clients in run_shard.
+"""
+import json
+import struct
+import threading
+
+import numpy as np
+
+from core import root_folder
+
+# first byte of the messages
+SNAPSHOT = b'S'
+STATS = b'T'
+
+# market timestamp, gateway timestamp and request timestamp in micro seconds, number of bids, number of asks, then the
+# lengths in bytes of the market, instrument type, sym and misc
+SNAPSHOT_HEADER = struct.Struct('<qqqIIHHHI')
+
+
+def pack_snapshot(recorded_sym, ob, request_timestamp):
+    """
+    :param recorded_sym: RecordedSym
+    :param ob: OrderBook
+    :param request_timestamp: int, in micro seconds
+    :return: bytes, the message of the snapshot, see unpack_snapshot
+    """
+    texts = [text.encode() for text in [ob.market, recorded_sym.instrument_type, ob.sym, ob.misc or '']]
+    header = SNAPSHOT_HEADER.pack(ob.market_timestamp, ob.gateway_timestamp, request_timestamp, len(ob.bid_prices),
+                                  len(ob.ask_prices), *[len(text) for text in texts])
+    arrays = [np.ascontiguousarray(array, dtype=np.float64).tobytes()
+              for array in [ob.bid_prices, ob.bid_sizes, ob.ask_prices, ob.ask_sizes]]
+    return b''.join([SNAPSHOT, header] + texts + arrays)
+
+
+def unpack_snapshot(message):
+    """
+    :param message: bytes, see pack_snapshot
+    :return: tuple, (market, instrument_type, snapshot) where the snapshot is as made by recorder.make_snapshot
+    """
+    # imported here to keep this module light, see the docstring of the module
+    from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, \
+        ASK_SIZES, ASK_PRICES, MISC
+    market_timestamp, gateway_timestamp, request_timestamp, n_bids, n_asks, *lengths = \
+        SNAPSHOT_HEADER.unpack_from(message, 1)
+    offset = 1 + SNAPSHOT_HEADER.size
+    texts = []
+    for length in lengths:
+        texts.append(message[offset:offset + length].decode())
+        offset += length
+    market, instrument_type, sym, misc = texts
+    arrays = []
+    for n in [n_bids, n_bids, n_asks, n_asks]:
+        arrays.append(np.frombuffer(message, dtype=np.float64, count=n, offset=offset))
+        offset += 8 * n
+    bid_prices, bid_sizes, ask_prices, ask_sizes = arrays
+    return market, instrument_type, {MARKET_TIMESTAMP: market_timestamp,
+                                     GATEWAY_TIMESTAMP: gateway_timestamp,
+                                     SYM: sym,
+                                     MARKET: market,
+                                     BID_SIZES: bid_sizes.tolist(),
+                                     BID_PRICES: bid_prices.tolist(),
+                                     ASK_SIZES: ask_sizes.tolist(),
+                                     ASK_PRICES: ask_prices.tolist(),
+                                     MISC: misc,
+                                     'request_timestamp': request_timestamp}
+
+
+def pack_stats(stats):
+    """
+    :param stats: dict, see Recorder.get_stats
+    :return: bytes, the message of the stats
+    """
+    return STATS + json.dumps(stats).encode()
+
+
+def unpack_stats(message):
+    """
+    :param message: bytes, see pack_stats
+    :return: dict
+    """
+    return json.loads(message[1:])
+
+
+class ShardWriter:
+    """
+    The writer of the Recorder of a worker, it sends the snapshots packed by pack_snapshot to the parent
+    """
+
+    def __init__(self, connection):
+        """
+
+        :param connection: multiprocessing.connection.Connection
+        """
+        self.connection = connection
+        self.lock = threading.Lock()
+
+    def write(self, market, instrument_type, snapshot):
+        """
+        :param market: str
+        :param instrument_type: str
+        :param snapshot: bytes, see pack_snapshot
+        """
+        with self.lock:
+            self.connection.send_bytes(snapshot)
+
+    def send_stats(self, stats):
+        """
+        :param stats: dict
+        """
+        with self.lock:
+            self.connection.send_bytes(pack_stats(stats))
+
+
+def share_rate_limit(rate_limiter, n_shards):
+    """
+    :param rate_limiter: RateLimiter, None if the market has no rate limit
+    :param n_shards: int, number of shards sharing the limit
+    """
+    if rate_limiter is not None:
+        rate_limiter.capacity = max(rate_limiter.capacity / n_shards, rate_limiter.cost)
+        rate_limiter.refill_per_second /= n_shards
+        rate_limiter.tokens = min(rate_limiter.tokens, rate_limiter.capacity)
+
+
+def share_rate_limits(n_shards_per_market):
+    """
+    Give the rate limiters of this process their share of the limits of the exchanges, which apply to all the shards
+    recording the market together
+
+    :param n_shards_per_market: dict, (market, instrument_type) -> number of shards recording syms of the market, for
+        the markets of this shard
+    """
+    from rest.src.rate_limiter import get_rate_limiter
+    for (market, instrument_type), n_shards in n_shards_per_market.items():
+        share_rate_limit(get_rate_limiter(market, instrument_type), n_shards)
+
+
+def run_shard(root, rows, connection, stop_connection, n_shards_per_market, max_workers, stats_interval, get_api=None):
+    """
+    Record the syms of a shard until the parent closes stop_connection, the entry point of the worker processes
+
+    :param root: str, the root folder of the parent
+    :param rows: list, of tuples, the arguments of the RecordedSym of the shard
+    :param connection: multiprocessing.connection.Connection, to the parent
+    :param stop_connection: multiprocessing.connection.Connection, from the parent, which closes it to stop the worker
+    :param n_shards_per_market: dict, see share_rate_limits
+    :param max_workers: int, see Recorder
+    :param stats_interval: float, in seconds
+    :param get_api: function, picklable, see Recorder, by default the shared clients of the process
+    """
+    root_folder.ROOT_FOLDER = root
+    from recorder.src.recorder import Recorder, RecordedSym
+    from rest.src.market_data_rest_factory import get_market_data_rest_api
+
+    recorded_syms = [RecordedSym(*row) for row in rows]
+    share_rate_limits(n_shards_per_market)
+    writer = ShardWriter(connection)
+    recorder = Recorder(recorded_syms, writer, max_workers, get_api=get_api or get_market_data_rest_api,
+                        to_snapshot=pack_snapshot)
+    thread = threading.Thread(target=recorder.run, name='recorder-scheduler')
+    thread.start()
+    try:
+        while not stop_connection.poll(stats_interval):
+            writer.send_stats(recorder.get_stats())
+    finally:
+        recorder.stop()
+        thread.join()
+        writer.send_stats(recorder.get_stats())
+        connection.close()
+        stop_connection.close()
@@ -0,0 +1,243 @@
+"""
+Record orderbook snapshots across a pool of processes, for when parsing them is too much for one core
+
+The syms of the config are spread over n_shards shards, balanced by their number of requests per second. Each shard is
+recorded by its own worker process, which has its own clients, so that each client is pinned to one worker and parses
+on its own core. The snapshots are streamed back to the parent as packed arrays, see shard_worker, and written by it.
+
+A worker that dies, or that has sent nothing for heartbeat_timeout, is restarted with the same shard.
+
+usage:
+    python recorder/run_recorder.py <config.csv> <output folder> [max workers] [number of processes]
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+from core import root_folder
+from recorder.src.recorder import N_SAMPLES
+from recorder.src.shard_worker import run_shard, unpack_snapshot, unpack_stats, SNAPSHOT
+
+# seconds over which the throughput of the shards is measured
+THROUGHPUT_WINDOW = 10.
+
+
+def assign_shards(recorded_syms, n_shards):
+    """
+    Spread the syms over the shards, the syms with the most requests per second first, each to the least loaded shard
+
+    :param recorded_syms: list, of RecordedSym
+    :param n_shards: int
+    :return: list, of n_shards lists of RecordedSym, in the order of recorded_syms
+    """
+    loads = [0.] * n_shards
+    indices = [[] for _ in range(n_shards)]
+    for i in sorted(range(len(recorded_syms)), key=lambda i: recorded_syms[i].interval):
+        shard = loads.index(min(loads))
+        loads[shard] += 1 / recorded_syms[i].interval
+        indices[shard].append(i)
+    return [[recorded_syms[i] for i in sorted(shard)] for shard in indices]
+
+
+def count_shards_per_market(shards):
+    """
+    :param shards: list, of lists of RecordedSym, see assign_shards
+    :return: dict, (market, instrument_type) -> number of shards recording syms of that market
+    """
+    n_shards_per_market = {}
+    for shard in shards:
+        for key in {(recorded_sym.market, recorded_sym.instrument_type) for recorded_sym in shard}:
+            n_shards_per_market[key] = n_shards_per_market.get(key, 0) + 1
+    return n_shards_per_market
+
+
+class Shard:
+    """
+    A worker process and what the parent knows of it
+    """
+
+    def __init__(self, index, recorded_syms):
+        """
+
+        :param index: int
+        :param recorded_syms: list, of RecordedSym
+        """
+        self.index = index
+        self.recorded_syms = recorded_syms
+        self.process = None
+        self.connection = None
+        # the end of the stop pipe of the parent, closing it stops the worker
+        self.stop_connection = None
+        # clock() when the worker was last started
+        self.started = None
+        self.n_restarts = 0
+        # exit code of the worker before the last restart, None if it was killed by the parent
+        self.last_exit_code = None
+        self.n_snapshots = 0
+        self.n_bytes = 0
+        # clock() when the last message was received, or when the worker was started
+        self.last_message = None
+        # clock() of the last snapshots, for the throughput
+        self.received = deque(maxlen=N_SAMPLES)
+        # the last stats sent by the worker, see Recorder.get_stats, they are reset when it restarts
+        self.worker_stats = {}
+
+
+class ShardedRecorder:
+
+    def __init__(self, recorded_syms, writer, n_shards=None, max_workers=8, stats_interval=5.,
+                 heartbeat_timeout=60., restart_delay=1., get_api=None, clock=time.monotonic):
+        """
+
+        :param recorded_syms: list, of RecordedSym
+        :param writer: RotatingSnapshotWriter, or any object with write(market, instrument_type, snapshot)
+        :param n_shards: int, number of worker processes, by default the number of cores, at most one per sym
+        :param max_workers: int, maximum number of requests in flight per shard
+        :param stats_interval: float, in seconds, how often the workers send their stats
+        :param heartbeat_timeout: float, in seconds, a worker that sent nothing for that long is restarted
+        :param restart_delay: float, in seconds, minimum time between two starts of the same shard
+        :param get_api: function, picklable, (market, instrument_type) -> MarketDataRestApi, called in the workers,
+            by default their shared clients
+        :param clock: function, returns the current time in seconds
+        """
+        n_shards = min(n_shards or os.cpu_count() or 1, len(recorded_syms))
+        self.shards = [Shard(i, shard) for i, shard in enumerate(assign_shards(recorded_syms, n_shards))]
+        # the rate limits of a market are shared by the shards recording it only
+        self.n_shards_per_market = count_shards_per_market([shard.recorded_syms for shard in self.shards])
+        self.writer = writer
+        self.max_workers = max_workers
+        self.stats_interval = stats_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_delay = restart_delay
+        self.get_api = get_api
+        self.clock = clock
+        # the workers are started fresh rather than forked from a process with threads
+        self.context = multiprocessing.get_context('spawn')
+        # not shared with the workers, a worker killed while waiting on a multiprocessing.Event leaves it locked
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def _start(self, shard):
+        if shard.started is not None:
+            time.sleep(max(0., shard.started + self.restart_delay - self.clock()))
+            shard.n_restarts += 1
+        connection, child_connection = self.context.Pipe(duplex=False)
+        child_stop_connection, shard.stop_connection = self.context.Pipe(duplex=False)
+        # sent as tuples as the workers cannot import the recorder before they set the root folder
+        rows = [(recorded_sym.market, recorded_sym.instrument_type, recorded_sym.sym, recorded_sym.n_levels,
+                 recorded_sym.interval) for recorded_sym in shard.recorded_syms]
+        n_shards_per_market = {row[:2]: self.n_shards_per_market[row[:2]] for row in rows}
+        shard.process = self.context.Process(
+            target=run_shard, name=f'recorder-shard-{shard.index}', daemon=True,
+            args=(root_folder.ROOT_FOLDER, rows, child_connection, child_stop_connection, n_shards_per_market,
+                  self.max_workers, self.stats_interval, self.get_api))
+        shard.process.start()
+        # the parent keeps no end of the worker, so that its death is seen as the end of the connection
+        child_connection.close()
+        child_stop_connection.close()
+        shard.connection = connection
+        shard.worker_stats = {}
+        shard.started = shard.last_message = self.clock()
+
+    def _restart(self, shard, silent=False):
+        """
+        :param shard: Shard
+        :param silent: bool, True if the worker sent nothing for heartbeat_timeout, False if its connection is over
+        """
+        if not silent:
+            # the worker is exiting
+            shard.process.join(timeout=1.)
+        if shard.process.is_alive():
+            shard.process.kill()
+        shard.process.join()
+        shard.last_exit_code = None if silent else shard.process.exitcode
+        shard.connection.close()
+        shard.stop_connection.close()
+        self._start(shard)
+
+    def _receive(self, shard):
+        """
+        Handle the messages of a shard that are ready
+
+        :return: bool, False if the connection is over
+        """
+        try:
+            while shard.connection.poll():
+                message = shard.connection.recv_bytes()
+                now = self.clock()
+                with self.lock:
+                    shard.last_message = now
+                    shard.n_bytes += len(message)
+                    if message[:1] == SNAPSHOT:
+                        shard.n_snapshots += 1
+                        shard.received.append(now)
+                    else:
+                        shard.worker_stats = unpack_stats(message)
+                if message[:1] == SNAPSHOT:
+                    self.writer.write(*unpack_snapshot(message))
+        except (EOFError, OSError):
+            return False
+        return True
+
+    def run(self, duration=None):
+        """
+        Record until stop is called or for duration
+
+        :param duration: float, in seconds, None to run until stop is called
+        """
+        end = None if duration is None else self.clock() + duration
+        for shard in self.shards:
+            self._start(shard)
+        try:
+            while not self.stop_event.is_set() and (end is None or self.clock() < end):
+                ready = wait([shard.connection for shard in self.shards], timeout=0.1)
+                for shard in self.shards:
+                    if shard.connection in ready and not self._receive(shard):
+                        self._restart(shard)
+                    elif self.clock() - shard.last_message > self.heartbeat_timeout:
+                        self._restart(shard, silent=True)
+        finally:
+            self.stop_event.set()
+            for shard in self.shards:
+                shard.stop_connection.close()
+            # what was sent before stopping is still written, the workers exit once their requests are completed
+            deadline = self.clock() + self.stats_interval + 5.
+            running = list(self.shards)
+            while running and self.clock() < deadline:
+                ready = wait([shard.connection for shard in running], timeout=0.1)
+                running = [shard for shard in running if shard.connection not in ready or self._receive(shard)]
+            for shard in self.shards:
+                if shard.process.is_alive():
+                    shard.process.kill()
+                shard.process.join()
+                shard.connection.close()
+
+    def stop(self):
+        """
+        Stop the workers, the requests in flight are completed
+        """
+        self.stop_event.set()
+
+    def get_stats(self):
+        """
+        :return: dict, with keys ['n_snapshots', 'shards'] where shards is a list of dicts, one per shard, with keys
+            ['n_syms', 'pid', 'n_restarts', 'last_exit_code', 'n_snapshots', 'n_bytes', 'throughput', 'worker'],
+            last_exit_code being the exit code of the worker before its last restart, None if it was killed for
+            being silent, throughput in snapshots per second over the last THROUGHPUT_WINDOW seconds and worker the
+            last stats of the worker, see Recorder.get_stats
+        """
+        now = self.clock()
+        with self.lock:
+            shards = [{'n_syms': len(shard.recorded_syms),
+                       'pid': shard.process.pid if shard.process is not None else None,
+                       'n_restarts': shard.n_restarts,
+                       'last_exit_code': shard.last_exit_code,
+                       'n_snapshots': shard.n_snapshots,
+                       'n_bytes': shard.n_bytes,
+                       'throughput': sum(1 for t in shard.received if t > now - THROUGHPUT_WINDOW) / THROUGHPUT_WINDOW,
+                       'worker': shard.worker_stats}
+                      for shard in self.shards]
+        return {'n_snapshots': sum(shard['n_snapshots'] for shard in shards), 'shards': shards}
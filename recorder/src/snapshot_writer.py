@@ -0,0 +1,79 @@
+import datetime
+import json
+import os
+import threading
+import time
+
+
+class RotatingSnapshotWriter:
+    """
+    Append snapshots as json lines to one file per (market, instrument_type), a new file is started when the current
+    one gets too big or too old
+
+    Files are named <market>_<instrument_type>_<YYYYmmdd_HHMMSS>.jsonl, from the time they were started.
+    """
+
+    def __init__(self, folder, max_bytes=100 * 1024 * 1024, max_seconds=60 * 60, clock=time.time):
+        """
+
+        :param folder: str, created if needed
+        :param max_bytes: int, size after which a file is rotated
+        :param max_seconds: float, age after which a file is rotated
+        :param clock: function, returns the current timestamp in seconds
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.clock = clock
+        os.makedirs(folder, exist_ok=True)
+        # (market, instrument_type) -> [file, path, start time, bytes written]
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def _open(self, market, instrument_type, now):
+        start = datetime.datetime.fromtimestamp(now).strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.folder, f'{market}_{instrument_type}_{start}.jsonl')
+        n = 1
+        while os.path.exists(path):
+            # rotated twice within the same second
+            path = os.path.join(self.folder, f'{market}_{instrument_type}_{start}_{n}.jsonl')
+            n += 1
+        return [open(path, 'a'), path, now, 0]
+
+    def write(self, market, instrument_type, snapshot):
+        """
+        :param market: str
+        :param instrument_type: str
+        :param snapshot: dict, json serializable
+        """
+        line = json.dumps(snapshot) + '\n'
+        key = (market, instrument_type)
+        with self.lock:
+            now = self.clock()
+            current = self.files.get(key)
+            if current is not None and (current[3] >= self.max_bytes or now - current[2] >= self.max_seconds):
+                current[0].close()
+                current = None
+            if current is None:
+                current = self._open(market, instrument_type, now)
+                self.files[key] = current
+            current[0].write(line)
+            current[3] += len(line)
+
+    def get_paths(self):
+        """
+        :return: dict, (market, instrument_type) -> path of the file being written
+        """
+        with self.lock:
+            return {key: current[1] for key, current in self.files.items()}
+
+    def flush(self):
+        with self.lock:
+            for current in self.files.values():
+                current[0].flush()
+
+    def close(self):
+        with self.lock:
+            for current in self.files.values():
+                current[0].close()
+            self.files.clear()
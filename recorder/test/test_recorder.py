@@ -0,0 +1,142 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from core import root_folder
+from core.src.column_names import SYM, BID_PRICES, MARKET
+from core.src.instrument_types import SPOT, FUTURE
+from core.src.markets import KRAKEN
+from core.src.spot_syms import ETHUSD, BTCUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.constants import PATH_TO_DATA
+from recorder.src.recorder import Recorder, RecordedSym, load_recorder_config
+from recorder.src.snapshot_writer import RotatingSnapshotWriter
+from rest.src.market_data_rest_factory import MARKET_DATA_REST_APIS
+from rest.test.local_exchange import LocalExchange
+
+FUTURE_ETHUSD = 'FUT_ETHUSD_230630'
+
+
+def kraken_spot_depth(query, form):
+    pair = form['pair'][0]
+    count = int(form['count'][0])
+    return {'error': [], 'result': {pair: {'bids': [['100.5', '2.0', 1700000000]] * count,
+                                           'asks': [['101.5', '1.0', 1700000001]] * count}}}
+
+
+ROUTES = {
+    '/public/Depth': kraken_spot_depth,
+    '/derivatives/api/v3/orderbook': {'result': 'success', 'serverTime': '2023-05-01T10:00:00.123Z',
+                                      'orderBook': {'bids': [[1800.0, 5.0]], 'asks': [[1801.0, 2.0]]}},
+}
+
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange(ROUTES)
+        self.folder = tempfile.TemporaryDirectory()
+        self.apis = {}
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.exchange.stop()
+        self.folder.cleanup()
+
+    def get_api(self, market, instrument_type):
+        with self.lock:
+            if (market, instrument_type) not in self.apis:
+                api = MARKET_DATA_REST_APIS[(market, instrument_type)]()
+                self.apis[(market, instrument_type)] = self.exchange.connect(api)
+            return self.apis[(market, instrument_type)]
+
+    def test_load_recorder_config(self):
+        recorded_syms = load_recorder_config(PATH_TO_DATA + 'recorder.csv')
+        self.assertEqual(recorded_syms[0].market, KRAKEN)
+        self.assertEqual(recorded_syms[0].sym, ETHUSD)
+        self.assertEqual(recorded_syms[0].n_levels, 10)
+        self.assertEqual(recorded_syms[0].interval, 1.)
+
+    def test_recorder(self):
+        recorded_syms = [RecordedSym(KRAKEN, SPOT, ETHUSD, 2, 0.05),
+                         RecordedSym(KRAKEN, SPOT, BTCUSD, 1, 0.1),
+                         RecordedSym(KRAKEN, FUTURE, FUTURE_ETHUSD, 1, 0.1)]
+        writer = RotatingSnapshotWriter(self.folder.name)
+        recorder = Recorder(recorded_syms, writer, max_workers=4, get_api=self.get_api)
+        recorder.run(duration=0.5)
+        writer.close()
+
+        stats = recorder.get_stats()
+        # 10 + 5 + 5 ticks, give or take the last one
+        self.assertGreaterEqual(stats['n_ticks'], 18)
+        self.assertLessEqual(stats['n_ticks'], 20)
+        self.assertEqual(stats['n_snapshots'] + stats['n_missed_ticks'], stats['n_ticks'])
+        self.assertEqual(stats['errors'], {})
+        self.assertLess(stats['jitter']['p50'], 0.05)
+        self.assertEqual(set(stats['latency']), {KRAKEN})
+
+        files = sorted(os.listdir(self.folder.name))
+        self.assertEqual(len(files), 2)
+        self.assertTrue(files[0].startswith(f'{KRAKEN}_{FUTURE}_'))
+        with open(os.path.join(self.folder.name, files[1])) as f:
+            snapshots = [json.loads(line) for line in f]
+        self.assertEqual({snapshot[SYM] for snapshot in snapshots}, {ETHUSD, BTCUSD})
+        self.assertEqual(snapshots[0][MARKET], KRAKEN)
+        self.assertEqual(snapshots[0][BID_PRICES], [100.5] * (2 if snapshots[0][SYM] == ETHUSD else 1))
+
+    def test_missed_ticks(self):
+        # the requests take longer than the interval
+        def get_api(market, instrument_type):
+            time.sleep(0.12)
+            return self.get_api(market, instrument_type)
+
+        writer = RotatingSnapshotWriter(self.folder.name)
+        recorder = Recorder([RecordedSym(KRAKEN, SPOT, ETHUSD, 1, 0.05)], writer, get_api=get_api)
+        recorder.run(duration=0.5)
+        writer.close()
+        stats = recorder.get_stats()
+        self.assertLessEqual(stats['n_snapshots'], 4)
+        self.assertGreater(stats['n_missed_ticks'], 5)
+
+    def test_errors(self):
+        def get_api(market, instrument_type):
+            if instrument_type == FUTURE:
+                raise Exception('down')
+            return self.get_api(market, instrument_type)
+
+        writer = RotatingSnapshotWriter(self.folder.name)
+        recorded_syms = [RecordedSym(KRAKEN, SPOT, ETHUSD, 1, 0.1), RecordedSym(KRAKEN, FUTURE, FUTURE_ETHUSD, 1, 0.1)]
+        recorder = Recorder(recorded_syms, writer, get_api=get_api)
+        recorder.run(duration=0.35)
+        writer.close()
+        stats = recorder.get_stats()
+        self.assertEqual(list(stats['sym_errors']), [f'{KRAKEN}/{FUTURE_ETHUSD}'])
+        self.assertEqual(stats['errors'][KRAKEN], stats['sym_errors'][f'{KRAKEN}/{FUTURE_ETHUSD}'])
+        self.assertGreaterEqual(stats['errors'][KRAKEN], 3)
+        self.assertTrue(stats['last_error'].endswith("Exception('down')"))
+
+    def test_writer_rotation(self):
+        now = [1700000000.]
+        writer = RotatingSnapshotWriter(self.folder.name, max_bytes=30, max_seconds=60, clock=lambda: now[0])
+        writer.write(KRAKEN, SPOT, {SYM: ETHUSD})
+        writer.write(KRAKEN, SPOT, {SYM: BTCUSD})
+        # too big
+        writer.write(KRAKEN, SPOT, {SYM: ETHUSD})
+        now[0] += 61
+        # too old
+        writer.write(KRAKEN, SPOT, {SYM: ETHUSD})
+        writer.close()
+        files = sorted(os.listdir(self.folder.name))
+        self.assertEqual(len(files), 3)
+        with open(os.path.join(self.folder.name, files[0])) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import functools
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from core import root_folder
+from core.src.column_names import SYM, BID_PRICES, ASK_SIZES, MARKET, MISC
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN, DERIBIT
+from core.src.spot_syms import ETHUSD, BTCUSD, XRPUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.orderbook import OrderBook
+from recorder.src.recorder import RecordedSym, make_snapshot
+from recorder.src.shard_worker import pack_snapshot, unpack_snapshot, share_rate_limit
+from recorder.src.sharded_recorder import ShardedRecorder, assign_shards
+from recorder.src.snapshot_writer import RotatingSnapshotWriter
+from recorder.test.test_recorder import ROUTES, FUTURE_ETHUSD
+from rest.src.rate_limiter import RateLimiter
+from rest.test.local_exchange import LocalExchange, get_local_api
+
+
+class TestShardedRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange(ROUTES)
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.exchange.stop()
+        self.folder.cleanup()
+
+    def read_snapshots(self):
+        snapshots = []
+        for name in os.listdir(self.folder.name):
+            with open(os.path.join(self.folder.name, name)) as f:
+                snapshots += [json.loads(line) for line in f]
+        return snapshots
+
+    def test_assign_shards(self):
+        recorded_syms = [RecordedSym(KRAKEN, SPOT, ETHUSD, 10, 1.), RecordedSym(KRAKEN, SPOT, BTCUSD, 10, 0.5),
+                         RecordedSym(KRAKEN, SPOT, XRPUSD, 10, 1.), RecordedSym(KRAKEN, FUTURE, FUTURE_ETHUSD, 10, 2.)]
+        shards = assign_shards(recorded_syms, 2)
+        self.assertEqual([[recorded_sym.sym for recorded_sym in shard] for shard in shards],
+                         [[BTCUSD, FUTURE_ETHUSD], [ETHUSD, XRPUSD]])
+        self.assertEqual(sum(len(shard) for shard in assign_shards(recorded_syms, 8)), 4)
+
+    def test_rate_limits_are_shared_by_the_shards_of_the_market(self):
+        recorded_syms = [RecordedSym(KRAKEN, SPOT, ETHUSD, 10, 1.), RecordedSym(KRAKEN, SPOT, BTCUSD, 10, 1.),
+                         RecordedSym(KRAKEN, SPOT, XRPUSD, 10, 1.), RecordedSym(KRAKEN, FUTURE, FUTURE_ETHUSD, 10, 1.),
+                         RecordedSym(DERIBIT, OPTION, 'C_ETHUSD_230630_1200', 10, 1.)]
+        recorder = ShardedRecorder(recorded_syms, writer=None, n_shards=8)
+        self.assertEqual(len(recorder.shards), 5)
+        self.assertEqual(recorder.n_shards_per_market, {(KRAKEN, SPOT): 3, (KRAKEN, FUTURE): 1, (DERIBIT, OPTION): 1})
+
+        rate_limiter = RateLimiter(capacity=20, refill_per_second=20)
+        share_rate_limit(rate_limiter, 1)
+        self.assertEqual((rate_limiter.capacity, rate_limiter.refill_per_second), (20, 20))
+        share_rate_limit(rate_limiter, 4)
+        self.assertEqual((rate_limiter.capacity, rate_limiter.refill_per_second, rate_limiter.tokens), (5, 5, 5))
+
+    def test_pack_snapshot(self):
+        ob = OrderBook(ETHUSD, KRAKEN, np.array([100.5, 100.]), np.array([2., 3.]), np.array([101.5]),
+                       np.array([1.]), 1700000001000000, 1700000001500000, misc='é')
+        recorded_sym = RecordedSym(KRAKEN, SPOT, ETHUSD, 2, 1.)
+        market, instrument_type, snapshot = unpack_snapshot(pack_snapshot(recorded_sym, ob, 1700000001200000))
+        self.assertEqual((market, instrument_type), (KRAKEN, SPOT))
+        self.assertEqual(snapshot, make_snapshot(recorded_sym, ob, 1700000001200000))
+        self.assertEqual(snapshot[MISC], 'é')
+
+    def test_sharded_recorder(self):
+        recorded_syms = [RecordedSym(KRAKEN, SPOT, ETHUSD, 2, 0.05),
+                         RecordedSym(KRAKEN, SPOT, BTCUSD, 1, 0.1),
+                         RecordedSym(KRAKEN, FUTURE, FUTURE_ETHUSD, 1, 0.1)]
+        writer = RotatingSnapshotWriter(self.folder.name)
+        recorder = ShardedRecorder(recorded_syms, writer, n_shards=2, stats_interval=0.2,
+                                   get_api=functools.partial(get_local_api, self.exchange.url))
+        recorder.run(duration=4.)
+        writer.close()
+
+        stats = recorder.get_stats()
+        self.assertEqual([shard['n_syms'] for shard in stats['shards']], [1, 2])
+        self.assertEqual([shard['n_restarts'] for shard in stats['shards']], [0, 0])
+        for shard in stats['shards']:
+            self.assertGreater(shard['n_snapshots'], 0)
+            self.assertGreater(shard['throughput'], 0)
+            self.assertEqual(shard['worker']['n_snapshots'], shard['n_snapshots'])
+            self.assertEqual(shard['worker']['errors'], {})
+            self.assertIsNone(shard['worker']['last_error'])
+            self.assertIsNone(shard['last_exit_code'])
+        snapshots = self.read_snapshots()
+        self.assertEqual(len(snapshots), stats['n_snapshots'])
+        self.assertEqual({snapshot[SYM] for snapshot in snapshots}, {ETHUSD, BTCUSD, FUTURE_ETHUSD})
+        ethusd = [snapshot for snapshot in snapshots if snapshot[SYM] == ETHUSD][0]
+        self.assertEqual(ethusd[MARKET], KRAKEN)
+        self.assertEqual(ethusd[BID_PRICES], [100.5, 100.5])
+        self.assertEqual(ethusd[ASK_SIZES], [1., 1.])
+
+    def test_worker_restart(self):
+        writer = RotatingSnapshotWriter(self.folder.name)
+        recorder = ShardedRecorder([RecordedSym(KRAKEN, SPOT, ETHUSD, 1, 0.05)], writer, stats_interval=0.2,
+                                   restart_delay=0.1, get_api=functools.partial(get_local_api, self.exchange.url))
+        thread = threading.Thread(target=recorder.run)
+        thread.start()
+        shard = recorder.shards[0]
+        # wait for the worker to be up
+        deadline = time.monotonic() + 30
+        while shard.n_snapshots == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        pid = shard.process.pid
+        shard.process.kill()
+        n_snapshots = shard.n_snapshots
+        while (shard.n_restarts == 0 or shard.n_snapshots <= n_snapshots + 2) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        recorder.stop()
+        thread.join()
+        writer.close()
+        self.assertEqual(shard.n_restarts, 1)
+        self.assertEqual(recorder.get_stats()['shards'][0]['last_exit_code'], -signal.SIGKILL)
+        self.assertNotEqual(shard.process.pid, pid)
+        self.assertGreater(shard.n_snapshots, n_snapshots + 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
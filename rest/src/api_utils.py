@@ -1,4 +1,5 @@
-import pandas as pd
+import csv
+import threading
 
 from core.src.exceptions import raise_instrument_type_not_supported_for_market_exception, raise_market_not_supported
 from core.src.instrument_types import SPOT, FUTURE
@@ -6,17 +7,51 @@ from core.src.markets import KRAKEN, DERIBIT, SUPPORTED_MARKETS
 from core.src.constants import PATH_TO_DATA
 
 
+MARKETS_TO_APIS_FILE = 'markets_to_apis.csv'
+
+# loaded once per process, see get_market_registry
+_market_registry = None
+_market_registry_lock = threading.Lock()
+
+
+def get_market_registry():
+    """
+    Get the content of markets_to_apis.csv, the file is read only once per process
+
+    :return: dict, (market, instrument_type) -> list of rows, each row being a dict column -> value
+    """
+    global _market_registry
+    if _market_registry is None:
+        with _market_registry_lock:
+            if _market_registry is None:
+                registry = {}
+                with open(PATH_TO_DATA + MARKETS_TO_APIS_FILE, newline='') as f:
+                    for row in csv.DictReader(f):
+                        registry.setdefault((row['market'], row['instrument_type']), []).append(row)
+                _market_registry = registry
+    return _market_registry
+
+
 def get_api_url(market, instrument_type):
-    apis = pd.read_csv(PATH_TO_DATA + 'markets_to_apis.csv')
-    api_url = apis.query('market == @market and instrument_type == @instrument_type')['api_url']
+    api_url = [row['api_url'] for row in get_market_registry().get((market, instrument_type), [])]
     if len(api_url) == 1:
-        return "https://" + api_url.values[0]
+        return "https://" + api_url[0]
     elif len(api_url) > 1:
         raise Exception(f'Multiple api urls for {market} and {instrument_type}')
     elif len(api_url) == 0:
         raise Exception(f'No api url for {market} and {instrument_type}')
 
 
+def get_ws_url(market, instrument_type):
+    ws_url = [row['ws_url'] for row in get_market_registry().get((market, instrument_type), []) if row['ws_url']]
+    if len(ws_url) == 1:
+        return "wss://" + ws_url[0]
+    elif len(ws_url) > 1:
+        raise Exception(f'Multiple websocket urls for {market} and {instrument_type}')
+    elif len(ws_url) == 0:
+        raise Exception(f'No websocket url for {market} and {instrument_type}')
+
+
 def get_header_key_col(market, instrument_type):
     if market not in SUPPORTED_MARKETS:
         raise_market_not_supported(market)
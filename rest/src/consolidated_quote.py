@@ -0,0 +1,180 @@
+"""
+Top of book quotes of one underlying across markets, requested at the same time
+
+    view = ConsolidatedQuoteView().get_view(ETHUSD)
+    view[BID], view[ASK]  # best bid and offer across the spot markets
+    view[FUTURES]         # basis of each future against the consolidated spot mid
+    view[SKEW]            # seconds between the first and the last leg received
+
+Each leg is the top of book quote of one sym on one market. The legs are sent together on a pool of workers, so that
+the quotes are as close in time as the slowest leg allows rather than the sum of the latencies. A leg that fails is
+reported in ERRORS and left out of the view.
+"""
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from core.src.column_names import BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET, SYM, EXPIRY, BASIS, \
+    ANNUALIZED_BASIS, DAYS_TO_EXPIRY, SENT_TIMESTAMP, RECEIVED_TIMESTAMP, LATENCY, SKEW, BID_MARKETS, ASK_MARKETS, \
+    MARKET_TIMESTAMP, GATEWAY_TIMESTAMP
+from core.src.date import get_current_timestamp, today_date
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.instruments import get_instrument
+from core.src.markets import KRAKEN, DERIBIT
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+
+# keys of the view, see ConsolidatedQuoteView.get_view
+QUOTES = 'quotes'
+FUTURES = 'futures'
+ERRORS = 'errors'
+
+QUOTE_COLUMNS = [MARKET, SYM, BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP,
+                 SENT_TIMESTAMP, RECEIVED_TIMESTAMP, LATENCY]
+
+DAYS_PER_YEAR = 365
+
+
+def annualize_basis(future_mid, spot_mid, days_to_expiry):
+    """
+    :param future_mid: float or np.ndarray
+    :param spot_mid: float
+    :param days_to_expiry: float or np.ndarray, nan for perpetual futures
+    :return: float or np.ndarray, the relative basis per year, nan if the future has no expiry or has expired
+    """
+    days_to_expiry = np.asarray(days_to_expiry, dtype=np.float64)
+    days_to_expiry = np.where(days_to_expiry > 0, days_to_expiry, np.nan)
+    return (np.asarray(future_mid) / spot_mid - 1) * DAYS_PER_YEAR / days_to_expiry
+
+
+def consolidate_quotes(quotes):
+    """
+    :param quotes: pd.DataFrame, with columns [MARKET, BID, BID_SIZE, ASK, ASK_SIZE]
+    :return: dict, with keys [BID, BID_SIZE, BID_MARKETS, ASK, ASK_SIZE, ASK_MARKETS, MID, SPREAD], the size at the
+        best price being summed over the markets quoting it, nan if there is no quote
+    """
+    if len(quotes) == 0:
+        return {BID: np.nan, BID_SIZE: np.nan, BID_MARKETS: [], ASK: np.nan, ASK_SIZE: np.nan, ASK_MARKETS: [],
+                MID: np.nan, SPREAD: np.nan}
+    bid = quotes[BID].max()
+    ask = quotes[ASK].min()
+    at_bid = quotes[quotes[BID] == bid]
+    at_ask = quotes[quotes[ASK] == ask]
+    return {BID: bid, BID_SIZE: at_bid[BID_SIZE].sum(), BID_MARKETS: at_bid[MARKET].tolist(),
+            ASK: ask, ASK_SIZE: at_ask[ASK_SIZE].sum(), ASK_MARKETS: at_ask[MARKET].tolist(),
+            MID: 0.5 * (bid + ask), SPREAD: ask - bid}
+
+
+class ConsolidatedQuoteView:
+
+    def __init__(self, spot_markets=(KRAKEN,), future_market=KRAKEN, option_market=DERIBIT, max_workers=8,
+                 get_api=get_market_data_rest_api, clock=get_current_timestamp):
+        """
+
+        :param spot_markets: list, of str, the markets consolidated into the best bid and offer
+        :param future_market: str, None to leave the futures out
+        :param option_market: str
+        :param max_workers: int, maximum number of legs in flight
+        :param get_api: function, (market, instrument_type) -> MarketDataRestApi
+        :param clock: function, returns the current timestamp in seconds
+        """
+        self.spot_markets = list(spot_markets)
+        self.future_market = future_market
+        self.option_market = option_market
+        self.get_api = get_api
+        self.clock = clock
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='consolidated-quote')
+        # (underlying, date) -> list of the syms of the futures listed that day, see get_future_syms
+        self.future_syms = {}
+        self.lock = threading.Lock()
+
+    def get_future_syms(self, underlying):
+        """
+        :param underlying: str, eg: ETHUSD
+        :return: list, of str, the futures of the underlying on the future market, perpetual included, looked up
+            once a day
+        """
+        key = (underlying, today_date())
+        future_syms = self.future_syms.get(key)
+        if future_syms is None:
+            tickers = self.get_api(self.future_market, FUTURE).get_tickers()
+            future_syms = sorted(sym for sym in tickers.index if get_instrument(sym).pair == underlying)
+            with self.lock:
+                # the lists of the previous days are dropped
+                self.future_syms = {**{other: syms for other, syms in self.future_syms.items() if other[1] == key[1]},
+                                    key: future_syms}
+        return future_syms
+
+    def get_view(self, underlying, future_syms=None, option_syms=()):
+        """
+        :param underlying: str, eg: ETHUSD
+        :param future_syms: list, of str, by default every future of the underlying, see get_future_syms
+        :param option_syms: list, of str, eg: C_ETHUSD_230630_1200, their quotes are in QUOTES
+        :return: dict, with the keys of consolidate_quotes and
+            QUOTES: pd.DataFrame, one row per leg received with columns QUOTE_COLUMNS, the latency being in seconds
+            FUTURES: pd.DataFrame, indexed by sym with columns [EXPIRY, MID, BASIS, DAYS_TO_EXPIRY, ANNUALIZED_BASIS]
+                where the basis is the future mid minus the consolidated spot mid
+            SKEW: float, seconds between the first and the last leg received, nan if less than two were
+            ERRORS: dict, (market, sym) -> str, the legs that failed
+        """
+        if future_syms is None:
+            future_syms = [] if self.future_market is None else self.get_future_syms(underlying)
+        legs = [(market, SPOT, underlying) for market in self.spot_markets] + \
+               [(self.future_market, FUTURE, sym) for sym in future_syms] + \
+               [(self.option_market, OPTION, sym) for sym in option_syms]
+        results = list(self.pool.map(lambda leg: self._get_leg(*leg), legs))
+
+        rows = []
+        errors = {}
+        for (market, instrument_type, sym), (quote, error) in zip(legs, results):
+            if error is not None:
+                errors[(market, sym)] = repr(error)
+            else:
+                rows.append({MARKET: market, SYM: sym, **quote})
+        quotes = pd.DataFrame(rows, columns=QUOTE_COLUMNS)
+        view = consolidate_quotes(quotes[quotes[SYM] == underlying])
+        view[QUOTES] = quotes
+        view[FUTURES] = self._get_basis(quotes[quotes[SYM].isin(future_syms)], view[MID])
+        received = quotes[RECEIVED_TIMESTAMP]
+        view[SKEW] = (received.max() - received.min()).total_seconds() if len(received) > 1 else np.nan
+        view[ERRORS] = errors
+        return view
+
+    def _get_leg(self, market, instrument_type, sym):
+        """
+        :return: tuple, (quote, error), the quote being the one of get_tob_quote with SENT_TIMESTAMP,
+            RECEIVED_TIMESTAMP and LATENCY, None if error
+        """
+        try:
+            api = self.get_api(market, instrument_type)
+            sent = self.clock()
+            quote = api.get_tob_quote(sym)
+            received = self.clock()
+        except Exception as error:
+            return None, error
+        quote[SENT_TIMESTAMP] = datetime.datetime.fromtimestamp(sent)
+        quote[RECEIVED_TIMESTAMP] = datetime.datetime.fromtimestamp(received)
+        quote[LATENCY] = received - sent
+        return quote, None
+
+    @staticmethod
+    def _get_basis(future_quotes, spot_mid):
+        """
+        :param future_quotes: pd.DataFrame, the rows of QUOTES of the futures
+        :param spot_mid: float
+        :return: pd.DataFrame, see get_view
+        """
+        futures = pd.DataFrame({EXPIRY: [get_instrument(sym).expiry for sym in future_quotes[SYM]],
+                                MID: future_quotes[MID].to_numpy(dtype=float)},
+                               index=pd.Index(future_quotes[SYM], name=SYM))
+        today = today_date()
+        futures[BASIS] = futures[MID] - spot_mid
+        futures[DAYS_TO_EXPIRY] = [np.nan if expiry is None else (expiry - today).days for expiry in futures[EXPIRY]]
+        futures[ANNUALIZED_BASIS] = annualize_basis(futures[MID].to_numpy(), spot_mid,
+                                                    futures[DAYS_TO_EXPIRY].to_numpy(dtype=float))
+        return futures
+
+    def close(self):
+        self.pool.shutdown()
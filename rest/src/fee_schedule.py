@@ -0,0 +1,140 @@
+"""
+Fees of whole arrays of fills at once, eg: for a backtest
+
+    fee_engine = FeeEngine()
+    fees = fee_engine.get_fees(KRAKEN, SPOT, ETHUSD, notionals, is_maker, volumes)
+
+The schedules of get_fee_schedule are lists of [volume, fee percentage] tiers, each tier applying from its volume up to
+the volume of the next one. A FeeSchedule holds them as sorted arrays, so that the tier of every fill is found by a
+binary search, and the FeeEngine keeps one FeeSchedule per sym so that the exchange is queried once per ttl.
+"""
+import threading
+import time
+
+import numpy as np
+
+from core.src.column_names import FEES_TAKER, FEES_MAKER, FEE_VOLUME_CURRENCY
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+from rest.src.response_cache import HOUR
+
+
+def tiers_to_arrays(tiers):
+    """
+    :param tiers: list, of [volume, fee percentage], see get_fee_schedule
+    :return: tuple, (volumes, rates) two np.ndarray sorted by volume, the rates being fractions of the notional
+    """
+    if len(tiers) == 0:
+        raise Exception('Fee schedule has no tier')
+    tiers = np.asarray(tiers, dtype=np.float64)
+    order = np.argsort(tiers[:, 0], kind='stable')
+    return tiers[order, 0], tiers[order, 1] / 100
+
+
+class FeeSchedule:
+    """
+    The maker and taker tiers of a sym, looked up by 30 days volume
+    """
+
+    def __init__(self, fees_taker, fees_maker, fee_volume_currency=None):
+        """
+
+        :param fees_taker: list, of [volume, fee percentage]
+        :param fees_maker: list, of [volume, fee percentage]
+        :param fee_volume_currency: str, the currency of the volumes, eg: USD
+        """
+        self.taker_volumes, self.taker_rates = tiers_to_arrays(fees_taker)
+        self.maker_volumes, self.maker_rates = tiers_to_arrays(fees_maker)
+        self.fee_volume_currency = fee_volume_currency
+
+    @classmethod
+    def from_fee_schedule(cls, fee_schedule):
+        """
+        :param fee_schedule: dict, as returned by get_fee_schedule
+        :return: FeeSchedule
+        """
+        return cls(fee_schedule[FEES_TAKER], fee_schedule[FEES_MAKER], fee_schedule.get(FEE_VOLUME_CURRENCY))
+
+    @staticmethod
+    def _get_tiers(volumes, volume):
+        # a volume below the first tier gets the first tier
+        return np.maximum(np.searchsorted(volumes, volume, side='right') - 1, 0)
+
+    def get_tier(self, volume, is_maker=False):
+        """
+        :param volume: float or np.ndarray, 30 days volume in fee_volume_currency
+        :param is_maker: bool
+        :return: int or np.ndarray, index of the tier of the volume
+        """
+        return self._get_tiers(self.maker_volumes if is_maker else self.taker_volumes, volume)
+
+    def get_rates(self, is_maker, volume):
+        """
+        :param is_maker: bool or np.ndarray of bool, True for the fills that added liquidity
+        :param volume: float or np.ndarray, 30 days volume in fee_volume_currency
+        :return: float or np.ndarray, the fees as fractions of the notional
+        """
+        maker_rates = self.maker_rates[self._get_tiers(self.maker_volumes, volume)]
+        taker_rates = self.taker_rates[self._get_tiers(self.taker_volumes, volume)]
+        return np.where(is_maker, maker_rates, taker_rates)
+
+    def get_fees(self, notional, is_maker, volume):
+        """
+        :param notional: float or np.ndarray, the notional of the fills, negative for sells
+        :param is_maker: bool or np.ndarray of bool, True for the fills that added liquidity
+        :param volume: float or np.ndarray, 30 days volume in fee_volume_currency when each fill was done
+        :return: float or np.ndarray, the fees in the currency of the notional, always positive
+        """
+        return np.abs(notional) * self.get_rates(is_maker, volume)
+
+
+class FeeEngine:
+
+    def __init__(self, ttl=HOUR, get_api=get_market_data_rest_api, clock=time.monotonic):
+        """
+
+        :param ttl: float, in seconds, how long a fee schedule is kept for
+        :param get_api: function, (market, instrument_type) -> MarketDataRestApi
+        :param clock: function, returns the current time in seconds
+        """
+        self.ttl = ttl
+        self.get_api = get_api
+        self.clock = clock
+        # (market, instrument_type, sym) -> (expiry time, FeeSchedule)
+        self.fee_schedules = {}
+        self.lock = threading.Lock()
+
+    def get_fee_schedule(self, market, instrument_type, sym):
+        """
+        :param market: str, eg: KRAKEN
+        :param instrument_type: str, eg: SPOT
+        :param sym: str, eg: ETHUSD
+        :return: FeeSchedule
+        """
+        key = (market, instrument_type, sym)
+        now = self.clock()
+        entry = self.fee_schedules.get(key)
+        if entry is None or entry[0] <= now:
+            fee_schedule = FeeSchedule.from_fee_schedule(self.get_api(market, instrument_type).get_fee_schedule(sym))
+            entry = (now + self.ttl, fee_schedule)
+            with self.lock:
+                self.fee_schedules[key] = entry
+        return entry[1]
+
+    def get_fees(self, market, instrument_type, sym, notional, is_maker, volume):
+        """
+        :param market: str, eg: KRAKEN
+        :param instrument_type: str, eg: SPOT
+        :param sym: str, eg: ETHUSD
+        :param notional: float or np.ndarray, see FeeSchedule.get_fees
+        :param is_maker: bool or np.ndarray of bool
+        :param volume: float or np.ndarray
+        :return: float or np.ndarray
+        """
+        return self.get_fee_schedule(market, instrument_type, sym).get_fees(notional, is_maker, volume)
+
+    def clear(self):
+        """
+        Drop the fee schedules, they are queried again on their next use
+        """
+        with self.lock:
+            self.fee_schedules.clear()
@@ -0,0 +1,349 @@
+"""
+The HTTP transport of the REST clients, shared by the whole process
+
+All the clients send their requests through the same transport, so that there is a single pool of kept-alive
+connections per host however many clients there are, and a connection is only opened, with its TCP and TLS
+handshakes, when all the others of its host are busy. The addresses of the hosts are cached as well.
+
+The transport counts the requests, the connections it opened and the DNS lookups of each host, see get_stats: in a
+hot loop of requests the number of connections should stay flat.
+
+HTTP/2 is optional and needs httpx with its http2 extra, the connections of a host are then multiplexed.
+"""
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+from rest.src.instrumentation import CONNECT, TTFB, DOWNLOAD
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def get_host_key(scheme, host, port=None):
+    """
+    :param scheme: str, http or https
+    :param host: str
+    :param port: int, optional, the default port of the scheme if None
+    :return: str, eg: api.kraken.com:443
+    """
+    return f'{host}:{port or DEFAULT_PORTS[scheme]}'
+
+
+class DnsCache:
+    """
+    A thread safe cache of the addresses of the hosts
+
+    getaddrinfo does not tell how long an address is valid for, so they are kept for a fixed ttl. The address of a
+    host is dropped when a connection to it fails so that the next one looks it up again.
+    """
+
+    def __init__(self, ttl=300., clock=time.monotonic, resolve=socket.getaddrinfo):
+        """
+
+        :param ttl: float, in seconds
+        :param clock: function, returns the current time in seconds
+        :param resolve: function, same as socket.getaddrinfo
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.resolve = resolve
+        # host -> (address, expiry time)
+        self.addresses = {}
+        self.lock = threading.Lock()
+
+    def get_address(self, host, port):
+        """
+        :param host: str
+        :param port: int
+        :return: tuple, (str address, bool True if it was cached)
+        """
+        now = self.clock()
+        with self.lock:
+            entry = self.addresses.get(host)
+        if entry is not None and entry[1] > now:
+            return entry[0], True
+        # the first address, as socket.create_connection would try first
+        address = self.resolve(host, port, 0, socket.SOCK_STREAM)[0][4][0]
+        with self.lock:
+            self.addresses[host] = (address, now + self.ttl)
+        return address, False
+
+    def invalidate(self, host):
+        """
+        :param host: str
+        """
+        with self.lock:
+            self.addresses.pop(host, None)
+
+    def clear(self):
+        with self.lock:
+            self.addresses.clear()
+
+
+class HostStats:
+    """
+    The counters of a host
+    """
+    __slots__ = ['n_requests', 'n_connections', 'n_dns_lookups', 'n_dns_hits']
+
+    def __init__(self):
+        self.n_requests = 0
+        # each one is a TCP handshake, and a TLS one for https
+        self.n_connections = 0
+        self.n_dns_lookups = 0
+        self.n_dns_hits = 0
+
+    def to_dict(self):
+        """
+        :return: dict, with keys ['n_requests', 'n_connections', 'n_reused', 'n_dns_lookups', 'n_dns_hits']
+        """
+        return {'n_requests': self.n_requests,
+                'n_connections': self.n_connections,
+                # requests sent over a connection that was already open
+                'n_reused': max(self.n_requests - self.n_connections, 0),
+                'n_dns_lookups': self.n_dns_lookups,
+                'n_dns_hits': self.n_dns_hits}
+
+
+class _TransportConnection:
+    """
+    Mixin of the urllib3 connections, they connect to the cached address of their host and are counted
+    """
+    transport = None
+    scheme = 'http'
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            # the connection is opened from the thread of the request, see HttpTransport.request
+            local = self.transport.local
+            local.connect_seconds = getattr(local, 'connect_seconds', 0.) + time.perf_counter() - start
+
+    def _new_conn(self):
+        transport = self.transport
+        key = get_host_key(self.scheme, self.host, self.port)
+        transport._count(key, 'n_connections')
+        if transport.dns_cache is None:
+            return super()._new_conn()
+        try:
+            address, is_cached = transport.dns_cache.get_address(self.host, self.port)
+        except socket.gaierror as error:
+            raise NameResolutionError(self.host, self, error) from error
+        transport._count(key, 'n_dns_hits' if is_cached else 'n_dns_lookups')
+        # the host itself is still used for the Host header and the TLS checks
+        self._dns_host = address
+        try:
+            return super()._new_conn()
+        except Exception:
+            transport.dns_cache.invalidate(self.host)
+            raise
+
+
+class _TransportAdapter(HTTPAdapter):
+    """
+    A requests adapter whose pools make their connections through the transport
+    """
+
+    def __init__(self, transport, max_connections, block):
+        """
+
+        :param transport: HttpTransport
+        :param max_connections: int, per host
+        :param block: bool, see HttpTransport
+        """
+        self.transport = transport
+        super().__init__(pool_connections=transport.max_hosts, pool_maxsize=max_connections, pool_block=block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+        attributes = {'transport': self.transport}
+        http_connection = type('HttpConnection', (_TransportConnection, HTTPConnection), attributes)
+        https_connection = type('HttpsConnection', (_TransportConnection, HTTPSConnection),
+                                dict(attributes, scheme='https'))
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': type('HttpConnectionPool', (HTTPConnectionPool,), {'ConnectionCls': http_connection}),
+            'https': type('HttpsConnectionPool', (HTTPSConnectionPool,), {'ConnectionCls': https_connection})}
+
+
+class HttpTransport:
+    """
+    A thread safe pool of connections per host, with the same request method as requests.Session so that it can be
+    used in its place, see request_types.make_request
+    """
+
+    def __init__(self, max_connections=10, max_hosts=10, block=True, keep_alive=True, http2=False, dns_ttl=300.):
+        """
+
+        :param max_connections: int, maximum number of connections kept open to each host, the whole transport for
+            HTTP/2
+        :param max_hosts: int, number of hosts whose pools are kept, the least recently used ones are closed beyond
+        :param block: bool, if True a request waits for a connection of its host to be free when they are all busy,
+            otherwise it opens an extra one that is closed after the request
+        :param keep_alive: bool, if False every request is sent on a new connection
+        :param http2: bool, needs httpx[http2], the DNS cache is then left to httpx
+        :param dns_ttl: float, in seconds, how long the addresses of the hosts are cached, None to look them up for
+            each connection
+        """
+        self.max_connections = max_connections
+        self.max_hosts = max_hosts
+        self.block = block
+        self.keep_alive = keep_alive
+        self.http2 = http2
+        self.dns_cache = DnsCache(dns_ttl) if dns_ttl is not None and not http2 else None
+        # host key -> HostStats
+        self.stats = {}
+        self.lock = threading.Lock()
+        # time spent opening connections by the request of the thread
+        self.local = threading.local()
+        self.session = None
+        self.client = None
+        self._open()
+
+    def _open(self):
+        if self.http2:
+            if httpx is None:
+                raise Exception('HTTP/2 needs httpx, pip install httpx[http2]')
+            max_keepalive_connections = self.max_connections if self.keep_alive else 0
+            limits = httpx.Limits(max_connections=self.max_connections,
+                                  max_keepalive_connections=max_keepalive_connections)
+            self.client = httpx.Client(http2=True, limits=limits)
+        else:
+            self.session = requests.Session()
+            adapter = _TransportAdapter(self, self.max_connections, self.block)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            if not self.keep_alive:
+                self.session.headers['Connection'] = 'close'
+
+    def close(self):
+        """
+        Close the connections, they are opened again by the next requests
+        """
+        with self.lock:
+            session, client = self.session, self.client
+            self.session = self.client = None
+            self._open()
+        if session is not None:
+            session.close()
+        if client is not None:
+            client.close()
+
+    def _count(self, key, counter, n=1):
+        with self.lock:
+            stats = self.stats.get(key)
+            if stats is None:
+                stats = self.stats[key] = HostStats()
+            setattr(stats, counter, getattr(stats, counter) + n)
+
+    def request(self, method, url, params=None, data=None, headers=None, timeout=None, timings=None):
+        """
+        :param method: str, 'GET' or 'POST'
+        :param url: str
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data to be attached to the body
+        :param headers: dict
+        :param timeout: float, in seconds
+        :param timings: dict, optional, filled with the seconds spent in the phases CONNECT, TTFB and DOWNLOAD of
+            instrumentation
+        :return: requests.Response, or httpx.Response for HTTP/2, both have status_code, content and text
+        :raises requests.Timeout, requests.ConnectionError: if the request could not be sent or answered
+        """
+        parts = urlsplit(url)
+        key = get_host_key(parts.scheme, parts.hostname, parts.port)
+        self._count(key, 'n_requests')
+        self.local.connect_seconds = 0.
+        start = time.perf_counter()
+        if self.client is None:
+            # streamed so that the headers and the body are timed apart
+            response = self.session.request(method, url, params=params, data=data, headers=headers, timeout=timeout,
+                                            stream=True)
+            headers_received = time.perf_counter()
+            response.content
+        else:
+            response, headers_received = self._request_http2(key, method, url, params, data, headers, timeout)
+        if timings is not None:
+            connect_seconds = self.local.connect_seconds
+            timings[CONNECT] = connect_seconds
+            timings[TTFB] = headers_received - start - connect_seconds
+            timings[DOWNLOAD] = time.perf_counter() - headers_received
+        return response
+
+    def _request_http2(self, key, method, url, params, data, headers, timeout):
+        local = self.local
+
+        def trace(event, info):
+            if event in ['connection.connect_tcp.started', 'connection.start_tls.started']:
+                local.connect_started = time.perf_counter()
+            elif event in ['connection.connect_tcp.complete', 'connection.start_tls.complete']:
+                local.connect_seconds += time.perf_counter() - local.connect_started
+                if event == 'connection.connect_tcp.complete':
+                    self._count(key, 'n_connections')
+
+        request = self.client.build_request(method, url, params=params, data=data or None, headers=headers,
+                                            timeout=timeout, extensions={'trace': trace})
+        try:
+            response = self.client.send(request, stream=True)
+            headers_received = time.perf_counter()
+            response.read()
+            return response, headers_received
+        except httpx.TimeoutException as error:
+            raise requests.Timeout(str(error)) from error
+        except httpx.TransportError as error:
+            raise requests.ConnectionError(str(error)) from error
+
+    def get_stats(self, host=None):
+        """
+        :param host: str, optional, eg: api.kraken.com:443, see get_host_key
+        :return: dict, host key -> dict of counters, see HostStats.to_dict, or the counters of host only
+        """
+        with self.lock:
+            if host is not None:
+                return self.stats.get(host, HostStats()).to_dict()
+            return {key: stats.to_dict() for key, stats in self.stats.items()}
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats.clear()
+
+
+_http_transport = None
+_http_transport_lock = threading.Lock()
+
+
+def get_http_transport():
+    """
+    :return: HttpTransport, shared by all the clients of the process
+    """
+    global _http_transport
+    if _http_transport is None:
+        with _http_transport_lock:
+            if _http_transport is None:
+                _http_transport = HttpTransport()
+    return _http_transport
+
+
+def set_http_transport(transport):
+    """
+    Replace the shared transport, eg: to configure it, the clients created before keep the previous one
+
+    :param transport: HttpTransport
+    :return: HttpTransport, the previous one, None if it had not been created
+    """
+    global _http_transport
+    with _http_transport_lock:
+        previous, _http_transport = _http_transport, transport
+    return previous
@@ -0,0 +1,237 @@
+"""
+Instrumentation of the requests sent to the exchanges
+
+Each attempt of a public request is recorded per (market, endpoint), with the histograms of its latency split into
+phases, the status codes, the bytes received and the retries:
+
+    CONNECT   opening the connection, TCP and TLS handshakes, 0 when a kept-alive one is reused
+    TTFB      from the request being sent to the headers of the response being received
+    DOWNLOAD  reading the body
+    PARSE     decoding the body
+    TOTAL     the whole attempt, waits of the rate limiter excluded
+
+The metrics are read as a dict with snapshot or as the text format of Prometheus with to_prometheus. Hooks are called
+with each attempt, eg: to feed a tracer:
+
+    get_request_metrics().add_hook(lambda event: tracer.record(event[ENDPOINT], event[TIMINGS]))
+"""
+import bisect
+import threading
+
+CONNECT = 'connect'
+TTFB = 'ttfb'
+DOWNLOAD = 'download'
+PARSE = 'parse'
+TOTAL = 'total'
+PHASES = [CONNECT, TTFB, DOWNLOAD, PARSE, TOTAL]
+
+# keys of the events passed to the hooks
+MARKET = 'market'
+ENDPOINT = 'endpoint'
+STATUS = 'status'
+TIMINGS = 'timings'
+N_BYTES = 'n_bytes'
+ATTEMPT = 'attempt'
+ERROR = 'error'
+
+# status of the attempts that got no response, eg: timeouts
+NO_RESPONSE = 'none'
+
+# upper bounds of the buckets of the latency histograms, in seconds
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.]
+
+PROMETHEUS_PREFIX = 'market_data_rest'
+
+
+class Histogram:
+    """
+    Counts of values per bucket, as a Prometheus histogram
+    """
+    __slots__ = ['bounds', 'counts', 'sum', 'count']
+
+    def __init__(self, bounds=None):
+        """
+
+        :param bounds: list, of float, sorted upper bounds of the buckets, the last bucket has no upper bound
+        """
+        self.bounds = LATENCY_BUCKETS if bounds is None else bounds
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.
+        self.count = 0
+
+    def observe(self, value):
+        """
+        :param value: float
+        """
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        :param q: float, in [0, 1]
+        :return: float, upper bound of the bucket of the quantile, inf if beyond the last bound, nan if empty
+        """
+        if self.count == 0:
+            return float('nan')
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def to_dict(self):
+        """
+        :return: dict, with keys ['count', 'sum', 'mean', 'p50', 'p99', 'buckets'], buckets being the cumulative
+            counts per upper bound
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip(self.bounds + [float('inf')], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {'count': self.count,
+                'sum': self.sum,
+                'mean': self.sum / self.count if self.count else float('nan'),
+                'p50': self.quantile(0.5),
+                'p99': self.quantile(0.99),
+                'buckets': buckets}
+
+
+class EndpointMetrics:
+    """
+    The metrics of one endpoint of a market
+    """
+    __slots__ = ['latencies', 'statuses', 'n_bytes', 'n_retries']
+
+    def __init__(self):
+        # phase -> Histogram
+        self.latencies = {phase: Histogram() for phase in PHASES}
+        # status code, or NO_RESPONSE -> number of attempts
+        self.statuses = {}
+        self.n_bytes = 0
+        self.n_retries = 0
+
+    def to_dict(self):
+        """
+        :return: dict, with keys ['latencies', 'statuses', 'n_attempts', 'n_bytes', 'n_retries']
+        """
+        return {'latencies': {phase: histogram.to_dict() for phase, histogram in self.latencies.items()},
+                'statuses': dict(self.statuses),
+                'n_attempts': sum(self.statuses.values()),
+                'n_bytes': self.n_bytes,
+                'n_retries': self.n_retries}
+
+
+class RequestMetrics:
+    """
+    The metrics of the requests of all the markets, thread safe
+    """
+
+    def __init__(self):
+        # (market, endpoint) -> EndpointMetrics
+        self.endpoints = {}
+        # functions called with each event, see record
+        self.hooks = []
+        self.n_hook_errors = 0
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        """
+        :param hook: function, called with a dict with keys [MARKET, ENDPOINT, STATUS, TIMINGS, N_BYTES, ATTEMPT,
+            ERROR] after each attempt, from the thread or the event loop of the request, it should be quick
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """
+        :param hook: function
+        """
+        self.hooks.remove(hook)
+
+    def record(self, market, endpoint, timings, status=NO_RESPONSE, n_bytes=0, attempt=0, error=None):
+        """
+        :param market: str
+        :param endpoint: str, eg: public/Depth
+        :param timings: dict, phase -> seconds, the missing phases are not recorded
+        :param status: int, status code of the response, NO_RESPONSE if there was none
+        :param n_bytes: int, size of the body
+        :param attempt: int, 0 for the first attempt, more for the retries
+        :param error: Exception, optional, why the attempt failed
+        """
+        with self.lock:
+            metrics = self.endpoints.get((market, endpoint))
+            if metrics is None:
+                metrics = self.endpoints[(market, endpoint)] = EndpointMetrics()
+            for phase, seconds in timings.items():
+                metrics.latencies[phase].observe(seconds)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.n_bytes += n_bytes
+            if attempt > 0:
+                metrics.n_retries += 1
+        if self.hooks:
+            event = {MARKET: market, ENDPOINT: endpoint, STATUS: status, TIMINGS: timings, N_BYTES: n_bytes,
+                     ATTEMPT: attempt, ERROR: error}
+            for hook in list(self.hooks):
+                try:
+                    hook(event)
+                except Exception:
+                    # a broken tracer should not fail the requests
+                    self.n_hook_errors += 1
+
+    def snapshot(self):
+        """
+        :return: dict, (market, endpoint) -> dict, see EndpointMetrics.to_dict
+        """
+        with self.lock:
+            return {key: metrics.to_dict() for key, metrics in self.endpoints.items()}
+
+    def reset(self):
+        with self.lock:
+            self.endpoints.clear()
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """
+        :param prefix: str, of the names of the metrics
+        :return: str, the metrics in the Prometheus text exposition format
+        """
+        latency_lines = []
+        status_lines = []
+        bytes_lines = []
+        retries_lines = []
+        for (market, endpoint), metrics in sorted(self.snapshot().items()):
+            labels = f'market="{market}",endpoint="{endpoint}"'
+            for phase, histogram in metrics['latencies'].items():
+                if histogram['count'] == 0:
+                    continue
+                phase_labels = f'{labels},phase="{phase}"'
+                for bound, count in histogram['buckets'].items():
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    latency_lines.append(f'{prefix}_request_seconds_bucket{{{phase_labels},le="{le}"}} {count}')
+                latency_lines.append(f'{prefix}_request_seconds_sum{{{phase_labels}}} {histogram["sum"]!r}')
+                latency_lines.append(f'{prefix}_request_seconds_count{{{phase_labels}}} {histogram["count"]}')
+            for status, count in sorted(metrics['statuses'].items(), key=str):
+                status_lines.append(f'{prefix}_requests_total{{{labels},status="{status}"}} {count}')
+            bytes_lines.append(f'{prefix}_response_bytes_total{{{labels}}} {metrics["n_bytes"]}')
+            retries_lines.append(f'{prefix}_retries_total{{{labels}}} {metrics["n_retries"]}')
+        lines = [f'# HELP {prefix}_request_seconds Latency of the requests to the exchanges per phase',
+                 f'# TYPE {prefix}_request_seconds histogram'] + latency_lines + \
+                [f'# HELP {prefix}_requests_total Attempts per status code',
+                 f'# TYPE {prefix}_requests_total counter'] + status_lines + \
+                [f'# HELP {prefix}_response_bytes_total Bytes of the response bodies',
+                 f'# TYPE {prefix}_response_bytes_total counter'] + bytes_lines + \
+                [f'# HELP {prefix}_retries_total Attempts that were retries',
+                 f'# TYPE {prefix}_retries_total counter'] + retries_lines
+        return '\n'.join(lines) + '\n'
+
+
+_request_metrics = RequestMetrics()
+
+
+def get_request_metrics():
+    """
+    :return: RequestMetrics, shared by all the clients of the process
+    """
+    return _request_metrics
@@ -0,0 +1,175 @@
+"""
+Decoding of the response bodies
+
+orjson is used when it is installed, it is several times faster than the standard json module which is the fallback.
+
+Most of a book or of a series of bars is a large array of numbers, often sent as strings: decoding it builds a Python
+list per level and a str per number only to convert them to floats afterwards. ArrayDecoder cuts those arrays out of
+the body before it is decoded and parses them as one flat list of numbers into a float64 array, and can keep only
+their first rows so that the rest of a deep book is never parsed at all.
+"""
+import json
+import re
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# the end of an array of arrays, rows never contain brackets
+END_OF_ROWS = re.compile(rb'\]\s*\]')
+WHITESPACES = b' \t\r\n'
+# removed from an array of numbers before it is parsed
+NON_NUMERIC = b'[]" \t\r\n'
+
+
+def loads(content):
+    """
+    :param content: bytes or str
+    :return: json
+    :raises ValueError: if content is not json
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def _skip_whitespaces(content, position):
+    while position < len(content) and content[position] in WHITESPACES:
+        position += 1
+    return position
+
+
+def find_array(content, key):
+    """
+    :param content: bytes, a json document
+    :param key: bytes, the first value of this key is looked for
+    :return: tuple, (start, end) of the array, end excluded, None if the key is not found or its value is not an array
+        of numbers or of arrays of numbers
+    """
+    needle = b'"' + key + b'"'
+    position = content.find(needle)
+    if position < 0:
+        return None
+    position = _skip_whitespaces(content, position + len(needle))
+    if content[position:position + 1] != b':':
+        return None
+    start = _skip_whitespaces(content, position + 1)
+    if content[start:start + 1] != b'[':
+        return None
+    first = _skip_whitespaces(content, start + 1)
+    if content[first:first + 1] == b'[':
+        match = END_OF_ROWS.search(content, first)
+        return (start, match.end()) if match is not None else None
+    end = content.find(b']', first)
+    return (start, end + 1) if end >= 0 else None
+
+
+def keep_first_rows(array, n_rows):
+    """
+    :param array: bytes, an array of arrays
+    :param n_rows: int
+    :return: bytes, the array with its first n_rows only
+    """
+    position = 0
+    for _ in range(n_rows):
+        position = array.find(b']', position + 1)
+        if position < 0 or array[_skip_whitespaces(array, position + 1):].startswith(b']'):
+            # fewer rows than n_rows
+            return array
+    return array[:position + 1] + b']'
+
+
+def parse_float_array(array):
+    """
+    :param array: bytes, an array of numbers or of arrays of numbers, the numbers can be strings
+    :return: np.ndarray, float64, of shape (n,) or (n, row length), None if the array is empty
+    :raises ValueError: if a value is not a number or the rows have different lengths
+    """
+    text = array.translate(None, NON_NUMERIC)
+    if not text:
+        return None
+    # a flat list of numbers is the cheapest thing to decode, the strings of words are not json once unquoted
+    values = np.array(loads(b'[' + text + b']'), dtype=np.float64)
+    first = _skip_whitespaces(array, 1)
+    if array[first:first + 1] == b'[':
+        row_length = array[first:array.find(b']', first)].count(b',') + 1
+        if len(values) % row_length != 0:
+            raise ValueError(f'Rows of different lengths in {array[:100]}')
+        values = values.reshape(-1, row_length)
+    return values
+
+
+class ArrayDecoder:
+    """
+    Decode a body, the values of the given keys being float64 arrays rather than lists
+
+    Only the first value of each key is converted and it should be reached from the root through objects only. If an
+    array is not made of numbers, or a key is missing as in an error response, the body is decoded as usual.
+    """
+    __slots__ = ['keys', 'n_rows']
+
+    def __init__(self, keys, n_rows=None):
+        """
+
+        :param keys: list, of str
+        :param n_rows: int, optional, only the first n_rows of the arrays are kept, the others are not parsed
+        """
+        self.keys = keys
+        self.n_rows = n_rows
+
+    def __repr__(self):
+        return f'ArrayDecoder({self.keys}, n_rows={self.n_rows})'
+
+    def __call__(self, content):
+        """
+        :param content: bytes
+        :return: json
+        :raises ValueError: if content is not json
+        """
+        if isinstance(content, str):
+            content = content.encode()
+        spans = []
+        for key in self.keys:
+            span = find_array(content, key.encode())
+            if span is not None:
+                spans.append(span)
+        spans.sort()
+        parts = []
+        arrays = {}
+        position = 0
+        for start, end in spans:
+            array = content[start:end]
+            if self.n_rows is not None and array[_skip_whitespaces(array, 1):].startswith(b'['):
+                array = keep_first_rows(array, self.n_rows)
+            try:
+                values = parse_float_array(array)
+            except ValueError:
+                return loads(content)
+            if values is None:
+                continue
+            # replaced by a string that is swapped for the array once the rest is decoded
+            placeholder = f'\x00array{len(arrays)}'
+            arrays[placeholder] = values
+            parts.append(content[position:start])
+            parts.append(json.dumps(placeholder).encode())
+            position = end
+        if not arrays:
+            return loads(content)
+        parts.append(content[position:])
+        result = loads(b''.join(parts))
+        _replace_placeholders(result, arrays)
+        return result
+
+
+def _replace_placeholders(result, arrays):
+    if not isinstance(result, dict):
+        return
+    for key, value in result.items():
+        if isinstance(value, str):
+            if value in arrays:
+                result[key] = arrays[value]
+        elif isinstance(value, dict):
+            _replace_placeholders(value, arrays)
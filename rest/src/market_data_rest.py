@@ -1,13 +1,23 @@
+import datetime
 import json
 import time
 from abc import ABC, abstractmethod
 from http import HTTPStatus
 
+import pandas as pd
 import requests
 
-from core.src.date import today_date
+from core.src.column_names import BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, TIME
+from core.src.date import get_current_timestamp, date_to_timestamp, MINUTES_PER_DAY
+from core.src.exceptions import ExchangeError, ExchangeRateLimitError, ExchangeUnavailableError, raise_exchange_error
+from core.src.instruments import get_instrument_registry
 from rest.src.api_utils import get_header_key_col, get_header_signature_col, get_api_url
-from rest.src.request_types import GET, make_request, dict_to_querystring
+from rest.src.http_transport import get_http_transport
+from rest.src.instrumentation import get_request_metrics, NO_RESPONSE, PARSE, TOTAL
+from rest.src.rate_limiter import get_rate_limiter
+from rest.src.request_types import GET, make_request, get_response_body
+from rest.src.response_cache import ResponseCache, make_cache_key
+from rest.src.retry import RetryPolicy, get_circuit_breaker
 
 
 class MarketDataRestApi(ABC):
@@ -17,6 +27,12 @@ class MarketDataRestApi(ABC):
 
     When adding a method that should be enforced on all children, use @abstractmethod
     """
+    # endpoint prefix -> time to live in seconds of its responses in the response cache, see _cache_ttl
+    CACHE_TTLS = {}
+    # number of bars the ohlc endpoint can go back, the bar in progress included, None if it serves the whole history
+    OHLC_HISTORY = None
+    # maximum number of bars in a response of the ohlc endpoint, None if it is not capped, see _merge_ohlc_results
+    OHLC_PAGE_SIZE = None
 
     def __init__(self,
                  market,
@@ -36,7 +52,8 @@ class MarketDataRestApi(ABC):
         """
         self.market = market
         self.instrument_type = instrument_type
-        self.session = requests.Session()
+        # The connections are pooled per host and shared by all the clients of the process
+        self.session = get_http_transport()
         # The base url of the API depends on the market and instrument type
         self.api_url = get_api_url(market, instrument_type)
 
@@ -51,6 +68,36 @@ class MarketDataRestApi(ABC):
         self.public_key = public_key
         self.private_key = private_key
 
+        # Responses of slow-changing public endpoints, see CACHE_TTLS. It can be replaced by any object with the same
+        # interface as ResponseCache, or None to disable caching
+        self.response_cache = ResponseCache()
+        # Shared by all the clients of the market, if not blocking, requests above the limit raise instead of waiting
+        self.rate_limiter = get_rate_limiter(market, instrument_type)
+        self.rate_limit_blocking = True
+        # Retries of the public requests, and the circuit breaker shared by all the clients of the market
+        self.retry_policy = RetryPolicy()
+        self.circuit_breaker = get_circuit_breaker(market, instrument_type)
+        # Optional, an OhlcStore: get_ohlc and get_close then read from it and only fetch the ranges it does not have
+        self.ohlc_store = None
+        # The names of the syms on the exchange are formatted once per process, see get_market_sym
+        self.sym_namespace = (market, instrument_type)
+        # Latency, status codes, bytes and retries of the public requests per endpoint, None to disable, see
+        # instrumentation
+        self.request_metrics = get_request_metrics()
+
+    @staticmethod
+    def for_market(market, instrument_type):
+        """
+        Get the shared public client of a market, see market_data_rest_factory.get_market_data_rest_api
+
+        :param market: str, eg: KRAKEN
+        :param instrument_type: str, eg: SPOT
+        :return: MarketDataRestApi
+        """
+        # imported here as the factory imports the children of this class
+        from rest.src.market_data_rest_factory import get_market_data_rest_api
+        return get_market_data_rest_api(market, instrument_type)
+
     @staticmethod
     def _nonce():
         """
@@ -60,7 +107,8 @@ class MarketDataRestApi(ABC):
         nonce = int(1000 * time.time())
         return nonce
 
-    def _query_public(self, method, timeout=10, headers=None, params=None, data=None, request_type=GET) -> json:
+    def _query_public(self, method, timeout=10, headers=None, params=None, data=None, request_type=GET,
+                      decoder=None) -> json:
         """
         Used to query the public endpoints
 
@@ -70,6 +118,7 @@ class MarketDataRestApi(ABC):
         :param params: dict, arguments for the endpoints
         :param data:dict, data to be attached to the body
         :param request_type: str, 'GET or 'POST'
+        :param decoder: function, optional, bytes -> json, to decode the body, see json_decode.ArrayDecoder
         :return:
         """
         if headers is None:
@@ -77,20 +126,290 @@ class MarketDataRestApi(ABC):
         if data is None:
             data = {}
 
+        cache_key, cache_ttl, result = self._get_cached_response(method, params, data)
+        if result is not None:
+            return result
+
         # the url is composed of the base url + the route to public if any + the endpoint itself
         url = self.api_url + self.public_path + method
-        # @TODO: remove once we have a logger
-        p = dict_to_querystring(params)
-        print(f'\nurl={url}?{p}')
-        print(f'\nparams={params}')
+        result = self._send_public(url, timeout, headers, params, data, request_type, decoder)
+        if cache_ttl is not None:
+            self.response_cache.set(cache_key, result, cache_ttl)
+        return result
 
-        response = make_request(self.session, url, timeout, headers, params, data, request_type)
+    def _send_public(self, url, timeout, headers, params, data, request_type, decoder=None):
+        """
+        Send a public request, the retryable errors are retried with backoff as long as the circuit breaker of the
+        market is closed
 
-        if response.status_code == HTTPStatus.OK:
-            result = response.json()
+        :param url: str
+        :param timeout: float, in seconds
+        :param headers: dict
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data to be attached to the body
+        :param request_type: str, 'GET or 'POST'
+        :param decoder: function, optional, bytes -> json
+        :return: json
+        """
+        endpoint = self._get_endpoint(url)
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            self._acquire_rate_limit()
+            timings = {}
+            status, n_bytes, error = NO_RESPONSE, 0, None
+            start = time.perf_counter()
+            try:
+                response = make_request(self.session, url, timeout, headers, params, data, request_type, timings)
+                status, n_bytes = response.status_code, len(response.content)
+                parse_start = time.perf_counter()
+                body = get_response_body(response, decoder)
+                timings[PARSE] = time.perf_counter() - parse_start
+                result = self._process_response(status, body)
+            except (requests.Timeout, requests.ConnectionError) as request_error:
+                error = ExchangeUnavailableError(self.market, str(request_error))
+            except ExchangeError as exchange_error:
+                error = exchange_error
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            self._record_attempt(endpoint, attempt, start, timings, status, n_bytes, error)
+            self._record_outcome(error)
+            if error is None:
+                return result
+            self.retry_policy.sleep(self._on_request_error(error, attempt))
+            attempt += 1
+
+    def _get_endpoint(self, url):
+        """
+        :param url: str
+        :return: str, the url without the base url of the api, eg: public/Depth
+        """
+        return url[len(self.api_url):] if url.startswith(self.api_url) else url
+
+    def _record_attempt(self, endpoint, attempt, start, timings, status=NO_RESPONSE, n_bytes=0, error=None):
+        """
+        :param endpoint: str
+        :param attempt: int, 0 for the first attempt
+        :param start: float, time.perf_counter() when the attempt was sent
+        :param timings: dict, phase -> seconds, see instrumentation
+        :param status: int, status code, NO_RESPONSE if there was no response
+        :param n_bytes: int, size of the body
+        :param error: ExchangeError, optional
+        """
+        if self.request_metrics is None:
+            return
+        timings[TOTAL] = time.perf_counter() - start
+        self.request_metrics.record(self.market, endpoint, timings, status, n_bytes, attempt, error)
+
+    def _record_outcome(self, error=None):
+        """
+        Tell the circuit breaker how a request it let through went, the exchange is up as long as it answers, even
+        with an error
+
+        :param error: ExchangeError, optional
+        """
+        if isinstance(error, ExchangeUnavailableError):
+            self.circuit_breaker.record_failure()
         else:
-            result = self.process_error(response)
-        return result
+            self.circuit_breaker.record_success()
+
+    def _on_request_error(self, error, attempt):
+        """
+        Tell how long to wait before the next attempt, see _record_outcome for the circuit breaker
+
+        :param error: ExchangeError
+        :param attempt: int, 0 for the first attempt
+        :return: float, in seconds
+        :raises ExchangeError: if the request should not be retried
+        """
+        if not error.retryable or attempt >= self.retry_policy.max_retries or self.circuit_breaker.is_open():
+            raise error
+        return self.retry_policy.get_delay(attempt, error)
+
+    def _process_response(self, status_code, body):
+        """
+        :param status_code: int
+        :param body: json, or str if the response is not json
+        :return: json
+        :raises ExchangeError: if the exchange returned an error
+        """
+        if status_code == HTTPStatus.OK and not isinstance(body, str):
+            self.check_result(body)
+            return body
+        self.process_error(status_code, body)
+        # process_error is expected to raise, this is a safety net
+        raise_exchange_error(self.market, str(body), status_code)
+
+    def _acquire_rate_limit(self):
+        """
+        Wait until the rate limit of the market allows another request, after the circuit breaker let it through
+
+        :raises ExchangeRateLimitError: if the limit is reached and rate_limit_blocking is False
+        """
+        if self.rate_limiter is None:
+            return
+        try:
+            if not self.rate_limiter.acquire(blocking=self.rate_limit_blocking):
+                raise ExchangeRateLimitError(self.market,
+                                             f'Rate limit reached for {self.market}/{self.instrument_type}')
+        except BaseException:
+            # nothing was sent
+            self.circuit_breaker.release()
+            raise
+
+    def _cache_ttl(self, method, params, data):
+        """
+        How long the response of a public query can be cached for, by default it is looked up in CACHE_TTLS
+
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: float, time to live in seconds, None if the response should not be cached
+        """
+        for prefix, ttl in self.CACHE_TTLS.items():
+            if method.startswith(prefix):
+                return ttl
+        return None
+
+    def _cache_key(self, method, params, data):
+        """
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: tuple, the key of the response in the response cache
+        """
+        return make_cache_key(method, params, data)
+
+    def _get_cached_response(self, method, params, data):
+        """
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: tuple, (cache key, time to live, cached response), the time to live is None if the response should
+            not be cached and the cached response is None on a miss
+        """
+        if self.response_cache is None:
+            return None, None, None
+        cache_ttl = self._cache_ttl(method, params, data)
+        if cache_ttl is None:
+            return None, None, None
+        cache_key = self._cache_key(method, params, data)
+        return cache_key, cache_ttl, self.response_cache.get(cache_key)
+
+    def _plan_ohlc_queries(self, sym, start, end, interval):
+        """
+        Find the ranges missing from the ohlc store and the requests that fetch them
+
+        :param sym: str
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: tuple, (plan, queries) where plan is to be given to _merge_ohlc_results along with the responses to
+            queries, a list of arguments of _query_public
+        """
+        now = int(get_current_timestamp())
+        step = interval * 60
+        start = 0 if start is None else start
+        end = now if end is None else min(end, now)
+        gaps = self.ohlc_store.find_gaps(self.market, sym, interval, start, end)
+        earliest = self._get_earliest_ohlc(interval, now)
+        if earliest is not None:
+            # what is older than the history of the endpoint cannot be fetched
+            gaps = [(max(gap_start, earliest), gap_end) for gap_start, gap_end in gaps if gap_end > earliest]
+        queries = [self._ohlc_range_query(sym, gap_start, gap_end, interval) for gap_start, gap_end in gaps]
+        return (start, end, interval, gaps, now), queries
+
+    def _get_earliest_ohlc(self, interval, now=None):
+        """
+        :param interval: int, frequency in minutes
+        :param now: int, timestamp in seconds, None for now
+        :return: int, timestamp in seconds of the oldest bar the ohlc endpoint returns, None if it serves the whole
+            history
+        """
+        if self.OHLC_HISTORY is None:
+            return None
+        step = interval * 60
+        now = int(get_current_timestamp()) if now is None else now
+        # the bar in progress is one of the OHLC_HISTORY bars
+        return (now // step - self.OHLC_HISTORY + 1) * step
+
+    def _merge_ohlc_results(self, sym, plan, results):
+        """
+        Add the fetched bars to the ohlc store and read the requested range from it
+
+        :param sym: str
+        :param plan: tuple, see _plan_ohlc_queries
+        :param results: list, of json, the responses to the queries of _plan_ohlc_queries
+        :return: pd.DataFrame, see get_ohlc
+        """
+        start, end, interval, gaps, now = plan
+        step = interval * 60
+        # bars that are not over yet are returned but not stored
+        complete_end = now // step * step
+        complete_bars = []
+        partial_bars = []
+        covered = []
+        for (gap_start, gap_end), result in zip(gaps, results):
+            ohlc = self._parse_ohlc(result, sym)
+            is_complete = ohlc[TIME].map(lambda t: t.timestamp() + step <= now).astype(bool)
+            complete_bars.append(ohlc.loc[is_complete])
+            partial_bars.append(ohlc.loc[~is_complete])
+            covered_start, covered_end = gap_start, min(gap_end, complete_end)
+            if self.OHLC_PAGE_SIZE is not None and len(ohlc) >= self.OHLC_PAGE_SIZE:
+                # a full page, the exchange may have dropped bars at either end of the gap, only what it returned is
+                # covered
+                times = ohlc.loc[is_complete, TIME]
+                if len(times) == 0:
+                    continue
+                covered_start = max(covered_start, int(times.min().timestamp()))
+                covered_end = min(covered_end, int(times.max().timestamp()) + step)
+            if covered_end > covered_start:
+                covered.append((covered_start, covered_end))
+        if len(gaps) > 0:
+            self.ohlc_store.update(self.market, sym, interval, pd.concat(complete_bars, ignore_index=True), covered)
+        ohlc = self.ohlc_store.read(self.market, sym, interval, start, end)
+        if any(len(bars) > 0 for bars in partial_bars):
+            ohlc = pd.concat([ohlc] + partial_bars, ignore_index=True)
+            ohlc = ohlc.drop_duplicates(subset=TIME, keep='last').sort_values(TIME).reset_index(drop=True)
+            start_time, end_time = datetime.datetime.fromtimestamp(start), datetime.datetime.fromtimestamp(end)
+            ohlc = ohlc.loc[(ohlc[TIME] >= start_time) & (ohlc[TIME] < end_time)].reset_index(drop=True)
+        return ohlc
+
+    def _get_ohlc_from_store(self, sym, start, end, interval):
+        """
+        Returns the ohlc data of [start, end) from the ohlc store, only the ranges it does not have are fetched
+
+        :param sym: str
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: pd.DataFrame, see get_ohlc
+        """
+        plan, queries = self._plan_ohlc_queries(sym, start, end, interval)
+        results = [self._query_public(**query) for query in queries]
+        return self._merge_ohlc_results(sym, plan, results)
+
+    @staticmethod
+    def _close_range(close_date):
+        """
+        :param close_date: datetime.date
+        :return: tuple, (start, end, interval) of the daily bar of close_date, see _get_ohlc_from_store
+        """
+        start = date_to_timestamp(close_date) // 1000
+        return start, start + MINUTES_PER_DAY * 60, MINUTES_PER_DAY
+
+    def _get_close_ohlc(self, sym, ohlc_kwargs, close_date):
+        """
+        :param sym: str
+        :param ohlc_kwargs: dict, the arguments of get_ohlc, see _close_query
+        :param close_date: datetime.date
+        :return: pd.DataFrame, the ohlc to look the close up in, only the daily bar of close_date if there is an ohlc
+            store
+        """
+        if self.ohlc_store is not None:
+            return self._get_ohlc_from_store(sym, *self._close_range(close_date))
+        return self.get_ohlc(sym, **ohlc_kwargs)
 
     def _query_private(self, method, timeout=10, headers=None, params=None, data=None, request_type=GET):
         """
@@ -123,11 +442,22 @@ class MarketDataRestApi(ABC):
                 self.header_signature_col: signature
             }
 
-        response = make_request(self.session, url, timeout, headers, params, data, request_type)
-        if response.status_code == HTTPStatus.OK:
-            result = response.json()
-        else:
-            result = self.process_error(response)
+        # private requests may not be idempotent, so they are never retried
+        self.circuit_breaker.before_request()
+        self._acquire_rate_limit()
+        try:
+            response = make_request(self.session, url, timeout, headers, params, data, request_type)
+            result = self._process_response(response.status_code, get_response_body(response))
+        except (requests.Timeout, requests.ConnectionError):
+            self.circuit_breaker.record_failure()
+            raise
+        except ExchangeError as exchange_error:
+            self._record_outcome(exchange_error)
+            raise
+        except BaseException:
+            self.circuit_breaker.release()
+            raise
+        self._record_outcome()
         return result
 
     @abstractmethod
@@ -171,59 +501,134 @@ class MarketDataRestApi(ABC):
         """
         pass
 
+    def get_market_sym(self, sym):
+        """
+        Same as format_sym_for_market, the name is only formatted the first time, see InstrumentRegistry
+
+        :param sym: str
+        :return: str
+        """
+        return get_instrument_registry().get_market_sym(self.sym_namespace, sym, self.format_sym_for_market)
+
+    def get_sym(self, market_sym):
+        """
+        Same as format_sym_back, the sym is only formatted the first time, see InstrumentRegistry
+
+        :param market_sym: str
+        :return: str
+        """
+        return get_instrument_registry().get_sym(self.sym_namespace, market_sym, self.format_sym_back)
+
+    def get_market_syms(self, syms):
+        """
+        :param syms: list or pd.Series, of str
+        :return: same type as syms, see get_market_sym
+        """
+        return get_instrument_registry().get_market_syms(self.sym_namespace, syms, self.format_sym_for_market)
+
+    def get_syms(self, market_syms):
+        """
+        :param market_syms: list or pd.Series, of str
+        :return: same type as market_syms, see get_sym
+        """
+        return get_instrument_registry().get_syms(self.sym_namespace, market_syms, self.format_sym_back)
+
     @abstractmethod
-    def process_error(self, response):
+    def check_result(self, result):
         """
-        Used to process an error received from the endpoint
+        Used to detect the errors sent by the endpoint with a 200 status code
 
-        :param response: session.response
-        :return:
+        :param result: json
+        :raises ExchangeError: if result is an error
+        """
+        pass
+
+    @abstractmethod
+    def process_error(self, status_code, body):
+        """
+        Used to process an error received from the endpoint, it should raise the matching ExchangeError
+
+        :param status_code: int, http status code
+        :param body: json, or str if the response is not json
+        :raises ExchangeError:
         """
         pass
 
     @abstractmethod
+    def get_tob_quote(self, sym) -> dict:
+        """
+        Returns the top of book (tob) quote, built from a single request so that bid and ask come from the same
+        snapshot
+
+        :param sym: str
+        :return: dict, with keys [BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP]
+        """
+        pass
+
+    @staticmethod
+    def _make_tob_quote(bid, bid_size, ask, ask_size, market_timestamp) -> dict:
+        """
+        Build a top of book quote, the mid and spread are derived from the bid and ask
+
+        :param bid: float, top of book bid price
+        :param bid_size: float, size available at the bid
+        :param ask: float, top of book ask price
+        :param ask_size: float, size available at the ask
+        :param market_timestamp: datetime.datetime, time of the snapshot on the exchange
+        :return: dict, see get_tob_quote
+        """
+        bid = float(bid)
+        ask = float(ask)
+        quote = {BID: bid,
+                 BID_SIZE: float(bid_size),
+                 ASK: ask,
+                 ASK_SIZE: float(ask_size),
+                 MID: 0.5 * (bid + ask),
+                 SPREAD: ask - bid,
+                 MARKET_TIMESTAMP: market_timestamp,
+                 GATEWAY_TIMESTAMP: datetime.datetime.fromtimestamp(get_current_timestamp())}
+        return quote
+
     def get_tob_bid(self, sym) -> float:
         """
 
         :param sym: str
         :return: float, top of book (tob) bid price
         """
-        pass
+        return self.get_tob_quote(sym)[BID]
 
-    @abstractmethod
     def get_tob_ask(self, sym) -> float:
         """
 
         :param sym: str
         :return: float, top of book (tob) ask price
         """
-        pass
+        return self.get_tob_quote(sym)[ASK]
 
-    @abstractmethod
     def get_tob_mid(self, sym) -> float:
         """
 
         :param sym: str
         :return: float, top of book (tob) mid price
         """
-        pass
+        return self.get_tob_quote(sym)[MID]
 
-    @abstractmethod
     def get_tob_spread(self, sym) -> float:
         """
 
         :param sym: str
         :return: float, top of book (tob) spread
         """
-        pass
+        return self.get_tob_quote(sym)[SPREAD]
 
     @abstractmethod
-    def get_orderbook(self, sym, n_levels):
+    def get_orderbook(self, sym, n_levels, as_frame=True):
         """
         Returns the orderbook for the first n_levels
 
         :param sym: str
         :param n_levels: int
+        :param as_frame: bool, if False the OrderBook itself is returned, which is much cheaper to build
         :return: an orderbook, i.e. a pd.DataFrane with columns [TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET,
             BID_SIZES, BID_PRICES,ASK_SIZES, ASK_PRICES, MISC]
         """
@@ -232,7 +637,7 @@ class MarketDataRestApi(ABC):
     @abstractmethod
     def get_ohlc(self, sym, since=None, interval=None):
         """
-        Returns the ohlc data from start_timestamp at window interval
+        Returns the ohlc data from start_timestamp at window interval, from the ohlc store if there is one
 
         :param sym: str
         :param since: timestamp
@@ -242,12 +647,116 @@ class MarketDataRestApi(ABC):
         pass
 
     @abstractmethod
-    def get_close(self, sym, d=today_date()):
+    def get_close(self, sym, d=None):
         """
         Returns the closing price at date d for sym
 
         :param sym: str
+        :param d: timestamp, by default yesterday
+        :return: float
+        """
+        pass
+
+    @abstractmethod
+    def _tob_quote_query(self, sym) -> dict:
+        """
+        The request behind get_tob_quote, split from the parsing so that it can be sent by any transport
+
+        :param sym: str
+        :return: dict, the arguments of _query_public
+        """
+        pass
+
+    @abstractmethod
+    def _parse_tob_quote(self, result, sym) -> dict:
+        """
+        :param result: json, the response to _tob_quote_query
+        :param sym: str
+        :return: dict, see get_tob_quote
+        """
+        pass
+
+    @abstractmethod
+    def _orderbook_query(self, sym, n_levels) -> dict:
+        """
+        The request behind get_orderbook
+
+        :param sym: str
+        :param n_levels: int
+        :return: dict, the arguments of _query_public
+        """
+        pass
+
+    @abstractmethod
+    def _parse_orderbook(self, result, sym, n_levels):
+        """
+        :param result: json, the response to _orderbook_query
+        :param sym: str
+        :param n_levels: int
+        :return: OrderBook, see get_orderbook
+        """
+        pass
+
+    @abstractmethod
+    def _ohlc_query(self, sym, since=None, interval=None) -> dict:
+        """
+        The request behind get_ohlc
+
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public
+        """
+        pass
+
+    @abstractmethod
+    def _ohlc_range(self, since=None, interval=None):
+        """
+        Resolves the arguments of get_ohlc the way the exchange does
+
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: tuple, (start, end, interval), see _get_ohlc_from_store
+        """
+        pass
+
+    @abstractmethod
+    def _ohlc_range_query(self, sym, start, end, interval) -> dict:
+        """
+        The request for the bars of [start, end), used to fill the gaps of the ohlc store
+
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public
+        """
+        pass
+
+    @abstractmethod
+    def _parse_ohlc(self, result, sym):
+        """
+        :param result: json, the response to _ohlc_query
+        :param sym: str
+        :return: pd.DataFrame, see get_ohlc
+        """
+        pass
+
+    @abstractmethod
+    def _close_query(self, d):
+        """
+        Validates the date of get_close and tells which ohlc to fetch
+
         :param d: timestamp
+        :return: tuple, the arguments of get_ohlc and the datetime.date of the close
+        """
+        pass
+
+    @abstractmethod
+    def _parse_close(self, ohlc, close_date) -> float:
+        """
+        :param ohlc: pd.DataFrame, see get_ohlc
+        :param close_date: datetime.date
         :return: float
         """
         pass
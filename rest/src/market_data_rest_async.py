@@ -0,0 +1,395 @@
+import asyncio
+import time
+from abc import ABC
+
+import aiohttp
+
+from core.src.column_names import BID, ASK, MID, SPREAD
+from core.src.exceptions import ExchangeError, ExchangeRateLimitError, ExchangeUnavailableError
+from rest.src.instrumentation import CONNECT, TTFB, DOWNLOAD, PARSE, NO_RESPONSE
+from rest.src.json_decode import loads
+from rest.src.market_data_rest import MarketDataRestApi
+from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.request_types import GET, POST
+
+
+async def _on_connection_create_start(session, context, params):
+    context.connect_start = time.perf_counter()
+
+
+async def _on_connection_create_end(session, context, params):
+    if context.trace_request_ctx is not None:
+        context.trace_request_ctx[CONNECT] += time.perf_counter() - context.connect_start
+
+
+def make_connection_trace_config():
+    """
+    :return: aiohttp.TraceConfig, that adds the time spent opening connections to the timings passed to
+        make_request_async
+    """
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_start.append(_on_connection_create_start)
+    trace_config.on_connection_create_end.append(_on_connection_create_end)
+    return trace_config
+
+
+async def make_request_async(session, url, timeout=10, headers=None, params=None, data=None, request_type=GET,
+                             timings=None):
+    """
+    Awaitable counterpart of make_request, the body is read before returning so that the connection goes back to the
+    pool straight away
+
+    :param session: aiohttp.ClientSession
+    :param url: str
+    :param timeout: float, in seconds
+    :param headers: dict
+    :param params: dict, arguments for the endpoints
+    :param data: dict, data to be attached to the body
+    :param request_type: str, 'GET or 'POST'
+    :param timings: dict, optional, filled with the seconds spent in the phases CONNECT, TTFB and DOWNLOAD of
+        instrumentation, the connections are only timed if the session has make_connection_trace_config
+    :return: aiohttp.ClientResponse
+    """
+    if request_type not in [GET, POST]:
+        raise Exception(f'Request type not supported: {request_type}')
+    # aiohttp would send an empty form for an empty dict, requests sends nothing
+    data = data if data else None
+    if timings is not None:
+        timings[CONNECT] = 0.
+    start = time.perf_counter()
+    async with session.request(request_type, url, params=params, data=data, headers=headers,
+                               timeout=aiohttp.ClientTimeout(total=timeout), trace_request_ctx=timings) as response:
+        headers_received = time.perf_counter()
+        await response.read()
+    if timings is not None:
+        timings[TTFB] = headers_received - start - timings[CONNECT]
+        timings[DOWNLOAD] = time.perf_counter() - headers_received
+    return response
+
+
+async def get_response_body_async(response, decoder=None):
+    """
+    :param response: aiohttp.ClientResponse, already read
+    :param decoder: function, optional, bytes -> json, see json_decode.ArrayDecoder, by default json_decode.loads
+    :return: json, or str if the body is not json
+    """
+    try:
+        return await response.json(content_type=None, loads=decoder or loads)
+    except ValueError:
+        return await response.text()
+
+
+class AsyncMarketDataRestApi(MarketDataRestApi, ABC):
+    """
+    A base class for asyncio Market Data REST APIs
+    Child classes names should be AsyncMarketDataRestApi<Market><InstrumentType> and inherit from this class first and
+    then from the blocking MarketDataRestApi<Market><InstrumentType>, so that the sym formatting, the requests and the
+    parsing are shared and only the transport differs.
+
+    get_tob_*, get_orderbook, get_ohlc and get_close are awaitable, the other methods are the blocking ones.
+    """
+
+    def __init__(self, *args, max_connections=100, **kwargs):
+        """
+
+        :param args: the arguments of the blocking api
+        :param max_connections: int, maximum number of simultaneous connections to the exchange
+        :param kwargs: the arguments of the blocking api
+        """
+        super().__init__(*args, **kwargs)
+        self.max_connections = max_connections
+        # created lazily as it has to be created from within the event loop
+        self.async_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _get_async_session(self):
+        if self.async_session is None or self.async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections)
+            self.async_session = aiohttp.ClientSession(connector=connector,
+                                                       trace_configs=[make_connection_trace_config()])
+        return self.async_session
+
+    async def close(self):
+        """
+        Close the underlying connection pool
+        """
+        if self.async_session is not None:
+            await self.async_session.close()
+            self.async_session = None
+
+    async def _acquire_rate_limit_async(self):
+        """
+        Awaitable counterpart of _acquire_rate_limit
+        """
+        if self.rate_limiter is None:
+            return
+        try:
+            if not await self.rate_limiter.acquire_async(blocking=self.rate_limit_blocking):
+                raise ExchangeRateLimitError(self.market,
+                                             f'Rate limit reached for {self.market}/{self.instrument_type}')
+        except BaseException:
+            # nothing was sent, or the task was cancelled
+            self.circuit_breaker.release()
+            raise
+
+    async def _query_public_async(self, method, timeout=10, headers=None, params=None, data=None, request_type=GET,
+                                  decoder=None):
+        """
+        Awaitable counterpart of _query_public
+
+        :param method:
+        :param timeout:
+        :param headers:
+        :param params: dict, arguments for the endpoints
+        :param data:dict, data to be attached to the body
+        :param request_type: str, 'GET or 'POST'
+        :param decoder: function, optional, bytes -> json, to decode the body
+        :return:
+        """
+        if headers is None:
+            headers = {}
+        if data is None:
+            data = {}
+
+        cache_key, cache_ttl, result = self._get_cached_response(method, params, data)
+        if result is not None:
+            return result
+
+        # the url is composed of the base url + the route to public if any + the endpoint itself
+        url = self.api_url + self.public_path + method
+        result = await self._send_public_async(url, timeout, headers, params, data, request_type, decoder)
+        if cache_ttl is not None:
+            self.response_cache.set(cache_key, result, cache_ttl)
+        return result
+
+    async def _send_public_async(self, url, timeout, headers, params, data, request_type, decoder=None):
+        """
+        Awaitable counterpart of _send_public
+
+        :param url: str
+        :param timeout: float, in seconds
+        :param headers: dict
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data to be attached to the body
+        :param request_type: str, 'GET or 'POST'
+        :param decoder: function, optional, bytes -> json
+        :return: json
+        """
+        endpoint = self._get_endpoint(url)
+        attempt = 0
+        while True:
+            self.circuit_breaker.before_request()
+            await self._acquire_rate_limit_async()
+            timings = {}
+            status, n_bytes, error = NO_RESPONSE, 0, None
+            start = time.perf_counter()
+            try:
+                response = await make_request_async(self._get_async_session(), url, timeout, headers, params, data,
+                                                    request_type, timings)
+                status, n_bytes = response.status, response.content_length or 0
+                parse_start = time.perf_counter()
+                body = await get_response_body_async(response, decoder)
+                timings[PARSE] = time.perf_counter() - parse_start
+                result = self._process_response(status, body)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as request_error:
+                error = ExchangeUnavailableError(self.market, repr(request_error))
+            except ExchangeError as exchange_error:
+                error = exchange_error
+            except BaseException:
+                self.circuit_breaker.release()
+                raise
+            self._record_attempt(endpoint, attempt, start, timings, status, n_bytes, error)
+            self._record_outcome(error)
+            if error is None:
+                return result
+            await asyncio.sleep(self._on_request_error(error, attempt))
+            attempt += 1
+
+    async def get_tob_quote(self, sym) -> dict:
+        """
+
+        :param sym: str
+        :return: dict, with keys [BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP]
+        """
+        result = await self._query_public_async(**self._tob_quote_query(sym))
+        return self._parse_tob_quote(result, sym)
+
+    async def get_tob_bid(self, sym) -> float:
+        """
+
+        :param sym: str
+        :return: float, top of book (tob) bid price
+        """
+        return (await self.get_tob_quote(sym))[BID]
+
+    async def get_tob_ask(self, sym) -> float:
+        """
+
+        :param sym: str
+        :return: float, top of book (tob) ask price
+        """
+        return (await self.get_tob_quote(sym))[ASK]
+
+    async def get_tob_mid(self, sym) -> float:
+        """
+
+        :param sym: str
+        :return: float, top of book (tob) mid price
+        """
+        return (await self.get_tob_quote(sym))[MID]
+
+    async def get_tob_spread(self, sym) -> float:
+        """
+
+        :param sym: str
+        :return: float, top of book (tob) spread
+        """
+        return (await self.get_tob_quote(sym))[SPREAD]
+
+    async def get_orderbook(self, sym, n_levels, as_frame=True):
+        """
+        Returns the orderbook for the first n_levels
+
+        :param sym: str
+        :param n_levels: int
+        :param as_frame: bool, if False the OrderBook itself is returned
+        :return: an orderbook, see MarketDataRestApi.get_orderbook
+        """
+        result = await self._query_public_async(**self._orderbook_query(sym, n_levels))
+        ob = self._parse_orderbook(result, sym, n_levels)
+        return ob.to_frame() if as_frame else ob
+
+    async def get_orderbooks(self, syms, n_levels, as_frame=True):
+        """
+        Returns the orderbooks of several syms, all the requests are in flight at the same time
+
+        :param syms: list, of str
+        :param n_levels: int
+        :param as_frame: bool, if False the OrderBooks themselves are returned
+        :return: list, of orderbooks in the same order as syms
+        """
+        return await asyncio.gather(*[self.get_orderbook(sym, n_levels, as_frame) for sym in syms])
+
+    async def get_ohlc(self, sym, since=None, interval=None):
+        """
+        Returns the ohlc data from start_timestamp at window interval
+
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: a pd.DataFrame, see MarketDataRestApi.get_ohlc
+        """
+        if self.ohlc_store is not None:
+            return await self._get_ohlc_from_store_async(sym, *self._ohlc_range(since, interval))
+        result = await self._query_public_async(**self._ohlc_query(sym, since, interval))
+        return self._parse_ohlc(result, sym)
+
+    async def _get_ohlc_from_store_async(self, sym, start, end, interval):
+        """
+        Awaitable counterpart of _get_ohlc_from_store, the missing ranges are fetched concurrently
+
+        :param sym: str
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: pd.DataFrame, see MarketDataRestApi.get_ohlc
+        """
+        plan, queries = self._plan_ohlc_queries(sym, start, end, interval)
+        results = await asyncio.gather(*[self._query_public_async(**query) for query in queries])
+        return self._merge_ohlc_results(sym, plan, results)
+
+    async def get_close(self, sym, d=None):
+        """
+        Returns the closing price at date d for sym
+
+        :param sym: str
+        :param d: timestamp, by default yesterday
+        :return: float
+        """
+        ohlc_kwargs, close_date = self._close_query(d)
+        if self.ohlc_store is not None:
+            ohlc = await self._get_ohlc_from_store_async(sym, *self._close_range(close_date))
+        else:
+            ohlc = await self.get_ohlc(sym, **ohlc_kwargs)
+        return self._parse_close(ohlc, close_date)
+
+
+class AsyncMarketDataRestApiKrakenSpot(AsyncMarketDataRestApi, MarketDataRestApiKrakenSpot):
+    """
+    asyncio Kraken Spot Api
+
+    The bars older than the OHLC endpoint history are rebuilt from the trades by the blocking api, in the default
+    executor, as the pages of trades can only be requested one after the other.
+    """
+
+    async def _get_ohlc_from_store_async(self, sym, start, end, interval):
+        """
+        On top of AsyncMarketDataRestApi._get_ohlc_from_store_async, the bars older than the OHLC endpoint history are
+        rebuilt from the trades, see MarketDataRestApiKrakenSpot._get_ohlc_from_store
+
+        :param sym: str
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: pd.DataFrame, see MarketDataRestApi.get_ohlc
+        """
+        trades_range = self._get_trades_range(start, end, interval)
+        if trades_range is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._backfill_ohlc_store, sym, *trades_range,
+                                                             interval)
+        return await super()._get_ohlc_from_store_async(sym, start, end, interval)
+
+    async def get_close(self, sym, d=None):
+        """
+        Returns the closing price at date d for sym, the closes older than the OHLC endpoint history are rebuilt from
+        the trades
+
+        :param sym: str
+        :param d: timestamp, by default yesterday
+        :return: float
+        """
+        ohlc_kwargs, close_date = self._close_query(d)
+        if not self._is_close_from_trades(close_date):
+            return await super().get_close(sym, d)
+        ohlc = await asyncio.get_running_loop().run_in_executor(None, self.get_ohlc_history, sym,
+                                                                *self._close_range(close_date))
+        return self._parse_close(ohlc, close_date)
+
+
+class AsyncMarketDataRestApiKrakenFuture(AsyncMarketDataRestApi, MarketDataRestApiKrakenFuture):
+    """
+    asyncio Kraken Future Api
+    """
+
+    async def get_tickers(self, syms=None):
+        """
+        Returns the tickers of every inverse future with a single request
+
+        :param syms: list, of str, optional, only keep these syms, in this order
+        :return: pd.DataFrame, see MarketDataRestApiKrakenFuture.get_tickers
+        """
+        result = await self._query_public_async(**self._tickers_query())
+        return self._parse_tickers(result, syms)
+
+
+class AsyncMarketDataRestApiDeribitOption(AsyncMarketDataRestApi, MarketDataRestApiDeribitOption):
+    """
+    asyncio Deribit Option Api
+    """
+
+    async def get_option_chain(self, underlying):
+        """
+        Returns every live option on underlying from a single request
+
+        :param underlying: str, eg: ETHUSD
+        :return: pd.DataFrame, see MarketDataRestApiDeribitOption.get_option_chain
+        """
+        result = await self._query_public_async(**self._option_chain_query(underlying))
+        return self._parse_option_chain(result)
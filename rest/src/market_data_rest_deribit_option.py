@@ -1,20 +1,31 @@
 import datetime
+from http import HTTPStatus
 
-import numpy as np
 import pandas as pd
 
-from core.src.column_names import PRICE, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, \
-    BID_SIZES, SIZE, MISC, RESULT, BIDS, ASKS, \
-    TIMESTAMP, OPEN, CLOSE, HIGH, LOW, TIME
+from core.src.column_names import RESULT, BIDS, ASKS, TIMESTAMP, OPEN, CLOSE, HIGH, LOW, TIME, SYM, BID, ASK, MARK, \
+    UNDERLYING_PRICE, STRIKE, EXPIRY, OPTION_TYPE, MARKET_TIMESTAMP
 from core.src.date import get_current_timestamp, today_date, convert_expiry_to_deribit_format, to_date, \
-    get_yesterday_timestamp, date_to_timestamp
+    get_yesterday_timestamp, date_to_timestamp, MINUTES_PER_DAY, convert_expiry_from_deribit_format
+from core.src.exceptions import raise_exchange_error
 from core.src.instrument_types import OPTION
 from core.src.markets import DERIBIT
 from core.src.option_syms import check_currency_pair_option
-from core.src.spot_syms import split_currency_pair_into_lhs_rhs
+from core.src.orderbook import OrderBook, levels_to_arrays, seconds_to_micros
+from core.src.spot_syms import split_currency_pair_into_lhs_rhs, check_currency_pair_spot, USD, \
+    SUPPORTED_CRYPTO_CURRENCIES
+from rest.src.json_decode import ArrayDecoder
 from rest.src.market_data_rest import MarketDataRestApi
 from rest.src.request_types import GET
+from rest.src.response_cache import MINUTE
+
+# see https://docs.deribit.com/#rpc-error-codes
+# too_many_requests
+RATE_LIMIT_ERROR_CODES = [10028]
+# retry, matching_engine_queue_full, system_maintenance, temporarily_unavailable, timed_out
+UNAVAILABLE_ERROR_CODES = [10040, 10047, 11051, 13028, 13888]
+# the bars of get_tradingview_chart_data, one array per column
+CHART_DECODER = ArrayDecoder(['ticks', 'open', 'high', 'low', 'close', 'volume', 'cost'])
 
 
 class MarketDataRestApiDeribitOption(MarketDataRestApi):
@@ -65,11 +76,16 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         """
         Format the sym back from the exchange format to our standard format
 
-        :param sym:
-        :return:
+        :param sym: str
+        :return: str
         """
-        # @TODO: not needed for now, implement later
-        pass
+        # From: 'ETH-26MAY23-1200-C'
+        # To: C_ETHUSD_230526_1200
+        crypto, expiry, strike, option_type = sym.split("-")
+        crypto = self.format_crypto_back(crypto)
+        sym = "_".join([option_type, crypto + USD, convert_expiry_from_deribit_format(expiry), strike])
+        check_currency_pair_option(sym)
+        return sym
 
     def format_crypto_back(self, crypto):
         """
@@ -78,8 +94,9 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         :param crypto:
         :return:
         """
-        # @TODO: not needed for now, implement later
-        pass
+        if crypto not in SUPPORTED_CRYPTO_CURRENCIES:
+            raise Exception(f'Failed to convert back to crypto: {crypto}')
+        return crypto
 
     def format_fiat_back(self, fiat):
         """
@@ -88,103 +105,185 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         :param fiat:
         :return:
         """
-        # @TODO: not needed for now, implement later
-        pass
+        # options are quoted in coin against the usd index
+        if fiat != USD:
+            raise Exception(f'Failed to convert back to fiat: {fiat}')
+        return fiat
 
-    def process_error(self, response):
+    def _cache_ttl(self, method, params, data):
         """
-        Used to process an error received from the endpoint
+        Daily chart data is cached
 
-        :param response: session.response
-        :return:
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: float, time to live in seconds, None if the response should not be cached
         """
-        # @TODO: not needed for now, implement later
-        pass
+        if method == "get_tradingview_chart_data" and (params or {}).get("resolution") == "1D":
+            return 10 * MINUTE
+        return super()._cache_ttl(method, params, data)
 
-    def get_tob_bid(self, sym) -> float:
+    def _cache_key(self, method, params, data):
         """
+        The end of chart data requests is always now, so it is left out of the key
 
-        :return: float, top of book (tob) bid price
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: tuple, the key of the response in the response cache
         """
-        ob = self.get_orderbook(sym, 1)
-        bid = ob[BID_PRICES].values[0][0]
-        bid = float(bid)
-        return bid
+        if method == "get_tradingview_chart_data" and params is not None:
+            params = {k: v for k, v in params.items() if k != "end_timestamp"}
+        return super()._cache_key(method, params, data)
 
-    def get_tob_ask(self, sym) -> float:
+    def check_result(self, result):
         """
+        Deribit follows json-rpc, errors are sent in the error field
 
-        :param sym: str
-        :return: float, top of book (tob) ask price
+        :param result: json
+        :raises ExchangeError: if result is an error
+        """
+        if 'error' in result:
+            self.process_error(HTTPStatus.OK, result)
+
+    def process_error(self, status_code, body):
         """
-        ob = self.get_orderbook(sym, 1)
-        ask = ob[ASK_PRICES].values[0][0]
-        ask = float(ask)
-        return ask
+        Used to process an error received from the endpoint
 
-    def get_tob_mid(self, sym) -> float:
+        :param status_code: int, http status code
+        :param body: json, or str if the response is not json
+        :raises ExchangeError:
+        """
+        error = body.get('error', {}) if isinstance(body, dict) else {}
+        if not isinstance(error, dict):
+            error = {'message': error}
+        code = error.get('code')
+        message = f"{code}: {error.get('message')}" if error else str(body)
+        raise_exchange_error(self.market, message, status_code,
+                             rate_limited=code in RATE_LIMIT_ERROR_CODES,
+                             unavailable=code in UNAVAILABLE_ERROR_CODES)
+
+    def get_tob_quote(self, sym) -> dict:
         """
+        Returns the top of book (tob) quote from a single get_order_book request, prices are converted from coin to
+        usd using the underlying price of the same snapshot
 
         :param sym: str
-        :return: float, top of book (tob) mid price
+        :return: dict, with keys [BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP]
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        mid = 0.5 * (bid + ask)
-        return mid
+        result = self._query_public(**self._tob_quote_query(sym))
+        return self._parse_tob_quote(result, sym)
 
-    def get_tob_spread(self, sym) -> float:
+    def _tob_quote_query(self, sym):
         """
+        :param sym: str
+        :return: dict, the arguments of _query_public to get the top of book quote
+        """
+        return self._orderbook_query(sym, 1)
 
+    def _parse_tob_quote(self, result, sym):
+        """
+        :param result: json, the response of the get_order_book endpoint
         :param sym: str
-        :return: float, top of book (tob) spread
+        :return: dict, see get_tob_quote
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        spread = ask - bid
-        return spread
+        data_ob = result[RESULT]
+        reference_price = data_ob['underlying_price']
+        bid_price, bid_size = data_ob[BIDS][0]
+        ask_price, ask_size = data_ob[ASKS][0]
+        market_timestamp = datetime.datetime.fromtimestamp(int(data_ob[TIMESTAMP]) / 1000)
+        return self._make_tob_quote(bid_price * reference_price, bid_size, ask_price * reference_price, ask_size,
+                                    market_timestamp)
 
-    def get_orderbook(self, sym, n_levels):
+    def get_orderbook(self, sym, n_levels, as_frame=True):
         """
         Returns the orderbook for the first n_levels
 
         :param sym: str
         :param n_levels: int
+        :param as_frame: bool, if False the OrderBook itself is returned, which is much cheaper to build
         :return: an orderbook, i.e. a pd.DataFrane with columns [TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET,
             BID_SIZES, BID_PRICES,ASK_SIZES, ASK_PRICES, MISC]
         """
+        result = self._query_public(**self._orderbook_query(sym, n_levels))
+        ob = self._parse_orderbook(result, sym, n_levels)
+        return ob.to_frame() if as_frame else ob
 
-        ticker = self.format_sym_for_market(sym)
-        result = self._query_public(method="get_order_book", params={'instrument_name': ticker, "depth": n_levels},
-                                    request_type=GET)
+    def _orderbook_query(self, sym, n_levels):
+        """
+        :param sym: str
+        :param n_levels: int
+        :return: dict, the arguments of _query_public to get the orderbook
+        """
+        ticker = self.get_market_sym(sym)
+        return dict(method="get_order_book", params={'instrument_name': ticker, "depth": n_levels},
+                    request_type=GET, decoder=ArrayDecoder([BIDS, ASKS]))
+
+    def _parse_orderbook(self, result, sym, n_levels):
+        """
+        :param result: json, the response of the get_order_book endpoint
+        :param sym: str
+        :param n_levels: int
+        :return: OrderBook, see get_orderbook
+        """
         data_ob = result[RESULT]
         reference_price = data_ob['underlying_price']
+        bid_prices, bid_sizes = levels_to_arrays(data_ob[BIDS], n_levels)
+        ask_prices, ask_sizes = levels_to_arrays(data_ob[ASKS], n_levels)
+        # prices are in coin, convert them to usd
+        bid_prices *= reference_price
+        ask_prices *= reference_price
+        last_updated_timestamp = int(data_ob[TIMESTAMP]) * 1000
+        return OrderBook(sym, self.market, bid_prices, bid_sizes, ask_prices, ask_sizes, last_updated_timestamp,
+                         seconds_to_micros(get_current_timestamp()))
+
+    def get_option_chain(self, underlying):
+        """
+        Returns every live option on underlying from a single get_book_summary_by_currency request, prices are
+        converted from coin to usd using the underlying price of each option
 
-        # Convert bids and asks to DataFrames
-        bids_df = pd.DataFrame(data_ob[BIDS], columns=[PRICE, SIZE])
-        asks_df = pd.DataFrame(data_ob[ASKS], columns=[PRICE, SIZE])
-        last_updated_timestamp = data_ob[TIMESTAMP]
-
-        # Convert price and size columns to numeric type
-        bids_df[[PRICE, SIZE]] = bids_df[[PRICE, SIZE]].apply(pd.to_numeric)
-        asks_df[[PRICE, SIZE]] = asks_df[[PRICE, SIZE]].apply(pd.to_numeric)
-
-        ob = pd.DataFrame(data=[[bids_df[SIZE].tolist()[:n_levels],
-                                 np.array(bids_df[PRICE].tolist()[:n_levels]) * reference_price,
-                                 asks_df[SIZE].tolist()[:n_levels],
-                                 np.array(asks_df[PRICE].tolist()[:n_levels]) * reference_price]],
-                          columns=[BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES])
-        ob[SYM] = sym
-        ob[MARKET] = self.market
-        ob[MARKET_TIMESTAMP] = last_updated_timestamp
-        ob[GATEWAY_TIMESTAMP] = get_current_timestamp()
-        ob[MARKET_TIMESTAMP] = ob[MARKET_TIMESTAMP].apply(
-            lambda x: datetime.datetime.fromtimestamp(int(x) / 1000))
-        ob[GATEWAY_TIMESTAMP] = ob[GATEWAY_TIMESTAMP].apply(
-            lambda x: datetime.datetime.fromtimestamp(x))
-        ob[MISC] = ''
-        ob = ob[[MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES, MISC]]
-        return ob
+        :param underlying: str, eg: ETHUSD
+        :return: pd.DataFrame, with columns [SYM, OPTION_TYPE, EXPIRY, STRIKE, BID, ASK, MARK, UNDERLYING_PRICE,
+            MARKET_TIMESTAMP], BID and ASK are nan when there is no order on that side
+        """
+        result = self._query_public(**self._option_chain_query(underlying))
+        return self._parse_option_chain(result)
+
+    def _option_chain_query(self, underlying):
+        """
+        :param underlying: str, eg: ETHUSD
+        :return: dict, the arguments of _query_public to get the option chain
+        """
+        crypto, _ = split_currency_pair_into_lhs_rhs(check_currency_pair_spot(underlying))
+        return dict(method="get_book_summary_by_currency", params={'currency': crypto, 'kind': 'option'},
+                    request_type=GET)
+
+    def _parse_option_chain(self, result):
+        """
+        :param result: json, the response of the get_book_summary_by_currency endpoint
+        :return: pd.DataFrame, see get_option_chain
+        """
+        columns = [SYM, OPTION_TYPE, EXPIRY, STRIKE, BID, ASK, MARK, UNDERLYING_PRICE, MARKET_TIMESTAMP]
+        summaries = pd.DataFrame.from_records(result[RESULT], columns=['instrument_name', 'bid_price', 'ask_price',
+                                                                       'mark_price', 'underlying_price',
+                                                                       'creation_timestamp'])
+        if len(summaries) == 0:
+            return pd.DataFrame(columns=columns)
+        # From: 'ETH-26MAY23-1200-C'
+        parts = summaries['instrument_name'].str.split("-", expand=True)
+        expiry = pd.to_datetime(parts[1], format="%d%b%y")
+        chain = pd.DataFrame({OPTION_TYPE: parts[3],
+                              EXPIRY: expiry.dt.date,
+                              STRIKE: pd.to_numeric(parts[2])})
+        chain.insert(0, SYM, parts[3] + "_" + parts[0] + USD + "_" + expiry.dt.strftime("%y%m%d") + "_" + parts[2])
+        underlying_price = pd.to_numeric(summaries['underlying_price'])
+        # prices are in coin, convert them to usd
+        for column, summary_column in [(BID, 'bid_price'), (ASK, 'ask_price'), (MARK, 'mark_price')]:
+            chain[column] = pd.to_numeric(summaries[summary_column]) * underlying_price
+        chain[UNDERLYING_PRICE] = underlying_price
+        chain[MARKET_TIMESTAMP] = [datetime.datetime.fromtimestamp(t / 1000) for t in summaries['creation_timestamp']]
+        chain = chain.sort_values([EXPIRY, STRIKE, OPTION_TYPE]).reset_index(drop=True)
+        return chain[columns]
 
     def get_ohlc(self, sym, since=None, interval=None):
         """
@@ -193,7 +292,19 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         :param sym: str
         :param since: timestamp
         :param interval: int, frequency in minutes
-        :return: a pd.DataFrame with the following columns
+        :return: a pd.DataFrame with columns [TIME, OPEN, CLOSE, HIGH, LOW]
+        """
+        if self.ohlc_store is not None:
+            return self._get_ohlc_from_store(sym, *self._ohlc_range(since, interval))
+        result = self._query_public(**self._ohlc_query(sym, since, interval))
+        return self._parse_ohlc(result, sym)
+
+    def _ohlc_query(self, sym, since=None, interval=None):
+        """
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
         """
         if interval is None:
             interval = "1D"
@@ -202,13 +313,58 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         elif type(since) != int:
             since = since + datetime.timedelta(days=1)
             since = date_to_timestamp(since)
-        ticker = self.format_sym_for_market(sym)
         end_timestamp = int(get_current_timestamp() * 1000)
-        result = self._query_public(method="get_tradingview_chart_data", params={'instrument_name': ticker,
-                                                                                 "start_timestamp": since,
-                                                                                 "end_timestamp": end_timestamp,
-                                                                                 "resolution": interval},
-                                    request_type=GET)
+        return self._chart_query(sym, since, end_timestamp, interval)
+
+    def _chart_query(self, sym, start_timestamp, end_timestamp, resolution):
+        """
+        :param sym: str
+        :param start_timestamp: int, in milli seconds
+        :param end_timestamp: int, in milli seconds
+        :param resolution: str, frequency in minutes or "1D"
+        :return: dict, the arguments of _query_public to get the chart data
+        """
+        ticker = self.get_market_sym(sym)
+        return dict(method="get_tradingview_chart_data", params={'instrument_name': ticker,
+                                                                 "start_timestamp": start_timestamp,
+                                                                 "end_timestamp": end_timestamp,
+                                                                 "resolution": resolution},
+                    request_type=GET, decoder=CHART_DECODER)
+
+    def _ohlc_range(self, since=None, interval=None):
+        """
+        :param since: timestamp
+        :param interval: str, frequency in minutes or "1D"
+        :return: tuple, (start, end, interval), see _get_ohlc_from_store
+        """
+        interval = MINUTES_PER_DAY if interval in [None, "1D"] else int(interval)
+        if since is None:
+            start = get_yesterday_timestamp()
+        elif type(since) != int:
+            start = date_to_timestamp(since + datetime.timedelta(days=1)) // 1000
+        else:
+            # since is in milli seconds, see _ohlc_query
+            start = since // 1000
+        return start, None, interval
+
+    def _ohlc_range_query(self, sym, start, end, interval):
+        """
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
+        """
+        resolution = "1D" if interval == MINUTES_PER_DAY else str(interval)
+        # both ends are inclusive
+        return self._chart_query(sym, start * 1000, end * 1000 - 1, resolution)
+
+    def _parse_ohlc(self, result, sym):
+        """
+        :param result: json, the response of the get_tradingview_chart_data endpoint
+        :param sym: str
+        :return: pd.DataFrame, see get_ohlc
+        """
         result = result[RESULT]
         ohlc = pd.DataFrame.from_dict(result)
         ohlc[[OPEN, CLOSE, HIGH, LOW]] = ohlc[[OPEN, CLOSE, HIGH, LOW]].apply(pd.to_numeric)
@@ -217,7 +373,7 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         ohlc = ohlc[[TIME, OPEN, CLOSE, HIGH, LOW]]
         return ohlc
 
-    def get_close(self, sym, d=today_date() + datetime.timedelta(days=-1)):
+    def get_close(self, sym, d=None):
         """
         Returns the closing price at date d for sym
 
@@ -225,18 +381,35 @@ class MarketDataRestApiDeribitOption(MarketDataRestApi):
         :param d: timestamp, by default yesterday
         :return: float
         """
+        ohlc_kwargs, close_date = self._close_query(d)
+        ohlc = self._get_close_ohlc(sym, ohlc_kwargs, close_date)
+        return self._parse_close(ohlc, close_date)
+
+    def _close_query(self, d):
+        """
+        :param d: timestamp, None for yesterday
+        :return: tuple, the arguments of get_ohlc and the date of the close
+        """
+        if d is None:
+            d = today_date() + datetime.timedelta(days=-1)
         if type(d) != int:
             d = date_to_timestamp(d)
         start_date_timestamp = int(min(get_current_timestamp(), d))
-        start_date = to_date(start_date_timestamp * 1000)
-        ohlc = self.get_ohlc(sym, since=start_date_timestamp)
+        return dict(since=start_date_timestamp), to_date(d)
+
+    def _parse_close(self, ohlc, close_date):
+        """
+        :param ohlc: pd.DataFrame, see get_ohlc
+        :param close_date: datetime.date
+        :return: float
+        """
         ohlc[TIME] = ohlc[TIME].apply(lambda x: to_date(x))
 
-        subset = ohlc.loc[ohlc[TIME] == to_date(d)]
+        subset = ohlc.loc[ohlc[TIME] == close_date]
         if len(subset) > 0:
             close_price = subset[CLOSE].values[0]
         else:
-            raise Exception(f'Failed to get Deribit close for {to_date(d)}')
+            raise Exception(f'Failed to get Deribit close for {close_date}')
         return close_price
 
     def get_fee_schedule(self, sym):
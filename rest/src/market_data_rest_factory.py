@@ -0,0 +1,49 @@
+import threading
+
+from core.src.exceptions import raise_instrument_type_not_supported_for_market_exception
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN, DERIBIT
+from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+
+MARKET_DATA_REST_APIS = {
+    (KRAKEN, SPOT): MarketDataRestApiKrakenSpot,
+    (KRAKEN, FUTURE): MarketDataRestApiKrakenFuture,
+    (DERIBIT, OPTION): MarketDataRestApiDeribitOption,
+}
+
+# one public client per (market, instrument_type) and per process
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_market_data_rest_api(market, instrument_type):
+    """
+    Get the shared public client of a market, it is created on the first call and then reused so that its connection
+    pool stays warm. Only public endpoints should be queried through it as it holds no keys.
+
+    :param market: str, eg: KRAKEN
+    :param instrument_type: str, eg: SPOT
+    :return: MarketDataRestApi
+    """
+    key = (market, instrument_type)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                if key not in MARKET_DATA_REST_APIS:
+                    raise_instrument_type_not_supported_for_market_exception(instrument_type, market)
+                client = MARKET_DATA_REST_APIS[key]()
+                _clients[key] = client
+    return client
+
+
+def clear_market_data_rest_apis():
+    """
+    Drop the shared clients, the next call to get_market_data_rest_api will create new ones
+    """
+    with _clients_lock:
+        # the connections are shared by the whole process, see http_transport, they are not closed
+        _clients.clear()
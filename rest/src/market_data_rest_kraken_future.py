@@ -2,19 +2,24 @@ import base64
 import datetime
 import hashlib
 import hmac
+from http import HTTPStatus
 
 import pandas as pd
 
-from core.src.column_names import PRICE, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, \
-    BID_SIZES, SIZE, MISC, FEES_MAKER, FEES_TAKER, LOW, OPEN, CLOSE, HIGH, TIME, BIDS, ASKS, SYMBOL
-from core.src.date import get_current_timestamp, today_date, to_date
-from core.src.future_syms import FUT_, check_currency_pair_future
+from core.src.column_names import FEES_MAKER, FEES_TAKER, LOW, OPEN, CLOSE, HIGH, TIME, BIDS, ASKS, SYMBOL, RESULT, \
+    VWAP, VOLUME, COUNT, SYM, BID, BID_SIZE, ASK, ASK_SIZE, MARK, LAST, OPEN_INTEREST, FUNDING_RATE, INDEX_PRICE, \
+    MARKET_TIMESTAMP, FEE_VOLUME_CURRENCY
+from core.src.date import get_current_timestamp, today_date, to_date, MINUTES_PER_DAY
+from core.src.exceptions import raise_exchange_error
+from core.src.future_syms import FUT_, check_currency_pair_future, PERP
 from core.src.instrument_types import FUTURE
 from core.src.markets import KRAKEN
-from core.src.spot_syms import USD
+from core.src.orderbook import OrderBook, levels_to_arrays, seconds_to_micros
+from core.src.spot_syms import USD, BTC, SUPPORTED_CCY_PAIRS
+from rest.src.json_decode import ArrayDecoder
 from rest.src.market_data_rest import MarketDataRestApi
 from rest.src.request_types import GET
+from rest.src.response_cache import HOUR, MINUTE
 
 # Kraken Future API uses 3 different endpoints
 # see https://docs.futures.kraken.com/#introduction-api-urls
@@ -22,11 +27,21 @@ DERIVATIVES_API = "derivatives/api/v3/"
 HISTORY_API = "api/history/v2/"
 CHART_API = "api/charts/v1/"
 
+# prefixes of the inverse futures symbols, see https://support.kraken.com/hc/en-us/articles/360022835891
+FIXED_MATURITY = "FI_"
+PERPETUAL = "PI_"
+
+# see https://docs.futures.kraken.com/#http-api-http-api-introduction-errors
+RATE_LIMIT_ERRORS = ['apiLimitExceeded']
+UNAVAILABLE_ERRORS = ['Unavailable', 'marketUnavailable']
+
 
 class MarketDataRestApiKrakenFuture(MarketDataRestApi):
     """
     Kraken Future Api
     """
+    # the charts are daily bars
+    CACHE_TTLS = {DERIVATIVES_API + "feeschedules": HOUR, CHART_API: 10 * MINUTE}
 
     def __init__(self,
                  public_path='/',
@@ -75,22 +90,34 @@ class MarketDataRestApiKrakenFuture(MarketDataRestApi):
         :return: str
         """
         check_currency_pair_future(sym)
-        sym = sym.replace(FUT_, "FI_")
-        return sym
+        _, pair, expiry = sym.split("_")
+        # Kraken uses XBT for BTC
+        pair = pair.replace(BTC, "XBT")
+        if expiry == PERP:
+            return PERPETUAL + pair
+        return FIXED_MATURITY + pair + "_" + expiry
 
     def format_sym_back(self, sym):
         """
         Format the sym back from the exchange format to our standard format
 
-        :param sym:
-        :return:
+        :param sym: str, eg: FI_XBTUSD_230630 or PI_ETHUSD
+        :return: str, eg: FUT_BTCUSD_230630 or FUT_ETHUSD_PERP
         """
+        parts = sym.upper().split("_")
+        if parts[0] + "_" == PERPETUAL and len(parts) == 2:
+            expiry = PERP
+        elif parts[0] + "_" == FIXED_MATURITY and len(parts) == 3:
+            expiry = parts[2]
+        else:
+            raise Exception(f'Failed to convert back to future: {sym}')
         # fiat is always 3 letters
-        fiat = sym[-3:]
-        fiat = self.format_fiat_back(sym)
-        crypto = self.format_crypto_back(sym[:-4])
-        ccy = crypto + fiat
-        return ccy
+        pair = parts[1]
+        fiat = self.format_fiat_back(pair[-3:])
+        crypto = self.format_crypto_back(pair[:-3])
+        sym = FUT_ + crypto + fiat + "_" + expiry
+        check_currency_pair_future(sym)
+        return sym
 
     def format_crypto_back(self, crypto):
         """
@@ -99,7 +126,9 @@ class MarketDataRestApiKrakenFuture(MarketDataRestApi):
         :param crypto:
         :return:
         """
-        if len(crypto) == 3:
+        if crypto == "XBT":
+            return BTC
+        elif len(crypto) == 3:
             return crypto
         elif crypto[0] == 'X':
             return crypto[1:]
@@ -120,100 +149,143 @@ class MarketDataRestApiKrakenFuture(MarketDataRestApi):
         else:
             raise Exception(f'Failed to convert back to fiat: {fiat}')
 
-    def process_error(self, response):
+    def check_result(self, result):
         """
-        Used to process an error received from the endpoint
+        The derivatives endpoints send their errors with a 200 status code and result set to error
 
-        :param response: session.response
-        :return:
+        :param result: json
+        :raises ExchangeError: if result is an error
         """
+        if result.get(RESULT) == 'error':
+            self.process_error(HTTPStatus.OK, result)
 
-        # @TODO: not needed for now, implement later
-        pass
+    def process_error(self, status_code, body):
+        """
+        Used to process an error received from the endpoint
 
-    def get_tob_bid(self, sym) -> float:
+        :param status_code: int, http status code
+        :param body: json, or str if the response is not json
+        :raises ExchangeError:
         """
+        error = str(body.get('error', body)) if isinstance(body, dict) else body
+        raise_exchange_error(self.market, error, status_code,
+                             rate_limited=error in RATE_LIMIT_ERRORS,
+                             unavailable=error in UNAVAILABLE_ERRORS)
 
-        :return: float, top of book (tob) bid price
+    def get_tickers(self, syms=None):
         """
-        ticker = self.format_sym_for_market(sym)
-        ob = self.get_orderbook(sym, 1)
-        bid = ob[BID_PRICES].values[0][0]
-        bid = float(bid)
-        return bid
+        Returns the tickers of every inverse future, fixed maturity and perpetual, with a single request
 
-    def get_tob_ask(self, sym) -> float:
+        :param syms: list, of str, optional, only keep these syms, in this order
+        :return: pd.DataFrame, indexed by sym with float columns [BID, BID_SIZE, ASK, ASK_SIZE, MARK, LAST, VOLUME,
+            OPEN_INTEREST, FUNDING_RATE, INDEX_PRICE] and MARKET_TIMESTAMP, volume is over the last 24 hours and the
+            funding rate is nan for fixed maturities
         """
+        result = self._query_public(**self._tickers_query())
+        return self._parse_tickers(result, syms)
 
-        :param sym: str
-        :return: float, top of book (tob) ask price
+    def _tickers_query(self):
+        """
+        :return: dict, the arguments of _query_public to get the tickers
         """
-        ob = self.get_orderbook(sym, 1)
-        ask = ob[ASK_PRICES].values[0][0]
-        ask = float(ask)
-        return ask
+        return dict(method=DERIVATIVES_API + "tickers", request_type=GET)
 
-    def get_tob_mid(self, sym) -> float:
+    def _parse_tickers(self, result, syms=None):
+        """
+        :param result: json, the response of the tickers endpoint
+        :param syms: list, of str, optional, only keep these syms, in this order
+        :return: pd.DataFrame, see get_tickers
         """
+        columns = {'bid': BID, 'bidSize': BID_SIZE, 'ask': ASK, 'askSize': ASK_SIZE, 'markPrice': MARK, 'last': LAST,
+                   'vol24h': VOLUME, 'openInterest': OPEN_INTEREST, 'fundingRate': FUNDING_RATE,
+                   'indexPrice': INDEX_PRICE}
+        tickers = pd.DataFrame.from_records(result['tickers'], columns=['symbol'] + list(columns))
+        tickers = tickers.rename(columns=columns)
+        # only the inverse futures on supported pairs, eg: not the indices IN_ nor the multi-collateral PF_
+        symbols = tickers['symbol'].str.upper()
+        parts = symbols.str.split("_", expand=True).reindex(columns=[0, 1, 2])
+        is_future = ((parts[0] + "_" == PERPETUAL) & parts[2].isna()) | \
+                    ((parts[0] + "_" == FIXED_MATURITY) & parts[2].notna())
+        pairs = parts[1].str.replace("XBT", BTC, regex=False)
+        tickers = tickers.loc[is_future & pairs.isin(SUPPORTED_CCY_PAIRS)]
+        tickers.insert(0, SYM, self.get_syms(tickers['symbol']))
+        tickers = tickers.drop(columns='symbol').set_index(SYM)
+        tickers = tickers.apply(pd.to_numeric).astype(float)
+        tickers[MARKET_TIMESTAMP] = datetime.datetime.strptime(result['serverTime'], "%Y-%m-%dT%H:%M:%S.%fZ")
+        if syms is not None:
+            tickers = tickers.reindex(syms)
+        return tickers
+
+    def get_tob_quote(self, sym) -> dict:
+        """
+        Returns the top of book (tob) quote from a single orderbook request
 
         :param sym: str
-        :return: float, top of book (tob) mid price
+        :return: dict, with keys [BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP]
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        mid = 0.5 * (bid + ask)
-        return mid
+        result = self._query_public(**self._tob_quote_query(sym))
+        return self._parse_tob_quote(result, sym)
 
-    def get_tob_spread(self, sym) -> float:
+    def _tob_quote_query(self, sym):
+        """
+        :param sym: str
+        :return: dict, the arguments of _query_public to get the top of book quote
         """
+        # the orderbook endpoint has no depth argument
+        return self._orderbook_query(sym, 1)
 
+    def _parse_tob_quote(self, result, sym):
+        """
+        :param result: json, the response of the orderbook endpoint
         :param sym: str
-        :return: float, top of book (tob) spread
+        :return: dict, see get_tob_quote
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        spread = ask - bid
-        return spread
+        data_ob = result['orderBook']
+        market_timestamp = datetime.datetime.strptime(result['serverTime'], "%Y-%m-%dT%H:%M:%S.%fZ")
+        bid_price, bid_size = data_ob[BIDS][0]
+        ask_price, ask_size = data_ob[ASKS][0]
+        return self._make_tob_quote(bid_price, bid_size, ask_price, ask_size, market_timestamp)
 
-    def get_orderbook(self, sym, n_levels):
+    def get_orderbook(self, sym, n_levels, as_frame=True):
         """
         Returns the orderbook for the first n_levels
 
         :param sym: str
         :param n_levels: int
+        :param as_frame: bool, if False the OrderBook itself is returned, which is much cheaper to build
         :return: an orderbook, i.e. a pd.DataFrane with columns [TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET,
             BID_SIZES, BID_PRICES,ASK_SIZES, ASK_PRICES, MISC]
         """
+        result = self._query_public(**self._orderbook_query(sym, n_levels))
+        ob = self._parse_orderbook(result, sym, n_levels)
+        return ob.to_frame() if as_frame else ob
+
+    def _orderbook_query(self, sym, n_levels):
+        """
+        :param sym: str
+        :param n_levels: int
+        :return: dict, the arguments of _query_public to get the orderbook
+        """
+        ticker = self.get_market_sym(sym)
+        # the whole book is sent, only its first n_levels are parsed
+        return dict(method=DERIVATIVES_API + "orderbook", params={SYMBOL: ticker}, request_type=GET,
+                    decoder=ArrayDecoder([BIDS, ASKS], n_levels))
 
-        ticker = self.format_sym_for_market(sym)
-        result = self._query_public(method=DERIVATIVES_API + "orderbook", params={SYMBOL: ticker}, request_type=GET)
+    def _parse_orderbook(self, result, sym, n_levels):
+        """
+        :param result: json, the response of the orderbook endpoint
+        :param sym: str
+        :param n_levels: int
+        :return: OrderBook, see get_orderbook
+        """
         data_ob = result['orderBook']
         timestamp = result['serverTime']
         format_string = "%Y-%m-%dT%H:%M:%S.%fZ"
         timestamp = datetime.datetime.strptime(timestamp, format_string)
-        # Convert bids and asks to DataFrames
-        bids_df = pd.DataFrame(data_ob[BIDS], columns=[PRICE, SIZE])
-        asks_df = pd.DataFrame(data_ob[ASKS], columns=[PRICE, SIZE])
-
-        # Convert price and size columns to numeric type
-        bids_df[[PRICE, SIZE]] = bids_df[[PRICE, SIZE]].apply(pd.to_numeric)
-        asks_df[[PRICE, SIZE]] = asks_df[[PRICE, SIZE]].apply(pd.to_numeric)
-
-        ob = pd.DataFrame(data=[[bids_df[SIZE].tolist()[:n_levels],
-                                 bids_df[PRICE].tolist()[:n_levels],
-                                 asks_df[SIZE].tolist()[:n_levels],
-                                 asks_df[PRICE].tolist()[:n_levels]]],
-                          columns=[BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES])
-        ob[SYM] = sym
-        ob[MARKET] = self.market
-        ob[MARKET_TIMESTAMP] = timestamp
-        ob[GATEWAY_TIMESTAMP] = get_current_timestamp()
-        ob[GATEWAY_TIMESTAMP] = ob[GATEWAY_TIMESTAMP].apply(
-            lambda x: datetime.datetime.fromtimestamp(x))
-        ob[MISC] = ''
-        ob = ob[[MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES,
-                 ASK_PRICES, MISC]]
-        return ob
+        bid_prices, bid_sizes = levels_to_arrays(data_ob[BIDS], n_levels)
+        ask_prices, ask_sizes = levels_to_arrays(data_ob[ASKS], n_levels)
+        return OrderBook(sym, self.market, bid_prices, bid_sizes, ask_prices, ask_sizes,
+                         seconds_to_micros(timestamp.timestamp()), seconds_to_micros(get_current_timestamp()))
 
     def get_ohlc(self, sym, since=None, interval=None):
         """
@@ -222,38 +294,97 @@ class MarketDataRestApiKrakenFuture(MarketDataRestApi):
         :param sym: str
         :param since: timestamp
         :param interval: int, frequency in minutes
-        :return: a pd.DataFrame with the following columns
+        :return: a pd.DataFrame with columns [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
+        """
+        if self.ohlc_store is not None:
+            return self._get_ohlc_from_store(sym, *self._ohlc_range(since, interval))
+        result = self._query_public(**self._ohlc_query(sym, since, interval))
+        return self._parse_ohlc(result, sym)
+
+    def _ohlc_query(self, sym, since=None, interval=None):
+        """
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
+        """
+        if interval is not None:
+            raise Exception("Kraken Future OHLC method cannot look back.")
+        ticker = self.get_market_sym(sym)
+        return dict(method=CHART_API + "mark/" + ticker + '/1d', request_type=GET)
+
+    def _ohlc_range(self, since=None, interval=None):
+        """
+        :param since: timestamp, in seconds
+        :param interval: int, frequency in minutes
+        :return: tuple, (start, end, interval), see _get_ohlc_from_store
         """
         if interval is not None:
             raise Exception("Kraken Future OHLC method cannot look back.")
-        ticker = self.format_sym_for_market(sym)
-        result = self._query_public(method=CHART_API + "mark/" + ticker + '/1d', request_type=GET)
+        return since, None, MINUTES_PER_DAY
+
+    def _ohlc_range_query(self, sym, start, end, interval):
+        """
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
+        """
+        query = self._ohlc_query(sym)
+        query['params'] = {'from': start, 'to': end}
+        return query
+
+    def _parse_ohlc(self, result, sym):
+        """
+        :param result: json, the response of the charts endpoint
+        :param sym: str
+        :return: pd.DataFrame, see get_ohlc
+        """
         result = result['candles']
-        cols = [TIME, OPEN, HIGH, LOW, CLOSE, "vwap", "volume", "count"]
+        cols = [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
         ohlc = pd.DataFrame(result, columns=cols)
         ohlc[TIME] = ohlc[TIME].apply(lambda x: datetime.datetime.fromtimestamp(x / 1000))
-        ohlc[[OPEN, CLOSE, HIGH, LOW]] = ohlc[[OPEN, CLOSE, HIGH, LOW]].apply(pd.to_numeric)
+        ohlc[cols[1:]] = ohlc[cols[1:]].apply(pd.to_numeric)
         return ohlc
 
-    def get_close(self, sym, d=today_date() + datetime.timedelta(days=-1)):
+    def get_close(self, sym, d=None):
         """
         Returns the closing price at date d for sym
 
         :param sym: str
-        :param d: timestamp
+        :param d: timestamp, by default yesterday
         :return: float
         """
+        ohlc_kwargs, close_date = self._close_query(d)
+        ohlc = self._get_close_ohlc(sym, ohlc_kwargs, close_date)
+        return self._parse_close(ohlc, close_date)
+
+    def _close_query(self, d):
+        """
+        :param d: timestamp, None for yesterday
+        :return: tuple, the arguments of get_ohlc and the date of the close
+        """
+        if d is None:
+            d = today_date() + datetime.timedelta(days=-1)
         if d < today_date()+ datetime.timedelta(days=-1):
             raise Exception("Kraken Future OHLC method cannot look back.")
         start_date = today_date()
-        ohlc = self.get_ohlc(sym)
+        return {}, start_date
+
+    def _parse_close(self, ohlc, close_date):
+        """
+        :param ohlc: pd.DataFrame, see get_ohlc
+        :param close_date: datetime.date
+        :return: float
+        """
         ohlc[TIME] = ohlc[TIME].apply(lambda x: to_date(x))
 
-        subset = ohlc.query(f'{TIME} == @start_date')
+        subset = ohlc.query(f'{TIME} == @close_date')
         if len(subset) > 0:
             close_price = subset[CLOSE].values[0]
         else:
-            raise Exception(f'Failed to get Kraken close for {start_date}')
+            raise Exception(f'Failed to get Kraken close for {close_date}')
         return close_price
 
     def get_fee_schedule(self, sym):
@@ -278,5 +409,5 @@ class MarketDataRestApiKrakenFuture(MarketDataRestApi):
             fees[FEES_TAKER].append([fee['usdVolume'], fee['takerFee']])
             fees[FEES_MAKER].append([fee['usdVolume'], fee['makerFee']])
 
-        fees['fee_volume_currency'] = USD
+        fees[FEE_VOLUME_CURRENCY] = USD
         return fees
@@ -3,25 +3,40 @@ import datetime
 import hashlib
 import hmac
 import urllib
+from http import HTTPStatus
 
+import numpy as np
 import pandas as pd
 
-from core.src.column_names import PRICE, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, \
-    BID_SIZES, SIZE, MISC, FEES, FEES_MAKER, FEES_TAKER, RESULT, PAIR, LOW, OPEN, CLOSE, HIGH, TIME, BIDS, ASKS
+from core.src.column_names import SYM, FEES, FEES_MAKER, FEES_TAKER, RESULT, PAIR, LOW, OPEN, CLOSE, HIGH, TIME, BIDS, \
+    ASKS, BID, ASK, LAST, VOLUME, VWAP, COUNT, FEE_VOLUME_CURRENCY
 from core.src.date import get_current_timestamp, today_date, MINUTES_PER_DAY, timestamp_to_date, add_days_to_date, \
     to_date
+from core.src.exceptions import raise_exchange_error
 from core.src.instrument_types import SPOT
 from core.src.markets import KRAKEN
-from core.src.spot_syms import split_currency_pair_into_lhs_rhs, BTC, check_currency_pair_spot, ETH, USDT
+from core.src.orderbook import OrderBook, levels_to_arrays, seconds_to_micros
+from core.src.resample import TradesResampler, OHLC_COLUMNS
+from core.src.spot_syms import split_currency_pair_into_lhs_rhs, BTC, check_currency_pair_spot, ETH, USDT, \
+    SUPPORTED_CRYPTO_CURRENCIES
+from rest.src.json_decode import ArrayDecoder
 from rest.src.market_data_rest import MarketDataRestApi
 from rest.src.request_types import POST
+from rest.src.response_cache import HOUR, MINUTE
+
+# see https://support.kraken.com/hc/en-us/articles/360001491786-API-error-messages
+RATE_LIMIT_ERRORS = ['EAPI:Rate limit exceeded', 'EGeneral:Too many requests']
+UNAVAILABLE_ERRORS = ['EService:Unavailable', 'EService:Busy', 'EService:Deadline elapsed']
 
 
 class MarketDataRestApiKrakenSpot(MarketDataRestApi):
     """
     A base class for Kraken Spot Api
     """
+    CACHE_TTLS = {"AssetPairs": HOUR}
+    OHLC_HISTORY = 720
+    # the OHLC endpoint returns the newest bars after since, at most OHLC_HISTORY of them
+    OHLC_PAGE_SIZE = OHLC_HISTORY
 
     def __init__(self,
                  public_path='public/',
@@ -82,10 +97,13 @@ class MarketDataRestApiKrakenSpot(MarketDataRestApi):
         :param sym:
         :return:
         """
-        # fiat is always 3 letters
-        fiat = sym[-3:]
-        fiat = self.format_fiat_back(sym)
-        crypto = self.format_crypto_back(sym[:-4])
+        # fiat is always 3 letters, optionally prefixed by Z
+        if sym[-4] == 'Z':
+            crypto, fiat = sym[:-4], sym[-4:]
+        else:
+            crypto, fiat = sym[:-3], sym[-3:]
+        fiat = self.format_fiat_back(fiat)
+        crypto = self.format_crypto_back(crypto)
         ccy = crypto + fiat
         return ccy
 
@@ -96,12 +114,14 @@ class MarketDataRestApiKrakenSpot(MarketDataRestApi):
         :param crypto:
         :return:
         """
-        if len(crypto) == 3:
-            return crypto
-        elif crypto[0] == 'X':
-            return crypto[1:]
-        else:
-            raise Exception(f'Failed to convert back to fiat: {crypto}')
+        # Sometimes it is XBT sometimes BTC, and legacy assets are prefixed by X
+        if crypto in ["XBT", "XXBT"]:
+            crypto = BTC
+        elif len(crypto) == 4 and crypto[0] == 'X':
+            crypto = crypto[1:]
+        if crypto not in SUPPORTED_CRYPTO_CURRENCIES:
+            raise Exception(f'Failed to convert back to crypto: {crypto}')
+        return crypto
 
     def format_fiat_back(self, fiat):
         """
@@ -117,15 +137,42 @@ class MarketDataRestApiKrakenSpot(MarketDataRestApi):
         else:
             raise Exception(f'Failed to convert back to fiat: {fiat}')
 
-    def process_error(self, response):
+    def _cache_ttl(self, method, params, data):
+        """
+        On top of CACHE_TTLS, daily bars are cached
+
+        :param method: str, the endpoint
+        :param params: dict, arguments for the endpoints
+        :param data: dict, data attached to the body
+        :return: float, time to live in seconds, None if the response should not be cached
+        """
+        if method == "OHLC" and data.get('interval') == MINUTES_PER_DAY:
+            return 10 * MINUTE
+        return super()._cache_ttl(method, params, data)
+
+    def check_result(self, result):
+        """
+        Kraken sends its errors with a 200 status code in the error list
+
+        :param result: json
+        :raises ExchangeError: if result is an error
+        """
+        if result.get('error'):
+            self.process_error(HTTPStatus.OK, result)
+
+    def process_error(self, status_code, body):
         """
         Used to process an error received from the endpoint
 
-        :param response: session.response
-        :return:
+        :param status_code: int, http status code
+        :param body: json, or str if the response is not json
+        :raises ExchangeError:
         """
-        # @TODO: not needed for now, implement later
-        pass
+        errors = body.get('error', []) if isinstance(body, dict) else [body]
+        message = ', '.join(str(error) for error in errors)
+        raise_exchange_error(self.market, message, status_code,
+                             rate_limited=any(error in RATE_LIMIT_ERRORS for error in errors),
+                             unavailable=any(error in UNAVAILABLE_ERRORS for error in errors))
 
     def get_ticker_info(self, sym):
         """
@@ -135,133 +182,359 @@ class MarketDataRestApiKrakenSpot(MarketDataRestApi):
         :param sym:
         :return:
         """
-        ticker = self.format_sym_for_market(sym)
+        ticker = self.get_market_sym(sym)
         ticker_info = self._query_public(method="Ticker", data={PAIR: ticker}, request_type=POST)
         return ticker_info
 
-    def get_tob_bid(self, sym) -> float:
+    def get_tickers(self, syms):
         """
+        Returns the ticker info of several syms with a single Ticker request
 
-        :return: float, top of book (tob) bid price
+        :param syms: list, of str
+        :return: pd.DataFrame, indexed by sym with float columns [BID, ASK, LAST, VOLUME, VWAP], volume and vwap
+            are over the last 24 hours
         """
-        ticker = self.format_sym_for_market(sym)
-        ticker_info = self.get_ticker_info(sym)
-        bid = ticker_info[RESULT][ticker]['b'][0]
-        bid = float(bid)
-        return bid
-
-    def get_tob_ask(self, sym) -> float:
+        tickers = self.get_market_syms(syms)
+        result = self._query_public(method="Ticker", data={PAIR: ",".join(tickers)}, request_type=POST)
+        result = result[RESULT]
+        # a, b and c are [price, ...] while v and p are [today, last 24 hours]
+        tickers_info = pd.DataFrame({SYM: self.get_syms(list(result.keys())),
+                                     BID: [info['b'][0] for info in result.values()],
+                                     ASK: [info['a'][0] for info in result.values()],
+                                     LAST: [info['c'][0] for info in result.values()],
+                                     VOLUME: [info['v'][1] for info in result.values()],
+                                     VWAP: [info['p'][1] for info in result.values()]})
+        tickers_info = tickers_info.set_index(SYM)
+        tickers_info = tickers_info.astype(float)
+        tickers_info = tickers_info.reindex([check_currency_pair_spot(sym) for sym in syms])
+        return tickers_info
+
+    def get_tob_quote(self, sym) -> dict:
         """
+        Returns the top of book (tob) quote from a single Depth request
 
         :param sym: str
-        :return: float, top of book (tob) ask price
+        :return: dict, with keys [BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP]
         """
-        ticker = self.format_sym_for_market(sym)
-        ticker_info = self.get_ticker_info(sym)
-        ask = ticker_info[RESULT][ticker]['a'][0]
-        ask = float(ask)
-        return ask
+        result = self._query_public(**self._tob_quote_query(sym))
+        return self._parse_tob_quote(result, sym)
 
-    def get_tob_mid(self, sym) -> float:
+    def _tob_quote_query(self, sym):
         """
-
         :param sym: str
-        :return: float, top of book (tob) mid price
+        :return: dict, the arguments of _query_public to get the top of book quote
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        mid = 0.5 * (bid + ask)
-        return mid
+        ticker = self.get_market_sym(sym)
+        return dict(method="Depth", data={PAIR: ticker, "count": 1}, request_type=POST,
+                    decoder=ArrayDecoder([BIDS, ASKS]))
 
-    def get_tob_spread(self, sym) -> float:
+    def _parse_tob_quote(self, result, sym):
         """
-
+        :param result: json, the response of the Depth endpoint
         :param sym: str
-        :return: float, top of book (tob) spread
+        :return: dict, see get_tob_quote
         """
-        bid = self.get_tob_bid(sym)
-        ask = self.get_tob_ask(sym)
-        spread = ask - bid
-        return spread
+        ticker = self.get_market_sym(sym)
+        data_ob = result[RESULT][ticker]
+        bid_price, bid_size, bid_timestamp = data_ob[BIDS][0]
+        ask_price, ask_size, ask_timestamp = data_ob[ASKS][0]
+        market_timestamp = datetime.datetime.fromtimestamp(max(bid_timestamp, ask_timestamp))
+        return self._make_tob_quote(bid_price, bid_size, ask_price, ask_size, market_timestamp)
 
-    def get_orderbook(self, sym, n_levels):
+    def get_orderbook(self, sym, n_levels, as_frame=True):
         """
         Returns the orderbook for the first n_levels
 
         :param sym: str
         :param n_levels: int
+        :param as_frame: bool, if False the OrderBook itself is returned, which is much cheaper to build
         :return: an orderbook, i.e. a pd.DataFrane with columns [TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET,
             BID_SIZES, BID_PRICES,ASK_SIZES, ASK_PRICES, MISC]
         """
+        result = self._query_public(**self._orderbook_query(sym, n_levels))
+        ob = self._parse_orderbook(result, sym, n_levels)
+        return ob.to_frame() if as_frame else ob
 
-        ticker = self.format_sym_for_market(sym)
-        result = self._query_public(method="Depth", data={PAIR: ticker, "count": n_levels}, request_type=POST)
-        data_ob = result[RESULT][ticker]
+    def _orderbook_query(self, sym, n_levels):
+        """
+        :param sym: str
+        :param n_levels: int
+        :return: dict, the arguments of _query_public to get the orderbook
+        """
+        ticker = self.get_market_sym(sym)
+        return dict(method="Depth", data={PAIR: ticker, "count": n_levels}, request_type=POST,
+                    decoder=ArrayDecoder([BIDS, ASKS]))
 
-        # Convert bids and asks to DataFrames
-        bids_df = pd.DataFrame(data_ob[BIDS], columns=[PRICE, SIZE, MARKET_TIMESTAMP])
-        asks_df = pd.DataFrame(data_ob[ASKS], columns=[PRICE, SIZE, MARKET_TIMESTAMP])
-        timestamps = set(bids_df[MARKET_TIMESTAMP].tolist() + asks_df[MARKET_TIMESTAMP].tolist())
-        last_updated_timestamp = max(timestamps)
-
-        # Convert price and size columns to numeric type
-        bids_df[[PRICE, SIZE]] = bids_df[[PRICE, SIZE]].apply(pd.to_numeric)
-        asks_df[[PRICE, SIZE]] = asks_df[[PRICE, SIZE]].apply(pd.to_numeric)
-
-        ob = pd.DataFrame(data=[[bids_df[SIZE].tolist(),
-                                 bids_df[PRICE].tolist(),
-                                 asks_df[SIZE].tolist(),
-                                 asks_df[PRICE].tolist()]],
-                          columns=[BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES])
-        ob[SYM] = sym
-        ob[MARKET] = self.market
-        ob[MARKET_TIMESTAMP] = last_updated_timestamp
-        ob[GATEWAY_TIMESTAMP] = get_current_timestamp()
-        ob[MARKET_TIMESTAMP] = ob[MARKET_TIMESTAMP].apply(
-            lambda x: datetime.datetime.fromtimestamp(x))
-        ob[GATEWAY_TIMESTAMP] = ob[GATEWAY_TIMESTAMP].apply(
-            lambda x: datetime.datetime.fromtimestamp(x))
-        ob[MISC] = ''
-        ob = ob[[MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, ASK_PRICES, MISC]]
-        return ob
+    def _parse_orderbook(self, result, sym, n_levels):
+        """
+        :param result: json, the response of the Depth endpoint
+        :param sym: str
+        :param n_levels: int
+        :return: OrderBook, see get_orderbook
+        """
+        ticker = self.get_market_sym(sym)
+        data_ob = result[RESULT][ticker]
+        bid_prices, bid_sizes = levels_to_arrays(data_ob[BIDS])
+        ask_prices, ask_sizes = levels_to_arrays(data_ob[ASKS])
+        # each level has its own timestamp, the book is as of the last update
+        last_updated_timestamp = max(float(level[2]) for levels in [data_ob[BIDS], data_ob[ASKS]] for level in levels)
+        return OrderBook(sym, self.market, bid_prices, bid_sizes, ask_prices, ask_sizes,
+                         seconds_to_micros(last_updated_timestamp), seconds_to_micros(get_current_timestamp()))
 
     def get_ohlc(self, sym, since=None, interval=None):
-        ticker = self.format_sym_for_market(sym)
+        """
+        Returns the ohlc data from start_timestamp at window interval, from the ohlc store if there is one
+
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: a pd.DataFrame with columns [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
+        """
+        if self.ohlc_store is not None:
+            return self._get_ohlc_from_store(sym, *self._ohlc_range(since, interval))
+        result = self._query_public(**self._ohlc_query(sym, since, interval))
+        return self._parse_ohlc(result, sym)
+
+    def _ohlc_query(self, sym, since=None, interval=None):
+        """
+        :param sym: str
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
+        """
+        ticker = self.get_market_sym(sym)
         data = {PAIR: ticker}
         if since is not None:
             data['since'] = since
         if interval is not None:
             data['interval'] = interval
-        result = self._query_public(method="OHLC", data=data, request_type=POST)
+        return dict(method="OHLC", data=data, request_type=POST, decoder=ArrayDecoder([ticker]))
+
+    def _ohlc_range(self, since=None, interval=None):
+        """
+        :param since: timestamp
+        :param interval: int, frequency in minutes
+        :return: tuple, (start, end, interval), see _get_ohlc_from_store
+        """
+        if interval is None:
+            interval = 1
+        if since is None:
+            # the endpoint returns its last OHLC_HISTORY bars
+            since = self._get_earliest_ohlc(interval)
+        return since, None, interval
+
+    def _ohlc_range_query(self, sym, start, end, interval):
+        """
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded, the endpoint has no end so bars after it are returned too
+        :param interval: int, frequency in minutes
+        :return: dict, the arguments of _query_public to get the ohlc
+        """
+        # since is exclusive
+        return self._ohlc_query(sym, start - 1, interval)
+
+    def _parse_ohlc(self, result, sym):
+        """
+        :param result: json, the response of the OHLC endpoint
+        :param sym: str
+        :return: pd.DataFrame, see get_ohlc
+        """
+        ticker = self.get_market_sym(sym)
         result = result[RESULT][ticker]
-        cols = [TIME, OPEN, HIGH, LOW, CLOSE, "vwap", "volume", "count"]
+        cols = [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
         ohlc = pd.DataFrame(result, columns=cols)
         ohlc[TIME] = ohlc[TIME].apply(lambda x: datetime.datetime.fromtimestamp(x))
-        ohlc[[OPEN, CLOSE, HIGH, LOW]] = ohlc[[OPEN, CLOSE, HIGH, LOW]].apply(pd.to_numeric)
+        ohlc[cols[1:]] = ohlc[cols[1:]].apply(pd.to_numeric)
+        # the bars are decoded as floats by ArrayDecoder
+        ohlc[COUNT] = ohlc[COUNT].astype(np.int64)
         return ohlc
 
-    def get_close(self, sym, d=today_date()+datetime.timedelta(days=-1  )):
+    def _get_ohlc_from_store(self, sym, start, end, interval):
         """
-        Returns the closing price at date d for sym
+        On top of MarketDataRestApi._get_ohlc_from_store, the bars older than the OHLC endpoint history are rebuilt
+        from the trades
 
         :param sym: str
-        :param d: timestamp
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: pd.DataFrame, see get_ohlc
+        """
+        trades_range = self._get_trades_range(start, end, interval)
+        if trades_range is not None:
+            self._backfill_ohlc_store(sym, *trades_range, interval)
+        return super()._get_ohlc_from_store(sym, start, end, interval)
+
+    def _get_trades_range(self, start, end, interval):
+        """
+        :param start: int, timestamp in seconds, None for the whole history
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: tuple, (start, end) the part of [start, end) older than the OHLC endpoint history, which is rebuilt
+            from the trades, None if there is none
+        """
+        earliest = self._get_earliest_ohlc(interval)
+        if start is None or start >= earliest:
+            return None
+        return start, earliest if end is None else min(end, earliest)
+
+    def get_trades(self, sym, since=None):
+        """
+        Returns one page of trades, at most 1000 of them
+
+        :param sym: str
+        :param since: timestamp in seconds, or the cursor returned by the previous page
+        :return: tuple, (trades, cursor) where trades is a np.ndarray of float64 with columns [price, size, time] and
+            cursor is to be given as since to get the next page
+        """
+        ticker = self.get_market_sym(sym)
+        data = {PAIR: ticker}
+        if since is not None:
+            data['since'] = since
+        result = self._query_public(method="Trades", data=data, request_type=POST)
+        result = result[RESULT]
+        # each trade is [price, volume, time, buy/sell, market/limit, miscellaneous, trade id]
+        trades = np.array([trade[:3] for trade in result[ticker]], dtype=np.float64).reshape(-1, 3)
+        return trades, result['last']
+
+    def iter_trades(self, sym, start, end=None):
+        """
+        Page through the trades of [start, end), only one page is held at a time
+
+        :param sym: str
+        :param start: timestamp in seconds, or a cursor returned by get_trades to resume from
+        :param end: int, timestamp in seconds, excluded, None for now
+        :return: generator, of (trades, cursor), see get_trades
+        """
+        end = get_current_timestamp() if end is None else end
+        cursor = start
+        while True:
+            trades, next_cursor = self.get_trades(sym, cursor)
+            in_range = trades[:, 2] < end
+            if in_range.any():
+                yield trades[in_range], next_cursor
+            # the last page either goes past end or is empty
+            if len(trades) == 0 or not in_range.all() or next_cursor == cursor:
+                return
+            cursor = next_cursor
+
+    def iter_ohlc_history(self, sym, start, end=None, interval=MINUTES_PER_DAY):
+        """
+        Rebuild the bars of [start, end) from the trades, so that any range can be served, not only the last bars of
+        the OHLC endpoint. The bars are added to the ohlc store as they are built if there is one, so an interrupted
+        backfill resumes where it stopped.
+
+        :param sym: str
+        :param start: int, timestamp in seconds, at the start of a bar
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: generator, of pd.DataFrame with columns [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT], one per
+            page of trades, the bar in progress at end is only in the last one
+        """
+        now = int(get_current_timestamp())
+        end = now if end is None else min(end, now)
+        step = interval * 60
+        # the bars that are over are stored, not the one in progress
+        complete_end = min(end, now // step * step)
+        resampler = TradesResampler(interval)
+        for trades, _ in self.iter_trades(sym, start, end):
+            ohlc = resampler.add(trades[:, 2], trades[:, 0], trades[:, 1])
+            if len(ohlc) > 0:
+                if self.ohlc_store is not None:
+                    # no trade between two bars means there was no bar
+                    covered_end = int(ohlc[TIME].iloc[-1].timestamp()) + step
+                    self.ohlc_store.update(self.market, sym, interval, ohlc, [(start, covered_end)])
+                yield ohlc
+        ohlc = resampler.flush()
+        if self.ohlc_store is not None:
+            is_complete = ohlc[TIME].map(lambda t: t.timestamp() + step <= now).astype(bool)
+            self.ohlc_store.update(self.market, sym, interval, ohlc.loc[is_complete], [(start, complete_end)])
+        if len(ohlc) > 0:
+            yield ohlc
+
+    def get_ohlc_history(self, sym, start, end=None, interval=MINUTES_PER_DAY):
+        """
+        Returns the bars of [start, end) rebuilt from the trades, see iter_ohlc_history
+        With an ohlc store, only the ranges it does not have are rebuilt.
+
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        :return: pd.DataFrame, with columns [TIME, OPEN, HIGH, LOW, CLOSE, VWAP, VOLUME, COUNT]
+        """
+        if self.ohlc_store is not None:
+            self._backfill_ohlc_store(sym, start, end, interval)
+            return self.ohlc_store.read(self.market, sym, interval, start, end)
+        ohlc = [bars for bars in self.iter_ohlc_history(sym, start, end, interval)]
+        if len(ohlc) == 0:
+            return pd.DataFrame(columns=OHLC_COLUMNS)
+        return pd.concat(ohlc, ignore_index=True)
+
+    def _backfill_ohlc_store(self, sym, start, end, interval):
+        """
+        Rebuild from the trades the bars of [start, end) that the ohlc store does not have
+
+        :param sym: str
+        :param start: int, timestamp in seconds
+        :param end: int, timestamp in seconds, excluded, None for now
+        :param interval: int, frequency in minutes
+        """
+        end = int(get_current_timestamp()) if end is None else end
+        for gap_start, gap_end in self.ohlc_store.find_gaps(self.market, sym, interval, start, end):
+            for _ in self.iter_ohlc_history(sym, gap_start, gap_end, interval):
+                pass
+
+    def get_close(self, sym, d=None):
+        """
+        Returns the closing price at date d for sym, the closes older than the OHLC endpoint history are rebuilt from
+        the trades
+
+        :param sym: str
+        :param d: timestamp, by default yesterday
         :return: float
         """
+        ohlc_kwargs, close_date = self._close_query(d)
+        if self._is_close_from_trades(close_date):
+            ohlc = self.get_ohlc_history(sym, *self._close_range(close_date))
+        else:
+            ohlc = self._get_close_ohlc(sym, ohlc_kwargs, close_date)
+        return self._parse_close(ohlc, close_date)
+
+    def _is_close_from_trades(self, close_date):
+        """
+        :param close_date: datetime.date
+        :return: bool, True if the close is older than the OHLC endpoint history and is rebuilt from the trades
+        """
+        # the bar of today is one of the OHLC_HISTORY bars
+        return close_date <= add_days_to_date(today_date(), -self.OHLC_HISTORY)
+
+    def _close_query(self, d):
+        """
+        :param d: timestamp, None for yesterday
+        :return: tuple, the arguments of get_ohlc and the date of the close
+        """
+        if d is None:
+            d = today_date() + datetime.timedelta(days=-1)
         if type(d) == int:
             d = timestamp_to_date(d)
         start_date = min(today_date(), d)
-        days_720_ago = add_days_to_date(today_date(), -720)
-        if start_date < days_720_ago:
-            raise Exception(f'kraken OHLC is broken and will not be able to get data for: {start_date}')
-        ohlc = self.get_ohlc(sym, interval=MINUTES_PER_DAY)
+        return dict(interval=MINUTES_PER_DAY), start_date
+
+    def _parse_close(self, ohlc, close_date):
+        """
+        :param ohlc: pd.DataFrame, see get_ohlc
+        :param close_date: datetime.date
+        :return: float
+        """
         ohlc[TIME] = ohlc[TIME].apply(lambda x: to_date(x))
 
-        subset = ohlc.query(f'{TIME} == @start_date')
+        subset = ohlc.query(f'{TIME} == @close_date')
         if len(subset) > 0:
             close_price = subset[CLOSE].values[0]
         else:
-            raise Exception(f'Failed to get Kraken close for {start_date}')
+            raise Exception(f'Failed to get Kraken close for {close_date}')
         return close_price
 
     def get_fee_schedule(self, sym):
@@ -273,11 +546,11 @@ class MarketDataRestApiKrakenSpot(MarketDataRestApi):
          list and each sublist has 2 elements, first the usd volume and then the fee percentage
         """
         fees = {}
-        ticker = self.format_sym_for_market(sym)
+        ticker = self.get_market_sym(sym)
         result = self._query_public(method="AssetPairs", data={PAIR: ticker}, request_type=POST)
         result = result[RESULT][ticker]
         fees[FEES_TAKER] = result[FEES]
         fees[FEES_MAKER] = result[FEES_MAKER]
         fee_currency = result['fee_volume_currency']
-        fees['fee_volume_currency'] = self.format_fiat_back(fee_currency)
+        fees[FEE_VOLUME_CURRENCY] = self.format_fiat_back(fee_currency)
         return fees
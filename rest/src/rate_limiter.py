@@ -0,0 +1,133 @@
+"""
+Client side rate limiting, so that requests are sent right at the limit of the exchanges instead of being rejected.
+
+Kraken uses a call counter that is increased by each call and decays over time, the call is rejected if the counter
+would go above its maximum. Deribit uses credits, each call costs credits and they are refilled over time.
+Both are a token bucket: the capacity is the maximum of the counter (or of the credits), the refill rate its decay (or
+the credits refill) and the cost is what each call adds to the counter (or consumes).
+"""
+import asyncio
+import threading
+import time
+
+from rest.src.api_utils import get_market_registry
+
+
+class RateLimiter:
+    """
+    A thread safe token bucket
+    """
+
+    def __init__(self, capacity, refill_per_second, cost=1, clock=time.monotonic, sleep=time.sleep):
+        """
+
+        :param capacity: float, maximum number of tokens, i.e. the size of a burst
+        :param refill_per_second: float, number of tokens added every second, i.e. the sustained throughput
+        :param cost: float, default number of tokens consumed by a request
+        :param clock: function, returns the current time in seconds
+        :param sleep: function, sleeps for the given number of seconds
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.cost = cost
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = capacity
+        self.last_refill = clock()
+        self.lock = threading.Lock()
+        # how many requests had to wait, and for how long in total
+        self.n_waits = 0
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_per_second)
+        self.last_refill = now
+
+    def _reserve(self, cost, blocking, timeout):
+        """
+        Take cost tokens, possibly in advance, so that waiting requests are served in order
+
+        :param cost: float
+        :param blocking: bool
+        :param timeout: float, maximum wait in seconds, None to wait as long as needed
+        :return: float, how long to wait before sending the request, None if the request should not be sent
+        """
+        cost = self.cost if cost is None else cost
+        with self.lock:
+            self._refill()
+            wait = max(0.0, (cost - self.tokens) / self.refill_per_second)
+            if wait > 0 and (not blocking or (timeout is not None and wait > timeout)):
+                return None
+            self.tokens -= cost
+            if wait > 0:
+                self.n_waits += 1
+                self.total_wait += wait
+            return wait
+
+    def acquire(self, cost=None, blocking=True, timeout=None):
+        """
+        Wait until a request can be sent
+
+        :param cost: float, number of tokens consumed, by default self.cost
+        :param blocking: bool, if False return straight away
+        :param timeout: float, maximum wait in seconds, None to wait as long as needed
+        :return: bool, True if the request can be sent
+        """
+        wait = self._reserve(cost, blocking, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            self.sleep(wait)
+        return True
+
+    async def acquire_async(self, cost=None, blocking=True, timeout=None):
+        """
+        Awaitable counterpart of acquire
+
+        :param cost: float, number of tokens consumed, by default self.cost
+        :param blocking: bool, if False return straight away
+        :param timeout: float, maximum wait in seconds, None to wait as long as needed
+        :return: bool, True if the request can be sent
+        """
+        wait = self._reserve(cost, blocking, timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return True
+
+    def get_stats(self):
+        """
+        :return: dict, with keys ['tokens', 'n_waits', 'total_wait']
+        """
+        with self.lock:
+            self._refill()
+            return {'tokens': self.tokens, 'n_waits': self.n_waits, 'total_wait': self.total_wait}
+
+
+# the limits are per IP or per account, so the limiters are shared by all the clients of a process
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(market, instrument_type):
+    """
+    Get the shared rate limiter of a market, configured from markets_to_apis.csv
+
+    :param market: str, eg: KRAKEN
+    :param instrument_type: str, eg: SPOT
+    :return: RateLimiter, None if the market has no rate limit
+    """
+    key = (market, instrument_type)
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            rows = get_market_registry().get(key, [])
+            rate_limiter = None
+            if len(rows) > 0 and rows[0].get('rate_limit_capacity'):
+                row = rows[0]
+                rate_limiter = RateLimiter(float(row['rate_limit_capacity']),
+                                           float(row['rate_limit_refill_per_second']),
+                                           float(row['rate_limit_cost']))
+            _rate_limiters[key] = rate_limiter
+        return _rate_limiters[key]
@@ -0,0 +1,254 @@
+"""
+Capture of the requests sent by make_request, to replay them later without the network
+
+In record mode every request is sent as usual and appended with its response to a capture file. In replay mode nothing
+is sent, each request is answered with the response recorded for it at the time of the replay clock. That clock starts
+at the first recorded request and runs at a speed factor, get_current_timestamp and today_date follow it so that the
+gateway timestamps and the default dates of get_close are those of the recorded day.
+
+usage:
+    set_request_capture(RequestRecorder('day.capture'))
+    ... the clients are used as usual ...
+    set_request_capture(None)
+
+    set_request_capture(RequestReplayer('day.capture', speed=60))
+    ... same calls, answered from the file, one minute of the day per second ...
+    set_request_capture(None)
+
+The capture file is append-only, each record being the lengths of its header and body, the header as json and the
+body compressed with zlib. A record cut by a crash at the end of the file is ignored.
+
+The responses are looked up by the method, the url and the arguments of the request. As the arguments that are times,
+eg: since, differ between the recording and the replay, a request that was not recorded as is is answered from the
+recordings of the same request without them.
+
+The response caches of the clients run on their own clock, pass ResponseCache(clock=get_current_timestamp) to have their
+entries expire with the replay clock.
+"""
+import bisect
+import json
+import struct
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from core.src.date import get_current_timestamp, set_clock
+
+RECORD = 'record'
+REPLAY = 'replay'
+
+# arguments that are times, left out of the loose key of a request, see make_request_key
+TIME_ARGUMENTS = ['since', 'start_timestamp', 'end_timestamp', 'from', 'to', 'nonce']
+
+# lengths of the header and of the body of a record
+RECORD_PREFIX = struct.Struct('<II')
+
+# errors of the requests that got no response, recorded so that they are replayed as well
+TIMEOUT = 'timeout'
+CONNECTION_ERROR = 'connection_error'
+
+
+def make_request_key(method, url, params=None, data=None, loose=False):
+    """
+    :param method: str, 'GET or 'POST'
+    :param url: str, the query string is ignored, the arguments are expected in params
+    :param params: dict, arguments for the endpoints
+    :param data: dict, data attached to the body
+    :param loose: bool, leave out the TIME_ARGUMENTS
+    :return: str
+    """
+    split = urlsplit(url)
+    arguments = [sorted((str(name), str(value)) for name, value in (arguments or {}).items()
+                        if not (loose and name in TIME_ARGUMENTS))
+                 for arguments in [params, data]]
+    return json.dumps([method, split.netloc + split.path, *arguments], separators=(',', ':'))
+
+
+def write_record(f, header, body):
+    """
+    :param f: file, opened in binary append mode
+    :param header: dict, json serializable
+    :param body: bytes
+    """
+    header_bytes = json.dumps(header, separators=(',', ':')).encode()
+    body_bytes = zlib.compress(body)
+    f.write(RECORD_PREFIX.pack(len(header_bytes), len(body_bytes)) + header_bytes + body_bytes)
+
+
+def read_records(path):
+    """
+    :param path: str, of a capture file
+    :return: generator, of tuples (header, body) in the order they were recorded
+    """
+    with open(path, 'rb') as f:
+        while True:
+            prefix = f.read(RECORD_PREFIX.size)
+            if len(prefix) < RECORD_PREFIX.size:
+                return
+            header_size, body_size = RECORD_PREFIX.unpack(prefix)
+            header_bytes = f.read(header_size)
+            body_bytes = f.read(body_size)
+            if len(header_bytes) < header_size or len(body_bytes) < body_size:
+                # cut while being written
+                return
+            yield json.loads(header_bytes), zlib.decompress(body_bytes)
+
+
+class RequestRecorder:
+    mode = RECORD
+
+    def __init__(self, path):
+        """
+
+        :param path: str, of the capture file, appended to if it exists
+        """
+        self.path = path
+        self.file = open(path, 'ab')
+        self.n_records = 0
+        self.lock = threading.Lock()
+
+    def record(self, method, url, params, data, sent_at, response=None, error=None):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict
+        :param data: dict
+        :param sent_at: float, timestamp in seconds when the request was sent
+        :param response: requests.Response, None if there was none
+        :param error: Exception, why there was no response
+        """
+        header = {'t': sent_at, 'method': method, 'url': url, 'params': params, 'data': data}
+        if response is not None:
+            header.update(status=response.status_code, headers=dict(response.headers),
+                          elapsed=get_current_timestamp() - sent_at)
+            body = response.content
+        else:
+            header['error'] = TIMEOUT if isinstance(error, requests.Timeout) else CONNECTION_ERROR
+            body = str(error).encode()
+        with self.lock:
+            write_record(self.file, header, body)
+            self.file.flush()
+            self.n_records += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class ReplayClock:
+
+    def __init__(self, start, speed=1., clock=time.monotonic):
+        """
+
+        :param start: float, timestamp in seconds the clock starts at
+        :param speed: float, seconds of the replay per second, eg: 60 to replay an hour in a minute
+        :param clock: function, returns the current time in seconds
+        """
+        self.start = start
+        self.speed = speed
+        self.clock = clock
+        # the clock starts when it is first read
+        self.origin = None
+
+    def __call__(self):
+        """
+        :return: float, the current timestamp in seconds of the replay
+        """
+        if self.origin is None:
+            self.origin = self.clock()
+        return self.start + (self.clock() - self.origin) * self.speed
+
+
+class RequestReplayer:
+    mode = REPLAY
+
+    def __init__(self, path, speed=1., start=None):
+        """
+
+        :param path: str, of a capture file written by a RequestRecorder
+        :param speed: float, see ReplayClock
+        :param start: float, timestamp in seconds the replay starts at, by default the first recorded request
+        """
+        # key -> tuple, (list of the times of the records, list of the records), a record being (header, body)
+        self.records = {}
+        self.loose_records = {}
+        first = None
+        for header, body in read_records(path):
+            first = header['t'] if first is None else first
+            for index, loose in [(self.records, False), (self.loose_records, True)]:
+                key = make_request_key(header['method'], header['url'], header['params'], header['data'], loose)
+                times, records = index.setdefault(key, ([], []))
+                position = bisect.bisect_right(times, header['t'])
+                times.insert(position, header['t'])
+                records.insert(position, (header, body))
+        if first is None:
+            raise Exception(f'No request recorded in {path}')
+        self.clock = ReplayClock(first if start is None else start, speed)
+        self.n_replayed = 0
+
+    def find(self, method, url, params=None, data=None, t=None):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict
+        :param data: dict
+        :param t: float, timestamp in seconds, by default the time of the replay clock
+        :return: tuple, (header, body) of the last record of the request sent before t, or the first one if none was
+        """
+        t = self.clock() if t is None else t
+        entry = self.records.get(make_request_key(method, url, params, data))
+        if entry is None:
+            entry = self.loose_records.get(make_request_key(method, url, params, data, loose=True))
+        if entry is None:
+            raise Exception(f'No recorded response to {method} {url} {params} {data}')
+        times, records = entry
+        return records[max(bisect.bisect_right(times, t) - 1, 0)]
+
+    def replay(self, method, url, params=None, data=None):
+        """
+        :param method: str
+        :param url: str
+        :param params: dict
+        :param data: dict
+        :return: requests.Response, the recorded one
+        :raises requests.Timeout, requests.ConnectionError: if the request got no response when it was recorded
+        """
+        header, body = self.find(method, url, params, data)
+        self.n_replayed += 1
+        if 'error' in header:
+            raise (requests.Timeout if header['error'] == TIMEOUT else requests.ConnectionError)(body.decode())
+        response = requests.Response()
+        response.status_code = header['status']
+        response.headers = CaseInsensitiveDict(header['headers'])
+        response._content = body
+        response.url = header['url']
+        response.encoding = 'utf-8'
+        return response
+
+
+_request_capture = None
+
+
+def get_request_capture():
+    """
+    :return: RequestRecorder or RequestReplayer, None if the requests are not captured
+    """
+    return _request_capture
+
+
+def set_request_capture(capture):
+    """
+    Record or replay the requests sent by make_request from now on, by all the clients. The clock of a replayer drives
+    get_current_timestamp and today_date as long as it is set.
+
+    :param capture: RequestRecorder or RequestReplayer, None to send the requests as usual
+    :return: RequestRecorder or RequestReplayer, the previous one
+    """
+    global _request_capture
+    previous, _request_capture = _request_capture, capture
+    set_clock(capture.clock if capture is not None and capture.mode == REPLAY else None)
+    return previous
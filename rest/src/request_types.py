@@ -1,3 +1,10 @@
+import requests
+
+from core.src.date import get_current_timestamp
+from rest.src.http_transport import HttpTransport
+from rest.src.json_decode import loads
+from rest.src.request_capture import get_request_capture, REPLAY
+
 GET = 'GET'
 POST = 'POST'
 
@@ -9,11 +16,50 @@ def dict_to_querystring(params):
         return ''
 
 
-def make_request(session, url, timeout=10, headers=None, params=None, data=None, request_type=GET):
-    if request_type == GET:
-        response = session.get(url, params=params, data=data, headers=headers, timeout=timeout)
-    elif request_type == POST:
-        response = session.post(url, params=params, data=data, headers=headers, timeout=timeout)
-    else:
+def make_request(session, url, timeout=10, headers=None, params=None, data=None, request_type=GET, timings=None):
+    """
+    :param session: http_transport.HttpTransport, or requests.Session
+    :param url: str
+    :param timeout: float, in seconds
+    :param headers: dict
+    :param params: dict, arguments for the endpoints
+    :param data: dict, data to be attached to the body
+    :param request_type: str, 'GET or 'POST'
+    :param timings: dict, optional, filled with the latency of the phases of the request, see
+        HttpTransport.request, needs an HttpTransport
+    :return: requests.Response, the recorded one when replaying, see request_capture
+    """
+    if request_type not in [GET, POST]:
         raise Exception(f'Request type not supported: {request_type}')
+    capture = get_request_capture()
+    if capture is None:
+        return _send(session, url, timeout, headers, params, data, request_type, timings)
+    if capture.mode == REPLAY:
+        return capture.replay(request_type, url, params, data)
+    sent_at = get_current_timestamp()
+    try:
+        response = _send(session, url, timeout, headers, params, data, request_type, timings)
+    except (requests.Timeout, requests.ConnectionError) as error:
+        capture.record(request_type, url, params, data, sent_at, error=error)
+        raise
+    capture.record(request_type, url, params, data, sent_at, response)
     return response
+
+
+def _send(session, url, timeout, headers, params, data, request_type, timings):
+    if timings is not None and isinstance(session, HttpTransport):
+        return session.request(request_type, url, params=params, data=data, headers=headers, timeout=timeout,
+                               timings=timings)
+    return session.request(request_type, url, params=params, data=data, headers=headers, timeout=timeout)
+
+
+def get_response_body(response, decoder=None):
+    """
+    :param response: requests.Response
+    :param decoder: function, optional, bytes -> json, see json_decode.ArrayDecoder, by default json_decode.loads
+    :return: json, or str if the body is not json
+    """
+    try:
+        return (decoder or loads)(response.content)
+    except ValueError:
+        return response.text
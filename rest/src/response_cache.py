@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+
+
+def make_cache_key(method, params=None, data=None):
+    """
+    Build a hashable key out of a request
+
+    :param method: str, the endpoint
+    :param params: dict, arguments for the endpoints
+    :param data: dict, data attached to the body
+    :return: tuple
+    """
+    params = tuple(sorted((params or {}).items()))
+    data = tuple(sorted((data or {}).items()))
+    return method, params, data
+
+
+class ResponseCache:
+    """
+    A thread safe LRU cache of responses where each entry expires after its own time to live (ttl)
+    """
+
+    def __init__(self, max_size=1024, clock=time.monotonic):
+        """
+
+        :param max_size: int, maximum number of responses kept, the least recently used ones are evicted first
+        :param clock: function, returns the current time in seconds
+        """
+        self.max_size = max_size
+        self.clock = clock
+        # key -> (expiry time, response)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        :param key: tuple, see make_cache_key
+        :return: the cached response or None if there is none or it expired
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= self.clock():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, response, ttl):
+        """
+        :param key: tuple, see make_cache_key
+        :param response: json
+        :param ttl: float, time to live in seconds
+        """
+        with self.lock:
+            self.entries[key] = (self.clock() + ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, method=None):
+        """
+        Drop cached responses
+
+        :param method: str, optional, only drop the responses of the endpoints starting with method, by default all of
+            them are dropped
+        """
+        with self.lock:
+            if method is None:
+                self.entries.clear()
+            else:
+                for key in [key for key in self.entries if key[0].startswith(method)]:
+                    del self.entries[key]
+
+    def get_stats(self):
+        """
+        :return: dict, with keys ['hits', 'misses', 'evictions', 'size']
+        """
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self.entries)}
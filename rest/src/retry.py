@@ -0,0 +1,131 @@
+import random
+import threading
+import time
+
+from core.src.exceptions import CircuitOpenError, ExchangeRateLimitError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter: the n-th retry waits a random time between 0 and base_delay * 2 ** n
+    """
+
+    def __init__(self, max_retries=3, base_delay=0.5, max_delay=10., rate_limit_delay=1., sleep=time.sleep,
+                 uniform=random.uniform):
+        """
+
+        :param max_retries: int, number of retries after the first attempt
+        :param base_delay: float, in seconds
+        :param max_delay: float, in seconds, cap of the exponential backoff
+        :param rate_limit_delay: float, in seconds, minimum wait after being rate limited by the exchange
+        :param sleep: function, sleeps for the given number of seconds
+        :param uniform: function, (a, b) -> random float between a and b
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limit_delay = rate_limit_delay
+        self.sleep = sleep
+        self.uniform = uniform
+
+    def get_delay(self, attempt, error):
+        """
+        :param attempt: int, 0 for the first attempt
+        :param error: ExchangeError, the error of the attempt
+        :return: float, how long to wait before the next attempt in seconds
+        """
+        delay = self.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if isinstance(error, ExchangeRateLimitError):
+            delay = max(delay, self.rate_limit_delay)
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Stops sending requests to an exchange that keeps failing
+
+    After failure_threshold consecutive failures the circuit opens and requests fail straight away. After
+    reset_timeout seconds it becomes half open and lets one request through, if it succeeds the circuit closes again,
+    otherwise it re-opens. Every request let through by before_request must end with record_success, record_failure
+    or release, or a half open circuit stays so.
+    """
+
+    def __init__(self, market, failure_threshold=5, reset_timeout=30., clock=time.monotonic):
+        """
+
+        :param market: str
+        :param failure_threshold: int, number of consecutive failures that opens the circuit
+        :param reset_timeout: float, in seconds
+        :param clock: function, returns the current time in seconds
+        """
+        self.market = market
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.n_failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_request(self):
+        """
+        :raises CircuitOpenError: if the request should not be sent
+        """
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+                # let a single trial request through
+                self.state = HALF_OPEN
+                return
+            raise CircuitOpenError(self.market, f'circuit open after {self.n_failures} consecutive failures')
+
+    def is_open(self):
+        """
+        :return: bool, True if requests are currently not let through
+        """
+        return self.state != CLOSED
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.n_failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.n_failures += 1
+            if self.state == HALF_OPEN or self.n_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = self.clock()
+
+    def release(self):
+        """
+        Give back a request let through by before_request but not sent, a half open circuit lets the next one through
+        """
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.state = OPEN
+
+
+# exchange outages affect all the clients of a process, so the circuit breakers are shared
+_circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(market, instrument_type):
+    """
+    Get the shared circuit breaker of a market
+
+    :param market: str, eg: KRAKEN
+    :param instrument_type: str, eg: SPOT
+    :return: CircuitBreaker
+    """
+    key = (market, instrument_type)
+    with _circuit_breakers_lock:
+        if key not in _circuit_breakers:
+            _circuit_breakers[key] = CircuitBreaker(f'{market}/{instrument_type}')
+        return _circuit_breakers[key]
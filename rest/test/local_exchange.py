@@ -0,0 +1,128 @@
+"""
+A local stand-in for the exchanges, it serves canned json responses so that the clients can be tested without network
+
+usage:
+    exchange = LocalExchange({'/public/Depth': {...}})
+    api = exchange.connect(MarketDataRestApiKrakenSpot())
+    ...
+    exchange.stop()
+"""
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from rest.src.retry import CircuitBreaker
+
+
+class LocalExchange:
+
+    def __init__(self, routes):
+        """
+
+        :param routes: dict, path -> json response, or a function (query, form) -> json response, or a tuple
+            (status code, json response)
+        """
+        self.routes = routes
+        # list of (method, path, query, form) received
+        self.requests = []
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self.server.daemon_threads = True
+        # to be used as api_url
+        self.url = f'http://127.0.0.1:{self.server.server_port}/'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def _make_handler(self):
+        exchange = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # the headers and the body are sent separately, without this a kept-alive connection waits for the
+            # delayed ack of the client before sending the body
+            disable_nagle_algorithm = True
+
+            def handle_request(self):
+                url = urlparse(self.path)
+                # collapse the double slashes coming from api_url + public_path
+                path = '/' + '/'.join(part for part in url.path.split('/') if part)
+                length = int(self.headers.get('Content-Length') or 0)
+                form = parse_qs(self.rfile.read(length).decode()) if length else {}
+                query = parse_qs(url.query)
+                exchange.requests.append((self.command, path, query, form))
+
+                status = 200
+                response = exchange.routes.get(path)
+                if callable(response):
+                    response = response(query, form)
+                if isinstance(response, tuple):
+                    status, response = response
+                if response is None:
+                    status, response = 404, {'error': f'unknown route {path}'}
+
+                body = json.dumps(response).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = handle_request
+            do_POST = handle_request
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def connect(self, api):
+        """
+        Point a client to this exchange, it gets its own circuit breaker and no rate limit so that it is isolated
+        from the state shared by the other clients of the process
+
+        :param api: MarketDataRestApi
+        :return: MarketDataRestApi, api
+        """
+        return connect(api, self.url)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def connect(api, url):
+    """
+    Point a client to the LocalExchange at url, see LocalExchange.connect
+
+    :param api: MarketDataRestApi
+    :param url: str
+    :return: MarketDataRestApi, api
+    """
+    api.api_url = url
+    api.rate_limiter = None
+    api.circuit_breaker = CircuitBreaker(api.market)
+    return api
+
+
+# (url, market, instrument_type) -> MarketDataRestApi, see get_local_api
+_local_apis = {}
+_local_apis_lock = threading.Lock()
+
+
+def get_local_api(url, market, instrument_type):
+    """
+    The client of the process for a market pointed to the LocalExchange at url, to be used as get_api from the processes
+    the exchange does not live in, eg: functools.partial(get_local_api, exchange.url)
+
+    :param url: str
+    :param market: str
+    :param instrument_type: str
+    :return: MarketDataRestApi
+    """
+    # imported here as the clients need the root folder, which the processes set after importing this module
+    from rest.src.market_data_rest_factory import MARKET_DATA_REST_APIS
+    key = (url, market, instrument_type)
+    with _local_apis_lock:
+        if key not in _local_apis:
+            _local_apis[key] = connect(MARKET_DATA_REST_APIS[(market, instrument_type)](), url)
+        return _local_apis[key]
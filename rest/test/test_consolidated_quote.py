@@ -0,0 +1,129 @@
+import datetime
+import math
+import os
+import time
+import unittest
+
+import pandas as pd
+
+from core import root_folder
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.column_names import BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, SYM, MARKET, BASIS, ANNUALIZED_BASIS, \
+    DAYS_TO_EXPIRY, SKEW, BID_MARKETS, ASK_MARKETS, LATENCY
+from core.src.date import set_clock
+from core.src.markets import KRAKEN, DERIBIT, BINANCE
+from rest.src.consolidated_quote import ConsolidatedQuoteView, consolidate_quotes, annualize_basis, QUOTES, FUTURES, \
+    ERRORS
+from rest.src.market_data_rest_factory import MARKET_DATA_REST_APIS
+from rest.test.local_exchange import LocalExchange
+
+SERVER_TIME = '2023-06-01T10:00:00.000Z'
+DEPTH = {'error': [], 'result': {'XETHZUSD': {'bids': [['1800.0', '2.0', 1685613600]],
+                                              'asks': [['1801.0', '1.0', 1685613600]]}}}
+FUTURE_BOOKS = {'FI_ETHUSD_230630': {'bids': [[1810., 100.]], 'asks': [[1812., 200.]]},
+                'PI_ETHUSD': {'bids': [[1799.5, 100.]], 'asks': [[1800.5, 200.]]}}
+TICKERS = {'result': 'success', 'serverTime': SERVER_TIME,
+           'tickers': [{'symbol': symbol, 'bid': 1., 'ask': 2.} for symbol in ['pi_ethusd', 'fi_ethusd_230630',
+                                                                             'fi_xbtusd_230630', 'in_ethusd']]}
+OPTION_BOOK = {'result': {'underlying_price': 1800., 'timestamp': 1685613600000,
+                          'bids': [[0.05, 10.]], 'asks': [[0.06, 20.]]}}
+# 2023-06-01 12:00:00 local time, 29 days before the expiry of FUT_ETHUSD_230630
+NOW = datetime.datetime(2023, 6, 1, 12).timestamp()
+
+
+def slow(response, delay):
+    def route(query, form):
+        time.sleep(delay)
+        return response
+    return route
+
+
+class TestConsolidatedQuote(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({
+            '/public/Depth': DEPTH,
+            '/derivatives/api/v3/tickers': TICKERS,
+            '/derivatives/api/v3/orderbook': lambda query, form: {
+                'result': 'success', 'serverTime': SERVER_TIME, 'orderBook': FUTURE_BOOKS[query['symbol'][0]]},
+            '/public/get_order_book': OPTION_BOOK,
+        })
+        self.apis = {}
+        set_clock(lambda: NOW)
+
+    def tearDown(self):
+        set_clock(None)
+        self.exchange.stop()
+
+    def get_api(self, market, instrument_type):
+        key = (market, instrument_type)
+        if key not in self.apis:
+            self.apis[key] = self.exchange.connect(MARKET_DATA_REST_APIS[key]())
+            self.apis[key].response_cache = None
+        return self.apis[key]
+
+    def test_view(self):
+        quote_view = ConsolidatedQuoteView(get_api=self.get_api)
+        view = quote_view.get_view(ETHUSD, option_syms=['C_ETHUSD_230630_1200'])
+        quote_view.close()
+        self.assertEqual(view[ERRORS], {})
+        self.assertEqual((view[BID], view[ASK], view[MID]), (1800., 1801., 1800.5))
+        self.assertEqual(view[BID_MARKETS], [KRAKEN])
+        self.assertEqual(view[QUOTES][SYM].tolist(), [ETHUSD, 'FUT_ETHUSD_230630', 'FUT_ETHUSD_PERP',
+                                                      'C_ETHUSD_230630_1200'])
+        self.assertEqual(view[QUOTES][MARKET].tolist(), [KRAKEN, KRAKEN, KRAKEN, DERIBIT])
+        futures = view[FUTURES]
+        self.assertEqual(futures.index.tolist(), ['FUT_ETHUSD_230630', 'FUT_ETHUSD_PERP'])
+        self.assertEqual(futures.loc['FUT_ETHUSD_230630', BASIS], 1811. - 1800.5)
+        self.assertEqual(futures.loc['FUT_ETHUSD_230630', DAYS_TO_EXPIRY], 29)
+        self.assertAlmostEqual(futures.loc['FUT_ETHUSD_230630', ANNUALIZED_BASIS], (1811. / 1800.5 - 1) * 365 / 29)
+        self.assertTrue(math.isnan(futures.loc['FUT_ETHUSD_PERP', ANNUALIZED_BASIS]))
+        self.assertEqual(futures.loc['FUT_ETHUSD_PERP', BASIS], -0.5)
+        # the clock is frozen
+        self.assertEqual(view[SKEW], 0.)
+
+    def test_legs_are_concurrent(self):
+        set_clock(None)
+        for path in ['/public/Depth', '/public/get_order_book']:
+            self.exchange.routes[path] = slow(self.exchange.routes[path], 0.2)
+        quote_view = ConsolidatedQuoteView(get_api=self.get_api)
+        start = time.perf_counter()
+        view = quote_view.get_view(ETHUSD, future_syms=[],
+                                   option_syms=['C_ETHUSD_230630_1200', 'P_ETHUSD_230630_1200'])
+        elapsed = time.perf_counter() - start
+        quote_view.close()
+        self.assertLess(elapsed, 0.5)
+        self.assertTrue((view[QUOTES][LATENCY] >= 0.2).all())
+        self.assertLess(view[SKEW], 0.15)
+
+    def test_failed_leg(self):
+        quote_view = ConsolidatedQuoteView(spot_markets=[KRAKEN, BINANCE], get_api=self.get_api)
+        view = quote_view.get_view(ETHUSD, future_syms=['FUT_ETHUSD_230630'])
+        quote_view.close()
+        self.assertEqual(list(view[ERRORS]), [(BINANCE, ETHUSD)])
+        self.assertEqual(view[BID], 1800.)
+        self.assertEqual(len(view[FUTURES]), 1)
+
+    def test_consolidate_quotes(self):
+        quotes = self.get_quotes([(KRAKEN, 100., 1., 101., 1.), (BINANCE, 100., 2., 100.5, 3.)])
+        view = consolidate_quotes(quotes)
+        self.assertEqual((view[BID], view[BID_SIZE], view[BID_MARKETS]), (100., 3., [KRAKEN, BINANCE]))
+        self.assertEqual((view[ASK], view[ASK_MARKETS], view[SPREAD]), (100.5, [BINANCE], 0.5))
+        self.assertTrue(math.isnan(consolidate_quotes(quotes.iloc[:0])[MID]))
+
+    def test_annualize_basis(self):
+        self.assertAlmostEqual(float(annualize_basis(101., 100., 365.)), 0.01)
+        self.assertAlmostEqual(annualize_basis(101., 100., [73., 0., float('nan')])[0], 0.05)
+        self.assertTrue(math.isnan(annualize_basis(101., 100., 0.)))
+
+    @staticmethod
+    def get_quotes(rows):
+        return pd.DataFrame(rows, columns=[MARKET, BID, BID_SIZE, ASK, ASK_SIZE])
+
+
+if __name__ == '__main__':
+    unittest.main()
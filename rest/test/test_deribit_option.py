@@ -9,8 +9,11 @@ dir_path = os.path.dirname(os.path.realpath(__file__))
 root_folder.ROOT_FOLDER = dir_path + '/../../'
 
 from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, MISC, TIME, OPEN, CLOSE, HIGH, LOW
+    ASK_PRICES, MISC, BID, ASK, BID_SIZE, ASK_SIZE, MID, SPREAD, TIME, OPEN, CLOSE, HIGH, LOW, MARK, \
+    UNDERLYING_PRICE, STRIKE, EXPIRY, OPTION_TYPE
+from core.src.spot_syms import ETHUSD
 from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.test.local_exchange import LocalExchange
 
 # INSTRUMENT = 'ETH-26MAY23-1200-C'
 INSTRUMENT = 'C_ETHUSD_230630_1200'
@@ -54,6 +57,17 @@ class TestDeribitOption(unittest.TestCase):
         tob_spread = deribit_option_api.get_tob_spread(INSTRUMENT)
         self.assertGreater(tob_spread, 0)
 
+    def test_tob_quote(self):
+        deribit_option_api = MarketDataRestApiDeribitOption()
+        quote = deribit_option_api.get_tob_quote(INSTRUMENT)
+        self.assertGreater(quote[BID], 0)
+        self.assertGreater(quote[ASK], quote[BID])
+        self.assertGreater(quote[BID_SIZE], 0)
+        self.assertGreater(quote[ASK_SIZE], 0)
+        self.assertEqual(quote[MID], 0.5 * (quote[BID] + quote[ASK]))
+        self.assertEqual(quote[SPREAD], quote[ASK] - quote[BID])
+        self.assertEqual(type(quote[MARKET_TIMESTAMP]), datetime.datetime)
+
     def test_orderbook(self):
         deribit_option_api = MarketDataRestApiDeribitOption()
         n_levels = 1
@@ -73,6 +87,39 @@ class TestDeribitOption(unittest.TestCase):
         self.assertTrue(ob[ASK_SIZES].values[0][0] >= 0)
         self.assertTrue(ob[ASK_PRICES].values[0][0] >= 0)
 
+    def test_format_sym_back(self):
+        deribit_option_api = MarketDataRestApiDeribitOption()
+        self.assertEqual(deribit_option_api.format_sym_back('ETH-30JUN23-1200-C'), INSTRUMENT)
+        self.assertEqual(deribit_option_api.format_sym_back('BTC-5MAY23-30000-P'), 'P_BTCUSD_230505_30000')
+        self.assertEqual(deribit_option_api.format_sym_for_market('P_BTCUSD_230505_30000'), 'BTC-5MAY23-30000-P')
+        with self.assertRaises(Exception):
+            deribit_option_api.format_sym_back('DOGE-5MAY23-1-P')
+
+    def test_option_chain(self):
+        summaries = [{'instrument_name': 'ETH-30JUN23-1200-C', 'bid_price': 0.4, 'ask_price': 0.41,
+                      'mark_price': 0.405, 'underlying_price': 2000.0, 'creation_timestamp': 1682935200000},
+                     {'instrument_name': 'ETH-5MAY23-1800-P', 'bid_price': None, 'ask_price': 0.001,
+                      'mark_price': 0.0005, 'underlying_price': 1990.0, 'creation_timestamp': 1682935200000}]
+        exchange = LocalExchange({'/public/get_book_summary_by_currency': {'result': summaries}})
+        try:
+            deribit_option_api = exchange.connect(MarketDataRestApiDeribitOption())
+            chain = deribit_option_api.get_option_chain(ETHUSD)
+            self.assertEqual(len(exchange.requests), 1)
+            self.assertEqual(exchange.requests[0][2], {'currency': ['ETH'], 'kind': ['option']})
+        finally:
+            exchange.stop()
+        self.assertEqual(chain.columns.tolist(), [SYM, OPTION_TYPE, EXPIRY, STRIKE, BID, ASK, MARK, UNDERLYING_PRICE,
+                                                  MARKET_TIMESTAMP])
+        # sorted by expiry
+        self.assertEqual(chain[SYM].tolist(), ['P_ETHUSD_230505_1800', INSTRUMENT])
+        self.assertEqual(chain[EXPIRY].tolist(), [datetime.date(2023, 5, 5), datetime.date(2023, 6, 30)])
+        self.assertEqual(chain[STRIKE].tolist(), [1800, 1200])
+        self.assertTrue(chain[BID].isna().values[0])
+        self.assertAlmostEqual(chain[ASK].values[0], 1.99)
+        self.assertAlmostEqual(chain[BID].values[1], 800.0)
+        self.assertAlmostEqual(chain[MARK].values[1], 810.0)
+        self.assertEqual(chain[UNDERLYING_PRICE].tolist(), [1990.0, 2000.0])
+
     def test_fee_schedule(self):
         deribit_option_api = MarketDataRestApiDeribitOption()
         with self.assertRaises(Exception) as context:
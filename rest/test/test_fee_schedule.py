@@ -0,0 +1,88 @@
+import os
+import unittest
+
+import numpy as np
+
+from core import root_folder
+from core.src.instrument_types import SPOT, FUTURE
+from core.src.markets import KRAKEN
+from core.src.spot_syms import ETHUSD, USD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.fee_schedule import FeeEngine, FeeSchedule
+from rest.src.market_data_rest_factory import MARKET_DATA_REST_APIS
+from rest.test.local_exchange import LocalExchange
+from rest.test.test_response_cache import ASSET_PAIRS, FakeClock
+
+FUTURE_ETHUSD = 'FUT_ETHUSD_230630'
+FEE_SCHEDULES = {'result': 'success', 'serverTime': '2023-06-01T10:00:00.000Z',
+                 'feeSchedules': [{'name': 'Other fees', 'tiers': [{'usdVolume': 0., 'takerFee': 1., 'makerFee': 1.}]},
+                                  {'name': 'Tiered fees',
+                                   'tiers': [{'usdVolume': 0., 'takerFee': 0.05, 'makerFee': 0.02},
+                                             {'usdVolume': 100000., 'takerFee': 0.04, 'makerFee': 0.015},
+                                             {'usdVolume': 1000000., 'takerFee': 0.03, 'makerFee': 0.}]}]}
+
+
+class TestFeeSchedule(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({'/public/AssetPairs': ASSET_PAIRS,
+                                       '/derivatives/api/v3/feeschedules': FEE_SCHEDULES})
+        self.clock = FakeClock()
+        self.apis = {}
+
+    def tearDown(self):
+        self.exchange.stop()
+
+    def get_api(self, market, instrument_type):
+        key = (market, instrument_type)
+        if key not in self.apis:
+            self.apis[key] = self.exchange.connect(MARKET_DATA_REST_APIS[key]())
+            self.apis[key].response_cache = None
+        return self.apis[key]
+
+    def test_tiers(self):
+        fee_schedule = FeeSchedule([[50000, 0.24], [0, 0.26], [100000, 0.22]], [[0, 0.16], [100000, 0.12]])
+        self.assertEqual(fee_schedule.get_tier(0.), 0)
+        self.assertEqual(fee_schedule.get_tier(-1.), 0)
+        np.testing.assert_array_equal(fee_schedule.get_tier(np.array([49999.99, 50000., 1e9])), [0, 1, 2])
+        np.testing.assert_array_equal(fee_schedule.get_tier(np.array([50000., 100000.]), is_maker=True), [0, 1])
+
+    def test_fees(self):
+        fee_schedule = FeeSchedule([[0, 0.26], [50000, 0.24]], [[0, 0.16], [50000, 0.14]])
+        notionals = np.array([1000., -1000., 1000., 2000.])
+        is_maker = np.array([False, False, True, True])
+        volumes = np.array([0., 0., 0., 60000.])
+        np.testing.assert_allclose(fee_schedule.get_fees(notionals, is_maker, volumes), [2.6, 2.6, 1.6, 2.8])
+        # one volume for every fill
+        np.testing.assert_allclose(fee_schedule.get_fees(notionals, is_maker, 60000.), [2.4, 2.4, 1.4, 2.8])
+        self.assertAlmostEqual(float(fee_schedule.get_fees(1000., True, 0.)), 1.6)
+
+    def test_fee_engine(self):
+        fee_engine = FeeEngine(ttl=10, get_api=self.get_api, clock=self.clock)
+        fees = fee_engine.get_fees(KRAKEN, SPOT, ETHUSD, np.array([1000., 1000.]), np.array([False, True]), 60000.)
+        np.testing.assert_allclose(fees, [2.4, 1.4])
+        self.assertEqual(fee_engine.get_fee_schedule(KRAKEN, SPOT, ETHUSD).fee_volume_currency, USD)
+
+        fee_schedule = fee_engine.get_fee_schedule(KRAKEN, FUTURE, FUTURE_ETHUSD)
+        np.testing.assert_allclose(fee_schedule.taker_rates, [0.0005, 0.0004, 0.0003])
+        np.testing.assert_allclose(fee_schedule.get_fees(10000., True, [0., 500000., 2000000.]), [2., 1.5, 0.])
+        self.assertEqual(len(self.exchange.requests), 2)
+
+        # the schedules are queried again once expired
+        self.clock.now = 10
+        fee_engine.get_fee_schedule(KRAKEN, SPOT, ETHUSD)
+        self.assertEqual(len(self.exchange.requests), 3)
+        fee_engine.clear()
+        fee_engine.get_fee_schedule(KRAKEN, SPOT, ETHUSD)
+        self.assertEqual(len(self.exchange.requests), 4)
+
+    def test_empty_schedule(self):
+        with self.assertRaises(Exception):
+            FeeSchedule([], [[0, 0.16]])
+
+
+if __name__ == '__main__':
+    unittest.main()
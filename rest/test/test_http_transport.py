@@ -0,0 +1,120 @@
+import os
+import socket
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from core import root_folder
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.http_transport import HttpTransport, DnsCache, get_host_key, get_http_transport, set_http_transport
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.request_types import make_request
+from rest.test.local_exchange import LocalExchange
+
+DEPTH = {'error': [], 'result': {'XETHZUSD': {'bids': [['100.5', '2.0', 1700000000]],
+                                              'asks': [['101.5', '1.0', 1700000001]]}}}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHttpTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({'/public/Depth': DEPTH})
+        self.host = get_host_key('http', '127.0.0.1', self.exchange.server.server_port)
+
+    def tearDown(self):
+        self.exchange.stop()
+
+    def test_connections_are_reused(self):
+        transport = HttpTransport()
+        for _ in range(20):
+            response = make_request(transport, self.exchange.url + 'public/Depth')
+            self.assertEqual(response.status_code, 200)
+        stats = transport.get_stats(self.host)
+        self.assertEqual(stats['n_requests'], 20)
+        self.assertEqual(stats['n_connections'], 1)
+        self.assertEqual(stats['n_reused'], 19)
+        self.assertEqual(stats['n_dns_lookups'], 1)
+
+    def test_no_keep_alive(self):
+        transport = HttpTransport(keep_alive=False)
+        for _ in range(3):
+            make_request(transport, self.exchange.url + 'public/Depth')
+        stats = transport.get_stats(self.host)
+        self.assertEqual(stats['n_connections'], 3)
+        # the address is looked up once
+        self.assertEqual(stats['n_dns_lookups'], 1)
+        self.assertEqual(stats['n_dns_hits'], 2)
+
+    def test_max_connections(self):
+        transport = HttpTransport(max_connections=2)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(lambda _: make_request(transport, self.exchange.url + 'public/Depth'),
+                                          range(40)))
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        stats = transport.get_stats(self.host)
+        self.assertEqual(stats['n_requests'], 40)
+        self.assertLessEqual(stats['n_connections'], 2)
+
+    def test_clients_share_the_transport(self):
+        previous = set_http_transport(HttpTransport())
+        try:
+            apis = [self.exchange.connect(MarketDataRestApiKrakenSpot()) for _ in range(3)]
+            self.assertIs(apis[0].session, apis[1].session)
+            for api in apis:
+                self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+            stats = get_http_transport().get_stats(self.host)
+            self.assertEqual(stats['n_requests'], 3)
+            self.assertEqual(stats['n_connections'], 1)
+        finally:
+            set_http_transport(previous)
+
+    def test_close(self):
+        transport = HttpTransport()
+        make_request(transport, self.exchange.url + 'public/Depth')
+        transport.close()
+        make_request(transport, self.exchange.url + 'public/Depth')
+        self.assertEqual(transport.get_stats(self.host)['n_connections'], 2)
+
+    def test_dns_cache(self):
+        lookups = []
+
+        def resolve(host, port, family, type):
+            lookups.append(host)
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', ('10.0.0.1', port))]
+
+        clock = FakeClock()
+        cache = DnsCache(ttl=60, clock=clock, resolve=resolve)
+        self.assertEqual(cache.get_address('api.kraken.com', 443), ('10.0.0.1', False))
+        clock.now = 59
+        self.assertEqual(cache.get_address('api.kraken.com', 443), ('10.0.0.1', True))
+        clock.now = 60
+        self.assertEqual(cache.get_address('api.kraken.com', 443), ('10.0.0.1', False))
+        cache.invalidate('api.kraken.com')
+        self.assertEqual(cache.get_address('api.kraken.com', 443), ('10.0.0.1', False))
+        self.assertEqual(len(lookups), 3)
+
+    def test_failed_connection_drops_the_address(self):
+        transport = HttpTransport()
+        port = self.exchange.server.server_port
+        self.exchange.stop()
+        with self.assertRaises(Exception):
+            make_request(transport, self.exchange.url + 'public/Depth', timeout=1)
+        self.assertNotIn('127.0.0.1', transport.dns_cache.addresses)
+        self.assertEqual(transport.get_stats(get_host_key('http', '127.0.0.1', port))['n_connections'], 1)
+        self.exchange = LocalExchange({})
+
+
+if __name__ == '__main__':
+    unittest.main()
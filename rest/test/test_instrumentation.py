@@ -0,0 +1,121 @@
+import asyncio
+import contextlib
+import io
+import math
+import os
+import unittest
+
+from core import root_folder
+from core.src.markets import KRAKEN
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.instrumentation import Histogram, RequestMetrics, CONNECT, TTFB, DOWNLOAD, PARSE, TOTAL, NO_RESPONSE, \
+    ENDPOINT, STATUS, ATTEMPT
+from rest.src.market_data_rest_async import AsyncMarketDataRestApiKrakenSpot
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.retry import RetryPolicy
+from rest.test.local_exchange import LocalExchange
+
+DEPTH = {'error': [], 'result': {'XETHZUSD': {'bids': [['100.5', '2.0', 1700000000]],
+                                              'asks': [['101.5', '1.0', 1700000001]]}}}
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({'/public/Depth': DEPTH})
+
+    def tearDown(self):
+        self.exchange.stop()
+
+    def make_api(self):
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.request_metrics = RequestMetrics()
+        api.retry_policy = RetryPolicy(max_retries=3, sleep=lambda seconds: None)
+        return api
+
+    def test_histogram(self):
+        histogram = Histogram([0.01, 0.1, 1.])
+        self.assertTrue(math.isnan(histogram.quantile(0.5)))
+        for value in [0.005] * 98 + [0.5, 5.]:
+            histogram.observe(value)
+        self.assertEqual(histogram.quantile(0.5), 0.01)
+        self.assertEqual(histogram.quantile(0.99), 1.)
+        self.assertEqual(histogram.quantile(1.), float('inf'))
+        stats = histogram.to_dict()
+        self.assertEqual(stats['count'], 100)
+        self.assertEqual(stats['buckets'], {0.01: 98, 0.1: 98, 1.: 99, float('inf'): 100})
+
+    def test_request_is_recorded(self):
+        api = self.make_api()
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            for _ in range(3):
+                api.get_tob_bid(ETHUSD)
+        self.assertEqual(stdout.getvalue(), '')
+        metrics = api.request_metrics.snapshot()[(KRAKEN, 'public/Depth')]
+        self.assertEqual(metrics['statuses'], {200: 3})
+        self.assertEqual(metrics['n_retries'], 0)
+        self.assertGreater(metrics['n_bytes'], 3 * 50)
+        for phase in [CONNECT, TTFB, DOWNLOAD, PARSE, TOTAL]:
+            self.assertEqual(metrics['latencies'][phase]['count'], 3)
+
+    def test_retries_and_hooks(self):
+        responses = [(503, 'Service Unavailable'), DEPTH]
+        self.exchange.routes['/public/Depth'] = lambda query, form: responses.pop(0)
+        api = self.make_api()
+        events = []
+        api.request_metrics.add_hook(events.append)
+        api.request_metrics.add_hook(lambda event: 1 / 0)
+        self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+        self.assertEqual([(event[ENDPOINT], event[STATUS], event[ATTEMPT]) for event in events],
+                         [('public/Depth', 503, 0), ('public/Depth', 200, 1)])
+        self.assertEqual(api.request_metrics.n_hook_errors, 2)
+        metrics = api.request_metrics.snapshot()[(KRAKEN, 'public/Depth')]
+        self.assertEqual(metrics['statuses'], {503: 1, 200: 1})
+        self.assertEqual(metrics['n_retries'], 1)
+
+    def test_no_response(self):
+        api = self.make_api()
+        api.retry_policy = RetryPolicy(max_retries=0)
+        self.exchange.stop()
+        with self.assertRaises(Exception):
+            api.get_tob_bid(ETHUSD)
+        metrics = api.request_metrics.snapshot()[(KRAKEN, 'public/Depth')]
+        self.assertEqual(metrics['statuses'], {NO_RESPONSE: 1})
+        self.assertEqual(metrics['latencies'][TOTAL]['count'], 1)
+        self.exchange = LocalExchange({})
+
+    def test_prometheus(self):
+        api = self.make_api()
+        api.get_tob_bid(ETHUSD)
+        text = api.request_metrics.to_prometheus()
+        self.assertIn('# TYPE market_data_rest_request_seconds histogram', text)
+        labels = f'market="{KRAKEN}",endpoint="public/Depth"'
+        self.assertIn(f'market_data_rest_request_seconds_bucket{{{labels},phase="total",le="+Inf"}} 1', text)
+        self.assertIn(f'market_data_rest_request_seconds_count{{{labels},phase="ttfb"}} 1', text)
+        self.assertIn(f'market_data_rest_requests_total{{{labels},status="200"}} 1', text)
+        self.assertIn(f'market_data_rest_retries_total{{{labels}}} 0', text)
+        self.assertTrue(text.endswith('\n'))
+
+    def test_async(self):
+        async def query():
+            async with AsyncMarketDataRestApiKrakenSpot() as api:
+                self.exchange.connect(api)
+                api.request_metrics = RequestMetrics()
+                await api.get_tob_bid(ETHUSD)
+                await api.get_tob_bid(ETHUSD)
+                return api.request_metrics.snapshot()[(KRAKEN, 'public/Depth')]
+
+        metrics = asyncio.run(query())
+        self.assertEqual(metrics['statuses'], {200: 2})
+        self.assertGreater(metrics['n_bytes'], 0)
+        for phase in [CONNECT, TTFB, DOWNLOAD, PARSE, TOTAL]:
+            self.assertEqual(metrics['latencies'][phase]['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
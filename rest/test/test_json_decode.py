@@ -0,0 +1,102 @@
+import os
+import unittest
+
+import numpy as np
+
+from core import root_folder
+from core.src.column_names import COUNT
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.json_decode import ArrayDecoder, find_array, keep_first_rows, parse_float_array, loads
+from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.test.local_exchange import LocalExchange
+
+DEPTH = b'{"error": [], "result": {"XETHZUSD": {"bids": [["100.5", "2.0", 1700000000], ["100.0", "3.0", 1700000002]],' \
+        b' "asks": [["101.5", "1.0", 1700000001]]}}}'
+
+
+class TestJsonDecode(unittest.TestCase):
+
+    def test_find_array(self):
+        start, end = find_array(DEPTH, b'asks')
+        self.assertEqual(DEPTH[start:end], b'[["101.5", "1.0", 1700000001]]')
+        self.assertIsNone(find_array(DEPTH, b'error2'))
+        self.assertIsNone(find_array(b'{"bids": "none"}', b'bids'))
+        start, end = find_array(b'{"ticks" : [1, 2,3 ], "open": [4]}', b'ticks')
+        self.assertEqual(end - start, len(b'[1, 2,3 ]'))
+
+    def test_keep_first_rows(self):
+        self.assertEqual(keep_first_rows(b'[[1,2],[3,4],[5,6]]', 2), b'[[1,2],[3,4]]')
+        self.assertEqual(keep_first_rows(b'[[1,2], [3,4] ]', 2), b'[[1,2], [3,4] ]')
+        self.assertEqual(keep_first_rows(b'[[1,2]]', 5), b'[[1,2]]')
+
+    def test_parse_float_array(self):
+        values = parse_float_array(b'[["100.5", "2.0", 1700000000],\n ["100.0", "3.0", 1700000002]]')
+        self.assertEqual(values.shape, (2, 3))
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(values[1].tolist(), [100.0, 3.0, 1700000002.0])
+        self.assertEqual(parse_float_array(b'[1, 2.5, "3"]').tolist(), [1.0, 2.5, 3.0])
+        self.assertIsNone(parse_float_array(b'[ ]'))
+        with self.assertRaises(ValueError):
+            parse_float_array(b'[["100.5", "2.0", "b"]]')
+        with self.assertRaises(ValueError):
+            parse_float_array(b'[[1, 2], [3]]')
+
+    def test_array_decoder(self):
+        result = ArrayDecoder(['bids', 'asks'])(DEPTH)
+        self.assertEqual(result['error'], [])
+        data_ob = result['result']['XETHZUSD']
+        self.assertEqual(data_ob['bids'].tolist(), [[100.5, 2.0, 1700000000.0], [100.0, 3.0, 1700000002.0]])
+        self.assertEqual(data_ob['asks'].tolist(), [[101.5, 1.0, 1700000001.0]])
+        data_ob = ArrayDecoder(['bids', 'asks'], n_rows=1)(DEPTH)['result']['XETHZUSD']
+        self.assertEqual(data_ob['bids'].tolist(), [[100.5, 2.0, 1700000000.0]])
+
+    def test_array_decoder_falls_back(self):
+        decoder = ArrayDecoder(['bids', 'asks'])
+        # an error response has no book
+        self.assertEqual(decoder(b'{"error": ["EQuery:Unknown asset pair"]}'), {'error': ['EQuery:Unknown asset pair']})
+        # trades are not only numbers
+        content = b'{"bids": [["100.5", "2.0", "b"]], "asks": []}'
+        self.assertEqual(decoder(content), loads(content))
+        # empty arrays are left as lists
+        self.assertEqual(decoder(b'{"bids": [], "asks": []}'), {'bids': [], 'asks': []})
+        with self.assertRaises(ValueError):
+            decoder(b'<html>Bad Gateway</html>')
+
+    def test_orderbook_is_truncated(self):
+        levels = [[1800.0 - i, 1.0 + i] for i in range(1000)]
+        exchange = LocalExchange({'/derivatives/api/v3/orderbook': {
+            'result': 'success', 'serverTime': '2023-05-01T10:00:00.123Z',
+            'orderBook': {'bids': levels, 'asks': [[1801.0 + i, size] for i, (_, size) in enumerate(levels)]}}})
+        try:
+            api = exchange.connect(MarketDataRestApiKrakenFuture())
+            ob = api.get_orderbook('FUT_ETHUSD_230630', 3, as_frame=False)
+            self.assertEqual(ob.bid_prices.tolist(), [1800.0, 1799.0, 1798.0])
+            self.assertEqual(ob.ask_sizes.tolist(), [1.0, 2.0, 3.0])
+            self.assertTrue(ob.bid_prices.flags['C_CONTIGUOUS'])
+        finally:
+            exchange.stop()
+
+    def test_kraken_spot(self):
+        exchange = LocalExchange({
+            '/public/Depth': loads(DEPTH),
+            '/public/OHLC': lambda query, form: {'error': [], 'result': {
+                form['pair'][0]: [[1700000000, '99', '102', '98', '101', '100', '10', 5]], 'last': 1700000000}}})
+        try:
+            api = exchange.connect(MarketDataRestApiKrakenSpot())
+            ob = api.get_orderbook(ETHUSD, 2, as_frame=False)
+            self.assertEqual(ob.bid_sizes.tolist(), [2.0, 3.0])
+            self.assertEqual(ob.market_timestamp, 1700000002 * 1000000)
+            ohlc = api.get_ohlc(ETHUSD)
+            self.assertEqual(ohlc[COUNT].tolist(), [5])
+            self.assertEqual(ohlc[COUNT].dtype, np.int64)
+        finally:
+            exchange.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
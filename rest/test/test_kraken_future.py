@@ -2,9 +2,12 @@ import datetime
 import os
 import unittest
 
+import pandas as pd
+
 from core import root_folder
 from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, MISC, HIGH, LOW, OPEN, CLOSE, TIME
+    ASK_PRICES, MISC, BID, ASK, BID_SIZE, ASK_SIZE, MID, SPREAD, HIGH, LOW, OPEN, CLOSE, TIME, MARK, LAST, VOLUME, \
+    OPEN_INTEREST, FUNDING_RATE, INDEX_PRICE
 from core.src.date import today_date
 from core.src.future_syms import FUT_ETHUSD_
 from core.src.spot_syms import SUPPORTED_FIAT_CURRENCIES
@@ -13,6 +16,7 @@ dir_path = os.path.dirname(os.path.realpath(__file__))
 root_folder.ROOT_FOLDER = dir_path + '/../../'
 
 from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.test.local_exchange import LocalExchange
 
 # @TODO: Fix, because if we are in the future then last date... maybe get sym dynamically
 FUTURE_ETHUSD = FUT_ETHUSD_ + "230630"
@@ -34,6 +38,46 @@ class TestKrakenSpot(unittest.TestCase):
         self.assertEqual(str(context.exception),
                          f'Future {wrong_sym} has wrong format, it should be FUT_LHSRHS_YYMMDD')
 
+    def test_format_sym(self):
+        kraken_future_api = MarketDataRestApiKrakenFuture()
+        self.assertEqual(kraken_future_api.format_sym_for_market(FUTURE_ETHUSD), 'FI_ETHUSD_230630')
+        self.assertEqual(kraken_future_api.format_sym_for_market('FUT_BTCUSD_230630'), 'FI_XBTUSD_230630')
+        self.assertEqual(kraken_future_api.format_sym_for_market('FUT_BTCUSD_PERP'), 'PI_XBTUSD')
+        self.assertEqual(kraken_future_api.format_sym_back('FI_XBTUSD_230630'), 'FUT_BTCUSD_230630')
+        self.assertEqual(kraken_future_api.format_sym_back('pi_ethusd'), 'FUT_ETHUSD_PERP')
+        with self.assertRaises(Exception):
+            kraken_future_api.format_sym_back('IN_XBTUSD')
+
+    def test_tickers(self):
+        tickers = [{'tag': 'perpetual', 'symbol': 'PI_XBTUSD', 'bid': 29000.5, 'bidSize': 1000, 'ask': 29001,
+                    'askSize': 2500, 'markPrice': 29000.7, 'last': 29000, 'vol24h': 123456, 'openInterest': 9876543,
+                    'fundingRate': 1.2e-12, 'indexPrice': 28999.9, 'suspended': False},
+                   {'tag': 'quarter', 'symbol': 'FI_ETHUSD_230630', 'bid': 1900, 'bidSize': 10, 'ask': 1901.5,
+                    'askSize': 20, 'markPrice': 1900.8, 'last': 1900.5, 'vol24h': 1000, 'openInterest': 5000,
+                    'indexPrice': 1890.1, 'suspended': False},
+                   {'tag': 'month', 'symbol': 'FI_DOGEUSD_230630', 'markPrice': 0.07},
+                   {'symbol': 'in_xbtusd', 'last': 28999.9},
+                   {'tag': 'perpetual', 'symbol': 'PF_XBTUSD', 'bid': 29000.1, 'ask': 29001.1}]
+        exchange = LocalExchange({'/derivatives/api/v3/tickers': {'result': 'success', 'tickers': tickers,
+                                                                  'serverTime': '2023-05-01T10:00:00.123Z'}})
+        try:
+            kraken_future_api = exchange.connect(MarketDataRestApiKrakenFuture())
+            board = kraken_future_api.get_tickers()
+            subset = kraken_future_api.get_tickers([FUTURE_ETHUSD, 'FUT_XRPUSD_230630'])
+            self.assertEqual(len(exchange.requests), 2)
+        finally:
+            exchange.stop()
+        self.assertEqual(board.index.tolist(), ['FUT_BTCUSD_PERP', FUTURE_ETHUSD])
+        self.assertEqual(board.columns.tolist(), [BID, BID_SIZE, ASK, ASK_SIZE, MARK, LAST, VOLUME, OPEN_INTEREST,
+                                                  FUNDING_RATE, INDEX_PRICE, MARKET_TIMESTAMP])
+        self.assertEqual(board.loc['FUT_BTCUSD_PERP', BID], 29000.5)
+        self.assertEqual(board.loc[FUTURE_ETHUSD, ASK_SIZE], 20.0)
+        self.assertEqual(board[OPEN_INTEREST].dtype, float)
+        self.assertTrue(pd.isna(board.loc[FUTURE_ETHUSD, FUNDING_RATE]))
+        self.assertEqual(board[MARKET_TIMESTAMP].values[0], pd.Timestamp('2023-05-01 10:00:00.123'))
+        self.assertEqual(subset.index.tolist(), [FUTURE_ETHUSD, 'FUT_XRPUSD_230630'])
+        self.assertTrue(subset.loc['FUT_XRPUSD_230630'].drop(MARKET_TIMESTAMP).isna().all())
+
     def test_tob_prices(self):
         kraken_future_api = MarketDataRestApiKrakenFuture()
         tob_bid = kraken_future_api.get_tob_bid(FUTURE_ETHUSD)
@@ -49,6 +93,17 @@ class TestKrakenSpot(unittest.TestCase):
         tob_spread = kraken_future_api.get_tob_spread(FUTURE_ETHUSD)
         self.assertGreater(tob_spread, 0)
 
+    def test_tob_quote(self):
+        kraken_future_api = MarketDataRestApiKrakenFuture()
+        quote = kraken_future_api.get_tob_quote(FUTURE_ETHUSD)
+        self.assertGreater(quote[BID], 0)
+        self.assertGreater(quote[ASK], quote[BID])
+        self.assertGreater(quote[BID_SIZE], 0)
+        self.assertGreater(quote[ASK_SIZE], 0)
+        self.assertEqual(quote[MID], 0.5 * (quote[BID] + quote[ASK]))
+        self.assertEqual(quote[SPREAD], quote[ASK] - quote[BID])
+        self.assertEqual(type(quote[MARKET_TIMESTAMP]), datetime.datetime)
+
     def test_orderbook(self):
         kraken_future_api = MarketDataRestApiKrakenFuture()
         n_levels = 3
@@ -4,9 +4,10 @@ import unittest
 
 from core import root_folder
 from core.src.column_names import MARKET_TIMESTAMP, GATEWAY_TIMESTAMP, SYM, MARKET, BID_SIZES, BID_PRICES, ASK_SIZES, \
-    ASK_PRICES, MISC, HIGH, LOW, OPEN, CLOSE, TIME
+    ASK_PRICES, MISC, BID, ASK, BID_SIZE, ASK_SIZE, MID, SPREAD, HIGH, LOW, OPEN, CLOSE, TIME, LAST, VOLUME, VWAP
 from core.src.date import today_date, MINUTES_PER_DAY
-from core.src.spot_syms import ETHUSD, SUPPORTED_FIAT_CURRENCIES
+from core.src.spot_syms import ETHUSD, SUPPORTED_FIAT_CURRENCIES, BTCUSD, USDTUSD, SOLUSD, MATICUSD, \
+    SUPPORTED_CCY_PAIRS
 
 dir_path = os.path.dirname(os.path.realpath(__file__))
 root_folder.ROOT_FOLDER = dir_path + '/../../'
@@ -45,6 +46,36 @@ class TestKrakenSpot(unittest.TestCase):
         tob_spread = kraken_spot_api.get_tob_spread(ETHUSD)
         self.assertGreater(tob_spread, 0)
 
+    def test_tob_quote(self):
+        kraken_spot_api = MarketDataRestApiKrakenSpot()
+        quote = kraken_spot_api.get_tob_quote(ETHUSD)
+        self.assertGreater(quote[BID], 0)
+        self.assertGreater(quote[ASK], quote[BID])
+        self.assertGreater(quote[BID_SIZE], 0)
+        self.assertGreater(quote[ASK_SIZE], 0)
+        self.assertEqual(quote[MID], 0.5 * (quote[BID] + quote[ASK]))
+        self.assertEqual(quote[SPREAD], quote[ASK] - quote[BID])
+        self.assertEqual(type(quote[MARKET_TIMESTAMP]), datetime.datetime)
+
+    def test_format_sym_back(self):
+        kraken_spot_api = MarketDataRestApiKrakenSpot()
+        self.assertEqual(kraken_spot_api.format_sym_back('XETHZUSD'), ETHUSD)
+        self.assertEqual(kraken_spot_api.format_sym_back('XXBTZUSD'), BTCUSD)
+        self.assertEqual(kraken_spot_api.format_sym_back('USDTZUSD'), USDTUSD)
+        self.assertEqual(kraken_spot_api.format_sym_back('SOLUSD'), SOLUSD)
+        self.assertEqual(kraken_spot_api.format_sym_back('MATICUSD'), MATICUSD)
+        for sym in SUPPORTED_CCY_PAIRS:
+            self.assertEqual(kraken_spot_api.format_sym_back(kraken_spot_api.format_sym_for_market(sym)), sym)
+
+    def test_tickers(self):
+        kraken_spot_api = MarketDataRestApiKrakenSpot()
+        syms = [ETHUSD, BTCUSD, SOLUSD]
+        tickers = kraken_spot_api.get_tickers(syms)
+        self.assertEqual(tickers.index.tolist(), syms)
+        self.assertEqual(tickers.columns.tolist(), [BID, ASK, LAST, VOLUME, VWAP])
+        self.assertTrue((tickers.dtypes == float).all())
+        self.assertTrue((tickers[ASK] > tickers[BID]).all())
+
     def test_orderbook(self):
         kraken_spot_api = MarketDataRestApiKrakenSpot()
         n_levels = 3
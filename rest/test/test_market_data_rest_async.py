@@ -0,0 +1,150 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from core import root_folder
+from core.src.column_names import BID, ASK, MID, SPREAD, BID_PRICES, ASK_PRICES, BID_SIZES, SYM, CLOSE
+from core.src.date import today_date, date_to_timestamp, MINUTES_PER_DAY
+from core.src.exceptions import ExchangeRequestError
+from core.src.ohlc_store import OhlcStore
+from core.src.spot_syms import ETHUSD, BTCUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.market_data_rest_async import AsyncMarketDataRestApiKrakenSpot, AsyncMarketDataRestApiKrakenFuture, \
+    AsyncMarketDataRestApiDeribitOption
+from rest.src.retry import RetryPolicy
+from rest.test.local_exchange import LocalExchange
+from rest.test.test_market_data_rest_ohlc_store import kraken_spot_ohlc as kraken_spot_daily_ohlc, \
+    kraken_spot_trades, DAY
+
+FUTURE_ETHUSD = 'FUT_ETHUSD_230630'
+OPTION_ETHUSD = 'C_ETHUSD_230630_1200'
+
+
+def kraken_spot_depth(query, form):
+    pair = form['pair'][0]
+    count = int(form['count'][0])
+    return {'error': [], 'result': {pair: {'bids': [['100.5', '2.0', 1700000000]] * count,
+                                           'asks': [['101.5', '1.0', 1700000001]] * count}}}
+
+
+def kraken_spot_ohlc(query, form):
+    pair = form['pair'][0]
+    yesterday = int(datetime.datetime.combine(today_date() - datetime.timedelta(days=1),
+                                              datetime.time.min).timestamp())
+    return {'error': [], 'result': {pair: [[yesterday, '99', '102', '98', '101', '100', '10', 5]], 'last': yesterday}}
+
+
+ROUTES = {
+    '/public/Depth': kraken_spot_depth,
+    '/public/OHLC': kraken_spot_ohlc,
+    '/derivatives/api/v3/orderbook': {'result': 'success', 'serverTime': '2023-05-01T10:00:00.123Z',
+                                      'orderBook': {'bids': [[1800.0, 5.0], [1799.5, 1.0]],
+                                                    'asks': [[1801.0, 2.0], [1802.0, 3.0]]}},
+    '/public/get_order_book': {'result': {'underlying_price': 2000.0, 'timestamp': 1700000000000,
+                                          'bids': [[0.01, 10.0]], 'asks': [[0.012, 5.0]]}},
+    '/public/get_tradingview_chart_data': {'result': {'ticks': [date_to_timestamp(today_date())],
+                                                      'open': [0.1], 'high': [0.2], 'low': [0.05], 'close': [0.15],
+                                                      'volume': [1.0], 'status': 'ok'}},
+}
+
+
+class TestMarketDataRestApiAsync(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.exchange = LocalExchange(ROUTES)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.exchange.stop()
+
+    async def test_kraken_spot(self):
+        async with AsyncMarketDataRestApiKrakenSpot() as api:
+            self.exchange.connect(api)
+            quote = await api.get_tob_quote(ETHUSD)
+            self.assertEqual(quote[BID], 100.5)
+            self.assertEqual(quote[ASK], 101.5)
+            self.assertEqual(quote[MID], 101.0)
+            self.assertEqual(quote[SPREAD], 1.0)
+            self.assertEqual(await api.get_tob_mid(ETHUSD), 101.0)
+
+            ob = await api.get_orderbook(ETHUSD, 3)
+            self.assertEqual(ob[SYM].values[0], ETHUSD)
+            self.assertEqual(ob[BID_SIZES].values[0], [2.0, 2.0, 2.0])
+
+            close_price = await api.get_close(ETHUSD)
+            self.assertEqual(close_price, 101.0)
+
+    async def test_kraken_future(self):
+        async with AsyncMarketDataRestApiKrakenFuture() as api:
+            self.exchange.connect(api)
+            self.assertEqual(await api.get_tob_bid(FUTURE_ETHUSD), 1800.0)
+            self.assertEqual(await api.get_tob_ask(FUTURE_ETHUSD), 1801.0)
+            ob = await api.get_orderbook(FUTURE_ETHUSD, 1)
+            self.assertEqual(ob[ASK_PRICES].values[0], [1801.0])
+            ob = await api.get_orderbook(FUTURE_ETHUSD, 2, as_frame=False)
+            self.assertEqual(ob.best_bid, 1800.0)
+            self.assertEqual(ob.bid_sizes.tolist(), [5.0, 1.0])
+
+    async def test_deribit_option(self):
+        async with AsyncMarketDataRestApiDeribitOption() as api:
+            self.exchange.connect(api)
+            self.assertAlmostEqual(await api.get_tob_spread(OPTION_ETHUSD), 4.0)
+            ohlc = await api.get_ohlc(OPTION_ETHUSD)
+            self.assertEqual(ohlc[CLOSE].values[0], 0.15)
+
+    async def test_concurrent_requests(self):
+        async with AsyncMarketDataRestApiKrakenSpot() as api:
+            self.exchange.connect(api)
+            n_requests_before = len(self.exchange.requests)
+            obs = await api.get_orderbooks([ETHUSD, BTCUSD] * 50, 1)
+            self.assertEqual(len(obs), 100)
+            self.assertEqual(obs[1][SYM].values[0], BTCUSD)
+            self.assertEqual(obs[1][BID_PRICES].values[0], [100.5])
+            self.assertEqual(len(self.exchange.requests) - n_requests_before, 100)
+
+    async def test_retries(self):
+        responses = [(503, 'Service Unavailable'), ROUTES['/derivatives/api/v3/orderbook']]
+        exchange = LocalExchange({'/derivatives/api/v3/orderbook': lambda query, form: responses.pop(0),
+                                  '/public/Depth': {'error': ['EQuery:Unknown asset pair']}})
+        try:
+            async with AsyncMarketDataRestApiKrakenFuture() as api:
+                exchange.connect(api)
+                api.retry_policy = RetryPolicy(base_delay=0)
+                self.assertEqual(await api.get_tob_bid(FUTURE_ETHUSD), 1800.0)
+                self.assertEqual(len(exchange.requests), 2)
+
+            async with AsyncMarketDataRestApiKrakenSpot() as api:
+                exchange.connect(api)
+                with self.assertRaises(ExchangeRequestError):
+                    await api.get_tob_bid(ETHUSD)
+                self.assertEqual(len(exchange.requests), 3)
+        finally:
+            exchange.stop()
+
+    async def test_kraken_spot_history(self):
+        exchange = LocalExchange({'/public/OHLC': kraken_spot_daily_ohlc, '/public/Trades': kraken_spot_trades})
+        folder = tempfile.TemporaryDirectory()
+        try:
+            async with AsyncMarketDataRestApiKrakenSpot() as api:
+                exchange.connect(api)
+                d = today_date() - datetime.timedelta(days=735)
+                d_time = int(datetime.datetime.combine(d, datetime.time.min).timestamp())
+                self.assertEqual(await api.get_close(ETHUSD, d), d_time // DAY)
+                self.assertEqual({request[1] for request in exchange.requests}, {'/public/Trades'})
+
+                api.ohlc_store = OhlcStore(folder.name)
+                n_requests = len(exchange.requests)
+                ohlc = await api.get_ohlc(ETHUSD, since=d_time + 2 * DAY, interval=MINUTES_PER_DAY)
+                self.assertEqual(ohlc[CLOSE].values[0], d_time // DAY + 2)
+                self.assertEqual(len(ohlc), (today_date() - d).days - 1)
+                self.assertEqual(exchange.requests[n_requests][1], '/public/Trades')
+                self.assertEqual(exchange.requests[-1][1], '/public/OHLC')
+                self.assertEqual(await api.get_close(ETHUSD, d + datetime.timedelta(days=2)), d_time // DAY + 2)
+        finally:
+            exchange.stop()
+            folder.cleanup()
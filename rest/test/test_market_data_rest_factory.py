@@ -0,0 +1,52 @@
+import os
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from core import root_folder
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN, DERIBIT, BINANCE
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.api_utils import get_market_registry, get_api_url, get_ws_url
+from rest.src.market_data_rest import MarketDataRestApi
+from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.src.market_data_rest_factory import clear_market_data_rest_apis
+from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+
+
+class TestMarketDataRestFactory(unittest.TestCase):
+
+    def tearDown(self):
+        clear_market_data_rest_apis()
+
+    def test_market_registry(self):
+        self.assertIs(get_market_registry(), get_market_registry())
+        self.assertEqual(get_api_url(KRAKEN, SPOT), 'https://api.kraken.com/0/')
+        self.assertEqual(get_api_url(DERIBIT, OPTION), 'https://deribit.com/api/v2/')
+        with self.assertRaises(Exception) as context:
+            get_api_url(DERIBIT, SPOT)
+        self.assertEqual(str(context.exception), 'No api url for DERIBIT and spot')
+        self.assertEqual(get_ws_url(KRAKEN, FUTURE), 'wss://futures.kraken.com/ws/v1')
+
+    def test_for_market(self):
+        kraken_spot_api = MarketDataRestApi.for_market(KRAKEN, SPOT)
+        self.assertIsInstance(kraken_spot_api, MarketDataRestApiKrakenSpot)
+        self.assertIs(MarketDataRestApi.for_market(KRAKEN, SPOT), kraken_spot_api)
+        self.assertIsInstance(MarketDataRestApi.for_market(KRAKEN, FUTURE), MarketDataRestApiKrakenFuture)
+        self.assertIsInstance(MarketDataRestApi.for_market(DERIBIT, OPTION), MarketDataRestApiDeribitOption)
+
+        clear_market_data_rest_apis()
+        self.assertIsNot(MarketDataRestApi.for_market(KRAKEN, SPOT), kraken_spot_api)
+
+    def test_for_market_is_thread_safe(self):
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            clients = list(executor.map(lambda _: MarketDataRestApi.for_market(KRAKEN, FUTURE), range(64)))
+        self.assertTrue(all(client is clients[0] for client in clients))
+
+    def test_unsupported_market(self):
+        with self.assertRaises(Exception) as context:
+            MarketDataRestApi.for_market(BINANCE, SPOT)
+        self.assertEqual(str(context.exception), 'Instrument type spot not supported for market BINANCE.')
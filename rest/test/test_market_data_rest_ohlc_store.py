@@ -0,0 +1,176 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from core import root_folder
+from core.src.column_names import CLOSE, TIME, OPEN, COUNT
+from core.src.date import get_current_timestamp, today_date, MINUTES_PER_DAY
+from core.src.markets import KRAKEN
+from core.src.ohlc_store import OhlcStore
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.test.local_exchange import LocalExchange
+
+OPTION_ETHUSD = 'C_ETHUSD_230630_1200'
+DAY = 24 * 60 * 60
+
+
+def kraken_spot_ohlc(query, form):
+    # daily bars after since, the last one is the current day
+    pair = form['pair'][0]
+    since = int(form['since'][0])
+    now = int(get_current_timestamp())
+    times = range((since // DAY + 1) * DAY, now, DAY)
+    return {'error': [], 'result': {pair: [[t, '99', '102', '98', str(t // DAY), '100', '10', 5] for t in times],
+                                    'last': now}}
+
+
+def kraken_spot_trades(query, form):
+    # 4 trades a day, priced at the day number, 5 trades per page
+    pair = form['pair'][0]
+    since = int(form['since'][0])
+    since = since / 1e9 if since > 1e12 else since
+    first = int(-(-since // (DAY / 4)) * (DAY / 4))
+    times = [t for t in range(first, int(get_current_timestamp()), DAY // 4)][:5]
+    trades = [[str(t // DAY), '0.5', float(t), 'b', 'l', '', 1] for t in times]
+    last = str(int((times[-1] + 1) * 1e9)) if times else str(int(since * 1e9))
+    return {'error': [], 'result': {pair: trades, 'last': last}}
+
+
+def kraken_spot_newest_ohlc(n_bars):
+    # like kraken_spot_ohlc, only the newest n_bars are returned
+    def route(query, form):
+        result = kraken_spot_ohlc(query, form)
+        pair = form['pair'][0]
+        result['result'][pair] = result['result'][pair][-n_bars:]
+        return result
+    return route
+
+
+def deribit_chart_data(query, form):
+    start = int(query['start_timestamp'][0]) // 1000
+    end = int(query['end_timestamp'][0]) // 1000
+    ticks = [t * 1000 for t in range(-(-start // DAY) * DAY, end + 1, DAY)]
+    return {'result': {'ticks': ticks, 'open': [0.1] * len(ticks), 'high': [0.2] * len(ticks),
+                       'low': [0.05] * len(ticks), 'close': [t / 1000 // DAY for t in ticks],
+                       'volume': [1.0] * len(ticks), 'status': 'ok'}}
+
+
+class TestMarketDataRestOhlcStore(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({'/public/OHLC': kraken_spot_ohlc,
+                                       '/public/Trades': kraken_spot_trades,
+                                       '/public/get_tradingview_chart_data': deribit_chart_data})
+        self.folder = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.exchange.stop()
+        self.folder.cleanup()
+
+    def test_kraken_spot(self):
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.response_cache = None
+        api.ohlc_store = OhlcStore(self.folder.name)
+
+        ohlc = api.get_ohlc(ETHUSD, interval=MINUTES_PER_DAY)
+        self.assertEqual(len(self.exchange.requests), 1)
+        self.assertEqual(len(ohlc), 720)
+        self.assertTrue(ohlc[TIME].is_monotonic_increasing)
+
+        # only the current bar, which is not over, is fetched again
+        since = int(self.exchange.requests[-1][3]['since'][0])
+        ohlc_again = api.get_ohlc(ETHUSD, interval=MINUTES_PER_DAY)
+        self.assertEqual(len(self.exchange.requests), 2)
+        self.assertGreater(int(self.exchange.requests[-1][3]['since'][0]), since)
+        self.assertEqual(ohlc_again[CLOSE].tolist(), ohlc[CLOSE].tolist())
+
+        # a past close is served from the store
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.ohlc_store = OhlcStore(self.folder.name)
+        yesterday = today_date() - datetime.timedelta(days=1)
+        yesterday_time = int(datetime.datetime.combine(yesterday, datetime.time.min).timestamp())
+        self.assertEqual(api.get_close(ETHUSD, yesterday), yesterday_time // DAY)
+        self.assertEqual(len(self.exchange.requests), 2)
+
+    def test_kraken_spot_history(self):
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        d = today_date() - datetime.timedelta(days=735)
+        d_time = int(datetime.datetime.combine(d, datetime.time.min).timestamp())
+        self.assertEqual(api.get_close(ETHUSD, d), d_time // DAY)
+        self.assertEqual({request[1] for request in self.exchange.requests}, {'/public/Trades'})
+
+        api.ohlc_store = OhlcStore(self.folder.name)
+        # interrupted after the first page
+        next(api.iter_ohlc_history(ETHUSD, d_time, d_time + 10 * DAY))
+        n_requests = len(self.exchange.requests)
+        ohlc = api.get_ohlc_history(ETHUSD, d_time, d_time + 10 * DAY)
+        self.assertEqual(ohlc[CLOSE].tolist(), [d_time // DAY + i for i in range(10)])
+        self.assertEqual(ohlc[OPEN].tolist(), ohlc[CLOSE].tolist())
+        self.assertEqual(ohlc[COUNT].tolist(), [4] * 10)
+        # it resumed after the bar it had
+        self.assertEqual(int(self.exchange.requests[n_requests][3]['since'][0]), d_time + DAY)
+
+        n_requests = len(self.exchange.requests)
+        ohlc = api.get_ohlc(ETHUSD, since=d_time + 2 * DAY, interval=MINUTES_PER_DAY)
+        self.assertEqual(ohlc[CLOSE].values[0], d_time // DAY + 2)
+        self.assertEqual(len(ohlc), (today_date() - d).days - 1)
+        self.assertEqual(self.exchange.requests[n_requests][1], '/public/Trades')
+        self.assertEqual(self.exchange.requests[-1][1], '/public/OHLC')
+
+    def test_capped_pages(self):
+        # the endpoint returns the newest bars, the one in progress included
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.OHLC_HISTORY = api.OHLC_PAGE_SIZE = 10
+        api.ohlc_store = OhlcStore(self.folder.name)
+        self.exchange.routes['/public/OHLC'] = kraken_spot_newest_ohlc(10)
+        today_time = int(get_current_timestamp()) // DAY * DAY
+        ohlc = api.get_ohlc(ETHUSD, since=today_time - 14 * DAY, interval=MINUTES_PER_DAY)
+        # the bars older than the history of the endpoint are rebuilt from the trades, none is missing
+        self.assertEqual(ohlc[CLOSE].tolist(), [today_time // DAY - 14 + i for i in range(15)])
+        self.assertEqual(api.ohlc_store.find_gaps(KRAKEN, ETHUSD, MINUTES_PER_DAY, today_time - 14 * DAY, today_time),
+                         [])
+        ohlc_requests = [request for request in self.exchange.requests if request[1] == '/public/OHLC']
+        self.assertEqual(int(ohlc_requests[-1][3]['since'][0]), today_time - 9 * DAY - 1)
+        close_date = datetime.date.fromtimestamp(today_time - 10 * DAY + DAY // 2)
+        self.assertEqual(api.get_close(ETHUSD, close_date), today_time // DAY - 10)
+
+        # a page capped before the end of the history, only the bars returned are covered
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.OHLC_HISTORY, api.OHLC_PAGE_SIZE = 10, 5
+        api.ohlc_store = OhlcStore(self.folder.name + '/capped')
+        self.exchange.routes['/public/OHLC'] = kraken_spot_newest_ohlc(5)
+        ohlc = api.get_ohlc(ETHUSD, since=today_time - 9 * DAY, interval=MINUTES_PER_DAY)
+        self.assertEqual(ohlc[CLOSE].tolist(), [today_time // DAY - 4 + i for i in range(5)])
+        self.assertEqual(api.ohlc_store.find_gaps(KRAKEN, ETHUSD, MINUTES_PER_DAY, today_time - 9 * DAY, today_time),
+                         [(today_time - 9 * DAY, today_time - 4 * DAY)])
+
+    def test_deribit_option(self):
+        api = self.exchange.connect(MarketDataRestApiDeribitOption())
+        api.ohlc_store = OhlcStore(self.folder.name)
+        d = today_date() - datetime.timedelta(days=10)
+        d_time = int(datetime.datetime.combine(d, datetime.time.min).timestamp())
+        self.assertEqual(api.get_close(OPTION_ETHUSD, d), d_time // DAY)
+        self.assertEqual(len(self.exchange.requests), 1)
+        query = self.exchange.requests[-1][2]
+        self.assertEqual(int(query['start_timestamp'][0]), d_time * 1000)
+        self.assertEqual(int(query['end_timestamp'][0]), (d_time + DAY) * 1000 - 1)
+
+        self.assertEqual(api.get_close(OPTION_ETHUSD, d), d_time // DAY)
+        self.assertEqual(len(self.exchange.requests), 1)
+
+        # the days after d are fetched, not d itself
+        ohlc = api.get_ohlc(OPTION_ETHUSD, since=d - datetime.timedelta(days=1))
+        self.assertEqual(len(self.exchange.requests), 2)
+        self.assertEqual(int(self.exchange.requests[-1][2]['start_timestamp'][0]), (d_time + DAY) * 1000)
+        self.assertEqual(ohlc[CLOSE].values[0], d_time // DAY)
+
+
+if __name__ == '__main__':
+    unittest.main()
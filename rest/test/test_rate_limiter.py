@@ -0,0 +1,89 @@
+import asyncio
+import os
+import unittest
+
+from core import root_folder
+from core.src.exceptions import ExchangeRateLimitError
+from core.src.instrument_types import SPOT, OPTION
+from core.src.markets import KRAKEN, DERIBIT
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.rate_limiter import RateLimiter, get_rate_limiter
+from rest.src.retry import CircuitBreaker
+
+
+class FakeTime:
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def make_rate_limiter(self, capacity, refill_per_second, cost=1):
+        fake_time = FakeTime()
+        rate_limiter = RateLimiter(capacity, refill_per_second, cost, clock=fake_time.clock, sleep=fake_time.sleep)
+        return rate_limiter, fake_time
+
+    def test_burst_then_refill_rate(self):
+        rate_limiter, fake_time = self.make_rate_limiter(capacity=3, refill_per_second=2)
+        for _ in range(3):
+            self.assertTrue(rate_limiter.acquire())
+        self.assertEqual(fake_time.sleeps, [])
+        for _ in range(4):
+            self.assertTrue(rate_limiter.acquire())
+        # once the burst is consumed, requests go out exactly at the refill rate
+        self.assertEqual(fake_time.sleeps, [0.5, 0.5, 0.5, 0.5])
+        self.assertEqual(rate_limiter.get_stats()['n_waits'], 4)
+
+    def test_non_blocking(self):
+        rate_limiter, fake_time = self.make_rate_limiter(capacity=1, refill_per_second=1)
+        self.assertTrue(rate_limiter.acquire(blocking=False))
+        self.assertFalse(rate_limiter.acquire(blocking=False))
+        fake_time.now += 1
+        self.assertTrue(rate_limiter.acquire(blocking=False))
+
+    def test_timeout(self):
+        rate_limiter, fake_time = self.make_rate_limiter(capacity=500, refill_per_second=100, cost=500)
+        self.assertTrue(rate_limiter.acquire())
+        self.assertFalse(rate_limiter.acquire(timeout=1))
+        self.assertTrue(rate_limiter.acquire(timeout=5))
+        self.assertEqual(fake_time.sleeps, [5.0])
+
+    def test_acquire_async(self):
+        rate_limiter = RateLimiter(capacity=1, refill_per_second=100)
+
+        async def acquire_all():
+            return await asyncio.gather(*[rate_limiter.acquire_async() for _ in range(3)])
+
+        self.assertEqual(asyncio.run(acquire_all()), [True, True, True])
+        self.assertEqual(rate_limiter.get_stats()['n_waits'], 2)
+
+    def test_configured_from_market_registry(self):
+        rate_limiter = get_rate_limiter(DERIBIT, OPTION)
+        self.assertIs(get_rate_limiter(DERIBIT, OPTION), rate_limiter)
+        self.assertEqual(rate_limiter.capacity, 50000)
+        self.assertEqual(rate_limiter.cost, 500)
+        self.assertIs(MarketDataRestApiKrakenSpot().rate_limiter, get_rate_limiter(KRAKEN, SPOT))
+
+    def test_non_blocking_client_raises(self):
+        kraken_spot_api = MarketDataRestApiKrakenSpot()
+        kraken_spot_api.circuit_breaker = CircuitBreaker(kraken_spot_api.market)
+        kraken_spot_api.rate_limiter, _ = self.make_rate_limiter(capacity=1, refill_per_second=1)
+        kraken_spot_api.rate_limiter.acquire()
+        kraken_spot_api.rate_limit_blocking = False
+        with self.assertRaises(ExchangeRateLimitError) as context:
+            kraken_spot_api.get_tob_bid(ETHUSD)
+        self.assertEqual(context.exception.message, 'Rate limit reached for KRAKEN/spot')
@@ -0,0 +1,145 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from core import root_folder
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from core.src.date import set_clock, get_current_timestamp, today_date
+from core.src.exceptions import ExchangeUnavailableError
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.request_capture import RequestRecorder, RequestReplayer, ReplayClock, set_request_capture, \
+    read_records, make_request_key
+from rest.src.request_types import make_request
+from rest.src.retry import RetryPolicy
+from rest.test.local_exchange import LocalExchange
+
+DEPTH = {'error': [], 'result': {'XETHZUSD': {'bids': [['100.5', '2.0', 1685577600]],
+                                              'asks': [['101.5', '1.0', 1685577601]]}}}
+# 2023-06-01 12:00:00 local time
+RECORDED_AT = datetime.datetime(2023, 6, 1, 12).timestamp()
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRequestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.exchange = LocalExchange({'/public/Depth': DEPTH})
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, 'day.capture')
+
+    def tearDown(self):
+        set_request_capture(None)
+        set_clock(None)
+        self.exchange.stop()
+        self.folder.cleanup()
+
+    def make_api(self):
+        api = self.exchange.connect(MarketDataRestApiKrakenSpot())
+        api.response_cache = None
+        api.retry_policy = RetryPolicy(max_retries=0)
+        return api
+
+    def record(self, calls):
+        """
+        :param calls: function, api -> anything, called while recording as of RECORDED_AT
+        """
+        recorder = RequestRecorder(self.path)
+        set_request_capture(recorder)
+        set_clock(lambda: RECORDED_AT)
+        try:
+            calls(self.make_api())
+        finally:
+            set_clock(None)
+            set_request_capture(None)
+            recorder.close()
+
+    def test_record_and_replay(self):
+        self.record(lambda api: [api.get_tob_bid(ETHUSD), api.get_orderbook(ETHUSD, 10, as_frame=False)])
+        self.assertEqual(len(list(read_records(self.path))), 2)
+        n_received = len(self.exchange.requests)
+
+        replayer = RequestReplayer(self.path)
+        set_request_capture(replayer)
+        api = self.make_api()
+        self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+        book = api.get_orderbook(ETHUSD, 10, as_frame=False)
+        self.assertEqual(book.ask_prices.tolist(), [101.5])
+        self.assertEqual(len(self.exchange.requests), n_received)
+        self.assertEqual(replayer.n_replayed, 2)
+        # the gateway timestamp is on the replay clock
+        self.assertAlmostEqual(book.gateway_timestamp / 1e6, RECORDED_AT, delta=5)
+        self.assertEqual(today_date(), datetime.date(2023, 6, 1))
+
+        set_request_capture(None)
+        self.assertGreater(get_current_timestamp(), RECORDED_AT + 86400)
+
+    def test_unknown_request(self):
+        self.record(lambda api: api.get_tob_bid(ETHUSD))
+        set_request_capture(RequestReplayer(self.path))
+        with self.assertRaises(Exception):
+            self.make_api().get_tob_bid('BTCUSD')
+
+    def test_replay_clock(self):
+        clock = FakeClock()
+        replay_clock = ReplayClock(RECORDED_AT, speed=60., clock=clock)
+        clock.now = 100.
+        self.assertEqual(replay_clock(), RECORDED_AT)
+        clock.now = 101.
+        self.assertEqual(replay_clock(), RECORDED_AT + 60.)
+
+    def test_responses_follow_the_clock(self):
+        recorder = RequestRecorder(self.path)
+        set_request_capture(recorder)
+        url = self.exchange.url + 'public/Depth'
+        for i in range(3):
+            self.exchange.routes['/public/Depth'] = {'error': [], 'result': i}
+            set_clock(lambda: RECORDED_AT + 10 * i)
+            make_request(self.make_api().session, url, params={'since': i})
+        recorder.close()
+        replayer = RequestReplayer(self.path)
+        # the times in the arguments are not matched
+        for t, expected in [(RECORDED_AT - 1, 0), (RECORDED_AT + 5, 0), (RECORDED_AT + 10, 1), (RECORDED_AT + 99, 2)]:
+            header, body = replayer.find('GET', url, {'since': 42}, t=t)
+            self.assertEqual(body, f'{{"error": [], "result": {expected}}}'.encode())
+        # unless they were recorded as is
+        self.assertEqual(replayer.find('GET', url, {'since': 1}, t=RECORDED_AT)[0]['params'], {'since': 1})
+
+    def test_no_response_is_replayed(self):
+        self.exchange.stop()
+        with self.assertRaises(ExchangeUnavailableError):
+            self.record(lambda api: api.get_tob_bid(ETHUSD))
+        set_request_capture(RequestReplayer(self.path))
+        with self.assertRaises(ExchangeUnavailableError):
+            self.make_api().get_tob_bid(ETHUSD)
+        self.exchange = LocalExchange({})
+
+    def test_cut_record_is_ignored(self):
+        self.record(lambda api: [api.get_tob_bid(ETHUSD), api.get_tob_ask(ETHUSD)])
+        with open(self.path, 'rb+') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(len(list(read_records(self.path))), 1)
+
+    def test_request_key(self):
+        self.assertEqual(make_request_key('GET', 'https://a.com/x?y=1', {'b': 1, 'a': 2}),
+                         make_request_key('GET', 'https://a.com/x', {'a': '2', 'b': '1'}))
+        self.assertNotEqual(make_request_key('GET', 'https://a.com/x', {'since': 1}),
+                            make_request_key('GET', 'https://a.com/x', {'since': 2}))
+        self.assertEqual(make_request_key('GET', 'https://a.com/x', {'since': 1}, loose=True),
+                         make_request_key('GET', 'https://a.com/x', {'since': 2}, loose=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
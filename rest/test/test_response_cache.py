@@ -0,0 +1,89 @@
+import os
+import unittest
+
+from core import root_folder
+from core.src.column_names import FEES_TAKER
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.response_cache import ResponseCache, make_cache_key
+from rest.test.local_exchange import LocalExchange
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+ASSET_PAIRS = {'error': [], 'result': {'XETHZUSD': {'fees': [[0, 0.26], [50000, 0.24]],
+                                                    'fees_maker': [[0, 0.16], [50000, 0.14]],
+                                                    'fee_volume_currency': 'ZUSD'}}}
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = ResponseCache(clock=clock)
+        key = make_cache_key('AssetPairs', data={'pair': 'XETHZUSD'})
+        self.assertIsNone(cache.get(key))
+        cache.set(key, {'result': 1}, ttl=10)
+        clock.now = 9
+        self.assertEqual(cache.get(key), {'result': 1})
+        clock.now = 10
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 2, 'evictions': 0, 'size': 0})
+
+    def test_key(self):
+        self.assertEqual(make_cache_key('OHLC', data={'pair': 'XETHZUSD', 'interval': 1440}),
+                         make_cache_key('OHLC', data={'interval': 1440, 'pair': 'XETHZUSD'}))
+        self.assertNotEqual(make_cache_key('OHLC', data={'pair': 'XETHZUSD'}),
+                            make_cache_key('OHLC', params={'pair': 'XETHZUSD'}))
+
+    def test_lru(self):
+        cache = ResponseCache(max_size=2)
+        cache.set('a', 1, ttl=10)
+        cache.set('b', 2, ttl=10)
+        cache.get('a')
+        cache.set('c', 3, ttl=10)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_invalidate(self):
+        cache = ResponseCache()
+        cache.set(make_cache_key('AssetPairs'), 1, ttl=10)
+        cache.set(make_cache_key('OHLC'), 2, ttl=10)
+        cache.invalidate('Asset')
+        self.assertIsNone(cache.get(make_cache_key('AssetPairs')))
+        self.assertEqual(cache.get(make_cache_key('OHLC')), 2)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_fee_schedule_is_cached(self):
+        exchange = LocalExchange({'/public/AssetPairs': ASSET_PAIRS})
+        try:
+            kraken_spot_api = exchange.connect(MarketDataRestApiKrakenSpot())
+            fees = kraken_spot_api.get_fee_schedule(ETHUSD)
+            self.assertEqual(kraken_spot_api.get_fee_schedule(ETHUSD), fees)
+            self.assertEqual(fees[FEES_TAKER], [[0, 0.26], [50000, 0.24]])
+            self.assertEqual(len(exchange.requests), 1)
+            self.assertEqual(kraken_spot_api.response_cache.get_stats()['hits'], 1)
+
+            kraken_spot_api.response_cache.invalidate()
+            kraken_spot_api.get_fee_schedule(ETHUSD)
+            self.assertEqual(len(exchange.requests), 2)
+
+            kraken_spot_api.response_cache = None
+            kraken_spot_api.get_fee_schedule(ETHUSD)
+            self.assertEqual(len(exchange.requests), 3)
+        finally:
+            exchange.stop()
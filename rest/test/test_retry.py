@@ -0,0 +1,169 @@
+import os
+import unittest
+
+from core import root_folder
+from core.src.exceptions import ExchangeRequestError, ExchangeRateLimitError, ExchangeUnavailableError, \
+    CircuitOpenError
+from core.src.spot_syms import ETHUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from rest.src.market_data_rest_deribit_option import MarketDataRestApiDeribitOption
+from rest.src.market_data_rest_kraken_future import MarketDataRestApiKrakenFuture
+from rest.src.market_data_rest_kraken_spot import MarketDataRestApiKrakenSpot
+from rest.src.rate_limiter import RateLimiter
+from rest.src.retry import RetryPolicy, CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from rest.test.local_exchange import LocalExchange
+
+DEPTH = {'error': [], 'result': {'XETHZUSD': {'bids': [['100.5', '2.0', 1700000000]],
+                                              'asks': [['101.5', '1.0', 1700000001]]}}}
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_responses(*responses):
+    """
+    :return: function, a route answering the given responses one after the other, the last one is then repeated
+    """
+    responses = list(responses)
+
+    def route(query, form):
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    return route
+
+
+class TestRetry(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.exchange = LocalExchange({})
+
+    def tearDown(self):
+        self.exchange.stop()
+
+    def make_api(self, api_class, failure_threshold=5):
+        api = self.exchange.connect(api_class())
+        api.retry_policy = RetryPolicy(max_retries=3, sleep=self.sleeps.append)
+        api.circuit_breaker = CircuitBreaker(api.market, failure_threshold=failure_threshold)
+        return api
+
+    def test_retry_policy_delays(self):
+        retry_policy = RetryPolicy(base_delay=1, max_delay=5, uniform=lambda a, b: b)
+        error = ExchangeUnavailableError('KRAKEN', 'down')
+        self.assertEqual([retry_policy.get_delay(attempt, error) for attempt in range(5)], [1, 2, 4, 5, 5])
+        retry_policy = RetryPolicy(rate_limit_delay=3, uniform=lambda a, b: a)
+        self.assertEqual(retry_policy.get_delay(0, ExchangeRateLimitError('KRAKEN', 'slow down')), 3)
+
+    def test_kraken_error_with_200_is_not_retried(self):
+        self.exchange.routes['/public/Depth'] = {'error': ['EQuery:Unknown asset pair'], 'result': {}}
+        api = self.make_api(MarketDataRestApiKrakenSpot)
+        with self.assertRaises(ExchangeRequestError) as context:
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(context.exception.message, 'EQuery:Unknown asset pair')
+        self.assertEqual(len(self.exchange.requests), 1)
+
+    def test_5xx_is_retried(self):
+        self.exchange.routes['/public/Depth'] = make_responses((502, 'Bad Gateway'), (503, {'error': []}), DEPTH)
+        api = self.make_api(MarketDataRestApiKrakenSpot)
+        self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+        self.assertEqual(len(self.exchange.requests), 3)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(api.circuit_breaker.state, CLOSED)
+
+    def test_rate_limit_gives_up(self):
+        self.exchange.routes['/public/Depth'] = {'error': ['EAPI:Rate limit exceeded']}
+        api = self.make_api(MarketDataRestApiKrakenSpot)
+        with self.assertRaises(ExchangeRateLimitError):
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(len(self.exchange.requests), 4)
+        # being rate limited does not mean that the exchange is down
+        self.assertEqual(api.circuit_breaker.n_failures, 0)
+
+    def test_kraken_future_and_deribit_errors(self):
+        self.exchange.routes['/derivatives/api/v3/orderbook'] = {'result': 'error', 'error': 'apiLimitExceeded'}
+        api = self.make_api(MarketDataRestApiKrakenFuture)
+        with self.assertRaises(ExchangeRateLimitError):
+            api.get_tob_bid('FUT_ETHUSD_230630')
+
+        self.exchange.routes['/public/get_order_book'] = (400, {'jsonrpc': '2.0', 'error': {
+            'code': 10009, 'message': 'invalid_argument'}})
+        api = self.make_api(MarketDataRestApiDeribitOption)
+        with self.assertRaises(ExchangeRequestError) as context:
+            api.get_tob_bid('C_ETHUSD_230630_1200')
+        self.assertEqual(context.exception.status_code, 400)
+        self.assertEqual(context.exception.message, '10009: invalid_argument')
+
+    def test_circuit_breaker_fails_fast(self):
+        self.exchange.routes['/public/Depth'] = (503, 'Service Unavailable')
+        api = self.make_api(MarketDataRestApiKrakenSpot, failure_threshold=2)
+        with self.assertRaises(ExchangeUnavailableError):
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(len(self.exchange.requests), 2)
+        self.assertEqual(api.circuit_breaker.state, OPEN)
+        with self.assertRaises(CircuitOpenError):
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(len(self.exchange.requests), 2)
+
+    def test_circuit_breaker_recovers(self):
+        clock = FakeClock()
+        circuit_breaker = CircuitBreaker('KRAKEN', failure_threshold=1, reset_timeout=10, clock=clock)
+        circuit_breaker.record_failure()
+        self.assertRaises(CircuitOpenError, circuit_breaker.before_request)
+        clock.now = 10
+        circuit_breaker.before_request()
+        self.assertEqual(circuit_breaker.state, HALF_OPEN)
+        # only one trial request is let through
+        self.assertRaises(CircuitOpenError, circuit_breaker.before_request)
+        circuit_breaker.record_failure()
+        self.assertEqual(circuit_breaker.state, OPEN)
+        clock.now = 20
+        circuit_breaker.before_request()
+        circuit_breaker.record_success()
+        self.assertEqual(circuit_breaker.state, CLOSED)
+        circuit_breaker.before_request()
+
+    def test_trial_request_answered_with_an_error_closes_the_circuit(self):
+        clock = FakeClock()
+        self.exchange.routes['/public/Depth'] = make_responses(
+            (503, 'Service Unavailable'), {'error': ['EQuery:Unknown asset pair'], 'result': {}}, DEPTH)
+        api = self.make_api(MarketDataRestApiKrakenSpot)
+        api.circuit_breaker = CircuitBreaker(api.market, failure_threshold=1, reset_timeout=10, clock=clock)
+        with self.assertRaises(ExchangeUnavailableError):
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(api.circuit_breaker.state, OPEN)
+        clock.now = 10
+        with self.assertRaises(ExchangeRequestError):
+            api.get_tob_bid(ETHUSD)
+        # the exchange answered, it is up
+        self.assertEqual(api.circuit_breaker.state, CLOSED)
+        self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+        self.assertEqual(len(self.exchange.requests), 3)
+
+    def test_trial_request_not_sent_is_released(self):
+        clock = FakeClock()
+        self.exchange.routes['/public/Depth'] = make_responses((503, 'Service Unavailable'), DEPTH)
+        api = self.make_api(MarketDataRestApiKrakenSpot)
+        api.circuit_breaker = CircuitBreaker(api.market, failure_threshold=1, reset_timeout=10, clock=clock)
+        with self.assertRaises(ExchangeUnavailableError):
+            api.get_tob_bid(ETHUSD)
+        clock.now = 10
+        rate_limiter = RateLimiter(capacity=1, refill_per_second=1e-9, clock=clock)
+        rate_limiter.tokens = 0
+        api.rate_limiter, api.rate_limit_blocking = rate_limiter, False
+        with self.assertRaises(ExchangeRateLimitError):
+            api.get_tob_bid(ETHUSD)
+        self.assertEqual(api.circuit_breaker.state, OPEN)
+        # the next request is the trial
+        api.rate_limiter = None
+        self.assertEqual(api.get_tob_bid(ETHUSD), 100.5)
+        self.assertEqual(api.circuit_breaker.state, CLOSED)
+        self.assertEqual(len(self.exchange.requests), 2)
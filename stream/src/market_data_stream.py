@@ -0,0 +1,423 @@
+import asyncio
+import datetime
+import inspect
+import json
+from abc import ABC, abstractmethod
+from collections import deque
+
+import aiohttp
+
+from core.src.column_names import SYM, BID, BID_SIZE, ASK, ASK_SIZE, MID, SPREAD, MARKET_TIMESTAMP, GATEWAY_TIMESTAMP
+from core.src.date import get_current_timestamp
+from core.src.instruments import get_instrument_registry
+from rest.src.api_utils import get_ws_url
+from rest.src.json_decode import loads
+
+# channels that can be subscribed to
+BOOK = 'book'
+TICKER = 'ticker'
+
+# number of errors kept by a stream, and their maximum length, the messages of the exchange they quote are cut
+N_ERRORS = 100
+MAX_ERROR_LENGTH = 300
+
+
+class Subscription:
+    """
+    A channel of a sym, with the callbacks of its updates
+    """
+    __slots__ = ['channel', 'sym', 'n_levels', 'callbacks']
+
+    def __init__(self, channel, sym, n_levels=None):
+        """
+
+        :param channel: str, BOOK or TICKER
+        :param sym: str
+        :param n_levels: int, number of levels of the books, None for the ticker
+        """
+        self.channel = channel
+        self.sym = sym
+        self.n_levels = n_levels
+        self.callbacks = []
+
+    def __repr__(self):
+        return f'Subscription({self.channel}, {self.sym}, n_levels={self.n_levels})'
+
+
+class SubscriptionManager:
+    """
+    The subscriptions of a stream, they are kept across connections so that they can be sent again on reconnect
+    """
+
+    def __init__(self):
+        # (channel, sym) -> Subscription
+        self.subscriptions = {}
+
+    def __iter__(self):
+        return iter(list(self.subscriptions.values()))
+
+    def __len__(self):
+        return len(self.subscriptions)
+
+    def get(self, channel, sym):
+        """
+        :param channel: str
+        :param sym: str
+        :return: Subscription, None if not subscribed
+        """
+        return self.subscriptions.get((channel, sym))
+
+    def add(self, channel, sym, n_levels=None, callback=None):
+        """
+        :param channel: str
+        :param sym: str
+        :param n_levels: int
+        :param callback: function, optional
+        :return: tuple, (Subscription, bool True if it is new and has to be sent to the exchange)
+        """
+        subscription = self.subscriptions.get((channel, sym))
+        is_new = subscription is None
+        if is_new:
+            subscription = Subscription(channel, sym, n_levels)
+            self.subscriptions[(channel, sym)] = subscription
+        elif n_levels is not None and n_levels > subscription.n_levels:
+            raise Exception(f'{sym} is already subscribed with {subscription.n_levels} levels, unsubscribe first')
+        if callback is not None:
+            subscription.callbacks.append(callback)
+        return subscription, is_new
+
+    def remove(self, channel, sym):
+        """
+        :param channel: str
+        :param sym: str
+        :return: Subscription, None if it was not subscribed
+        """
+        return self.subscriptions.pop((channel, sym), None)
+
+
+def make_tob_quote(sym, bid, bid_size, ask, ask_size, market_timestamp):
+    """
+    :param sym: str
+    :param bid: float
+    :param bid_size: float
+    :param ask: float
+    :param ask_size: float
+    :param market_timestamp: datetime.datetime
+    :return: dict, with the keys of MarketDataRestApi.get_tob_quote and SYM
+    """
+    bid = float(bid)
+    ask = float(ask)
+    return {SYM: sym,
+            BID: bid,
+            BID_SIZE: float(bid_size),
+            ASK: ask,
+            ASK_SIZE: float(ask_size),
+            MID: 0.5 * (bid + ask),
+            SPREAD: ask - bid,
+            MARKET_TIMESTAMP: market_timestamp,
+            GATEWAY_TIMESTAMP: datetime.datetime.fromtimestamp(get_current_timestamp())}
+
+
+class MarketDataStreamApi(ABC):
+    """
+    A base class for all Market Data streaming APIs, over websocket
+    Child classes names should be MarketDataStreamApi<Market><InstrumentType>
+
+    The books are pushed as OrderBook, like get_orderbook(as_frame=False), and the tickers as dicts with the keys of
+    get_tob_quote and SYM. They are passed to the callbacks of their subscription and, if the stream is iterated
+    over, queued for the iterator:
+
+        async with MarketDataStreamApiKrakenSpot() as stream:
+            await stream.subscribe_orderbook(ETHUSD, 10)
+            async for update in stream:
+                ...
+
+    The connection is opened again with an exponential backoff when it drops or goes silent, and every subscription is
+    sent again. The books are rebuilt from the new snapshots.
+    """
+
+    def __init__(self,
+                 market,
+                 instrument_type,
+                 heartbeat=30.,
+                 stale_timeout=60.,
+                 reconnect_delay=0.5,
+                 max_reconnect_delay=30.,
+                 max_queue_size=10000):
+        """
+
+        :param market: str
+        :param instrument_type: str
+        :param heartbeat: float, in seconds, interval of the websocket pings
+        :param stale_timeout: float, in seconds, the connection is dropped if nothing is received for that long
+        :param reconnect_delay: float, in seconds, first delay before reconnecting, doubled at each failure
+        :param max_reconnect_delay: float, in seconds
+        :param max_queue_size: int, updates of the iterator, the oldest ones are dropped when it is full
+        """
+        self.market = market
+        self.instrument_type = instrument_type
+        self.ws_url = get_ws_url(market, instrument_type)
+        self.heartbeat = heartbeat
+        self.stale_timeout = stale_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.max_queue_size = max_queue_size
+        self.subscriptions = SubscriptionManager()
+        # the names of the syms on the exchange are formatted once per process, see get_market_sym
+        self.sym_namespace = (market, instrument_type)
+        # sym -> L2Book, cleared on each connection
+        self.books = {}
+        # created from within the event loop
+        self.session = None
+        self.ws = None
+        self.task = None
+        self.connected = None
+        # created when the stream is iterated over
+        self.queue = None
+        self.closed = False
+        self.n_connections = 0
+        self.n_messages = 0
+        self.n_dropped_updates = 0
+        # books dropped and subscribed again after a lost update or a wrong checksum
+        self.n_resyncs = 0
+        # the last errors sent by the exchange or met while handling its messages, see _add_error
+        self.errors = deque(maxlen=N_ERRORS)
+        self.n_errors = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __aiter__(self):
+        if self.queue is None:
+            self.queue = asyncio.Queue()
+        return self
+
+    async def __anext__(self):
+        update = await self.queue.get()
+        if update is None:
+            raise StopAsyncIteration
+        return update
+
+    async def start(self):
+        """
+        Connect in the background, the subscriptions can be made before or after
+        """
+        if self.task is None:
+            self.closed = False
+            self.connected = asyncio.Event()
+            self.task = asyncio.create_task(self.run())
+
+    async def wait_connected(self, timeout=None):
+        """
+        :param timeout: float, in seconds
+        """
+        await asyncio.wait_for(self.connected.wait(), timeout)
+
+    async def close(self):
+        """
+        Close the connection and stop the iterators
+        """
+        self.closed = True
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        if self.queue is not None:
+            self.queue.put_nowait(None)
+
+    async def run(self):
+        """
+        Stay connected until close is called
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        delay = self.reconnect_delay
+        while not self.closed:
+            try:
+                async with self.session.ws_connect(self.ws_url, heartbeat=self.heartbeat) as ws:
+                    self.ws = ws
+                    self.n_connections += 1
+                    delay = self.reconnect_delay
+                    self.books.clear()
+                    for message in self._connect_messages():
+                        await self._send(message)
+                    for subscription in self.subscriptions:
+                        for message in self._subscribe_messages(subscription):
+                            await self._send(message)
+                    self.connected.set()
+                    await self._read(ws)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as error:
+                self._add_error(f'Connection to {self.ws_url} failed: {error!r}')
+            finally:
+                self.ws = None
+                self.connected.clear()
+            if self.closed:
+                break
+            await asyncio.sleep(delay)
+            delay = min(2 * delay, self.max_reconnect_delay)
+
+    async def _read(self, ws):
+        while True:
+            message = await ws.receive(timeout=self.stale_timeout)
+            if message.type != aiohttp.WSMsgType.TEXT:
+                # closed or error, the caller reconnects
+                return
+            self.n_messages += 1
+            try:
+                await self._on_message(loads(message.data))
+            except Exception as error:
+                self._add_error(f'Failed to handle {message.data[:MAX_ERROR_LENGTH]}: {error!r}')
+
+    def _add_error(self, error):
+        """
+        :param error: str, cut to MAX_ERROR_LENGTH
+        """
+        self.n_errors += 1
+        self.errors.append(error if len(error) <= MAX_ERROR_LENGTH else error[:MAX_ERROR_LENGTH] + '...')
+
+    async def _send(self, message):
+        """
+        :param message: json
+        """
+        if self.ws is not None and not self.ws.closed:
+            await self.ws.send_str(json.dumps(message))
+
+    async def _emit(self, subscription, update):
+        """
+        Pass an update to the callbacks of its subscription and to the iterator
+
+        :param subscription: Subscription
+        :param update: OrderBook or dict
+        """
+        for callback in subscription.callbacks:
+            result = callback(update)
+            if inspect.isawaitable(result):
+                await result
+        if self.queue is not None:
+            if self.queue.qsize() >= self.max_queue_size:
+                self.queue.get_nowait()
+                self.n_dropped_updates += 1
+            self.queue.put_nowait(update)
+
+    async def subscribe_orderbook(self, sym, n_levels, callback=None):
+        """
+        :param sym: str
+        :param n_levels: int
+        :param callback: function, optional, called with each OrderBook, can be a coroutine function
+        :return: Subscription
+        """
+        return await self._subscribe(BOOK, sym, n_levels, callback)
+
+    async def subscribe_tob_quote(self, sym, callback=None):
+        """
+        :param sym: str
+        :param callback: function, optional, called with each quote, see make_tob_quote, can be a coroutine function
+        :return: Subscription
+        """
+        return await self._subscribe(TICKER, sym, None, callback)
+
+    async def _subscribe(self, channel, sym, n_levels, callback):
+        # checks the format of the sym
+        self.get_market_sym(sym)
+        subscription, is_new = self.subscriptions.add(channel, sym, n_levels, callback)
+        if is_new:
+            for message in self._subscribe_messages(subscription):
+                await self._send(message)
+        return subscription
+
+    async def unsubscribe_orderbook(self, sym):
+        """
+        :param sym: str
+        """
+        await self._unsubscribe(BOOK, sym)
+
+    async def unsubscribe_tob_quote(self, sym):
+        """
+        :param sym: str
+        """
+        await self._unsubscribe(TICKER, sym)
+
+    async def _unsubscribe(self, channel, sym):
+        subscription = self.subscriptions.remove(channel, sym)
+        if subscription is None:
+            raise Exception(f'{sym} is not subscribed to {channel}')
+        for message in self._unsubscribe_messages(subscription):
+            await self._send(message)
+        if channel == BOOK:
+            self.books.pop(sym, None)
+
+    async def _resync(self, subscription):
+        """
+        Drop the book and subscribe again to get a new snapshot
+
+        :param subscription: Subscription
+        """
+        self.n_resyncs += 1
+        self.books.pop(subscription.sym, None)
+        for message in self._unsubscribe_messages(subscription) + self._subscribe_messages(subscription):
+            await self._send(message)
+
+    def _connect_messages(self):
+        """
+        :return: list, of json messages sent on each connection before the subscriptions, eg: to set up the heartbeat
+        """
+        return []
+
+    def get_market_sym(self, sym):
+        """
+        Same as format_sym_for_market, the name is only formatted the first time, see InstrumentRegistry
+
+        :param sym: str
+        :return: str
+        """
+        return get_instrument_registry().get_market_sym(self.sym_namespace, sym, self.format_sym_for_market)
+
+    def get_sym(self, market_sym):
+        """
+        Same as format_sym_back, the sym is only formatted the first time, see InstrumentRegistry
+
+        :param market_sym: str
+        :return: str
+        """
+        return get_instrument_registry().get_sym(self.sym_namespace, market_sym, self.format_sym_back)
+
+    @abstractmethod
+    def format_sym_for_market(self, sym):
+        pass
+
+    @abstractmethod
+    def format_sym_back(self, sym):
+        pass
+
+    @abstractmethod
+    def _subscribe_messages(self, subscription):
+        """
+        :param subscription: Subscription
+        :return: list, of json messages
+        """
+        pass
+
+    @abstractmethod
+    def _unsubscribe_messages(self, subscription):
+        """
+        :param subscription: Subscription
+        :return: list, of json messages
+        """
+        pass
+
+    @abstractmethod
+    async def _on_message(self, message):
+        """
+        :param message: json, a message received from the exchange
+        """
+        pass
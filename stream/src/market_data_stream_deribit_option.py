@@ -0,0 +1,145 @@
+import datetime
+
+from core.src.column_names import BIDS, ASKS, TIMESTAMP, UNDERLYING_PRICE
+from core.src.instrument_types import OPTION
+from core.src.l2_book import L2Book
+from core.src.markets import DERIBIT
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+from stream.src.market_data_stream import MarketDataStreamApi, make_tob_quote, BOOK, TICKER
+
+# depths the book channel can be subscribed with
+BOOK_DEPTHS = [1, 10, 20]
+# the shortest interval of the public channels, raw requires to be authenticated
+INTERVAL = "100ms"
+# the shortest heartbeat interval accepted, in seconds
+MIN_HEARTBEAT = 10
+
+
+def get_book_depth(n_levels):
+    """
+    :param n_levels: int
+    :return: int, the smallest depth of the book channel with at least n_levels
+    """
+    for depth in BOOK_DEPTHS:
+        if depth >= n_levels:
+            return depth
+    raise Exception(f'Deribit books have at most {BOOK_DEPTHS[-1]} levels, not {n_levels}')
+
+
+class MarketDataStreamApiDeribitOption(MarketDataStreamApi):
+    """
+    Deribit option websocket api, json-rpc
+
+    The book.* channels send the first levels of the book at each interval. The prices are in coin, like on the rest
+    api they are converted to usd with the underlying price, which comes from the ticker of the option: it is
+    subscribed to along with the book and the books are pushed once the first ticker is received.
+    """
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: see MarketDataStreamApi
+        """
+        super().__init__(DERIBIT, OPTION, **kwargs)
+        # the instruments have the same names on the rest api
+        self.rest_api = get_market_data_rest_api(DERIBIT, OPTION)
+        # sym -> underlying price of the last ticker
+        self.underlying_prices = {}
+        self.request_id = 0
+
+    def format_sym_for_market(self, sym):
+        """
+        :param sym: str, eg: C_ETHUSD_230526_1200
+        :return: str, eg: ETH-26MAY23-1200-C
+        """
+        return self.rest_api.format_sym_for_market(sym)
+
+    def format_sym_back(self, sym):
+        """
+        :param sym: str, eg: ETH-26MAY23-1200-C
+        :return: str, eg: C_ETHUSD_230526_1200
+        """
+        return self.rest_api.format_sym_back(sym)
+
+    def _request(self, method, params):
+        self.request_id += 1
+        return {"jsonrpc": "2.0", "id": self.request_id, "method": method, "params": params}
+
+    def _connect_messages(self):
+        # the exchange then sends test requests that have to be answered
+        return [self._request("public/set_heartbeat", {"interval": max(MIN_HEARTBEAT, int(self.heartbeat))})]
+
+    def _book_channel(self, subscription):
+        depth = get_book_depth(subscription.n_levels)
+        return f'{BOOK}.{self.get_market_sym(subscription.sym)}.none.{depth}.{INTERVAL}'
+
+    def _ticker_channel(self, sym):
+        return f'{TICKER}.{self.get_market_sym(sym)}.{INTERVAL}'
+
+    def _subscribe_messages(self, subscription):
+        channels = [self._ticker_channel(subscription.sym)]
+        if subscription.channel == BOOK:
+            channels.append(self._book_channel(subscription))
+        return [self._request("public/subscribe", {"channels": channels})]
+
+    def _unsubscribe_messages(self, subscription):
+        channels = []
+        if subscription.channel == BOOK:
+            channels.append(self._book_channel(subscription))
+            self.underlying_prices.pop(subscription.sym, None)
+        # the ticker is kept for the other subscription of the sym if any
+        other_channel = TICKER if subscription.channel == BOOK else BOOK
+        if self.subscriptions.get(other_channel, subscription.sym) is None:
+            channels.append(self._ticker_channel(subscription.sym))
+        return [self._request("public/unsubscribe", {"channels": channels})]
+
+    async def _on_message(self, message):
+        if "error" in message:
+            self._add_error(f'{self.market} error: {message["error"]}')
+            return
+        method = message.get("method")
+        if method == "heartbeat":
+            if message["params"]["type"] == "test_request":
+                await self._send(self._request("public/test", {}))
+        elif method == "subscription":
+            channel = message["params"]["channel"]
+            data = message["params"]["data"]
+            sym = self.get_sym(channel.split(".")[1])
+            if channel.startswith(BOOK + "."):
+                await self._on_book(sym, data)
+            elif channel.startswith(TICKER + "."):
+                await self._on_ticker(sym, data)
+
+    async def _on_book(self, sym, data):
+        subscription = self.subscriptions.get(BOOK, sym)
+        if subscription is None:
+            return
+        # each message is a snapshot of the first levels
+        book = self.books.get(sym)
+        if book is None:
+            book = L2Book(sym, self.market, subscription.n_levels)
+            self.books[sym] = book
+        book.apply_snapshot(data[BIDS], data[ASKS], int(data[TIMESTAMP]) * 1000)
+        await self._emit_book(subscription)
+
+    async def _emit_book(self, subscription):
+        book = self.books.get(subscription.sym)
+        underlying_price = self.underlying_prices.get(subscription.sym)
+        if book is not None and underlying_price is not None:
+            await self._emit(subscription, book.to_orderbook(underlying_price))
+
+    async def _on_ticker(self, sym, data):
+        underlying_price = data[UNDERLYING_PRICE]
+        is_first = sym not in self.underlying_prices
+        self.underlying_prices[sym] = underlying_price
+        book_subscription = self.subscriptions.get(BOOK, sym)
+        if is_first and book_subscription is not None:
+            # the book received before the first ticker
+            await self._emit_book(book_subscription)
+        subscription = self.subscriptions.get(TICKER, sym)
+        if subscription is None:
+            return
+        market_timestamp = datetime.datetime.fromtimestamp(int(data[TIMESTAMP]) / 1000)
+        await self._emit(subscription, make_tob_quote(sym, data["best_bid_price"] * underlying_price,
+                                                      data["best_bid_amount"], data["best_ask_price"] * underlying_price,
+                                                      data["best_ask_amount"], market_timestamp))
@@ -0,0 +1,27 @@
+from core.src.exceptions import raise_instrument_type_not_supported_for_market_exception
+from core.src.instrument_types import SPOT, FUTURE, OPTION
+from core.src.markets import KRAKEN, DERIBIT
+from stream.src.market_data_stream_deribit_option import MarketDataStreamApiDeribitOption
+from stream.src.market_data_stream_kraken_future import MarketDataStreamApiKrakenFuture
+from stream.src.market_data_stream_kraken_spot import MarketDataStreamApiKrakenSpot
+
+MARKET_DATA_STREAM_APIS = {
+    (KRAKEN, SPOT): MarketDataStreamApiKrakenSpot,
+    (KRAKEN, FUTURE): MarketDataStreamApiKrakenFuture,
+    (DERIBIT, OPTION): MarketDataStreamApiDeribitOption,
+}
+
+
+def make_market_data_stream_api(market, instrument_type, **kwargs):
+    """
+    Unlike the rest clients, streams are not shared: each one holds its own connection and subscriptions
+
+    :param market: str, eg: KRAKEN
+    :param instrument_type: str, eg: SPOT
+    :param kwargs: see MarketDataStreamApi
+    :return: MarketDataStreamApi
+    """
+    key = (market, instrument_type)
+    if key not in MARKET_DATA_STREAM_APIS:
+        raise_instrument_type_not_supported_for_market_exception(instrument_type, market)
+    return MARKET_DATA_STREAM_APIS[key](**kwargs)
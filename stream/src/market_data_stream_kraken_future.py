@@ -0,0 +1,105 @@
+import datetime
+
+from core.src.column_names import BIDS, ASKS, PRICE
+from core.src.instrument_types import FUTURE
+from core.src.l2_book import L2Book
+from core.src.markets import KRAKEN
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+from stream.src.market_data_stream import MarketDataStreamApi, make_tob_quote, BOOK, TICKER
+
+BOOK_SNAPSHOT = "book_snapshot"
+HEARTBEAT = "heartbeat"
+
+
+class MarketDataStreamApiKrakenFuture(MarketDataStreamApi):
+    """
+    Kraken futures websocket api
+
+    The book feed sends a snapshot of the whole book and then one message per updated level, numbered by seq. A gap in
+    the numbers means an update was lost, the book is then subscribed again to get a new snapshot.
+    """
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: see MarketDataStreamApi
+        """
+        super().__init__(KRAKEN, FUTURE, **kwargs)
+        # the products have the same names on the rest api
+        self.rest_api = get_market_data_rest_api(KRAKEN, FUTURE)
+        # sym -> seq of the last book message
+        self.seqs = {}
+
+    def format_sym_for_market(self, sym):
+        """
+        :param sym: str, eg: FUT_BTCUSD_230630
+        :return: str, eg: FI_XBTUSD_230630
+        """
+        return self.rest_api.format_sym_for_market(sym)
+
+    def format_sym_back(self, sym):
+        """
+        :param sym: str, eg: FI_XBTUSD_230630
+        :return: str, eg: FUT_BTCUSD_230630
+        """
+        return self.rest_api.format_sym_back(sym)
+
+    def _connect_messages(self):
+        # without it the connection is closed after a minute without subscription
+        return [{"event": "subscribe", "feed": HEARTBEAT}]
+
+    def _subscribe_messages(self, subscription):
+        return [{"event": "subscribe", "feed": subscription.channel,
+                 "product_ids": [self.get_market_sym(subscription.sym)]}]
+
+    def _unsubscribe_messages(self, subscription):
+        return [{"event": "unsubscribe", "feed": subscription.channel,
+                 "product_ids": [self.get_market_sym(subscription.sym)]}]
+
+    async def _on_message(self, message):
+        if message.get("event") == "error" or message.get("event") == "alert":
+            self._add_error(f'{self.market} error: {message.get("message")}')
+            return
+        feed = message.get("feed")
+        if feed == BOOK_SNAPSHOT:
+            await self._on_book_snapshot(message)
+        elif feed == BOOK:
+            await self._on_book_update(message)
+        elif feed == TICKER:
+            await self._on_ticker(message)
+
+    async def _on_book_snapshot(self, message):
+        sym = self.get_sym(message["product_id"])
+        subscription = self.subscriptions.get(BOOK, sym)
+        if subscription is None:
+            return
+        book = L2Book(sym, self.market, subscription.n_levels)
+        book.apply_snapshot([(level[PRICE], level["qty"]) for level in message[BIDS]],
+                            [(level[PRICE], level["qty"]) for level in message[ASKS]],
+                            int(message["timestamp"]) * 1000)
+        self.books[sym] = book
+        self.seqs[sym] = message["seq"]
+        await self._emit(subscription, book.to_orderbook())
+
+    async def _on_book_update(self, message):
+        sym = self.get_sym(message["product_id"])
+        subscription = self.subscriptions.get(BOOK, sym)
+        book = self.books.get(sym)
+        if subscription is None or book is None:
+            return
+        if message["seq"] != self.seqs[sym] + 1:
+            await self._resync(subscription)
+            return
+        self.seqs[sym] = message["seq"]
+        book.update(message["side"] == "buy", float(message[PRICE]), float(message["qty"]))
+        book.market_timestamp = int(message["timestamp"]) * 1000
+        await self._emit(subscription, book.to_orderbook())
+
+    async def _on_ticker(self, message):
+        sym = self.get_sym(message["product_id"])
+        subscription = self.subscriptions.get(TICKER, sym)
+        if subscription is None:
+            return
+        market_timestamp = datetime.datetime.fromtimestamp(int(message["time"]) / 1000)
+        await self._emit(subscription, make_tob_quote(sym, message["bid"], message["bid_size"], message["ask"],
+                                                      message["ask_size"], market_timestamp))
@@ -0,0 +1,127 @@
+import datetime
+
+from core.src.instrument_types import SPOT
+from core.src.l2_book import L2Book
+from core.src.markets import KRAKEN
+from core.src.orderbook import seconds_to_micros
+from core.src.spot_syms import split_currency_pair_into_lhs_rhs, check_currency_pair_spot, BTC
+from rest.src.market_data_rest_factory import get_market_data_rest_api
+from stream.src.market_data_stream import MarketDataStreamApi, make_tob_quote, BOOK, TICKER
+
+# depths the book channel can be subscribed with
+BOOK_DEPTHS = [10, 25, 100, 500, 1000]
+
+
+def get_book_depth(n_levels):
+    """
+    :param n_levels: int
+    :return: int, the smallest depth of the book channel with at least n_levels
+    """
+    for depth in BOOK_DEPTHS:
+        if depth >= n_levels:
+            return depth
+    raise Exception(f'Kraken books have at most {BOOK_DEPTHS[-1]} levels, not {n_levels}')
+
+
+class MarketDataStreamApiKrakenSpot(MarketDataStreamApi):
+    """
+    Kraken spot websocket api, v1
+
+    The book channel sends a snapshot and then the updated levels, the levels that fall beyond the subscribed depth
+    are not removed by the exchange so the book is truncated after each update. The updates come with the checksum of
+    the first levels: a book that does not match it is out of sync and is subscribed again.
+    """
+
+    def __init__(self, **kwargs):
+        """
+
+        :param kwargs: see MarketDataStreamApi
+        """
+        super().__init__(KRAKEN, SPOT, **kwargs)
+        # the pairs are not named like on the rest api
+        self.sym_namespace = (KRAKEN, SPOT, 'ws')
+        # for the formatting of the currencies only
+        self.rest_api = get_market_data_rest_api(KRAKEN, SPOT)
+
+    def format_sym_for_market(self, sym):
+        """
+        :param sym: str, eg: BTCUSD
+        :return: str, eg: XBT/USD
+        """
+        crypto, fiat = split_currency_pair_into_lhs_rhs(check_currency_pair_spot(sym))
+        if crypto == BTC:
+            crypto = "XBT"
+        return crypto + "/" + fiat
+
+    def format_sym_back(self, sym):
+        """
+        :param sym: str, eg: XBT/USD
+        :return: str, eg: BTCUSD
+        """
+        crypto, fiat = sym.split("/")
+        return self.rest_api.format_crypto_back(crypto) + self.rest_api.format_fiat_back(fiat)
+
+    def _subscription_body(self, subscription):
+        if subscription.channel == BOOK:
+            return {"name": BOOK, "depth": get_book_depth(subscription.n_levels)}
+        return {"name": TICKER}
+
+    def _subscribe_messages(self, subscription):
+        return [{"event": "subscribe", "pair": [self.get_market_sym(subscription.sym)],
+                 "subscription": self._subscription_body(subscription)}]
+
+    def _unsubscribe_messages(self, subscription):
+        return [{"event": "unsubscribe", "pair": [self.get_market_sym(subscription.sym)],
+                 "subscription": self._subscription_body(subscription)}]
+
+    async def _on_message(self, message):
+        if isinstance(message, dict):
+            # heartbeat, systemStatus, subscriptionStatus, pong
+            if message.get("status") == "error" or message.get("event") == "error":
+                self._add_error(f'{self.market} error: {message.get("errorMessage")}')
+            return
+        # [channel id, payload, ..., channel name, pair], the book updates of both sides come as 2 payloads
+        channel_name, pair = message[-2], message[-1]
+        sym = self.get_sym(pair)
+        if channel_name.startswith(BOOK):
+            await self._on_book(sym, message[1:-2])
+        elif channel_name == TICKER:
+            await self._on_ticker(sym, message[1])
+
+    async def _on_book(self, sym, payloads):
+        subscription = self.subscriptions.get(BOOK, sym)
+        if subscription is None:
+            return
+        book = self.books.get(sym)
+        checksum = None
+        for payload in payloads:
+            if "as" in payload or "bs" in payload:
+                book = L2Book(sym, self.market, subscription.n_levels)
+                self.books[sym] = book
+            if book is None:
+                # updates received before the snapshot
+                return
+            for key, is_bid in [("as", False), ("bs", True), ("a", False), ("b", True)]:
+                levels = payload.get(key)
+                if levels:
+                    book.update_levels(is_bid, levels)
+                    # [price, size, timestamp] and an optional flag
+                    timestamp = max(float(level[2]) for level in levels)
+                    book.market_timestamp = max(book.market_timestamp, seconds_to_micros(timestamp))
+            checksum = payload.get("c", checksum)
+        book.truncate(get_book_depth(subscription.n_levels))
+        if checksum is not None and not book.check_kraken_checksum(checksum):
+            await self._resync(subscription)
+            return
+        await self._emit(subscription, book.to_orderbook())
+
+    async def _on_ticker(self, sym, payload):
+        subscription = self.subscriptions.get(TICKER, sym)
+        if subscription is None:
+            return
+        # [price, whole lot volume, lot volume]
+        bid, _, bid_size = payload["b"]
+        ask, _, ask_size = payload["a"]
+        # the ticker has no timestamp
+        market_timestamp = datetime.datetime.now()
+        await self._emit(subscription, make_tob_quote(sym, bid, bid_size, ask, ask_size, market_timestamp))
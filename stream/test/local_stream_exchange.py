@@ -0,0 +1,100 @@
+"""
+A local stand-in for the websocket apis of the exchanges, to test the streams without network
+
+usage:
+    exchange = LocalStreamExchange(on_message)
+    await exchange.start()
+    stream = exchange.connect(MarketDataStreamApiKrakenSpot())
+    ...
+    await exchange.stop()
+"""
+import asyncio
+import inspect
+import json
+
+from aiohttp import web, WSMsgType
+
+
+class LocalStreamExchange:
+
+    def __init__(self, on_message=None):
+        """
+
+        :param on_message: function, (message) -> list of json messages to answer, called with each json message
+            received, can be a coroutine function
+        """
+        self.on_message = on_message
+        # json messages received, over all connections
+        self.received = []
+        # the websockets currently open
+        self.connections = []
+        self.n_connections = 0
+        self.runner = None
+        self.url = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/', self._handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f'ws://127.0.0.1:{port}/'
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections.append(ws)
+        self.n_connections += 1
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    break
+                message = json.loads(message.data)
+                self.received.append(message)
+                replies = self.on_message(message) if self.on_message is not None else []
+                if inspect.isawaitable(replies):
+                    replies = await replies
+                for reply in replies or []:
+                    await ws.send_str(json.dumps(reply))
+        finally:
+            self.connections.remove(ws)
+        return ws
+
+    async def send(self, message):
+        """
+        Send a message on every open connection
+
+        :param message: json
+        """
+        for ws in list(self.connections):
+            await ws.send_str(json.dumps(message))
+
+    async def drop(self):
+        """
+        Close every open connection, as if the exchange went down
+        """
+        for ws in list(self.connections):
+            await ws.close()
+
+    async def wait_for(self, condition, timeout=5.):
+        """
+        :param condition: function, () -> bool
+        :param timeout: float, in seconds
+        """
+        async def wait():
+            while not condition():
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(wait(), timeout)
+
+    def connect(self, stream):
+        """
+        :param stream: MarketDataStreamApi
+        :return: MarketDataStreamApi, stream
+        """
+        stream.ws_url = self.url
+        return stream
+
+    async def stop(self):
+        await self.runner.cleanup()
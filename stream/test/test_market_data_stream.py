@@ -0,0 +1,280 @@
+import asyncio
+import os
+import unittest
+import zlib
+
+from core import root_folder
+from core.src.column_names import BID, ASK, ASK_SIZE, SYM, MID
+from core.src.instrument_types import SPOT
+from core.src.markets import KRAKEN, DERIBIT
+from core.src.spot_syms import ETHUSD, BTCUSD
+
+dir_path = os.path.dirname(os.path.realpath(__file__))
+root_folder.ROOT_FOLDER = dir_path + '/../../'
+
+from stream.src.market_data_stream import N_ERRORS, MAX_ERROR_LENGTH
+from stream.src.market_data_stream_deribit_option import MarketDataStreamApiDeribitOption
+from stream.src.market_data_stream_factory import make_market_data_stream_api
+from stream.src.market_data_stream_kraken_future import MarketDataStreamApiKrakenFuture
+from stream.src.market_data_stream_kraken_spot import MarketDataStreamApiKrakenSpot
+from stream.test.local_stream_exchange import LocalStreamExchange
+
+FUTURE_ETHUSD = 'FUT_ETHUSD_PERP'
+OPTION_ETHUSD = 'C_ETHUSD_230526_1200'
+
+
+def kraken_spot_on_message(message):
+    if message.get('event') != 'subscribe':
+        return []
+    pair = message['pair'][0]
+    status = {'event': 'subscriptionStatus', 'status': 'subscribed', 'pair': pair,
+              'subscription': message['subscription']}
+    if message['subscription']['name'] == 'ticker':
+        return [status, [1, {'a': ['101.5', 1, '1.0'], 'b': ['100.5', 2, '2.0']}, 'ticker', pair]]
+    depth = message['subscription']['depth']
+    snapshot = [0, {'as': [['101.5', '1.0', '1700000000.1'], ['102.5', '3.0', '1700000000.2']],
+                    'bs': [['100.5', '2.0', '1700000000.3'], ['99.5', '4.0', '1700000000.4']]},
+                f'book-{depth}', pair]
+    return [status, snapshot]
+
+
+async def next_update(stream, timeout=5.):
+    return await asyncio.wait_for(stream.__anext__(), timeout)
+
+
+class TestMarketDataStreamKrakenSpot(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.exchange = LocalStreamExchange(kraken_spot_on_message)
+        await self.exchange.start()
+        self.stream = self.exchange.connect(MarketDataStreamApiKrakenSpot(reconnect_delay=0.01))
+        self.stream.__aiter__()
+
+    async def asyncTearDown(self):
+        await self.stream.close()
+        await self.exchange.stop()
+
+    def test_format_sym(self):
+        self.assertEqual(self.stream.format_sym_for_market(BTCUSD), 'XBT/USD')
+        self.assertEqual(self.stream.format_sym_back('XBT/USD'), BTCUSD)
+        self.assertEqual(self.stream.format_sym_back('ETH/USD'), ETHUSD)
+
+    async def test_orderbook(self):
+        books = []
+        await self.stream.subscribe_orderbook(ETHUSD, 2, callback=books.append)
+        await self.stream.start()
+        ob = await next_update(self.stream)
+        self.assertEqual(self.exchange.received[0]['subscription'], {'name': 'book', 'depth': 10})
+        self.assertEqual(ob.sym, ETHUSD)
+        self.assertEqual(ob.market, KRAKEN)
+        self.assertEqual(ob.bid_prices.tolist(), [100.5, 99.5])
+        self.assertEqual(ob.ask_sizes.tolist(), [1.0, 3.0])
+        self.assertEqual(ob.market_timestamp, 1700000000400000)
+
+        # an update of both sides: the best ask is removed and a bid is added
+        checksum = zlib.crc32(b'1025' b'30' b'1008' b'10' b'1005' b'20' b'995' b'40')
+        await self.exchange.send([0, {'a': [['101.5', '0.00000000', '1700000001.0']]},
+                                  {'b': [['100.8', '1.0', '1700000001.5']], 'c': str(checksum)}, 'book-10', 'ETH/USD'])
+        ob = await next_update(self.stream)
+        self.assertEqual(ob.bid_prices.tolist(), [100.8, 100.5])
+        self.assertEqual(ob.ask_prices.tolist(), [102.5])
+        self.assertEqual(ob.market_timestamp, 1700000001500000)
+        self.assertIs(books[-1], ob)
+        self.assertEqual(len(books), 2)
+        self.assertEqual(ob.to_frame().shape, (1, 9))
+
+    async def test_checksum(self):
+        await self.stream.subscribe_orderbook(ETHUSD, 2)
+        await self.stream.start()
+        await next_update(self.stream)
+        # the book is out of sync, it is subscribed again and rebuilt from a new snapshot
+        await self.exchange.send([0, {'b': [['100.8', '1.0', '1700000001.5']], 'c': '123'}, 'book-10', 'ETH/USD'])
+        ob = await next_update(self.stream)
+        self.assertEqual(self.stream.n_resyncs, 1)
+        self.assertEqual([message['event'] for message in self.exchange.received], ['subscribe', 'unsubscribe',
+                                                                                    'subscribe'])
+        self.assertEqual(ob.bid_prices.tolist(), [100.5, 99.5])
+
+    async def test_tob_quote(self):
+        async with self.stream:
+            await self.stream.subscribe_tob_quote(ETHUSD)
+            quote = await next_update(self.stream)
+        self.assertEqual(quote[SYM], ETHUSD)
+        self.assertEqual(quote[BID], 100.5)
+        self.assertEqual(quote[ASK_SIZE], 1.0)
+        self.assertEqual(quote[MID], 101.)
+
+    async def test_reconnect(self):
+        await self.stream.subscribe_orderbook(ETHUSD, 2)
+        await self.stream.subscribe_tob_quote(BTCUSD)
+        await self.stream.start()
+        await self.exchange.wait_for(lambda: len(self.exchange.received) == 2)
+        await self.exchange.drop()
+        # every subscription is sent again on the new connection
+        await self.exchange.wait_for(lambda: len(self.exchange.received) == 4)
+        self.assertEqual(self.stream.n_connections, 2)
+        self.assertEqual(self.exchange.received[2:], self.exchange.received[:2])
+
+        await self.stream.unsubscribe_orderbook(ETHUSD)
+        await self.exchange.wait_for(lambda: len(self.exchange.received) == 5)
+        self.assertEqual(self.exchange.received[-1]['event'], 'unsubscribe')
+        self.assertNotIn(ETHUSD, self.stream.books)
+
+    async def test_stale_connection(self):
+        # nothing is sent by the exchange once subscribed
+        self.stream.stale_timeout = 0.1
+        await self.stream.start()
+        await self.exchange.wait_for(lambda: self.stream.n_connections >= 3)
+
+    async def test_errors(self):
+        await self.stream.start()
+        await self.stream.wait_connected(5)
+        await self.exchange.send({'event': 'subscriptionStatus', 'status': 'error', 'errorMessage': 'Currency pair '
+                                                                                                    'not supported'})
+        await self.exchange.send(['not', 'a', 'book', 'UNKNOWN'])
+        await self.exchange.wait_for(lambda: len(self.stream.errors) == 2)
+        self.assertEqual(self.stream.errors[0], 'KRAKEN error: Currency pair not supported')
+        with self.assertRaises(Exception):
+            await self.stream.subscribe_orderbook(ETHUSD, 2000)
+
+    async def test_errors_are_bounded(self):
+        await self.stream.start()
+        await self.stream.wait_connected(5)
+        for _ in range(N_ERRORS + 10):
+            await self.exchange.send(['x' * 10000, 'book', 'UNKNOWN'])
+        await self.exchange.wait_for(lambda: self.stream.n_errors == N_ERRORS + 10)
+        self.assertEqual(len(self.stream.errors), N_ERRORS)
+        self.assertTrue(all(len(error) <= MAX_ERROR_LENGTH + 3 for error in self.stream.errors))
+
+
+class TestMarketDataStreamKrakenFuture(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.exchange = LocalStreamExchange(self.on_message)
+        await self.exchange.start()
+        self.stream = self.exchange.connect(MarketDataStreamApiKrakenFuture())
+        self.stream.__aiter__()
+
+    async def asyncTearDown(self):
+        await self.stream.close()
+        await self.exchange.stop()
+
+    @staticmethod
+    def on_message(message):
+        if message.get('event') != 'subscribe' or message['feed'] != 'book':
+            return []
+        product_id = message['product_ids'][0]
+        return [{'feed': 'book_snapshot', 'product_id': product_id, 'timestamp': 1700000000000, 'seq': 10,
+                 'bids': [{'price': 1800.0, 'qty': 5.0}, {'price': 1799.5, 'qty': 1.0}],
+                 'asks': [{'price': 1801.0, 'qty': 2.0}]}]
+
+    async def test_orderbook(self):
+        await self.stream.subscribe_orderbook(FUTURE_ETHUSD, 1)
+        await self.stream.start()
+        ob = await next_update(self.stream)
+        self.assertEqual(self.exchange.received[0], {'event': 'subscribe', 'feed': 'heartbeat'})
+        self.assertEqual(self.exchange.received[1]['product_ids'], ['PI_ETHUSD'])
+        self.assertEqual(ob.sym, FUTURE_ETHUSD)
+        self.assertEqual(ob.bid_prices.tolist(), [1800.0])
+        self.assertEqual(ob.market_timestamp, 1700000000000000)
+
+        await self.exchange.send({'feed': 'book', 'product_id': 'PI_ETHUSD', 'side': 'buy', 'seq': 11,
+                                  'price': 1800.0, 'qty': 0.0, 'timestamp': 1700000001000})
+        ob = await next_update(self.stream)
+        self.assertEqual(ob.bid_prices.tolist(), [1799.5])
+
+        # seq 12 is lost, the book is subscribed again and rebuilt from a new snapshot
+        await self.exchange.send({'feed': 'book', 'product_id': 'PI_ETHUSD', 'side': 'sell', 'seq': 13,
+                                  'price': 1800.5, 'qty': 1.0, 'timestamp': 1700000002000})
+        ob = await next_update(self.stream)
+        self.assertEqual(self.stream.n_resyncs, 1)
+        self.assertEqual([message['event'] for message in self.exchange.received[-2:]], ['unsubscribe', 'subscribe'])
+        self.assertEqual(ob.bid_prices.tolist(), [1800.0])
+
+    async def test_tob_quote(self):
+        await self.stream.subscribe_tob_quote(FUTURE_ETHUSD)
+        await self.stream.start()
+        await self.stream.wait_connected(5)
+        await self.exchange.send({'feed': 'ticker', 'product_id': 'PI_ETHUSD', 'bid': 1800.0, 'ask': 1801.0,
+                                  'bid_size': 5.0, 'ask_size': 2.0, 'time': 1700000000000})
+        quote = await next_update(self.stream)
+        self.assertEqual(quote[SYM], FUTURE_ETHUSD)
+        self.assertEqual(quote[ASK], 1801.0)
+
+
+class TestMarketDataStreamDeribitOption(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.exchange = LocalStreamExchange(self.on_message)
+        await self.exchange.start()
+        self.stream = self.exchange.connect(MarketDataStreamApiDeribitOption())
+        self.stream.__aiter__()
+
+    async def asyncTearDown(self):
+        await self.stream.close()
+        await self.exchange.stop()
+
+    @staticmethod
+    def on_message(message):
+        if message['method'] == 'public/set_heartbeat':
+            return [{'jsonrpc': '2.0', 'id': message['id'], 'result': 'ok'},
+                    {'jsonrpc': '2.0', 'method': 'heartbeat', 'params': {'type': 'test_request'}}]
+        if message['method'] != 'public/subscribe':
+            return []
+        replies = [{'jsonrpc': '2.0', 'id': message['id'], 'result': message['params']['channels']}]
+        # the book comes before the ticker
+        for channel in sorted(message['params']['channels']):
+            if channel.startswith('book.'):
+                data = {'timestamp': 1700000000000, 'instrument_name': 'ETH-26MAY23-1200-C', 'change_id': 1,
+                        'bids': [[0.01, 10.0]], 'asks': [[0.012, 5.0], [0.013, 1.0]]}
+            else:
+                data = {'timestamp': 1700000000100, 'instrument_name': 'ETH-26MAY23-1200-C', 'underlying_price': 2000.,
+                        'best_bid_price': 0.01, 'best_bid_amount': 10.0, 'best_ask_price': 0.012,
+                        'best_ask_amount': 5.0}
+            replies.append({'jsonrpc': '2.0', 'method': 'subscription', 'params': {'channel': channel, 'data': data}})
+        return replies
+
+    async def test_orderbook(self):
+        await self.stream.subscribe_orderbook(OPTION_ETHUSD, 5)
+        await self.stream.start()
+        ob = await next_update(self.stream)
+        self.assertEqual(self.exchange.received[0]['params'], {'interval': 30})
+        self.assertEqual(self.exchange.received[1]['params']['channels'],
+                         ['ticker.ETH-26MAY23-1200-C.100ms', 'book.ETH-26MAY23-1200-C.none.10.100ms'])
+        self.assertEqual(ob.sym, OPTION_ETHUSD)
+        self.assertEqual(ob.market, DERIBIT)
+        # in usd
+        self.assertEqual(ob.bid_prices.tolist(), [20.0])
+        self.assertEqual(ob.ask_prices.tolist(), [24.0, 26.0])
+        self.assertEqual(ob.market_timestamp, 1700000000000000)
+        # the test request of the heartbeat is answered
+        await self.exchange.wait_for(lambda: self.exchange.received[-1]['method'] == 'public/test')
+
+    async def test_tob_quote(self):
+        await self.stream.subscribe_tob_quote(OPTION_ETHUSD)
+        await self.stream.start()
+        quote = await next_update(self.stream)
+        self.assertEqual(quote[BID], 20.0)
+        self.assertEqual(quote[ASK], 24.0)
+
+        await self.stream.subscribe_orderbook(OPTION_ETHUSD, 1)
+        await next_update(self.stream)
+        await self.stream.unsubscribe_orderbook(OPTION_ETHUSD)
+        await self.exchange.wait_for(lambda: self.exchange.received[-1]['method'] == 'public/unsubscribe')
+        # the ticker is still needed by the quotes
+        self.assertEqual(self.exchange.received[-1]['params']['channels'], ['book.ETH-26MAY23-1200-C.none.1.100ms'])
+
+
+class TestMarketDataStreamFactory(unittest.TestCase):
+
+    def test_make_market_data_stream_api(self):
+        stream = make_market_data_stream_api(KRAKEN, SPOT, heartbeat=10.)
+        self.assertIsInstance(stream, MarketDataStreamApiKrakenSpot)
+        self.assertEqual(stream.ws_url, 'wss://ws.kraken.com')
+        self.assertEqual(stream.heartbeat, 10.)
+        with self.assertRaises(Exception):
+            make_market_data_stream_api(DERIBIT, SPOT)
+
+
+if __name__ == '__main__':
+    unittest.main()